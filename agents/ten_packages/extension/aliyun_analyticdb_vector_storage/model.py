@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 from alibabacloud_gpdb20160503 import models as gpdb_20160503_models  # type: ignore
+import re
 import time
 import json
 from typing import Dict, List, Any, Tuple
@@ -246,7 +247,7 @@ class Model:
         collection,
         namespace,
         namespace_password,
-        rows: List[Tuple[str, str, List[float]]] = None,
+        rows: List[Tuple] = None,  # (file_name, content, vector[, id])
     ) -> None:
         try:
             request_rows = []
@@ -259,8 +260,11 @@ class Model:
                     "file_name": file_name,
                     "content": content,
                 }
+                # an optional row id replaces the row previously upserted with it
                 request_row = gpdb_20160503_models.UpsertCollectionDataRequestRows(
-                    metadata=metadata, vector=vector
+                    id=row[3] if len(row) > 3 else None,
+                    metadata=metadata,
+                    vector=vector,
                 )
                 request_rows.append(request_row)
             upsert_collection_data_request = (
@@ -291,7 +295,7 @@ class Model:
         collection,
         namespace,
         namespace_password,
-        rows: List[Tuple[str, str, List[float]]] = None,
+        rows: List[Tuple] = None,  # (file_name, content, vector[, id])
     ) -> None:
         try:
             request_rows = []
@@ -304,8 +308,11 @@ class Model:
                     "file_name": file_name,
                     "content": content,
                 }
+                # an optional row id replaces the row previously upserted with it
                 request_row = gpdb_20160503_models.UpsertCollectionDataRequestRows(
-                    metadata=metadata, vector=vector
+                    id=row[3] if len(row) > 3 else None,
+                    metadata=metadata,
+                    vector=vector,
                 )
                 request_rows.append(request_row)
             upsert_collection_data_request = (
@@ -333,6 +340,38 @@ class Model:
             self.ten_env.log_error(f"Error: {e}")
             return e
 
+    async def delete_collection_data_async(
+        self, collection, namespace, namespace_password, ids: List[str]
+    ) -> None:
+        try:
+            # ids are generated by file_chunker, reject anything that could escape the quotes
+            if not all(re.fullmatch(r"[0-9A-Za-z_-]+", i) for i in ids):
+                raise ValueError(f"invalid ids {ids}")
+            request = gpdb_20160503_models.DeleteCollectionDataRequest(
+                region_id=self.region_id,
+                dbinstance_id=self.dbinstance_id,
+                collection=collection,
+                namespace_password=namespace_password,
+                namespace=namespace,
+                collection_data_filter="id IN ({})".format(
+                    ",".join(f"'{i}'" for i in ids)
+                ),
+            )
+            runtime = util_models.RuntimeOptions(
+                read_timeout=self.read_timeout, connect_timeout=self.connect_timeout
+            )
+            response = (
+                await self.get_client().delete_collection_data_with_options_async(
+                    request, runtime
+                )
+            )
+            self.ten_env.log_debug(
+                f"delete_collection_data response code: {response.status_code}, body:{response.body}"
+            )
+        except Exception as e:
+            self.ten_env.log_error(f"Error: {e}")
+            return e
+
     # pylint: disable=redefined-builtin
     def query_collection_data(
         self,
@@ -427,16 +466,23 @@ class Model:
             self.ten_env.log_error(f"Error: {e}")
             return None, e
 
+    def collection_matches(
+        self, body: gpdb_20160503_models.QueryCollectionDataResponseBody
+    ) -> List[Tuple[str, float]]:
+        """(content, score) of the matches, best first, read from the response model without converting it to a map."""
+        matches = body.matches.match if body.matches and body.matches.match else []
+        results = [(match.metadata["content"], match.score) for match in matches]
+        results.sort(key=lambda x: x[1], reverse=True)
+        return results
+
     def parse_collection_data(
         self, body: gpdb_20160503_models.QueryCollectionDataResponseBody
     ) -> str:
         try:
-            matches = body.to_map()["Matches"]["match"]
             results = [
-                {"content": match["Metadata"]["content"], "score": match["Score"]}
-                for match in matches
+                {"content": content, "score": score}
+                for content, score in self.collection_matches(body)
             ]
-            results.sort(key=lambda x: x["score"], reverse=True)
             json_str = json.dumps(results)
             return json_str
         except Exception as e:
@@ -2,6 +2,8 @@
 #
 
 import asyncio
+import heapq
+import itertools
 import os
 import json
 from ten import (
@@ -16,6 +18,11 @@ from ten import (
 import threading
 from datetime import datetime
 
+from ten_ai_base.vectors import decode_vector, decode_vectors, encode_vectors
+
+# sub-queries of a query_vector_batch in flight at once
+DEFAULT_QUERY_CONCURRENCY = 8
+
 
 class AliPGDBExtension(Extension):
     def __init__(self, name):
@@ -32,6 +39,7 @@ class AliPGDBExtension(Extension):
         self.account_password = os.environ.get("ADBPG_ACCOUNT_PASSWORD")
         self.namespace = os.environ.get("ADBPG_NAMESPACE")
         self.namespace_password = os.environ.get("ADBPG_NAMESPACE_PASSWORD")
+        self.query_concurrency = DEFAULT_QUERY_CONCURRENCY
 
     async def __thread_routine(self, ten_env: TenEnv):
         ten_env.log_info("__thread_routine start")
@@ -67,6 +75,11 @@ class AliPGDBExtension(Extension):
             ten, "ADBPG_NAMESPACE_PASSWORD", self.namespace_password
         )
 
+        try:
+            self.query_concurrency = max(ten.get_property_int("query_concurrency"), 1)
+        except Exception as e:
+            ten.log_warn(f"query_concurrency not set, use {self.query_concurrency}: {e}")
+
         if self.region_id in (
             "cn-beijing",
             "cn-hangzhou",
@@ -131,6 +144,14 @@ class AliPGDBExtension(Extension):
                 asyncio.run_coroutine_threadsafe(
                     self.async_query_vector(ten, cmd), self.loop
                 )
+            elif cmd_name == "query_vector_batch":
+                asyncio.run_coroutine_threadsafe(
+                    self.async_query_vector_batch(ten, cmd), self.loop
+                )
+            elif cmd_name == "delete_vector":
+                asyncio.run_coroutine_threadsafe(
+                    self.async_delete_vector(ten, cmd), self.loop
+                )
             else:
                 ten.return_result(CmdResult.create(StatusCode.ERROR), cmd)
         except Exception:
@@ -163,9 +184,20 @@ class AliPGDBExtension(Extension):
         start_time = datetime.now()
         collection = cmd.get_property_string("collection_name")
         file = cmd.get_property_string("file_name")
-        content = cmd.get_property_string("content")
-        obj = json.loads(content)
-        rows = [(file, item["text"], item["embedding"]) for item in obj]
+        embeddings_buf = self.get_property_buf(cmd, "embeddings_buf")
+        if embeddings_buf:
+            texts = json.loads(cmd.get_property_to_json("texts"))
+            embeddings = decode_vectors(embeddings_buf)
+            rows = [(file, text, embedding) for text, embedding in zip(texts, embeddings)]
+        else:
+            content = cmd.get_property_string("content")
+            obj = json.loads(content)
+            rows = [(file, item["text"], item["embedding"]) for item in obj]
+        try:
+            ids = json.loads(cmd.get_property_to_json("ids"))
+            rows = [row + (row_id,) for row, row_id in zip(rows, ids)]
+        except Exception:
+            pass  # rows without id
 
         err = await self.model.upsert_collection_data_async(
             collection, self.namespace, self.namespace_password, rows
@@ -181,14 +213,17 @@ class AliPGDBExtension(Extension):
     async def async_query_vector(self, ten: TenEnv, cmd: Cmd):
         start_time = datetime.now()
         collection = cmd.get_property_string("collection_name")
-        embedding = cmd.get_property_to_json("embedding")
         top_k = cmd.get_property_int("top_k")
-        vector = json.loads(embedding)
+        embedding_buf = self.get_property_buf(cmd, "embedding_buf")
+        if embedding_buf:
+            vector = decode_vector(embedding_buf)
+        else:
+            vector = json.loads(cmd.get_property_to_json("embedding"))
         response, error = await self.model.query_collection_data_async(
             collection, self.namespace, self.namespace_password, vector, top_k=top_k
         )
         ten.log_info(
-            f"query_vector finished for collection {collection}, embedding len {len(embedding)}, err {error}, cost {int((datetime.now() - start_time).total_seconds() * 1000)}ms"
+            f"query_vector finished for collection {collection}, embedding len {len(vector)}, err {error}, cost {int((datetime.now() - start_time).total_seconds() * 1000)}ms"
         )
 
         if error:
@@ -199,6 +234,91 @@ class AliPGDBExtension(Extension):
             ret.set_property_from_json("response", body)
             ten.return_result(ret, cmd)
 
+    async def async_query_vector_batch(self, ten: TenEnv, cmd: Cmd):
+        """
+        Query every embedding in every collection, with at most query_concurrency
+        sub-queries in flight, and merge the top_k matches of each embedding across
+        the collections. The matches of embedding i are response[i], their scores
+        row i of scores_buf, padded with NaN when there are fewer than top_k.
+        """
+        start_time = datetime.now()
+        collections = json.loads(cmd.get_property_to_json("collection_names"))
+        top_k = cmd.get_property_int("top_k")
+        embeddings_buf = self.get_property_buf(cmd, "embeddings_buf")
+        if embeddings_buf:
+            vectors = decode_vectors(embeddings_buf)
+        else:
+            vectors = json.loads(cmd.get_property_to_json("embeddings"))
+
+        semaphore = asyncio.Semaphore(self.query_concurrency)
+
+        async def query(vector, collection):
+            async with semaphore:
+                response, error = await self.model.query_collection_data_async(
+                    collection,
+                    self.namespace,
+                    self.namespace_password,
+                    vector,
+                    top_k=top_k,
+                    include_metadata_fields="content",
+                    include_values=False,
+                )
+            if error:
+                return None
+            try:
+                return [
+                    (score, content, collection)
+                    for content, score in self.model.collection_matches(response.body)
+                ]
+            except Exception as e:
+                ten.log_error(f"parse matches of collection {collection} failed: {e}")
+                return None
+
+        results = await asyncio.gather(
+            *[query(vector, collection) for vector in vectors for collection in collections]
+        )
+        failed = sum(1 for matches in results if matches is None)
+        ten.log_info(
+            f"query_vector_batch finished for {len(vectors)} embeddings in collections {collections}, failed {failed}/{len(results)}, cost {int((datetime.now() - start_time).total_seconds() * 1000)}ms"
+        )
+        if results and failed == len(results):
+            return ten.return_result(CmdResult.create(StatusCode.ERROR), cmd)
+
+        response, scores = [], []
+        for i in range(len(vectors)):
+            matches = results[i * len(collections) : (i + 1) * len(collections)]
+            best = heapq.nlargest(
+                top_k,
+                itertools.chain.from_iterable(m for m in matches if m),
+                key=lambda match: match[0],
+            )
+            response.append(
+                [{"content": content, "collection": coll} for _, content, coll in best]
+            )
+            scores.append(
+                [score for score, _, _ in best] + [float("nan")] * (top_k - len(best))
+            )
+
+        ret = CmdResult.create(StatusCode.OK)
+        ret.set_property_from_json("response", json.dumps(response))
+        ret.set_property_buf("scores_buf", encode_vectors(scores) if scores else b"")
+        ret.set_property_int("failed", failed)
+        ten.return_result(ret, cmd)
+
+    async def async_delete_vector(self, ten: TenEnv, cmd: Cmd):
+        collection = cmd.get_property_string("collection_name")
+        ids = json.loads(cmd.get_property_to_json("ids"))
+        err = await self.model.delete_collection_data_async(
+            collection, self.namespace, self.namespace_password, ids
+        )
+        ten.log_info(
+            f"delete_vector finished for collection {collection}, ids len {len(ids)}, err {err}"
+        )
+        if err is None:
+            ten.return_result(CmdResult.create(StatusCode.OK), cmd)
+        else:
+            ten.return_result(CmdResult.create(StatusCode.ERROR), cmd)
+
     async def async_delete_collection(self, ten: TenEnv, cmd: Cmd):
         collection = cmd.get_property_string("collection_name")
         # pylint: disable=too-many-function-args
@@ -216,3 +336,9 @@ class AliPGDBExtension(Extension):
         except Exception as e:
             ten.log_error(f"Error: {e}")
             return default
+
+    def get_property_buf(self, cmd: Cmd, key: str) -> bytes | None:
+        try:
+            return cmd.get_property_buf(key)
+        except Exception:
+            return None
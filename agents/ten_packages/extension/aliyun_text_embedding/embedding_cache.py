@@ -0,0 +1,201 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+import hashlib
+import json
+import os
+import threading
+from typing import List, Optional, Tuple
+import unicodedata
+
+import numpy as np
+
+INDEX_FILE = "index.jsonl"
+VECTORS_FILE = "embeddings.f32"
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(model: str, text: str) -> str:
+    """Content address of the embedding of text by model."""
+    return hashlib.blake2b(
+        f"{model}\n{normalize_text(text)}".encode("utf-8"), digest_size=16
+    ).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Thread safe embedding cache, keyed by cache_key.
+
+    Vectors are kept as float32 in an LRU bounded by max_entries and max_bytes. With a
+    cache_dir they are also appended to a float32 file read through a memory map, with
+    a jsonl index of key, offset and dimension, so they survive restarts.
+    """
+
+    def __init__(
+        self, max_entries: int = 10000, max_bytes: int = 256 << 20, cache_dir: str = ""
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.lock = threading.Lock()
+
+        self.entries: OrderedDict[str, np.ndarray] = OrderedDict()
+        self.bytes = 0
+
+        self.disk_index: dict[str, Tuple[int, int]] = {}
+        self.disk_size = 0  # float32 values in the vectors file
+        self.disk_map: Optional[np.memmap] = None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._load_index()
+
+    def _load_index(self) -> None:
+        vectors_path = os.path.join(self.cache_dir, VECTORS_FILE)
+        index_path = os.path.join(self.cache_dir, INDEX_FILE)
+        if os.path.exists(vectors_path):
+            size = os.path.getsize(vectors_path)
+            self.disk_size = size // 4
+            if size % 4:
+                # Drop the bytes of a torn append, later vectors must start on a float
+                os.truncate(vectors_path, self.disk_size * 4)
+        if not os.path.exists(index_path):
+            return
+        with open(index_path, "rb") as f:
+            content = f.read()
+        dropped = False
+        for line in content.splitlines():
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                dropped = True  # torn write
+                continue
+            # Ignore entries whose vector was not fully written
+            if entry["offset"] + entry["dim"] <= self.disk_size:
+                self.disk_index[entry["key"]] = (entry["offset"], entry["dim"])
+            else:
+                dropped = True
+        if dropped or (content and not content.endswith(b"\n")):
+            # Rewrite the index without them: the next entry would be appended to a torn
+            # line, and later vectors would make an entry of a lost one look valid
+            tmp = index_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                for key, (offset, dim) in self.disk_index.items():
+                    f.write(json.dumps({"key": key, "offset": offset, "dim": dim}) + "\n")
+            os.replace(tmp, index_path)
+
+    def _read_disk(self, offset: int, dim: int) -> np.ndarray:
+        if self.disk_map is None or len(self.disk_map) < offset + dim:
+            self.disk_map = np.memmap(
+                os.path.join(self.cache_dir, VECTORS_FILE),
+                dtype=np.float32,
+                mode="r",
+                shape=(self.disk_size,),
+            )
+        return np.array(self.disk_map[offset : offset + dim])
+
+    def _write_disk(self, key: str, vector: np.ndarray) -> None:
+        with open(os.path.join(self.cache_dir, VECTORS_FILE), "ab") as f:
+            f.write(vector.tobytes())
+        with open(
+            os.path.join(self.cache_dir, INDEX_FILE), "a", encoding="utf-8"
+        ) as f:
+            f.write(
+                json.dumps({"key": key, "offset": self.disk_size, "dim": len(vector)})
+                + "\n"
+            )
+        self.disk_index[key] = (self.disk_size, len(vector))
+        self.disk_size += len(vector)
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        if key in self.entries:
+            self.bytes -= self.entries.pop(key).nbytes
+        self.entries[key] = vector
+        self.bytes += vector.nbytes
+        while self.entries and (
+            len(self.entries) > self.max_entries or self.bytes > self.max_bytes
+        ):
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes -= evicted.nbytes
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self.lock:
+            vector = self.entries.get(key)
+            if vector is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return vector.tolist()
+
+            location = self.disk_index.get(key)
+            if location is not None:
+                vector = self._read_disk(*location)
+                self._remember(key, vector)
+                self.disk_hits += 1
+                return vector.tolist()
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, embedding: List[float]) -> List[float]:
+        """Cache an embedding, return it as it will be returned by get."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        with self.lock:
+            self._remember(key, vector)
+            if self.cache_dir and key not in self.disk_index:
+                self._write_disk(key, vector)
+        return vector.tolist()
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (
+                    round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0
+                ),
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "disk_entries": len(self.disk_index),
+            }
+
+
+class RequestCoalescer:
+    """
+    Lets concurrent requests for the same key share one vendor call: the first caller
+    of claim owns the key and must resolve or fail it, the others wait on its future.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.inflight: dict[str, Future] = {}
+        self.coalesced = 0
+
+    def claim(self, key: str) -> Tuple[Future, bool]:
+        """Return the future of key and whether the caller owns it."""
+        with self.lock:
+            future = self.inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = self.inflight[key] = Future()
+            return future, True
+
+    def resolve(self, key: str, embedding: List[float]) -> None:
+        with self.lock:
+            future = self.inflight.pop(key, None)
+        if future is not None:
+            future.set_result(embedding)
+
+    def fail(self, key: str, error: Exception) -> None:
+        with self.lock:
+            future = self.inflight.pop(key, None)
+        if future is not None:
+            future.set_exception(error)
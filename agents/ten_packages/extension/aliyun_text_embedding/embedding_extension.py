@@ -1,47 +1,75 @@
 from ten import (
-    Extension,
-    TenEnv,
+    AsyncExtension,
+    AsyncTenEnv,
     Cmd,
     StatusCode,
     CmdResult,
 )
 
+import asyncio
 import json
-from typing import Generator, List
+from typing import List, Optional, Tuple
 from http import HTTPStatus
-import threading, queue
 from datetime import datetime
 
+from ten_ai_base.const import PROPERTY_VECTOR_FORMAT, VECTOR_FORMAT_F32
+from ten_ai_base.vectors import encode_vector, encode_vectors
+
+from .embedding_cache import EmbeddingCache, RequestCoalescer, cache_key
+from .micro_batcher import MicroBatcher
+
 CMD_EMBED = "embed"
 CMD_EMBED_BATCH = "embed_batch"
 
 FIELD_KEY_EMBEDDING = "embedding"
 FIELD_KEY_EMBEDDINGS = "embeddings"
+FIELD_KEY_EMBEDDING_BUF = "embedding_buf"
+FIELD_KEY_EMBEDDINGS_BUF = "embeddings_buf"
+FIELD_KEY_TEXT_INDEXES = "text_indexes"
 FIELD_KEY_MESSAGE = "message"
 FIELD_KEY_CODE = "code"
 
 DASHSCOPE_MAX_BATCH_SIZE = 6
 
 
-class EmbeddingExtension(Extension):
+class EmbeddingError(Exception):
+    def __init__(self, code: str, message: str):
+        super().__init__(f"{code}: {message}")
+        self.code = code
+        self.message = message
+
+
+class EmbeddingExtension(AsyncExtension):
     def __init__(self, name: str):
         super().__init__(name)
         self.api_key = ""
         self.model = ""
 
-        self.stop = False
-        self.queue = queue.Queue()
-        self.threads = []
-
-        # workaround to speed up the embedding process,
+        # texts of all commands are grouped into full dashscope batches, sent concurrently
         # should be replace by https://help.aliyun.com/zh/model-studio/developer-reference/text-embedding-batch-api?spm=a2c4g.11186623.0.0.24cb7453KSjdhC
         # once v3 models supported
-        self.parallel = 10
+        self.batch_max_wait_ms = 10
+        self.max_concurrency = 10
+        self.batcher: MicroBatcher = None
+
+        self.cache: EmbeddingCache = None
+        self.coalescer = RequestCoalescer()
 
-    def on_start(self, ten: TenEnv) -> None:
+    async def on_start(self, ten: AsyncTenEnv) -> None:
         ten.log_info("on_start")
-        self.api_key = self.get_property_string(ten, "api_key", self.api_key)
-        self.model = self.get_property_string(ten, "model", self.api_key)
+        self.api_key = await self.get_property_string(ten, "api_key", self.api_key)
+        self.model = await self.get_property_string(ten, "model", self.api_key)
+        self.cache = EmbeddingCache(
+            max_entries=await self.get_property_int(ten, "cache_max_entries", 10000),
+            max_bytes=await self.get_property_int(ten, "cache_max_mb", 256) << 20,
+            cache_dir=await self.get_property_string(ten, "cache_dir", ""),
+        )
+        self.batch_max_wait_ms = await self.get_property_int(
+            ten, "batch_max_wait_ms", self.batch_max_wait_ms
+        )
+        self.max_concurrency = await self.get_property_int(
+            ten, "max_concurrency", self.max_concurrency
+        )
 
         # lazy import packages which requires long time to load
         global dashscope  # pylint: disable=global-statement
@@ -49,98 +77,150 @@ class EmbeddingExtension(Extension):
 
         dashscope.api_key = self.api_key
 
-        for i in range(self.parallel):
-            thread = threading.Thread(target=self.async_handler, args=[i, ten])
-            thread.start()
-            self.threads.append(thread)
-
-        ten.on_start_done()
-
-    def async_handler(self, index: int, ten: TenEnv):
-        ten.log_info(f"async_handler {index} statend")
-
-        while not self.stop:
-            cmd = self.queue.get()
-            if cmd is None:
-                break
-
-            cmd_name = cmd.get_name()
-            start_time = datetime.now()
-            ten.log_info(f"async_handler {index} processing cmd {cmd_name}")
-
-            if cmd_name == CMD_EMBED:
-                cmd_result = self.call_with_str(cmd.get_property_string("input"), ten)
-                ten.return_result(cmd_result, cmd)
-            elif cmd_name == CMD_EMBED_BATCH:
-                inputs_list = json.loads(cmd.get_property_to_json("inputs"))
-                cmd_result = self.call_with_strs(inputs_list, ten)
-                ten.return_result(cmd_result, cmd)
-            else:
-                ten.log_warn("unknown cmd {cmd_name}")
-
-            ten.log_info(
-                f"async_handler {index} finished processing cmd {cmd_name}, cost {int((datetime.now() - start_time).total_seconds() * 1000)}ms"
-            )
-
-        ten.log_info(f"async_handler {index} stopped")
+        self.batcher = MicroBatcher(
+            lambda batch: self.call_dashscope(batch, ten),
+            DASHSCOPE_MAX_BATCH_SIZE,
+            max_wait_ms=self.batch_max_wait_ms,
+            max_concurrency=self.max_concurrency,
+        )
 
-    def call_with_str(self, message: str, ten: TenEnv) -> CmdResult:
+    async def call_dashscope(
+        self, batch: List[str], ten: AsyncTenEnv
+    ) -> List[Optional[List[float]]]:
         start_time = datetime.now()
+        # dashscope only has a blocking client, the batcher bounds the threads in use
         # pylint: disable=undefined-variable
-        response = dashscope.TextEmbedding.call(model=self.model, input=message)
+        response = await asyncio.to_thread(
+            dashscope.TextEmbedding.call, model=self.model, input=batch
+        )
         ten.log_info(
-            f"embedding call finished for input [{message}], status_code {response.status_code}, cost {int((datetime.now() - start_time).total_seconds() * 1000)}ms"
+            f"embedding call finished for {len(batch)} inputs, status_code {response.status_code}, cost {int((datetime.now() - start_time).total_seconds() * 1000)}ms"
         )
-
-        if response.status_code == HTTPStatus.OK:
+        if response.status_code != HTTPStatus.OK:
+            ten.log_error(f"call {batch} failed, errmsg: {response}")
+            raise EmbeddingError(response.status_code, response.message)
+
+        embeddings: List[Optional[List[float]]] = [None] * len(batch)
+        for emb in response.output["embeddings"]:
+            embeddings[emb["text_index"]] = emb["embedding"]
+        return embeddings
+
+    async def embed(
+        self, messages: List[str]
+    ) -> Tuple[List[Optional[List[float]]], Optional[EmbeddingError]]:
+        """
+        Embeddings of messages, None where they failed, and the last error. Each one comes
+        from the cache, from a request for the same text in flight in another command, or
+        from a dashscope batch shared with the texts of other commands.
+        """
+        results: List[Optional[List[float]]] = [None] * len(messages)
+        owned: dict[str, List[int]] = {}  # keys this call fetches -> indexes
+        waiting = []
+        last_error = None
+        for i, message in enumerate(messages):
+            key = cache_key(self.model, message)
+            if key in owned:
+                owned[key].append(i)
+                continue
+            embedding = self.cache.get(key)
+            if embedding is not None:
+                results[i] = embedding
+                continue
+            future, owner = self.coalescer.claim(key)
+            if owner:
+                owned[key] = [i]
+            else:
+                waiting.append((i, future))
+
+        if owned:
+            keys = list(owned)
+            try:
+                futures = self.batcher.submit([messages[owned[key][0]] for key in keys])
+                responses = await asyncio.gather(*futures, return_exceptions=True)
+                for key, response in zip(keys, responses):
+                    if isinstance(response, EmbeddingError):
+                        error = response
+                    elif isinstance(response, BaseException):
+                        error = EmbeddingError("500", repr(response))
+                    elif response is None:
+                        error = EmbeddingError("500", "no embedding returned")
+                    else:
+                        error = None
+                    if error:
+                        self.coalescer.fail(key, error)
+                        last_error = error
+                        continue
+                    embedding = self.cache.put(key, response)
+                    self.coalescer.resolve(key, embedding)
+                    for i in owned[key]:
+                        results[i] = embedding
+            finally:
+                # never leave other commands waiting on a key this call gave up on
+                for key in keys:
+                    self.coalescer.fail(key, EmbeddingError("500", "request aborted"))
+
+        for i, future in waiting:
+            try:
+                results[i] = await asyncio.wrap_future(future)
+            except EmbeddingError as e:
+                last_error = e
+
+        return results, last_error
+
+    async def call_with_str(
+        self, message: str, ten: AsyncTenEnv, vector_format: str = ""
+    ) -> CmdResult:
+        [embedding], error = await self.embed([message])
+        if embedding is not None:
             cmd_result = CmdResult.create(StatusCode.OK)
-            cmd_result.set_property_from_json(
-                FIELD_KEY_EMBEDDING,
-                json.dumps(response.output["embeddings"][0]["embedding"]),
-            )
+            if vector_format == VECTOR_FORMAT_F32:
+                cmd_result.set_property_buf(
+                    FIELD_KEY_EMBEDDING_BUF, encode_vector(embedding)
+                )
+            else:
+                cmd_result.set_property_from_json(
+                    FIELD_KEY_EMBEDDING,
+                    json.dumps(embedding),
+                )
             return cmd_result
         else:
+            error = error or EmbeddingError("500", "no embedding returned")
             cmd_result = CmdResult.create(StatusCode.ERROR)
-            cmd_result.set_property_string(FIELD_KEY_CODE, response.status_code)
-            cmd_result.set_property_string(FIELD_KEY_MESSAGE, response.message)
+            cmd_result.set_property_string(FIELD_KEY_CODE, str(error.code))
+            cmd_result.set_property_string(FIELD_KEY_MESSAGE, error.message)
             return cmd_result
 
-    def batched(
-        self, inputs: List, batch_size: int = DASHSCOPE_MAX_BATCH_SIZE
-    ) -> Generator[List, None, None]:
-        for i in range(0, len(inputs), batch_size):
-            yield inputs[i : i + batch_size]
-
-    def call_with_strs(self, messages: List[str], ten: TenEnv) -> CmdResult:
+    async def call_with_strs(
+        self, messages: List[str], ten: AsyncTenEnv, vector_format: str = ""
+    ) -> CmdResult:
         start_time = datetime.now()
-        result = None  # merge the results.
-        batch_counter = 0
-        for batch in self.batched(messages):
-            # pylint: disable=undefined-variable
-            response = dashscope.TextEmbedding.call(model=self.model, input=batch)
-            # ten.log_info("%s Received %s", batch, response)
-            if response.status_code == HTTPStatus.OK:
-                if result is None:
-                    result = response.output
-                else:
-                    for emb in response.output["embeddings"]:
-                        emb["text_index"] += batch_counter
-                        result["embeddings"].append(emb)
-            else:
-                ten.log_error("call %s failed, errmsg: %s", batch, response)
-            batch_counter += len(batch)
+        results, _ = await self.embed(messages)
+        embeddings = [
+            {"embedding": embedding, "text_index": i}
+            for i, embedding in enumerate(results)
+            if embedding is not None
+        ]
 
         ten.log_info(
-            f"embedding call finished for inputs len {len(messages)}, batch_counter {batch_counter}, results len {len(result['embeddings'])}, cost {int((datetime.now() - start_time).total_seconds() * 1000)}ms "
+            f"embedding call finished for inputs len {len(messages)}, results len {len(embeddings)}, cost {int((datetime.now() - start_time).total_seconds() * 1000)}ms "
         )
-        if result is not None:
+        if embeddings and vector_format == VECTOR_FORMAT_F32:
+            # rows of the buffer are the embeddings of the inputs at text_indexes
+            cmd_result = CmdResult.create(StatusCode.OK)
+            cmd_result.set_property_buf(
+                FIELD_KEY_EMBEDDINGS_BUF,
+                encode_vectors([e["embedding"] for e in embeddings]),
+            )
+            cmd_result.set_property_from_json(
+                FIELD_KEY_TEXT_INDEXES, json.dumps([e["text_index"] for e in embeddings])
+            )
+            return cmd_result
+        elif embeddings:
             cmd_result = CmdResult.create(StatusCode.OK)
 
             # too slow `set_property_to_json`, so use `set_property_string` at the moment as workaround
             # will be replaced once `set_property_to_json` improved
-            cmd_result.set_property_string(
-                FIELD_KEY_EMBEDDINGS, json.dumps(result["embeddings"])
-            )
+            cmd_result.set_property_string(FIELD_KEY_EMBEDDINGS, json.dumps(embeddings))
             return cmd_result
         else:
             cmd_result = CmdResult.create(StatusCode.ERROR)
@@ -148,46 +228,60 @@ class EmbeddingExtension(Extension):
             ten.log_error("All batch failed")
             return cmd_result
 
-    def on_stop(self, ten: TenEnv) -> None:
+    async def on_stop(self, ten: AsyncTenEnv) -> None:
         ten.log_info("on_stop")
-        self.stop = True
-        # clear queue
-        while not self.queue.empty():
-            self.queue.get()
-        # put enough None to stop all threads
-        for thread in self.threads:
-            self.queue.put(None)
-        for thread in self.threads:
-            thread.join()
-        self.threads = []
-
-        ten.on_stop_done()
-
-    def on_cmd(self, ten: TenEnv, cmd: Cmd) -> None:
+        if self.batcher:
+            ten.log_info(f"batcher {self.batcher.stats()}, cache {self.cache.stats()}")
+            self.batcher.close()
+
+    async def on_cmd(self, ten: AsyncTenEnv, cmd: Cmd) -> None:
         cmd_name = cmd.get_name()
+        start_time = datetime.now()
+        try:
+            vector_format = cmd.get_property_string(PROPERTY_VECTOR_FORMAT)
+        except Exception:
+            vector_format = ""
 
-        if cmd_name in [CMD_EMBED, CMD_EMBED_BATCH]:
+        if cmd_name == CMD_EMBED:
             # // embed
             # {
             #     "name": "embed",
-            #     "input": "hello"
+            #     "input": "hello",
+            #     "vector_format": "f32" // optional, embedding_buf instead of embedding
             # }
-
+            cmd_result = await self.call_with_str(
+                cmd.get_property_string("input"), ten, vector_format
+            )
+        elif cmd_name == CMD_EMBED_BATCH:
             # // embed_batch
             # {
             #     "name": "embed_batch",
-            #     "inputs": ["hello", ...]
+            #     "inputs": ["hello", ...],
+            #     "vector_format": "f32" // optional, embeddings_buf and text_indexes instead of embeddings
             # }
-
-            self.queue.put(cmd)
+            inputs_list = json.loads(cmd.get_property_to_json("inputs"))
+            cmd_result = await self.call_with_strs(inputs_list, ten, vector_format)
         else:
             ten.log_warn(f"unknown cmd {cmd_name}")
             cmd_result = CmdResult.create(StatusCode.ERROR)
-            ten.return_result(cmd_result, cmd)
+            await ten.return_result(cmd_result, cmd)
+            return
+
+        await ten.return_result(cmd_result, cmd)
+        ten.log_info(
+            f"finished processing cmd {cmd_name}, cost {int((datetime.now() - start_time).total_seconds() * 1000)}ms, batcher {self.batcher.stats()}, cache {self.cache.stats()}, coalesced {self.coalescer.coalesced}"
+        )
+
+    async def get_property_string(self, ten: AsyncTenEnv, key, default):
+        try:
+            return await ten.get_property_string(key)
+        except Exception as e:
+            ten.log_warn(f"err: {e}")
+            return default
 
-    def get_property_string(self, ten: TenEnv, key, default):
+    async def get_property_int(self, ten: AsyncTenEnv, key, default):
         try:
-            return ten.get_property_string(key)
+            return await ten.get_property_int(key)
         except Exception as e:
             ten.log_warn(f"err: {e}")
             return default
@@ -0,0 +1,115 @@
+import asyncio
+from typing import Awaitable, Callable, List, Optional
+
+
+class MicroBatcher:
+    """
+    Groups texts submitted by concurrent commands into vendor sized batches.
+
+    When no batch is in flight a submitted text is sent right away, so a lone query
+    does not wait. While batches are in flight, texts accumulate until a batch is full
+    or max_wait_ms passed since the first one, so a busy ingestion sends full batches.
+    At most max_concurrency batches are in flight, each text gets its own result.
+    """
+
+    def __init__(
+        self,
+        call: Callable[[List[str]], Awaitable[List[Optional[List[float]]]]],
+        max_batch_size: int,
+        max_wait_ms: int = 10,
+        max_concurrency: int = 10,
+    ):
+        self.call = call
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.slots = asyncio.Semaphore(max_concurrency)
+        self.pending: List[tuple[str, asyncio.Future]] = []
+        self.timer: asyncio.TimerHandle | None = None
+        self.in_flight = 0
+        # in-flight task -> its batch
+        self.tasks: dict[asyncio.Task, List[tuple[str, asyncio.Future]]] = {}
+
+        self.batches = 0
+        self.texts = 0
+
+    def submit(self, texts: List[str]) -> List[asyncio.Future]:
+        """Queue texts, each future resolves to the embedding of its text, None if the vendor returned none."""
+        loop = asyncio.get_running_loop()
+        futures = []
+        for text in texts:
+            future = loop.create_future()
+            self.pending.append((text, future))
+            futures.append(future)
+        self._dispatch()
+        return futures
+
+    def _send(self) -> None:
+        batch = self.pending[: self.max_batch_size]
+        del self.pending[: self.max_batch_size]
+        self.in_flight += 1
+        task = asyncio.create_task(self._run(batch))
+        self.tasks[task] = batch
+        task.add_done_callback(self.tasks.pop)
+
+    def _dispatch(self) -> None:
+        # Only full batches while others are in flight, the rest waits for the timer
+        while len(self.pending) >= self.max_batch_size or (
+            self.pending and not self.in_flight
+        ):
+            self._send()
+        if self.pending and self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(
+                self.max_wait, self._flush
+            )
+
+    def _flush(self) -> None:
+        """The oldest pending text waited long enough, send everything pending."""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        while self.pending:
+            self._send()
+
+    async def _run(self, batch: List[tuple[str, asyncio.Future]]) -> None:
+        try:
+            async with self.slots:
+                self.batches += 1
+                self.texts += len(batch)
+                embeddings = await self.call([text for text, _ in batch])
+            for i, (_, future) in enumerate(batch):
+                if not future.done():
+                    future.set_result(embeddings[i] if i < len(embeddings) else None)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            # cancelled by close, CancelledError is not an Exception
+            for _, future in batch:
+                future.cancel()
+            self.in_flight -= 1
+            if not self.in_flight and self.pending:
+                self._flush()
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch_size": round(self.texts / self.batches, 2) if self.batches else 0,
+            "in_flight": self.in_flight,
+            "pending": len(self.pending),
+        }
+
+    def close(self) -> None:
+        """Cancel the pending and in-flight texts."""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        for _, future in self.pending:
+            future.cancel()
+        self.pending.clear()
+        for task, batch in self.tasks.items():
+            task.cancel()
+            # a task cancelled before it started never runs its finally
+            for _, future in batch:
+                future.cancel()
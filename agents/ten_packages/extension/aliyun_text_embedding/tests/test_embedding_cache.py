@@ -0,0 +1,136 @@
+import asyncio
+import json
+import os
+from pathlib import Path
+import sys
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from embedding_cache import (  # noqa: E402
+    INDEX_FILE,
+    VECTORS_FILE,
+    EmbeddingCache,
+    RequestCoalescer,
+    cache_key,
+)
+
+
+def vector(seed: int, dim: int = 4) -> list[float]:
+    return np.random.default_rng(seed).normal(size=dim).astype(np.float32).tolist()
+
+
+def test_cache_key_normalizes_whitespace():
+    assert cache_key("m", "hello  world\n") == cache_key("m", " hello world")
+    assert cache_key("m", "hello world") != cache_key("other", "hello world")
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = EmbeddingCache(max_entries=2)
+    cache.put("a", vector(0))
+    cache.put("b", vector(1))
+    assert cache.get("a") == vector(0)  # b is now the oldest
+    cache.put("c", vector(2))
+
+    assert cache.get("b") is None
+    assert cache.get("a") == vector(0) and cache.get("c") == vector(2)
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (2, 3, 1)
+
+
+def test_entries_are_bounded_by_bytes():
+    # room for two vectors of 4 float32
+    cache = EmbeddingCache(max_bytes=32)
+    for i in range(3):
+        cache.put(str(i), vector(i))
+    assert cache.get("0") is None
+    assert cache.stats()["bytes"] == 32
+
+
+def test_reload_from_disk(tmp_path):
+    cache = EmbeddingCache(cache_dir=str(tmp_path))
+    cache.put("a", vector(0))
+    cache.put("b", vector(1, dim=8))
+    cache.put("a", vector(0))  # already on disk, not appended again
+
+    reloaded = EmbeddingCache(cache_dir=str(tmp_path))
+    assert reloaded.get("b") == vector(1, dim=8)
+    assert reloaded.get("a") == vector(0)
+    assert reloaded.stats()["disk_hits"] == 2
+    assert reloaded.stats()["disk_entries"] == 2
+    # now in memory
+    assert reloaded.get("a") == vector(0) and reloaded.stats()["hits"] == 1
+
+
+def test_reload_after_a_truncated_append(tmp_path):
+    cache = EmbeddingCache(cache_dir=str(tmp_path))
+    cache.put("a", vector(0))
+    cache.put("b", vector(1))
+    vectors_path = tmp_path / VECTORS_FILE
+    index_path = tmp_path / INDEX_FILE
+    # the process died while appending c: part of its vector, part of its index line,
+    # and an index line whose vector never made it
+    with open(vectors_path, "ab") as f:
+        f.write(np.asarray(vector(2), dtype=np.float32).tobytes()[:7])
+    with open(index_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"key": "lost", "offset": 8, "dim": 4}) + "\n")
+        f.write('{"key": "c", "off')
+
+    reloaded = EmbeddingCache(cache_dir=str(tmp_path))
+    # cut to whole floats and whole lines, the float of c that made it is not indexed
+    assert os.path.getsize(vectors_path) == 9 * 4
+    assert index_path.read_text().endswith("}\n")
+    assert reloaded.get("a") == vector(0) and reloaded.get("b") == vector(1)
+    assert reloaded.get("lost") is None and reloaded.get("c") is None
+
+    # entries appended after the torn ones are read back intact
+    reloaded.put("c", vector(2))
+    reloaded = EmbeddingCache(cache_dir=str(tmp_path))
+    assert reloaded.get("c") == vector(2)
+    assert reloaded.get("a") == vector(0) and reloaded.stats()["disk_entries"] == 3
+
+
+def test_concurrent_misses_share_one_upstream_call():
+    cache = EmbeddingCache()
+    coalescer = RequestCoalescer()
+    upstream = []
+
+    async def embed(text: str) -> list[float]:
+        key = cache_key("m", text)
+        embedding = cache.get(key)
+        if embedding is not None:
+            return embedding
+        future, owner = coalescer.claim(key)
+        if not owner:
+            return await asyncio.wrap_future(future)
+        upstream.append(text)
+        await asyncio.sleep(0.01)
+        embedding = cache.put(key, vector(len(text)))
+        coalescer.resolve(key, embedding)
+        return embedding
+
+    async def main():
+        results = await asyncio.gather(*[embed("hello world") for _ in range(5)])
+        assert results == [vector(11)] * 5
+        assert upstream == ["hello world"] and coalescer.coalesced == 4
+        # later requests are served by the cache
+        assert await embed(" hello  world") == vector(11)
+        assert upstream == ["hello world"] and not coalescer.inflight
+
+    asyncio.run(main())
+
+
+def test_failed_call_fails_the_waiters_and_frees_the_key():
+    coalescer = RequestCoalescer()
+    future, owner = coalescer.claim("k")
+    waiter, waiter_owns = coalescer.claim("k")
+    assert owner and not waiter_owns and waiter is future
+
+    coalescer.fail("k", RuntimeError("vendor down"))
+    assert isinstance(waiter.exception(), RuntimeError)
+    # the next request tries again, a second fail or resolve is a no-op
+    _, owner = coalescer.claim("k")
+    assert owner
+    coalescer.resolve("k", [1.0])
+    coalescer.fail("k", RuntimeError("late"))
@@ -0,0 +1,124 @@
+import asyncio
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from micro_batcher import MicroBatcher  # noqa: E402
+
+
+class FakeVendor:
+    """Embeds a text as [len(text)], each call waits until released."""
+
+    def __init__(self):
+        self.calls: list[list[str]] = []
+        self.release = asyncio.Event()
+
+    async def __call__(self, texts: list[str]) -> list[list[float]]:
+        self.calls.append(texts)
+        await self.release.wait()
+        return [[float(len(text))] for text in texts]
+
+
+def run(coro):
+    asyncio.run(asyncio.wait_for(coro, 5))
+
+
+def test_lone_text_is_sent_right_away():
+    async def main():
+        vendor = FakeVendor()
+        vendor.release.set()
+        batcher = MicroBatcher(vendor, max_batch_size=4, max_wait_ms=1000)
+        [future] = batcher.submit(["hello"])
+        assert await future == [5.0]
+        assert vendor.calls == [["hello"]]
+
+    run(main())
+
+
+def test_batch_is_sent_when_full():
+    async def main():
+        vendor = FakeVendor()
+        batcher = MicroBatcher(vendor, max_batch_size=3, max_wait_ms=1000)
+        first = batcher.submit(["a"])
+        await asyncio.sleep(0)
+        # a batch is in flight, texts wait until a batch is full
+        futures = batcher.submit(["bb", "ccc"])
+        await asyncio.sleep(0.01)
+        assert vendor.calls == [["a"]] and batcher.stats()["pending"] == 2
+        futures += batcher.submit(["dddd", "eeeee"])
+        await asyncio.sleep(0)
+        assert vendor.calls == [["a"], ["bb", "ccc", "dddd"]]
+
+        vendor.release.set()
+        # the rest goes out once nothing is in flight
+        results = await asyncio.gather(*first, *futures)
+        assert results == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+        assert vendor.calls[2] == ["eeeee"]
+        stats = batcher.stats()
+        assert (stats["batches"], stats["texts"], stats["pending"]) == (3, 5, 0)
+
+    run(main())
+
+
+def test_partial_batch_is_sent_by_the_timer():
+    async def main():
+        vendor = FakeVendor()
+        batcher = MicroBatcher(vendor, max_batch_size=8, max_wait_ms=20)
+        batcher.submit(["a"])
+        await asyncio.sleep(0)
+        futures = batcher.submit(["bb", "ccc"])
+        await asyncio.sleep(0.005)
+        assert vendor.calls == [["a"]]
+        # sent while the first batch is still in flight
+        await asyncio.sleep(0.05)
+        assert vendor.calls == [["a"], ["bb", "ccc"]]
+        assert batcher.stats()["in_flight"] == 2
+
+        vendor.release.set()
+        assert await asyncio.gather(*futures) == [[2.0], [3.0]]
+
+    run(main())
+
+
+def test_missing_embedding_and_vendor_error():
+    async def main():
+        async def short(texts):
+            return [[1.0]]
+
+        batcher = MicroBatcher(short, max_batch_size=4)
+        assert await asyncio.gather(*batcher.submit(["a", "b"])) == [[1.0], None]
+
+        async def failing(texts):
+            raise RuntimeError("vendor down")
+
+        batcher = MicroBatcher(failing, max_batch_size=4)
+        with pytest.raises(RuntimeError):
+            await batcher.submit(["a"])[0]
+
+    run(main())
+
+
+def test_close_cancels_pending_and_in_flight_texts():
+    async def main():
+        vendor = FakeVendor()
+        batcher = MicroBatcher(vendor, max_batch_size=2, max_wait_ms=1000, max_concurrency=1)
+        in_flight = batcher.submit(["a"])
+        await asyncio.sleep(0)
+        # full, but waits for a concurrency slot
+        queued = batcher.submit(["b", "c"])
+        pending = batcher.submit(["d"])
+        await asyncio.sleep(0.01)
+        assert vendor.calls == [["a"]]
+
+        batcher.close()
+        futures = in_flight + queued + pending
+        await asyncio.gather(*futures, return_exceptions=True)
+        assert all(future.cancelled() for future in futures)
+        await asyncio.sleep(0.01)
+        assert vendor.calls == [["a"]] and not batcher.tasks
+        assert batcher.stats()["pending"] == 0
+
+    run(main())
@@ -1,6 +1,7 @@
 from .bedrock_llm import BedrockLLM, BedrockLLMConfig
 from datetime import datetime
 from threading import Thread
+from ten_ai_base.sentence import SentenceSegmenter
 from ten import (
     Addon,
     Extension,
@@ -40,28 +41,6 @@ def get_current_time():
     return unix_microseconds
 
 
-def is_punctuation(char):
-    if char in [",", "，", ".", "。", "?", "？", "!", "！"]:
-        return True
-    return False
-
-
-def parse_sentence(sentence, content):
-    remain = ""
-    found_punc = False
-
-    for char in content:
-        if not found_punc:
-            sentence += char
-        else:
-            remain += char
-
-        if not found_punc and is_punctuation(char):
-            found_punc = True
-
-    return sentence, remain, found_punc
-
-
 class BedrockLLMExtension(Extension):
     memory = []
     max_memory_length = 10
@@ -252,7 +231,7 @@ class BedrockLLMExtension(Extension):
                     return
 
                 stream = resp.get("stream")
-                sentence = ""
+                segmenter = SentenceSegmenter()
                 full_content = ""
                 first_sentence_sent = False
 
@@ -283,13 +262,7 @@ class BedrockLLMExtension(Extension):
 
                     full_content += content
 
-                    while True:
-                        sentence, content, sentence_is_final = parse_sentence(
-                            sentence, content
-                        )
-                        if not sentence or not sentence_is_final:
-                            ten_env.log_info(f"sentence [{sentence}] is empty or not final")
-                            break
+                    for sentence in segmenter.push(content):
                         ten_env.log_info(
                             f"GetConverseStream recv for input text: [{input_text}] got sentence: [{sentence}]"
                         )
@@ -313,7 +286,6 @@ class BedrockLLMExtension(Extension):
                             )
                             break
 
-                        sentence = ""
                         if not first_sentence_sent:
                             first_sentence_sent = True
                             ten_env.log_info(
@@ -336,6 +308,7 @@ class BedrockLLMExtension(Extension):
                     return
 
                 # send end of segment
+                sentence = segmenter.flush()
                 try:
                     output_data = Data.create("text_data")
                     output_data.set_property_string(
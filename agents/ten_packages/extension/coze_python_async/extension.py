@@ -5,9 +5,7 @@
 #
 import asyncio
 import traceback
-import aiohttp
 import json
-import copy
 
 from typing import List, Any, AsyncGenerator
 from dataclasses import dataclass
@@ -25,6 +23,13 @@ from ten import (
 )
 
 from ten_ai_base.config import BaseConfig
+from ten_ai_base.http_client import (
+    HttpClient,
+    HttpClientOptions,
+    get_http_client,
+    close_http_client,
+)
+from ten_ai_base.sentence import SentenceSegmenter
 from ten_ai_base.chat_memory import ChatMemory
 from ten_ai_base import (
     AsyncLLMBaseExtension,
@@ -51,26 +56,7 @@ DATA_OUT_TEXT_DATA_PROPERTY_END_OF_SEGMENT = "end_of_segment"
 
 CMD_PROPERTY_RESULT = "tool_result"
 
-
-def is_punctuation(char):
-    if char in [",", "，", ".", "。", "?", "？", "!", "！"]:
-        return True
-    return False
-
-
-def parse_sentences(sentence_fragment, content):
-    sentences = []
-    current_sentence = sentence_fragment
-    for char in content:
-        current_sentence += char
-        if is_punctuation(char):
-            stripped_sentence = current_sentence
-            if any(c.isalnum() for c in stripped_sentence):
-                sentences.append(stripped_sentence)
-            current_sentence = ""
-
-    remain = current_sentence
-    return sentences, remain
+HTTP_CLIENT_NAME = "coze"
 
 
 @dataclass
@@ -81,6 +67,7 @@ class CozeConfig(BaseConfig):
     user_id: str = "TenAgent"
     greeting: str = ""
     max_history: int = 32
+    max_history_tokens: int = 0
 
 
 class AsyncCozeExtension(AsyncLLMBaseExtension):
@@ -91,6 +78,7 @@ class AsyncCozeExtension(AsyncLLMBaseExtension):
     stopped: bool = False
     users_count = 0
     memory: ChatMemory = None
+    http: HttpClient = None
 
     acoze: AsyncCoze = None
     # conversation: str = ""
@@ -112,7 +100,9 @@ class AsyncCozeExtension(AsyncLLMBaseExtension):
             ten_env.log_error("Missing required configuration")
             return
 
-        self.memory = ChatMemory(self.config.max_history)
+        self.memory = ChatMemory(
+            self.config.max_history, max_tokens=self.config.max_history_tokens
+        )
         try:
             self.acoze = AsyncCoze(
                 auth=TokenAuth(token=self.config.token), base_url=self.config.base_url
@@ -125,6 +115,11 @@ class AsyncCozeExtension(AsyncLLMBaseExtension):
         except Exception as e:
             ten_env.log_error(f"Failed to create conversation {e}")
 
+        self.http = get_http_client(
+            HTTP_CLIENT_NAME, HttpClientOptions(total_timeout=300)
+        )
+        asyncio.create_task(self.http.warmup(ten_env, self.config.base_url))
+
         self.ten_env = ten_env
 
     async def on_stop(self, ten_env: AsyncTenEnv) -> None:
@@ -133,6 +128,10 @@ class AsyncCozeExtension(AsyncLLMBaseExtension):
 
         self.stopped = True
 
+        if self.http:
+            ten_env.log_info(f"http stats: {self.http.stats()}")
+        await close_http_client(HTTP_CLIENT_NAME)
+
     async def on_deinit(self, ten_env: AsyncTenEnv) -> None:
         await super().on_deinit(ten_env)
         ten_env.log_debug("on_deinit")
@@ -178,7 +177,7 @@ class AsyncCozeExtension(AsyncLLMBaseExtension):
             return
 
         input_messages: LLMChatCompletionUserMessageParam = kargs.get("messages", [])
-        messages = copy.copy(self.memory.get())
+        messages = list(self.memory.get())
         if not input_messages:
             ten_env.log_warn("No message in data")
         else:
@@ -187,7 +186,7 @@ class AsyncCozeExtension(AsyncLLMBaseExtension):
                 self.memory.put(i)
 
         total_output = ""
-        sentence_fragment = ""
+        segmenter = SentenceSegmenter()
         calls = {}
 
         sentences = []
@@ -198,12 +197,11 @@ class AsyncCozeExtension(AsyncLLMBaseExtension):
             try:
                 if message.event == ChatEventType.CONVERSATION_MESSAGE_DELTA:
                     total_output += message.message.content
-                    sentences, sentence_fragment = parse_sentences(
-                        sentence_fragment, message.message.content
-                    )
+                    sentences = segmenter.push(message.message.content)
                     for s in sentences:
                         await self._send_text(s, False)
                 elif message.event == ChatEventType.CONVERSATION_MESSAGE_COMPLETED:
+                    sentence_fragment = segmenter.flush()
                     if sentence_fragment:
                         await self._send_text(sentence_fragment, True)
                     else:
@@ -318,57 +316,54 @@ class AsyncCozeExtension(AsyncLLMBaseExtension):
             else:
                 raise ValueError(f"invalid chat.event: {event}, {event_data}")
 
-        async with aiohttp.ClientSession() as session:
-            try:
-                url = f"{self.config.base_url}/v3/chat"
-                headers = {
-                    "Authorization": f"Bearer {self.config.token}",
-                }
-                params = {
-                    "bot_id": self.config.bot_id,
-                    "user_id": self.config.user_id,
-                    "additional_messages": additionals,
-                    "stream": True,
-                    "auto_save_history": True,
-                    # "conversation_id": self.conversation.id
-                }
-                event = ""
-                async with session.post(url, json=params, headers=headers) as response:
-                    async for line in response.content:
-                        if line:
-                            try:
-                                self.ten_env.log_info(f"line: {line}")
-                                decoded_line = line.decode("utf-8").strip()
-                                if decoded_line:
-                                    if decoded_line.startswith("data:"):
-                                        data = decoded_line[5:].strip()
-                                        yield chat_stream_handler(
-                                            event=event, event_data=data.strip()
+        try:
+            url = f"{self.config.base_url}/v3/chat"
+            headers = {
+                "Authorization": f"Bearer {self.config.token}",
+            }
+            params = {
+                "bot_id": self.config.bot_id,
+                "user_id": self.config.user_id,
+                "additional_messages": additionals,
+                "stream": True,
+                "auto_save_history": True,
+                # "conversation_id": self.conversation.id
+            }
+            event = ""
+            async with self.http.post(url, json=params, headers=headers) as response:
+                async for line in response.content:
+                    if line:
+                        try:
+                            self.ten_env.log_info(f"line: {line}")
+                            decoded_line = line.decode("utf-8").strip()
+                            if decoded_line:
+                                if decoded_line.startswith("data:"):
+                                    data = decoded_line[5:].strip()
+                                    yield chat_stream_handler(
+                                        event=event, event_data=data.strip()
+                                    )
+                                elif decoded_line.startswith("event:"):
+                                    event = decoded_line[6:]
+                                    self.ten_env.log_info(f"event: {event}")
+                                    if event == "done":
+                                        break
+                                else:
+                                    result = json.loads(decoded_line)
+                                    code = result.get("code", 0)
+                                    if code == 4000:
+                                        await self._send_text(
+                                            "Coze bot is not published.", True
                                         )
-                                    elif decoded_line.startswith("event:"):
-                                        event = decoded_line[6:]
-                                        self.ten_env.log_info(f"event: {event}")
-                                        if event == "done":
-                                            break
                                     else:
-                                        result = json.loads(decoded_line)
-                                        code = result.get("code", 0)
-                                        if code == 4000:
-                                            await self._send_text(
-                                                "Coze bot is not published.", True
-                                            )
-                                        else:
-                                            self.ten_env.log_error(
-                                                f"Failed to stream chat: {result['code']}"
-                                            )
-                                            await self._send_text(
-                                                "Coze bot is not connected. Please check your configuration.",
-                                                True,
-                                            )
-                            except Exception as e:
-                                self.ten_env.log_error(f"Failed to stream chat: {e}")
-            except Exception as e:
-                traceback.print_exc()
-                self.ten_env.log_error(f"Failed to stream chat: {e}")
-            finally:
-                await session.close()
+                                        self.ten_env.log_error(
+                                            f"Failed to stream chat: {result['code']}"
+                                        )
+                                        await self._send_text(
+                                            "Coze bot is not connected. Please check your configuration.",
+                                            True,
+                                        )
+                        except Exception as e:
+                            self.ten_env.log_error(f"Failed to stream chat: {e}")
+        except Exception as e:
+            traceback.print_exc()
+            self.ten_env.log_error(f"Failed to stream chat: {e}")
@@ -19,6 +19,7 @@ from deepgram import (
 from dataclasses import dataclass
 
 from ten_ai_base.config import BaseConfig
+from ten_ai_base.trace import TurnContext
 
 DATA_OUT_TEXT_DATA_PROPERTY_TEXT = "text"
 DATA_OUT_TEXT_DATA_PROPERTY_IS_FINAL = "is_final"
@@ -175,4 +176,7 @@ class DeepgramASRExtension(AsyncExtension):
         stable_data.set_property_bool(
             DATA_OUT_TEXT_DATA_PROPERTY_END_OF_SEGMENT, is_final
         )
+        if is_final:
+            # The final transcript starts the turn the rest of the pipeline is traced against
+            TurnContext.begin().to_msg(stable_data)
         asyncio.create_task(self.ten_env.send_data(stable_data))
@@ -18,6 +18,7 @@ from ten_ai_base.helper import (
     get_property_string,
 )
 from ten_ai_base import AsyncLLMBaseExtension
+from ten_ai_base.sentence import SentenceSegmenter
 from ten_ai_base.types import (
     LLMCallCompletionArgs,
     LLMChatCompletionContentPartParam,
@@ -28,7 +29,6 @@ from ten_ai_base.types import (
     LLMToolResult,
 )
 
-from .helper import parse_sentences
 from .openai import OpenAIChatGPT, OpenAIChatGPTConfig
 from ten import (
     Cmd,
@@ -54,7 +54,7 @@ class OpenAIChatGPTExtension(AsyncLLMBaseExtension):
         self.memory_cache = []
         self.config = None
         self.client = None
-        self.sentence_fragment = ""
+        self.segmenter = SentenceSegmenter(max_length=100)
         self.tool_task_future: asyncio.Future | None = None
         self.users_count = 0
 
@@ -218,7 +218,7 @@ class OpenAIChatGPTExtension(AsyncLLMBaseExtension):
                 async_ten_env.log_info(f"Current memory: {memory}")
 
             # Reset state
-            self.sentence_fragment = ""
+            self.segmenter.reset()
 
             # Create a future to track the single tool call task
             self.tool_task_future = None
@@ -324,14 +324,12 @@ class OpenAIChatGPTExtension(AsyncLLMBaseExtension):
                     })
 
                 try:
-                    sentences, self.sentence_fragment = parse_sentences(
-                        self.sentence_fragment, content
-                    )
+                    sentences = self.segmenter.push(content)
                     for s in sentences:
                         self.send_text_output(async_ten_env, s, False)
                 except Exception as e:
                     async_ten_env.log_error(
-                        f"Error in handle_content_update: {str(e)}, content: {content}, fragment: {self.sentence_fragment}"
+                        f"Error in handle_content_update: {str(e)}, content: {content}, fragment: {self.segmenter.fragment}"
                     )
                     raise
 
@@ -360,6 +358,10 @@ class OpenAIChatGPTExtension(AsyncLLMBaseExtension):
             # Wait for the content to be finished
             try:
                 await asyncio.wait_for(content_finished_event.wait(), timeout=30.0)
+                # The segmenter holds back a trailing "." until more text arrives
+                fragment = self.segmenter.flush()
+                if fragment.strip():
+                    self.send_text_output(async_ten_env, fragment, False)
                 # Add the final assistant message to memory
                 for m in self.memory_cache:
                     if m.get("role") == "assistant":
@@ -19,41 +19,6 @@ def get_current_time():
     return unix_microseconds
 
 
-def is_punctuation(char):
-    if char in [",", "，", ".", "。", "?", "？", "!", "！", "\n"]:
-        return True
-    return False
-
-
-def parse_sentences(sentence_fragment, content):
-    sentences = []
-    current_sentence = sentence_fragment
-
-    # 如果当前句子片段已经足够长，直接作为一个句子
-    if len(current_sentence.strip()) > 100:
-        sentences.append(current_sentence)
-        current_sentence = ""
-
-    for char in content:
-        current_sentence += char
-        
-        # 遇到标点符号或者句子长度超过100时分句
-        if is_punctuation(char) or len(current_sentence.strip()) > 100:
-            # 检查当前句子是否包含非标点字符
-            stripped_sentence = current_sentence.strip()
-            if any(c.isalnum() for c in stripped_sentence):
-                sentences.append(stripped_sentence)
-            current_sentence = ""  # 重置，准备下一个句子
-
-    # 如果剩余的句子片段足够长，也作为一个句子
-    remain = current_sentence.strip()  # 剩余的字符形成未完成的句子
-    if len(remain) > 100:
-        sentences.append(remain)
-        remain = ""
-
-    return sentences, remain
-
-
 def rgb2base64jpeg(rgb_data, width, height):
     # Convert the RGB image to a PIL Image
     pil_image = Image.frombytes("RGBA", (width, height), bytes(rgb_data))
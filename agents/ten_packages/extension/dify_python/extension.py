@@ -10,9 +10,15 @@ import traceback
 from dataclasses import dataclass
 from typing import AsyncGenerator
 
-import aiohttp
 from ten import AsyncTenEnv, AudioFrame, Cmd, CmdResult, Data, StatusCode, VideoFrame
 from ten_ai_base.config import BaseConfig
+from ten_ai_base.http_client import (
+    HttpClient,
+    HttpClientOptions,
+    get_http_client,
+    close_http_client,
+)
+from ten_ai_base.sentence import SentenceSegmenter
 from ten_ai_base import (
     AsyncLLMBaseExtension,
 )
@@ -32,26 +38,7 @@ DATA_OUT_TEXT_DATA_PROPERTY_END_OF_SEGMENT = "end_of_segment"
 
 CMD_PROPERTY_RESULT = "tool_result"
 
-
-def is_punctuation(char):
-    if char in [",", "，", ".", "。", "?", "？", "!", "！"]:
-        return True
-    return False
-
-
-def parse_sentences(sentence_fragment, content):
-    sentences = []
-    current_sentence = sentence_fragment
-    for char in content:
-        current_sentence += char
-        if is_punctuation(char):
-            stripped_sentence = current_sentence
-            if any(c.isalnum() for c in stripped_sentence):
-                sentences.append(stripped_sentence)
-            current_sentence = ""
-
-    remain = current_sentence
-    return sentences, remain
+HTTP_CLIENT_NAME = "dify"
 
 
 @dataclass
@@ -68,6 +55,7 @@ class DifyExtension(AsyncLLMBaseExtension):
     config: DifyConfig = None
     ten_env: AsyncTenEnv = None
     loop: asyncio.AbstractEventLoop = None
+    http: HttpClient = None
     stopped: bool = False
     users_count = 0
     conversational_id = ""
@@ -88,6 +76,11 @@ class DifyExtension(AsyncLLMBaseExtension):
             ten_env.log_error("Missing required configuration")
             return
 
+        self.http = get_http_client(
+            HTTP_CLIENT_NAME, HttpClientOptions(total_timeout=300)
+        )
+        asyncio.create_task(self.http.warmup(ten_env, self.config.base_url))
+
         self.ten_env = ten_env
 
     async def on_stop(self, ten_env: AsyncTenEnv) -> None:
@@ -96,6 +89,10 @@ class DifyExtension(AsyncLLMBaseExtension):
 
         self.stopped = True
 
+        if self.http:
+            ten_env.log_info(f"http stats: {self.http.stats()}")
+        await close_http_client(HTTP_CLIENT_NAME)
+
     async def on_deinit(self, ten_env: AsyncTenEnv) -> None:
         await super().on_deinit(ten_env)
         ten_env.log_debug("on_deinit")
@@ -183,7 +180,7 @@ class DifyExtension(AsyncLLMBaseExtension):
             ten_env.log_warn("No message in data")
 
         total_output = ""
-        sentence_fragment = ""
+        segmenter = SentenceSegmenter()
         calls = {}
 
         sentences = []
@@ -198,9 +195,7 @@ class DifyExtension(AsyncLLMBaseExtension):
                     ten_env.log_info(f"conversation_id: {self.conversational_id}")
 
                 total_output += message.get("answer", "")
-                sentences, sentence_fragment = parse_sentences(
-                    sentence_fragment, message.get("answer", "")
-                )
+                sentences = segmenter.push(message.get("answer", ""))
                 for s in sentences:
                     await self._send_text(s, False)
             elif message_type == "message_end":
@@ -234,55 +229,51 @@ class DifyExtension(AsyncLLMBaseExtension):
             # except Exception as e:
             #     self.ten_env.log_error(f"Failed to parse response: {message} {e}")
             #     traceback.print_exc()
-        await self._send_text(sentence_fragment, True)
+        await self._send_text(segmenter.flush(), True)
         self.ten_env.log_info(f"total_output: {total_output} {calls}")
 
     async def _stream_chat(self, query: str) -> AsyncGenerator[dict, None]:
-        async with aiohttp.ClientSession() as session:
-            try:
-                payload = {
-                    "inputs": {},
-                    "query": query,
-                    "response_mode": "streaming",
-                }
-                if self.conversational_id:
-                    payload["conversation_id"] = self.conversational_id
-                if self.config.user_id:
-                    payload["user"] = self.config.user_id
-                self.ten_env.log_info(f"payload before sending: {json.dumps(payload)}")
-                headers = {
-                    "Authorization": f"Bearer {self.config.api_key}",
-                    "Content-Type": "application/json",
-                }
-                url = f"{self.config.base_url}/chat-messages"
-                start_time = time.time()
-                async with session.post(url, json=payload, headers=headers) as response:
-                    if response.status != 200:
-                        r = await response.json()
-                        self.ten_env.log_error(
-                            f"Received unexpected status {r} from the server."
-                        )
-                        if self.config.failure_info:
-                            await self._send_text(self.config.failure_info, True)
-                        return
-                    end_time = time.time()
-                    self.ten_env.log_info(f"connect time {end_time - start_time} s")
-
-                    async for line in response.content:
-                        if line:
-                            l = line.decode("utf-8").strip()
-                            if l.startswith("data:"):
-                                content = l[5:].strip()
-                                if content == "[DONE]":
-                                    break
-                                self.ten_env.log_debug(f"content: {content}")
-                                yield json.loads(content)
-            except Exception as e:
-                traceback.print_exc()
-                self.ten_env.log_error(f"Failed to handle {e}")
-            finally:
-                await session.close()
-                session = None
+        try:
+            payload = {
+                "inputs": {},
+                "query": query,
+                "response_mode": "streaming",
+            }
+            if self.conversational_id:
+                payload["conversation_id"] = self.conversational_id
+            if self.config.user_id:
+                payload["user"] = self.config.user_id
+            self.ten_env.log_info(f"payload before sending: {json.dumps(payload)}")
+            headers = {
+                "Authorization": f"Bearer {self.config.api_key}",
+                "Content-Type": "application/json",
+            }
+            url = f"{self.config.base_url}/chat-messages"
+            start_time = time.time()
+            async with self.http.post(url, json=payload, headers=headers) as response:
+                if response.status != 200:
+                    r = await response.json()
+                    self.ten_env.log_error(
+                        f"Received unexpected status {r} from the server."
+                    )
+                    if self.config.failure_info:
+                        await self._send_text(self.config.failure_info, True)
+                    return
+                end_time = time.time()
+                self.ten_env.log_info(f"connect time {end_time - start_time} s")
+
+                async for line in response.content:
+                    if line:
+                        l = line.decode("utf-8").strip()
+                        if l.startswith("data:"):
+                            content = l[5:].strip()
+                            if content == "[DONE]":
+                                break
+                            self.ten_env.log_debug(f"content: {content}")
+                            yield json.loads(content)
+        except Exception as e:
+            traceback.print_exc()
+            self.ten_env.log_error(f"Failed to handle {e}")
 
     async def _send_text(self, text: str, end_of_segment: bool) -> None:
         data = Data.create("text_data")
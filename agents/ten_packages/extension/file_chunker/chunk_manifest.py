@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Iterable, Optional
+
+
+def chunk_id(path: str, text: str) -> str:
+    """Content address of a chunk of a file, used as its row id in the vector storage."""
+    return hashlib.blake2b(
+        f"{path}\n{text}".encode("utf-8"), digest_size=16
+    ).hexdigest()
+
+
+class ChunkManifest:
+    """
+    The chunk ids of every file ingested into a collection, so a file sent again only
+    embeds its new chunks and deletes the removed ones. Persisted as
+    <manifest_dir>/<collection>.json, in memory only without manifest_dir. update is
+    called from worker threads, concurrent updates are serialized.
+    """
+
+    def __init__(self, collection: str, manifest_dir: str = ""):
+        self.collection = collection
+        self.manifest_dir = manifest_dir
+        self.files: dict[str, list[str]] = {}
+        self.lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.manifest_dir, f"{self.collection}.json")
+
+    @classmethod
+    def load_all(cls, manifest_dir: str) -> dict[str, "ChunkManifest"]:
+        """Manifests saved in manifest_dir, by collection."""
+        manifests = {}
+        if not manifest_dir or not os.path.isdir(manifest_dir):
+            return manifests
+        for name in os.listdir(manifest_dir):
+            if not name.endswith(".json"):
+                continue
+            manifest = cls(name[: -len(".json")], manifest_dir)
+            try:
+                with open(manifest.path, "r", encoding="utf-8") as f:
+                    manifest.files = json.load(f)["files"]
+            except (OSError, ValueError, KeyError):
+                continue
+            manifests[manifest.collection] = manifest
+        return manifests
+
+    def chunk_ids(self, path: str) -> set[str]:
+        return set(self.files.get(path, []))
+
+    def update(self, path: str, ids: Iterable[str]) -> None:
+        ids = sorted(ids)
+        with self.lock:
+            self.files[path] = ids
+            if not self.manifest_dir:
+                return
+            os.makedirs(self.manifest_dir, exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"files": self.files}, f)
+            os.replace(tmp, self.path)
+
+
+def find_collection(
+    manifests: dict[str, ChunkManifest], path: str
+) -> Optional[str]:
+    """The collection a file was ingested into, None if it never was."""
+    for collection, manifest in manifests.items():
+        if path in manifest.files:
+            return collection
+    return None
+
+
+def manifest_ids(
+    previous_ids: set[str],
+    chunk_ids: set[str],
+    stored_ids: set[str],
+    undeleted: set[str],
+) -> set[str]:
+    """
+    The ids to record for a file once ingested: its unchanged and newly stored chunks.
+    Failed chunks are left out to be embedded again next time, chunks that could not
+    be deleted are kept to be deleted next time.
+    """
+    return (chunk_ids & previous_ids) | stored_ids | undeleted
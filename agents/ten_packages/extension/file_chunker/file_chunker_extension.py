@@ -6,50 +6,112 @@
 #
 #
 from ten import (
-    Extension,
-    TenEnv,
+    AsyncExtension,
+    AsyncTenEnv,
     Cmd,
+    Data,
     StatusCode,
     CmdResult,
 )
-from typing import List, Any
+from typing import Iterator, List, Tuple
+import asyncio
 import json
+import os
+from dataclasses import dataclass, field
 from datetime import datetime
-import uuid, math
-import queue, threading
+import uuid
+
+from ten_ai_base.bm25 import BM25Index
+from ten_ai_base.config import BaseConfig
+from ten_ai_base.const import PROPERTY_VECTOR_FORMAT, VECTOR_FORMAT_F32
+
+from .chunk_manifest import ChunkManifest, chunk_id, find_collection, manifest_ids
 
 CMD_FILE_CHUNK = "file_chunk"
 UPSERT_VECTOR_CMD = "upsert_vector"
+DELETE_VECTOR_CMD = "delete_vector"
 FILE_CHUNKED_CMD = "file_chunked"
+FILE_CHUNK_PROGRESS_DATA = "file_chunk_progress"
 
 CHUNK_SIZE = 200
 CHUNK_OVERLAP = 20
 BATCH_SIZE = 5
+DELETE_BATCH_SIZE = 100
+
+
+@dataclass
+class FileChunkerConfig(BaseConfig):
+    # files ingested at the same time
+    max_concurrent_files: int = 2
+    # embed_batch + upsert_vector round trips in flight per file
+    max_in_flight_batches: int = 4
+    # chunk manifests of the collections are kept there, in memory only if empty
+    manifest_dir: str = ""
+    # BM25 indexes of the collections for the hybrid retrieval of llama_index_chat_engine,
+    # not built if empty
+    bm25_dir: str = ""
+
+
+@dataclass
+class FileIngestion:
+    """State of a file being ingested, each file has its own."""
+
+    path: str
+    collection: str
+    start_time: datetime = field(default_factory=datetime.now)
+    pages: int = 0
+    chunks: int = 0
+    chunks_stored: int = 0
+    chunks_failed: int = 0
+    chunks_unchanged: int = 0
+    chunks_deleted: int = 0
+    parsed: bool = False
+    # chunk ids of the previous ingestion of the file, of this one, and the ones stored
+    previous_ids: set[str] = field(default_factory=set)
+    chunk_ids: set[str] = field(default_factory=set)
+    stored_ids: set[str] = field(default_factory=set)
+    # (id, text) of every chunk, for the BM25 index
+    documents: List[Tuple[str, str]] = field(default_factory=list)
+
+    @property
+    def file_name(self) -> str:
+        return self.path.split("/")[-1]
+
+
+def read_pages(path: str) -> Iterator[str]:
+    """Text of the file page by page, PDFs are parsed lazily."""
+    if path.lower().endswith(".pdf"):
+        from pypdf import PdfReader
+
+        for page in PdfReader(path).pages:
+            yield page.extract_text() or ""
+    else:
+        # lazy import packages which requires long time to load
+        from llama_index.core import SimpleDirectoryReader
 
+        for document in SimpleDirectoryReader(
+            input_files=[path], filename_as_id=True
+        ).load_data():
+            yield document.text
 
-def batch(nodes, size):
-    batch_texts = []
-    for n in nodes:
-        batch_texts.append(n.text)
-        if len(batch_texts) == size:
-            yield batch_texts[:]
-            batch_texts.clear()
-    if batch_texts:
-        yield batch_texts
 
+class FileChunkerExtension(AsyncExtension):
+    """
+    Ingests files into a vector collection. Pages are read and split one at a time and
+    every BATCH_SIZE chunks are embedded and upserted while the next pages are parsed,
+    so the first chunks of a large file are queryable long before it is done.
+    """
 
-class FileChunkerExtension(Extension):
     def __init__(self, name: str):
         super().__init__(name)
-
-        self.counters = {}
-        self.expected = {}
-        self.new_collection_name = ""
-        self.file_chunked_event = threading.Event()
-
-        self.thread = None
-        self.queue = queue.Queue()
-        self.stop = False
+        self.config: FileChunkerConfig = None
+        self.ingestions: dict[str, FileIngestion] = {}
+        self.manifests: dict[str, ChunkManifest] = {}
+        # creation of the new collections, awaited by every file ingested into them
+        self.creating: dict[str, asyncio.Task] = {}
+        self.bm25_indexes: dict[str, BM25Index] = {}
+        self.files_slots: asyncio.Semaphore = None
+        self.tasks: set[asyncio.Task] = set()
 
     def generate_collection_name(self) -> str:
         """
@@ -58,92 +120,262 @@ class FileChunkerExtension(Extension):
 
         return "coll_" + uuid.uuid1().hex.lower()
 
-    def split(self, ten: TenEnv, path: str) -> List[Any]:
+    def splitter(self):
         # lazy import packages which requires long time to load
-        from llama_index.core import SimpleDirectoryReader
         from llama_index.core.node_parser import SentenceSplitter
 
-        # load pdf file by path
-        documents = SimpleDirectoryReader(
-            input_files=[path], filename_as_id=True
-        ).load_data()
-
-        # split pdf file into chunks
-        splitter = SentenceSplitter(
+        return SentenceSplitter(
             chunk_size=CHUNK_SIZE,
             chunk_overlap=CHUNK_OVERLAP,
         )
-        nodes = splitter.get_nodes_from_documents(documents)
-        ten.log_info(f"file {path} pages count {documents}, chunking count {nodes}")
-        return nodes
 
-    def create_collection(self, ten: TenEnv, collection_name: str, wait: bool):
+    async def create_collection(
+        self, ten_env: AsyncTenEnv, collection_name: str
+    ) -> None:
+        """Raises if the vector storage did not create the collection."""
         cmd_out = Cmd.create("create_collection")
         cmd_out.set_property_string("collection_name", collection_name)
+        [result, err] = await ten_env.send_cmd(cmd_out)
+        if result is None or result.get_status_code() != StatusCode.OK:
+            raise RuntimeError(
+                f"failed to create collection {collection_name}, err: {err}"
+            )
 
-        wait_event = threading.Event()
-        ten.send_cmd(
-            cmd_out,
-            lambda ten, result, _: wait_event.set(),
-        )
-        if wait:
-            wait_event.wait()
+    async def collection_manifest(
+        self, ten_env: AsyncTenEnv, collection: str
+    ) -> ChunkManifest:
+        """The manifest of the collection, once the collection exists."""
+        creating = self.creating.get(collection)
+        if creating is None and collection not in self.manifests:
+
+            async def create():
+                await self.create_collection(ten_env, collection)
+                ten_env.log_info(f"collection {collection} created")
+                # registered once created, a later file of the collection skips creation;
+                # a failed creation registers nothing and the files fail before storing
+                self.manifests[collection] = ChunkManifest(
+                    collection, self.config.manifest_dir
+                )
 
-    def embedding(self, ten: TenEnv, path: str, texts: List[str]):
-        ten.log_info(
-            f"generate embeddings for the file: {path}, with batch size: {len(texts)}"
+            creating = self.creating[collection] = asyncio.create_task(create())
+            creating.add_done_callback(lambda _: self.creating.pop(collection, None))
+        if creating is not None:
+            # other files wait for the same creation, cancelling one must not cancel it
+            await asyncio.shield(creating)
+        return self.manifests[collection]
+
+    async def embedding(
+        self, ten_env: AsyncTenEnv, ingestion: FileIngestion, texts: List[str]
+    ) -> CmdResult:
+        ten_env.log_info(
+            f"generate embeddings for the file: {ingestion.path}, with batch size: {len(texts)}"
         )
 
         cmd_out = Cmd.create("embed_batch")
         cmd_out.set_property_from_json("inputs", json.dumps(texts))
-        ten.send_cmd(
-            cmd_out, lambda ten, result, _: self.vector_store(ten, path, texts, result)
+        cmd_out.set_property_string(PROPERTY_VECTOR_FORMAT, VECTOR_FORMAT_F32)
+        [result, _] = await ten_env.send_cmd(cmd_out)
+        return result
+
+    async def vector_store(
+        self,
+        ten_env: AsyncTenEnv,
+        ingestion: FileIngestion,
+        texts: List[str],
+        ids: List[str],
+        result: CmdResult,
+    ) -> List[str]:
+        """Upsert the embedded texts, return the ids of the stored ones."""
+        ten_env.log_info(
+            f"vector store start for one splitting of the file {ingestion.path}"
         )
-
-    def vector_store(self, ten: TenEnv, path: str, texts: List[str], result: CmdResult):
-        ten.log_info(f"vector store start for one splitting of the file {path}")
-        file_name = path.split("/")[-1]
-        embed_output_json = result.get_property_string("embeddings")
-        embed_output = json.loads(embed_output_json)
+        # the binary embeddings are forwarded as is, with the texts of their rows
+        embeddings_buf = result.get_property_buf("embeddings_buf")
+        text_indexes = json.loads(result.get_property_to_json("text_indexes"))
         cmd_out = Cmd.create(UPSERT_VECTOR_CMD)
-        cmd_out.set_property_string("collection_name", self.new_collection_name)
-        cmd_out.set_property_string("file_name", file_name)
-        embeddings = [record["embedding"] for record in embed_output]
-        content = []
-        for text, embedding in zip(texts, embeddings):
-            content.append({"text": text, "embedding": embedding})
-        cmd_out.set_property_string("content", json.dumps(content))
-        # ten.log_info(json.dumps(content))
-        ten.send_cmd(cmd_out, lambda ten, result, _: self.file_chunked(ten, path))
-
-    def file_chunked(self, ten: TenEnv, path: str):
-        if path in self.counters and path in self.expected:
-            self.counters[path] += 1
-            ten.log_info(
-                "complete vector store for one splitting of the file: %s, current counter: %i, expected: %i",
-                path,
-                self.counters[path],
-                self.expected[path],
+        cmd_out.set_property_string("collection_name", ingestion.collection)
+        cmd_out.set_property_string("file_name", ingestion.file_name)
+        cmd_out.set_property_from_json(
+            "texts", json.dumps([texts[i] for i in text_indexes])
+        )
+        stored_ids = [ids[i] for i in text_indexes]
+        cmd_out.set_property_from_json("ids", json.dumps(stored_ids))
+        cmd_out.set_property_buf("embeddings_buf", embeddings_buf)
+        [upsert_result, _] = await ten_env.send_cmd(cmd_out)
+        if upsert_result.get_status_code() != StatusCode.OK:
+            return []
+        return stored_ids
+
+    async def store_batch(
+        self,
+        ten_env: AsyncTenEnv,
+        ingestion: FileIngestion,
+        texts: List[str],
+        ids: List[str],
+        batch_slots: asyncio.Semaphore,
+    ) -> None:
+        stored = []
+        try:
+            result = await self.embedding(ten_env, ingestion, texts)
+            if result.get_status_code() == StatusCode.OK:
+                stored = await self.vector_store(
+                    ten_env, ingestion, texts, ids, result
+                )
+        except Exception as e:
+            ten_env.log_error(f"failed to store a batch of the file {ingestion.path}, err: {e}")
+        finally:
+            batch_slots.release()
+
+        ingestion.stored_ids.update(stored)
+        ingestion.chunks_stored += len(stored)
+        ingestion.chunks_failed += len(texts) - len(stored)
+        ten_env.log_info(
+            f"complete vector store for one splitting of the file: {ingestion.path}, stored: {ingestion.chunks_stored}, failed: {ingestion.chunks_failed}, chunks: {ingestion.chunks}"
+        )
+        await self.send_progress(ten_env, ingestion)
+
+    async def send_progress(self, ten_env: AsyncTenEnv, ingestion: FileIngestion):
+        data = Data.create(FILE_CHUNK_PROGRESS_DATA)
+        data.set_property_string("path", ingestion.path)
+        data.set_property_string("collection", ingestion.collection)
+        data.set_property_int("pages", ingestion.pages)
+        data.set_property_int("chunks", ingestion.chunks)
+        data.set_property_int("chunks_stored", ingestion.chunks_stored)
+        data.set_property_int("chunks_failed", ingestion.chunks_failed)
+        data.set_property_int("chunks_unchanged", ingestion.chunks_unchanged)
+        data.set_property_int("chunks_deleted", ingestion.chunks_deleted)
+        data.set_property_bool("parsed", ingestion.parsed)
+        await ten_env.send_data(data)
+
+    async def delete_removed_chunks(
+        self, ten_env: AsyncTenEnv, ingestion: FileIngestion
+    ) -> set[str]:
+        """Delete the chunks gone since the previous ingestion, return the ids that could not be."""
+        removed = sorted(ingestion.previous_ids - ingestion.chunk_ids)
+        failed = set()
+        for i in range(0, len(removed), DELETE_BATCH_SIZE):
+            ids = removed[i : i + DELETE_BATCH_SIZE]
+            cmd_out = Cmd.create(DELETE_VECTOR_CMD)
+            cmd_out.set_property_string("collection_name", ingestion.collection)
+            cmd_out.set_property_from_json("ids", json.dumps(ids))
+            [result, _] = await ten_env.send_cmd(cmd_out)
+            if result.get_status_code() == StatusCode.OK:
+                ingestion.chunks_deleted += len(ids)
+            else:
+                failed.update(ids)
+        return failed
+
+    async def index_bm25(self, ten_env: AsyncTenEnv, ingestion: FileIngestion) -> None:
+        """Replace the chunks of the file in the BM25 index of its collection."""
+        index = self.bm25_indexes.get(ingestion.collection)
+        if index is None:
+            index = self.bm25_indexes[ingestion.collection] = BM25Index(
+                os.path.join(self.config.bm25_dir, ingestion.collection)
             )
-            if self.counters[path] == self.expected[path]:
-                chunks_count = self.counters[path]
-                del self.counters[path]
-                del self.expected[path]
-                ten.log_info(
-                    f"complete chunk for the file: {path}, chunks_count {chunks_count}"
+        ids = [doc_id for doc_id, _ in ingestion.documents]
+        texts = [text for _, text in ingestion.documents]
+        await asyncio.to_thread(index.replace, ingestion.path, ids, texts)
+        ten_env.log_info(
+            f"bm25 index of collection {ingestion.collection} updated with {len(ids)} chunks of the file {ingestion.path}"
+        )
+
+    async def file_chunked(self, ten_env: AsyncTenEnv, ingestion: FileIngestion):
+        ten_env.log_info(
+            f"complete chunk for the file: {ingestion.path}, chunks_count {ingestion.chunks}"
+        )
+        cmd_out = Cmd.create(FILE_CHUNKED_CMD)
+        cmd_out.set_property_string("path", ingestion.path)
+        cmd_out.set_property_string("collection", ingestion.collection)
+        await ten_env.send_cmd(cmd_out)
+        ten_env.log_info("send_cmd done")
+
+    async def ingest(self, ten_env: AsyncTenEnv, ingestion: FileIngestion):
+        async with self.files_slots:
+            path, collection = ingestion.path, ingestion.collection
+            ingestion.start_time = datetime.now()
+            ten_env.log_info(f"start processing {path}, collection {collection}")
+
+            try:
+                manifest = await self.collection_manifest(ten_env, collection)
+                ingestion.previous_ids = manifest.chunk_ids(path)
+
+                splitter = await asyncio.to_thread(self.splitter)
+                batch_slots = asyncio.Semaphore(self.config.max_in_flight_batches)
+                batches = []
+                texts, ids = [], []
+
+                async def flush(texts: List[str], ids: List[str]):
+                    # bounded window, parsing waits for a slot when the storage falls behind
+                    await batch_slots.acquire()
+                    batches.append(
+                        asyncio.create_task(
+                            self.store_batch(
+                                ten_env, ingestion, texts, ids, batch_slots
+                            )
+                        )
+                    )
+
+                pages = read_pages(path)
+                while True:
+                    page = await asyncio.to_thread(next, pages, None)
+                    if page is None:
+                        break
+                    ingestion.pages += 1
+                    chunks = await asyncio.to_thread(splitter.split_text, page)
+                    ingestion.chunks += len(chunks)
+                    for chunk in chunks:
+                        cid = chunk_id(path, chunk)
+                        if cid in ingestion.chunk_ids:
+                            continue  # repeated in the file
+                        ingestion.chunk_ids.add(cid)
+                        if self.config.bm25_dir:
+                            ingestion.documents.append((cid, chunk))
+                        if cid in ingestion.previous_ids:
+                            ingestion.chunks_unchanged += 1
+                            continue
+                        texts.append(chunk)
+                        ids.append(cid)
+                        if len(texts) == BATCH_SIZE:
+                            await flush(texts, ids)
+                            texts, ids = [], []
+                if texts:
+                    await flush(texts, ids)
+
+                ingestion.parsed = True
+                ten_env.log_info(
+                    f"file {path} parsed, pages count {ingestion.pages}, chunking count {ingestion.chunks}"
                 )
-                cmd_out = Cmd.create(FILE_CHUNKED_CMD)
-                cmd_out.set_property_string("path", path)
-                cmd_out.set_property_string("collection", self.new_collection_name)
-                ten.send_cmd(
-                    cmd_out,
-                    lambda ten, result, _: ten.log_info("send_cmd done"),
+                await asyncio.gather(*batches)
+                undeleted = await self.delete_removed_chunks(ten_env, ingestion)
+                if self.config.bm25_dir:
+                    await self.index_bm25(ten_env, ingestion)
+                await asyncio.to_thread(
+                    manifest.update,
+                    path,
+                    manifest_ids(
+                        ingestion.previous_ids,
+                        ingestion.chunk_ids,
+                        ingestion.stored_ids,
+                        undeleted,
+                    ),
                 )
-                self.file_chunked_event.set()
-        else:
-            ten.log_error("missing counter for the file path: %s", path)
+                ten_env.log_info(
+                    f"file {path} stored, unchanged {ingestion.chunks_unchanged}, stored {ingestion.chunks_stored}, failed {ingestion.chunks_failed}, deleted {ingestion.chunks_deleted}"
+                )
+                await self.send_progress(ten_env, ingestion)
+                await self.file_chunked(ten_env, ingestion)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                ten_env.log_error(f"failed to process {path}, err: {e}")
+            finally:
+                self.ingestions.pop(path, None)
+
+            ten_env.log_info(
+                f"finished processing {path}, collection {collection}, cost {int((datetime.now() - ingestion.start_time).total_seconds() * 1000)}ms"
+            )
 
-    def on_cmd(self, ten: TenEnv, cmd: Cmd) -> None:
+    async def on_cmd(self, ten_env: AsyncTenEnv, cmd: Cmd) -> None:
         cmd_name = cmd.get_name()
         if cmd_name == CMD_FILE_CHUNK:
             path = cmd.get_property_string("path")
@@ -152,72 +384,37 @@ class FileChunkerExtension(Extension):
             try:
                 collection = cmd.get_property_string("collection")
             except Exception:
-                ten.log_warn(f"missing collection property in cmd {cmd_name}")
-
-            self.queue.put((path, collection))  # make sure files are processed in order
+                ten_env.log_warn(f"missing collection property in cmd {cmd_name}")
+
+            if path in self.ingestions:
+                ten_env.log_warn(f"file {path} is already being processed")
+            else:
+                if collection is None:
+                    collection = find_collection(self.manifests, path)
+                if collection is None:
+                    collection = self.generate_collection_name()
+                    ten_env.log_info(f"collection {collection} generated")
+                ingestion = self.ingestions[path] = FileIngestion(path, collection)
+                task = asyncio.create_task(self.ingest(ten_env, ingestion))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
         else:
-            ten.log_info(f"unknown cmd {cmd_name}")
+            ten_env.log_info(f"unknown cmd {cmd_name}")
 
         cmd_result = CmdResult.create(StatusCode.OK)
         cmd_result.set_property_string("detail", "ok")
-        ten.return_result(cmd_result, cmd)
-
-    def async_handler(self, ten: TenEnv) -> None:
-        while not self.stop:
-            value = self.queue.get()
-            if value is None:
-                break
-            path, collection = value
-
-            # start processing the file
-            start_time = datetime.now()
-            if collection is None:
-                collection = self.generate_collection_name()
-                ten.log_info(f"collection {collection} generated")
-            ten.log_info(f"start processing {path}, collection {collection}")
-
-            # create collection
-            self.create_collection(ten, collection, True)
-            ten.log_info(f"collection {collection} created")
-
-            # split
-            nodes = self.split(ten, path)
-
-            # reset counters and events
-            self.new_collection_name = collection
-            self.expected[path] = math.ceil(len(nodes) / BATCH_SIZE)
-            self.counters[path] = 0
-            self.file_chunked_event.clear()
-
-            # trigger embedding and vector storing in parallel
-            for texts in list(batch(nodes, BATCH_SIZE)):
-                self.embedding(ten, path, texts)
-
-            # wait for all chunks to be processed
-            self.file_chunked_event.wait()
-
-            ten.log_info(
-                f"finished processing {path}, collection {collection}, cost {int((datetime.now() - start_time).total_seconds() * 1000)}ms"
-            )
-
-    def on_start(self, ten: TenEnv) -> None:
-        ten.log_info("on_start")
-
-        self.stop = False
-        self.thread = threading.Thread(target=self.async_handler, args=[ten])
-        self.thread.start()
-
-        ten.on_start_done()
-
-    def on_stop(self, ten: TenEnv) -> None:
-        ten.log_info("on_stop")
-
-        self.stop = True
-        if self.thread is not None:
-            while not self.queue.empty():
-                self.queue.get()
-            self.queue.put(None)
-            self.thread.join()
-            self.thread = None
+        await ten_env.return_result(cmd_result, cmd)
+
+    async def on_start(self, ten_env: AsyncTenEnv) -> None:
+        ten_env.log_info("on_start")
+        self.config = await FileChunkerConfig.create_async(ten_env=ten_env)
+        ten_env.log_info(f"config: {self.config}")
+        self.files_slots = asyncio.Semaphore(self.config.max_concurrent_files)
+        self.manifests = await asyncio.to_thread(
+            ChunkManifest.load_all, self.config.manifest_dir
+        )
 
-        ten.on_stop_done()
+    async def on_stop(self, ten_env: AsyncTenEnv) -> None:
+        ten_env.log_info("on_stop")
+        for task in self.tasks:
+            task.cancel()
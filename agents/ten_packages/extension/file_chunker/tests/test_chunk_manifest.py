@@ -0,0 +1,84 @@
+import json
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from chunk_manifest import (  # noqa: E402
+    ChunkManifest,
+    chunk_id,
+    find_collection,
+    manifest_ids,
+)
+
+
+def test_chunk_id_is_stable():
+    cid = chunk_id("/docs/a.pdf", "some text")
+    assert cid == chunk_id("/docs/a.pdf", "some text")
+    assert len(cid) == 32 and int(cid, 16) >= 0
+    # the same text in another file is another row
+    assert cid != chunk_id("/docs/b.pdf", "some text")
+    assert cid != chunk_id("/docs/a.pdf", "some text.")
+
+
+def test_update_and_load_all_round_trip(tmp_path):
+    manifest = ChunkManifest("coll_a", str(tmp_path))
+    manifest.update("/docs/a.pdf", {"c2", "c1"})
+    manifest.update("/docs/b.pdf", ["c3"])
+    ChunkManifest("coll_b", str(tmp_path)).update("/docs/c.pdf", ["c4"])
+    # a file sent again replaces its ids
+    manifest.update("/docs/b.pdf", ["c5"])
+
+    manifests = ChunkManifest.load_all(str(tmp_path))
+    assert sorted(manifests) == ["coll_a", "coll_b"]
+    assert manifests["coll_a"].files == {"/docs/a.pdf": ["c1", "c2"], "/docs/b.pdf": ["c5"]}
+    assert manifests["coll_a"].chunk_ids("/docs/a.pdf") == {"c1", "c2"}
+    assert manifests["coll_a"].chunk_ids("/docs/new.pdf") == set()
+    assert manifests["coll_b"].chunk_ids("/docs/c.pdf") == {"c4"}
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_load_all_skips_unreadable_manifests(tmp_path):
+    (tmp_path / "coll_bad.json").write_text("{")
+    (tmp_path / "coll_old.json").write_text(json.dumps({"ids": []}))
+    (tmp_path / "notes.txt").write_text("")
+    ChunkManifest("coll_a", str(tmp_path)).update("/docs/a.pdf", ["c1"])
+
+    assert list(ChunkManifest.load_all(str(tmp_path))) == ["coll_a"]
+    assert ChunkManifest.load_all(str(tmp_path / "missing")) == {}
+    assert ChunkManifest.load_all("") == {}
+
+
+def test_manifest_without_dir_is_in_memory_only(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    manifest = ChunkManifest("coll_a")
+    manifest.update("/docs/a.pdf", ["c1"])
+    assert manifest.chunk_ids("/docs/a.pdf") == {"c1"}
+    assert not list(tmp_path.iterdir())
+
+
+def test_find_collection():
+    a, b = ChunkManifest("coll_a"), ChunkManifest("coll_b")
+    a.update("/docs/a.pdf", ["c1"])
+    b.update("/docs/b.pdf", [])
+    manifests = {"coll_a": a, "coll_b": b}
+    assert find_collection(manifests, "/docs/a.pdf") == "coll_a"
+    # a file without chunks was still ingested there
+    assert find_collection(manifests, "/docs/b.pdf") == "coll_b"
+    assert find_collection(manifests, "/docs/c.pdf") is None
+    assert find_collection({}, "/docs/a.pdf") is None
+
+
+def test_manifest_ids_after_ingestion():
+    previous_ids = {"kept", "removed", "undeletable"}
+    chunk_ids = {"kept", "new", "failed"}
+    # "new" stored, "failed" not, "undeletable" could not be deleted
+    ids = manifest_ids(previous_ids, chunk_ids, {"new"}, {"undeletable"})
+    assert ids == {"kept", "new", "undeletable"}
+
+    # next time the failed chunk is embedded again and the leftover deleted
+    chunk_ids = {"kept", "new", "failed"}
+    assert manifest_ids(ids, chunk_ids, {"failed"}, set()) == {"kept", "new", "failed"}
+
+    # a file ingested for the first time records only what was stored
+    assert manifest_ids(set(), {"a", "b"}, {"a"}, set()) == {"a"}
@@ -12,7 +12,6 @@ import json
 import traceback
 import time
 from google import genai
-import numpy as np
 from typing import Iterable, cast
 
 import websockets
@@ -25,11 +24,13 @@ from ten import (
     CmdResult,
     Data,
 )
-from ten.audio_frame import AudioFrameDataFmt
+from ten_ai_base.histogram import WindowedHistogram, latency_stats
+from ten_ai_base.audio import PcmFrameEmitter
 from ten_ai_base.const import CMD_PROPERTY_RESULT, CMD_TOOL_CALL
 from ten_ai_base import AsyncLLMBaseExtension
 from dataclasses import dataclass
 from ten_ai_base.config import BaseConfig
+from ten_ai_base.sentence import SentenceSegmenter
 from ten_ai_base.chat_memory import ChatMemory
 from ten_ai_base.usage import (
     LLMUsage,
@@ -179,17 +180,17 @@ class GeminiRealtimeExtension(AsyncLLMBaseExtension):
         self.channel_name: str = ""
         self.audio_len_threshold: int = 5120
 
-        self.completion_times = []
-        self.connect_times = []
-        self.first_token_times = []
+        self.completion_times = WindowedHistogram()
+        self.connect_times = WindowedHistogram()
+        self.first_token_times = WindowedHistogram()
 
         self.buff: bytearray = b""
-        self.transcript: str = ""
+        self.transcript = SentenceSegmenter()
         self.ctx: dict = {}
         self.input_end = time.time()
         self.client = None
         self.session: AsyncSession = None
-        self.leftover_bytes = b""
+        self.audio_emitter = PcmFrameEmitter(sample_rate=24000)
         self.video_task = None
         self.image_queue = asyncio.Queue()
         self.video_buff: str = ""
@@ -239,10 +240,12 @@ class GeminiRealtimeExtension(AsyncLLMBaseExtension):
             try:
                 config: LiveConnectConfig = self._get_session_config()
                 ten_env.log_info("Start listen")
+                start_time = time.time()
                 async with self.client.aio.live.connect(
                     model=self.config.model, config=config
                 ) as session:
                     ten_env.log_info("Connected")
+                    self.connect_times.record(time.time() - start_time)
                     session = cast(AsyncSession, session)
                     self.session = session
                     self.connected = True
@@ -278,6 +281,7 @@ class GeminiRealtimeExtension(AsyncLLMBaseExtension):
                                                 )
                                         elif response.server_content.turn_complete:
                                             ten_env.log_info("Turn complete")
+                                            await self.audio_emitter.flush(ten_env)
                                     elif response.setup_complete:
                                         ten_env.log_info("Setup complete")
                                     elif response.tool_call:
@@ -305,34 +309,10 @@ class GeminiRealtimeExtension(AsyncLLMBaseExtension):
         bytes_per_sample = args.get("bytes_per_sample", 2)
         number_of_channels = args.get("number_of_channels", 1)
         try:
-            # Combine leftover bytes with new audio data
-            combined_data = self.leftover_bytes + audio_data
-
-            # Check if combined_data length is odd
-            if len(combined_data) % (bytes_per_sample * number_of_channels) != 0:
-                # Save the last incomplete frame
-                valid_length = len(combined_data) - (
-                    len(combined_data) % (bytes_per_sample * number_of_channels)
-                )
-                self.leftover_bytes = combined_data[valid_length:]
-                combined_data = combined_data[:valid_length]
-            else:
-                self.leftover_bytes = b""
-
-            if combined_data:
-                f = AudioFrame.create("pcm_frame")
-                f.set_sample_rate(sample_rate)
-                f.set_bytes_per_sample(bytes_per_sample)
-                f.set_number_of_channels(number_of_channels)
-                f.set_data_fmt(AudioFrameDataFmt.INTERLEAVE)
-                f.set_samples_per_channel(
-                    len(combined_data) // (bytes_per_sample * number_of_channels)
-                )
-                f.alloc_buf(len(combined_data))
-                buff = f.lock_buf()
-                buff[:] = combined_data
-                f.unlock_buf(buff)
-                await ten_env.send_audio_frame(f)
+            await self.audio_emitter.set_format(
+                ten_env, sample_rate, bytes_per_sample, number_of_channels
+            )
+            await self.audio_emitter.push(ten_env, audio_data)
         except Exception:
             pass
             # ten_env.log_error(f"error send audio frame, {traceback.format_exc()}")
@@ -521,26 +501,6 @@ class GeminiRealtimeExtension(AsyncLLMBaseExtension):
         return result
 
     def _send_transcript(self, content: str, role: Role, is_final: bool) -> None:
-        def is_punctuation(char):
-            if char in [",", "，", ".", "。", "?", "？", "!", "！"]:
-                return True
-            return False
-
-        def parse_sentences(sentence_fragment, content):
-            sentences = []
-            current_sentence = sentence_fragment
-            for char in content:
-                current_sentence += char
-                if is_punctuation(char):
-                    # Check if the current sentence contains non-punctuation characters
-                    stripped_sentence = current_sentence
-                    if any(c.isalnum() for c in stripped_sentence):
-                        sentences.append(stripped_sentence)
-                    current_sentence = ""  # Reset for the next sentence
-
-            remain = current_sentence  # Any remaining characters form the incomplete sentence
-            return sentences, remain
-
         def send_data(
             ten_env: AsyncTenEnv,
             sentence: str,
@@ -566,7 +526,7 @@ class GeminiRealtimeExtension(AsyncLLMBaseExtension):
         stream_id = self.remote_stream_id if role == Role.User else 0
         try:
             if role == Role.Assistant and not is_final:
-                sentences, self.transcript = parse_sentences(self.transcript, content)
+                sentences = self.transcript.push(content)
                 for s in sentences:
                     asyncio.create_task(
                         send_data(self.ten_env, s, stream_id, role, is_final)
@@ -675,6 +635,7 @@ class GeminiRealtimeExtension(AsyncLLMBaseExtension):
 
     async def _flush(self) -> None:
         try:
+            self.audio_emitter.reset()
             c = Cmd.create("flush")
             await self.ten_env.send_cmd(c)
         except Exception:
@@ -712,26 +673,21 @@ class GeminiRealtimeExtension(AsyncLLMBaseExtension):
 
         data = Data.create("llm_stat")
         data.set_property_from_json("usage", json.dumps(self.total_usage.model_dump()))
-        if self.connect_times and self.completion_times and self.first_token_times:
+        if (
+            self.connect_times.count
+            and self.completion_times.count
+            and self.first_token_times.count
+        ):
             data.set_property_from_json(
                 "latency",
                 json.dumps(
-                    {
-                        "connection_latency_95": np.percentile(self.connect_times, 95),
-                        "completion_latency_95": np.percentile(
-                            self.completion_times, 95
-                        ),
-                        "first_token_latency_95": np.percentile(
-                            self.first_token_times, 95
-                        ),
-                        "connection_latency_99": np.percentile(self.connect_times, 99),
-                        "completion_latency_99": np.percentile(
-                            self.completion_times, 99
-                        ),
-                        "first_token_latency_99": np.percentile(
-                            self.first_token_times, 99
-                        ),
-                    }
+                    latency_stats(
+                        {
+                            "connection_latency": self.connect_times,
+                            "completion_latency": self.completion_times,
+                            "first_token_latency": self.first_token_times,
+                        }
+                    )
                 ),
             )
         asyncio.create_task(self.ten_env.send_data(data))
@@ -5,12 +5,10 @@
 #
 import asyncio
 import traceback
-import aiohttp
 import json
 import time
 import re
 
-import numpy as np
 from typing import List, Any, AsyncGenerator
 from dataclasses import dataclass, field
 from pydantic import BaseModel
@@ -25,7 +23,17 @@ from ten import (
     Data,
 )
 
+from ten_ai_base.histogram import WindowedHistogram, latency_stats
 from ten_ai_base.config import BaseConfig
+from ten_ai_base.http_client import (
+    HttpClient,
+    HttpClientOptions,
+    get_http_client,
+    close_http_client,
+)
+from ten_ai_base.semantic_cache import SemanticCache
+from ten_ai_base.sentence import SentenceSegmenter
+from ten_ai_base.trace import SPAN_LLM_FIRST_TOKEN
 from ten_ai_base.chat_memory import (
     ChatMemory,
     EVENT_MEMORY_APPENDED,
@@ -60,26 +68,7 @@ DATA_OUT_TEXT_DATA_PROPERTY_END_OF_SEGMENT = "end_of_segment"
 
 CMD_PROPERTY_RESULT = "tool_result"
 
-
-def is_punctuation(char):
-    if char in [",", "，", ".", "。", "?", "？", "!", "！"]:
-        return True
-    return False
-
-
-def parse_sentences(sentence_fragment, content):
-    sentences = []
-    current_sentence = sentence_fragment
-    for char in content:
-        current_sentence += char
-        if is_punctuation(char):
-            stripped_sentence = current_sentence
-            if any(c.isalnum() for c in stripped_sentence):
-                sentences.append(stripped_sentence)
-            current_sentence = ""
-
-    remain = current_sentence
-    return sentences, remain
+HTTP_CLIENT_NAME = "glue"
 
 
 class ToolCallFunction(BaseModel):
@@ -122,6 +111,7 @@ class GlueConfig(BaseConfig):
     token: str = ""
     prompt: str = ""
     max_history: int = 10
+    max_history_tokens: int = 0
     greeting: str = ""
     failure_info: str = ""
     modalities: List[str] = field(default_factory=lambda: ["text"])
@@ -131,6 +121,15 @@ class GlueConfig(BaseConfig):
     extra_context: dict = field(default_factory=dict)
     enable_storage: bool = False
 
+    # answer utterances close to an already answered one from a local cache, needs an
+    # embedding extension connected to the embed cmd. Only the first turn of a chat, without
+    # history, is cached
+    semantic_cache_enabled: bool = False
+    semantic_cache_threshold: float = 0.92
+    semantic_cache_ttl_seconds: int = 3600
+    semantic_cache_max_entries: int = 10000
+    semantic_cache_lookup_timeout_ms: int = 300
+
 
 class AsyncGlueExtension(AsyncLLMBaseExtension):
     def __init__(self, name):
@@ -141,12 +140,13 @@ class AsyncGlueExtension(AsyncLLMBaseExtension):
         self.loop: asyncio.AbstractEventLoop = None
         self.stopped: bool = False
         self.memory: ChatMemory = None
+        self.http: HttpClient = None
         self.total_usage: LLMUsage = LLMUsage()
         self.users_count = 0
 
-        self.completion_times = []
-        self.connect_times = []
-        self.first_token_times = []
+        self.completion_times = WindowedHistogram()
+        self.connect_times = WindowedHistogram()
+        self.first_token_times = WindowedHistogram()
 
         self.remote_stream_id: int = 999
 
@@ -163,7 +163,14 @@ class AsyncGlueExtension(AsyncLLMBaseExtension):
         self.config = await GlueConfig.create_async(ten_env=ten_env)
         ten_env.log_info(f"config: {self.config}")
 
-        self.memory = ChatMemory(self.config.max_history)
+        self.http = get_http_client(
+            HTTP_CLIENT_NAME, HttpClientOptions(total_timeout=300)
+        )
+        asyncio.create_task(self.http.warmup(ten_env, self.config.api_url))
+
+        self.memory = ChatMemory(
+            self.config.max_history, max_tokens=self.config.max_history_tokens
+        )
 
         if self.config.enable_storage:
             [result, _] = await ten_env.send_cmd(Cmd.create("retrieve"))
@@ -180,6 +187,14 @@ class AsyncGlueExtension(AsyncLLMBaseExtension):
 
         self.memory.on(EVENT_MEMORY_APPENDED, self._on_memory_appended)
 
+        if self.config.semantic_cache_enabled:
+            self.semantic_cache = SemanticCache(
+                threshold=self.config.semantic_cache_threshold,
+                ttl_seconds=self.config.semantic_cache_ttl_seconds,
+                max_entries=self.config.semantic_cache_max_entries,
+                lookup_timeout_ms=self.config.semantic_cache_lookup_timeout_ms,
+            )
+
         self.ten_env = ten_env
 
     async def on_stop(self, ten_env: AsyncTenEnv) -> None:
@@ -189,6 +204,12 @@ class AsyncGlueExtension(AsyncLLMBaseExtension):
         self.stopped = True
         await self.queue.put(None)
 
+        if self.http:
+            ten_env.log_info(f"http stats: {self.http.stats()}")
+        if self.semantic_cache:
+            ten_env.log_info(f"semantic cache stats: {self.semantic_cache.stats()}")
+        await close_http_client(HTTP_CLIENT_NAME)
+
     async def on_deinit(self, ten_env: AsyncTenEnv) -> None:
         await super().on_deinit(ten_env)
         ten_env.log_debug("on_deinit")
@@ -288,7 +309,7 @@ class AsyncGlueExtension(AsyncLLMBaseExtension):
             tools.append(tool_dict(tool))
 
         total_output = ""
-        sentence_fragment = ""
+        segmenter = SentenceSegmenter()
         calls = {}
 
         sentences = []
@@ -303,15 +324,14 @@ class AsyncGlueExtension(AsyncLLMBaseExtension):
                     if c.choices[0].delta.content:
                         if first_token_time is None:
                             first_token_time = time.time()
-                            self.first_token_times.append(first_token_time - start_time)
+                            self.first_token_times.record(first_token_time - start_time)
+                            self.tracer.span(SPAN_LLM_FIRST_TOKEN)
 
                         content = c.choices[0].delta.content
                         if self.config.ssml_enabled and content.startswith("<speak>"):
                             content = trim_xml(content)
                         total_output += content
-                        sentences, sentence_fragment = parse_sentences(
-                            sentence_fragment, content
-                        )
+                        sentences = segmenter.push(content)
                         for s in sentences:
                             await self._send_text(s)
                     if c.choices[0].delta.tool_calls:
@@ -337,15 +357,18 @@ class AsyncGlueExtension(AsyncLLMBaseExtension):
             except Exception as e:
                 self.ten_env.log_error(f"Failed to parse response: {message} {e}")
                 traceback.print_exc()
+        sentence_fragment = segmenter.flush()
         if sentence_fragment:
             await self._send_text(sentence_fragment)
         end_time = time.time()
-        self.completion_times.append(end_time - start_time)
+        self.completion_times.record(end_time - start_time)
 
         if total_output:
             self.memory.put({"role": "assistant", "content": total_output})
 
         if calls:
+            # the answer depends on the tool results
+            self.no_semantic_cache()
             tasks = []
             tool_calls = []
             for _, call in calls.items():
@@ -370,6 +393,19 @@ class AsyncGlueExtension(AsyncLLMBaseExtension):
 
         self.ten_env.log_info(f"total_output: {total_output} {calls}")
 
+    def semantic_cache_prompt(self) -> str:
+        return self.config.prompt
+
+    def semantic_cache_has_history(self) -> bool:
+        return self.memory.count() > 0
+
+    async def on_semantic_cache_hit(
+        self, ten_env: AsyncTenEnv, messages: list, answer: str
+    ) -> None:
+        for i in messages:
+            self.memory.put(i)
+        self.memory.put({"role": "assistant", "content": answer})
+
     async def on_tools_update(
         self, ten_env: AsyncTenEnv, tool: LLMToolMetadata
     ) -> None:
@@ -425,6 +461,7 @@ class AsyncGlueExtension(AsyncLLMBaseExtension):
             return
 
         ten_env.log_info(f"OnData input text: [{input_text}]")
+        self.trace_input(data)
 
         # Start an asynchronous task for handling chat completion
         message = LLMChatCompletionUserMessageParam(role="user", content=input_text)
@@ -441,63 +478,59 @@ class AsyncGlueExtension(AsyncLLMBaseExtension):
         pass
 
     async def _send_text(self, text: str) -> None:
-        data = Data.create("text_data")
-        data.set_property_string(DATA_OUT_TEXT_DATA_PROPERTY_TEXT, text)
-        data.set_property_bool(DATA_OUT_TEXT_DATA_PROPERTY_END_OF_SEGMENT, True)
-        asyncio.create_task(self.ten_env.send_data(data))
+        self.send_text_output(self.ten_env, text, True)
 
     async def _stream_chat(
         self, messages: List[Any], tools: List[Any]
     ) -> AsyncGenerator[dict, None]:
-        async with aiohttp.ClientSession() as session:
-            try:
-                payload = {
-                    "messages": messages,
-                    "tools": tools,
-                    "tools_choice": "auto" if tools else "none",
-                    "model": "gpt-3.5-turbo",
-                    "stream": True,
-                    "stream_options": {"include_usage": True},
-                    "ssml_enabled": self.config.ssml_enabled,
-                }
-                if self.config.context_enabled:
-                    payload["context"] = {**self.config.extra_context}
-                self.ten_env.log_info(f"payload before sending: {json.dumps(payload)}")
-                headers = {
-                    "Authorization": f"Bearer {self.config.token}",
-                    "Content-Type": "application/json",
-                }
+        try:
+            payload = {
+                "messages": messages,
+                "tools": tools,
+                "tools_choice": "auto" if tools else "none",
+                "model": "gpt-3.5-turbo",
+                "stream": True,
+                "stream_options": {"include_usage": True},
+                "ssml_enabled": self.config.ssml_enabled,
+            }
+            if self.config.context_enabled:
+                payload["context"] = {**self.config.extra_context}
+            self.ten_env.log_info(f"payload before sending: {json.dumps(payload)}")
+            headers = {
+                "Authorization": f"Bearer {self.config.token}",
+                "Content-Type": "application/json",
+            }
 
-                start_time = time.time()
-                async with session.post(
-                    self.config.api_url, json=payload, headers=headers
-                ) as response:
-                    if response.status != 200:
-                        r = await response.json()
-                        self.ten_env.log_error(
-                            f"Received unexpected status {r} from the server."
-                        )
-                        if self.config.failure_info:
-                            await self._send_text(self.config.failure_info)
-                        return
-                    end_time = time.time()
-                    self.connect_times.append(end_time - start_time)
-
-                    async for line in response.content:
-                        if line:
-                            l = line.decode("utf-8").strip()
-                            if l.startswith("data:"):
-                                content = l[5:].strip()
-                                if content == "[DONE]":
-                                    break
-                                self.ten_env.log_debug(f"content: {content}")
-                                yield json.loads(content)
-            except Exception as e:
-                traceback.print_exc()
-                self.ten_env.log_error(f"Failed to handle {e}")
-            finally:
-                await session.close()
-                session = None
+            start_time = time.time()
+            async with self.http.post(
+                self.config.api_url, json=payload, headers=headers
+            ) as response:
+                if response.status != 200:
+                    r = await response.json()
+                    self.ten_env.log_error(
+                        f"Received unexpected status {r} from the server."
+                    )
+                    # the failure info is not an answer to cache
+                    self.no_semantic_cache()
+                    if self.config.failure_info:
+                        await self._send_text(self.config.failure_info)
+                    return
+                end_time = time.time()
+                self.connect_times.record(end_time - start_time)
+
+                async for line in response.content:
+                    if line:
+                        l = line.decode("utf-8").strip()
+                        if l.startswith("data:"):
+                            content = l[5:].strip()
+                            if content == "[DONE]":
+                                break
+                            self.ten_env.log_debug(f"content: {content}")
+                            yield json.loads(content)
+        except Exception as e:
+            self.no_semantic_cache()
+            traceback.print_exc()
+            self.ten_env.log_error(f"Failed to handle {e}")
 
     async def _update_usage(self, usage: LLMUsage) -> None:
         if not self.config.rtm_enabled:
@@ -538,26 +571,21 @@ class AsyncGlueExtension(AsyncLLMBaseExtension):
 
         data = Data.create("llm_stat")
         data.set_property_from_json("usage", json.dumps(self.total_usage.model_dump()))
-        if self.connect_times and self.completion_times and self.first_token_times:
+        if (
+            self.connect_times.count
+            and self.completion_times.count
+            and self.first_token_times.count
+        ):
             data.set_property_from_json(
                 "latency",
                 json.dumps(
-                    {
-                        "connection_latency_95": np.percentile(self.connect_times, 95),
-                        "completion_latency_95": np.percentile(
-                            self.completion_times, 95
-                        ),
-                        "first_token_latency_95": np.percentile(
-                            self.first_token_times, 95
-                        ),
-                        "connection_latency_99": np.percentile(self.connect_times, 99),
-                        "completion_latency_99": np.percentile(
-                            self.completion_times, 99
-                        ),
-                        "first_token_latency_99": np.percentile(
-                            self.first_token_times, 99
-                        ),
-                    }
+                    latency_stats(
+                        {
+                            "connection_latency": self.connect_times,
+                            "completion_latency": self.completion_times,
+                            "first_token_latency": self.first_token_times,
+                        }
+                    )
                 ),
             )
         asyncio.create_task(self.ten_env.send_data(data))
@@ -0,0 +1,49 @@
+import asyncio
+from typing import AsyncIterator
+
+from ten import Cmd, CmdResult, TenEnv
+
+
+def _call_soon(loop: asyncio.AbstractEventLoop, callback, *args) -> None:
+    try:
+        loop.call_soon_threadsafe(callback, *args)
+    except RuntimeError:
+        pass  # loop closed on stop, nobody is waiting anymore
+
+
+def send_cmd_async(ten: TenEnv, cmd: Cmd) -> "asyncio.Future[CmdResult]":
+    """
+    Send cmd, the returned future is resolved with its result on the running loop
+    from the send_cmd callback. Cancelling the future only drops the result.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def resolve(result: CmdResult, error) -> None:
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(RuntimeError(f"{cmd.get_name()} failed, err: {error}"))
+        else:
+            future.set_result(result)
+
+    ten.send_cmd(cmd, lambda _, result, error: _call_soon(loop, resolve, result, error))
+    return future
+
+
+async def send_cmd_stream_async(ten: TenEnv, cmd: Cmd) -> AsyncIterator[CmdResult]:
+    """Send cmd and yield its streamed results until the final one."""
+    loop = asyncio.get_running_loop()
+    results = asyncio.Queue()
+
+    def callback(_, result: CmdResult, error) -> None:
+        _call_soon(loop, results.put_nowait, (result, error))
+
+    ten.send_cmd(cmd, callback)
+    while True:
+        result, error = await results.get()
+        if error is not None:
+            raise RuntimeError(f"{cmd.get_name()} failed, err: {error}")
+        yield result
+        if result.get_is_final():
+            break
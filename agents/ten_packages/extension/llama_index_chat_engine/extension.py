@@ -13,23 +13,55 @@ from ten import (
     StatusCode,
     CmdResult,
 )
-import queue, threading
+import asyncio, importlib, os, threading, time
 from datetime import datetime
+from typing import Any, Dict, Tuple
 
 PROPERTY_CHAT_MEMORY_TOKEN_LIMIT = "chat_memory_token_limit"
 PROPERTY_GREETING = "greeting"
+PROPERTY_TOP_K = "top_k"
+PROPERTY_BM25_DIR = "bm25_dir"
+PROPERTY_RERANK_MODEL = "rerank_model"
+PROPERTY_PREFETCH_ON_PARTIAL = "prefetch_on_partial"
+PROPERTY_PARTIAL_STABLE_MS = "partial_stable_ms"
+PROPERTY_PARTIAL_MATCH_RATIO = "partial_match_ratio"
 
 TASK_TYPE_CHAT_REQUEST = "chat_request"
 TASK_TYPE_GREETING = "greeting"
 
+SYSTEM_PROMPT = (
+    "You are a voice assistant who talks in a conversational way and can chat with me like my friends. \n"
+    "I will speak to you in English or Chinese, and you will answer in the corrected and improved version of my text with the language I use. \n"
+    "Don’t talk like a robot, instead I would like you to talk like a real human with emotions. \n"
+    "I will use your answer for text-to-speech, so don’t return me any meaningless characters. \n"
+    "I want you to be helpful, when I’m asking you for advice, give me precise, practical and useful advice instead of being vague. \n"
+    "When giving me a list of options, express the options in a narrative way instead of bullet points.\n"
+)
+
+CONTEXT_SYSTEM_PROMPT = (
+    # "You are an expert Q&A system that is trusted around the world.\n"
+    SYSTEM_PROMPT + "Always answer the query using the provided context information, "
+    "and not prior knowledge.\n"
+    "Some rules to follow:\n"
+    "1. Never directly reference the given context in your answer.\n"
+    "2. Avoid statements like 'Based on the context, ...' or "
+    "'The context information ...' or anything along "
+    "those lines."
+)
+
 
 class LlamaIndexExtension(Extension):
     def __init__(self, name: str):
         super().__init__(name)
-        self.queue = queue.Queue()
+        self.loop = None
+        self.queue = asyncio.Queue()
         self.thread = None
         self.stop = False
 
+        # running turns, in arrival order, each waits for the previous one before answering
+        self.tasks: set[asyncio.Task] = set()
+        self.turn_lock = asyncio.Lock()
+
         self.outdate_ts = datetime.now()
         self.outdate_ts_lock = threading.Lock()
 
@@ -37,6 +69,25 @@ class LlamaIndexExtension(Extension):
         self.chat_memory_token_limit = 3000
         self.chat_memory = None
 
+        self.top_k = 3
+        # hybrid retrieval, BM25 indexes built by file_chunker under bm25_dir
+        self.bm25_dir = ""
+        self.rerank_model = ""
+        self.reranker = None
+
+        # speculative retrieval of partial transcripts unchanged for partial_stable_ms,
+        # reused by the final transcript when similar enough
+        self.prefetch_on_partial = True
+        self.partial_stable_ms = 200
+        self.partial_match_ratio = 0.8
+        self.speculation_timer: asyncio.TimerHandle = None
+
+        # chat engine and retriever by collection, "" for the engine without retrieval,
+        # only used from the loop thread
+        self.chat_engines: Dict[str, Tuple[Any, Any]] = {}
+        self.chat_engine_build_ms: Dict[str, float] = {}
+        self.setup_ms_saved = 0.0
+
     def _send_text_data(self, ten: TenEnv, text: str, end_of_segment: bool):
         try:
             output_data = Data.create("text_data")
@@ -67,8 +118,37 @@ class LlamaIndexExtension(Extension):
                 f"get {PROPERTY_CHAT_MEMORY_TOKEN_LIMIT} property failed, err: {err}"
             )
 
-        self.thread = threading.Thread(target=self.async_handle, args=[ten])
-        self.thread.start()
+        try:
+            self.top_k = ten.get_property_int(PROPERTY_TOP_K)
+        except Exception as err:
+            ten.log_warn(f"get {PROPERTY_TOP_K} property failed, err: {err}")
+
+        try:
+            self.bm25_dir = ten.get_property_string(PROPERTY_BM25_DIR)
+        except Exception as err:
+            ten.log_warn(f"get {PROPERTY_BM25_DIR} property failed, err: {err}")
+
+        try:
+            self.rerank_model = ten.get_property_string(PROPERTY_RERANK_MODEL)
+        except Exception as err:
+            ten.log_warn(f"get {PROPERTY_RERANK_MODEL} property failed, err: {err}")
+
+        try:
+            self.prefetch_on_partial = ten.get_property_bool(PROPERTY_PREFETCH_ON_PARTIAL)
+        except Exception as err:
+            ten.log_warn(f"get {PROPERTY_PREFETCH_ON_PARTIAL} property failed, err: {err}")
+
+        try:
+            self.partial_stable_ms = ten.get_property_int(PROPERTY_PARTIAL_STABLE_MS)
+        except Exception as err:
+            ten.log_warn(f"get {PROPERTY_PARTIAL_STABLE_MS} property failed, err: {err}")
+
+        try:
+            self.partial_match_ratio = ten.get_property_float(
+                PROPERTY_PARTIAL_MATCH_RATIO
+            )
+        except Exception as err:
+            ten.log_warn(f"get {PROPERTY_PARTIAL_MATCH_RATIO} property failed, err: {err}")
 
         # enable chat memory
         from llama_index.core.storage.chat_store import SimpleChatStore
@@ -79,6 +159,12 @@ class LlamaIndexExtension(Extension):
             chat_store=SimpleChatStore(),
         )
 
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_until_complete, args=[self.async_handle(ten)]
+        )
+        self.thread.start()
+
         # Send greeting if available
         if greeting is not None:
             self._send_text_data(ten, greeting, True)
@@ -90,10 +176,12 @@ class LlamaIndexExtension(Extension):
 
         self.stop = True
         self.flush()
-        self.queue.put(None)
+        self.put(None)
         if self.thread is not None:
             self.thread.join()
             self.thread = None
+            self.loop.close()
+        self.chat_engines.clear()
         self.chat_memory = None
 
         ten.on_stop_done()
@@ -111,6 +199,7 @@ class LlamaIndexExtension(Extension):
                     f"collection for querying has been updated from {self.collection_name} to {coll}"
                 )
                 self.collection_name = coll
+                self.prepare_chat_engine(ten, coll)
             else:
                 ten.log_info(
                     f"new collection {coll} incoming but won't change current collection_name {self.collection_name}"
@@ -119,20 +208,21 @@ class LlamaIndexExtension(Extension):
             # notify user
             file_chunked_text = "Your document has been processed. You can now start asking questions about your document. "
             # self._send_text_data(ten, file_chunked_text, True)
-            self.queue.put((file_chunked_text, datetime.now(), TASK_TYPE_GREETING))
+            self.put((file_chunked_text, datetime.now(), TASK_TYPE_GREETING))
         elif cmd_name == "file_chunk":
             self.collection_name = ""  # clear current collection
 
             # notify user
             file_chunk_text = "Your document has been received. Please wait a moment while we process it for you.  "
             # self._send_text_data(ten, file_chunk_text, True)
-            self.queue.put((file_chunk_text, datetime.now(), TASK_TYPE_GREETING))
+            self.put((file_chunk_text, datetime.now(), TASK_TYPE_GREETING))
         elif cmd_name == "update_querying_collection":
             coll = cmd.get_property_string("collection")
             ten.log_info(
                 f"collection for querying has been updated from {self.collection_name} to {coll}"
             )
             self.collection_name = coll
+            self.prepare_chat_engine(ten, coll)
 
             # notify user
             update_querying_collection_text = "Your document has been updated. "
@@ -141,7 +231,7 @@ class LlamaIndexExtension(Extension):
                     "You can now start asking questions about your document. "
                 )
             # self._send_text_data(ten, update_querying_collection_text, True)
-            self.queue.put(
+            self.put(
                 (update_querying_collection_text, datetime.now(), TASK_TYPE_GREETING)
             )
 
@@ -155,90 +245,215 @@ class LlamaIndexExtension(Extension):
 
     def on_data(self, ten: TenEnv, data: Data) -> None:
         is_final = data.get_property_bool("is_final")
+        inputText = data.get_property_string("text")
         if not is_final:
-            ten.log_info("on_data ignore non final")
+            if self.prefetch_on_partial and len(inputText) > 0:
+                self.speculate(ten, inputText)
+            else:
+                ten.log_info("on_data ignore non final")
             return
 
-        inputText = data.get_property_string("text")
         if len(inputText) == 0:
             ten.log_info("on_data ignore empty text")
             return
 
+        if self.prefetch_on_partial and self.loop is not None and not self.loop.is_closed():
+            # a partial not stable before the final transcript would not save anything
+            self.loop.call_soon_threadsafe(self.cancel_speculation_timer)
+
         ts = datetime.now()
 
         ten.log_info("on_data text [%s], ts [%s]", inputText, ts)
-        self.queue.put((inputText, ts, TASK_TYPE_CHAT_REQUEST))
+        self.put((inputText, ts, TASK_TYPE_CHAT_REQUEST))
+
+    def put(self, value) -> None:
+        """Queue a task from the runtime thread."""
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, value)
+
+    def speculate(self, ten: TenEnv, partial: str) -> None:
+        """Retrieve for a partial transcript once no newer partial came for partial_stable_ms."""
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.schedule_speculation, ten, partial)
+
+    def schedule_speculation(self, ten: TenEnv, partial: str) -> None:
+        if self.speculation_timer is not None:
+            self.speculation_timer.cancel()
+        self.speculation_timer = self.loop.call_later(
+            self.partial_stable_ms / 1000, self.start_speculation, ten, partial
+        )
 
-    def async_handle(self, ten: TenEnv):
+    def cancel_speculation_timer(self) -> None:
+        if self.speculation_timer is not None:
+            self.speculation_timer.cancel()
+            self.speculation_timer = None
+
+    def start_speculation(self, ten: TenEnv, partial: str) -> None:
+        self.speculation_timer = None
+        if self.stop or not self.collection_name:
+            return
+        try:
+            _, retriever = self.get_chat_engine(ten, self.collection_name)
+        except Exception as e:
+            ten.log_error(f"speculative retrieval for [{partial}] failed, err: {e}")
+            return
+        if retriever is not None:
+            retriever.speculate(partial)
+
+    def load_modules(self, ten: TenEnv) -> None:
+        # lazy import packages which requires long time to load
+        start_time = time.perf_counter()
+        for module in (
+            "llama_index.core.chat_engine",
+            f"{__package__}.llama_llm",
+            f"{__package__}.llama_retriever",
+        ):
+            importlib.import_module(module)
+
+        ten.log_info(
+            f"llama_index modules loaded in {(time.perf_counter() - start_time) * 1000:.1f}ms"
+        )
+
+        if self.rerank_model:
+            from .reranker import CrossEncoderReranker
+
+            start_time = time.perf_counter()
+            self.reranker = CrossEncoderReranker(self.rerank_model)
+            ten.log_info(
+                f"rerank model {self.rerank_model} loaded in {(time.perf_counter() - start_time) * 1000:.1f}ms"
+            )
+
+    def build_chat_engine(self, ten: TenEnv, collection: str) -> Tuple[Any, Any]:
+        from .llama_llm import LlamaLLM
+
+        if not collection:
+            from llama_index.core.chat_engine import SimpleChatEngine
+
+            chat_engine = SimpleChatEngine.from_defaults(
+                llm=LlamaLLM(ten=ten),
+                system_prompt=SYSTEM_PROMPT,
+                memory=self.chat_memory,
+            )
+            return chat_engine, None
+
+        from llama_index.core.chat_engine import ContextChatEngine
+        from ten_ai_base.bm25 import BM25Index
+        from .llama_retriever import LlamaRetriever
+
+        bm25 = None
+        if self.bm25_dir:
+            bm25 = BM25Index(os.path.join(self.bm25_dir, collection))
+        retriever = LlamaRetriever(
+            ten=ten,
+            coll=collection,
+            top_k=self.top_k,
+            bm25=bm25,
+            reranker=self.reranker,
+            match_ratio=self.partial_match_ratio,
+        )
+        chat_engine = ContextChatEngine.from_defaults(
+            llm=LlamaLLM(ten=ten),
+            retriever=retriever,
+            memory=self.chat_memory,
+            system_prompt=CONTEXT_SYSTEM_PROMPT,
+        )
+        return chat_engine, retriever
+
+    def get_chat_engine(self, ten: TenEnv, collection: str) -> Tuple[Any, Any]:
+        """The cached chat engine and retriever of collection, built on first use."""
+        engine = self.chat_engines.get(collection)
+        if engine is None:
+            start_time = time.perf_counter()
+            engine = self.build_chat_engine(ten, collection)
+            build_ms = (time.perf_counter() - start_time) * 1000
+            # only the engine without retrieval and the one of the current collection are kept
+            for stale in [c for c in self.chat_engines if c and c != collection]:
+                del self.chat_engines[stale]
+            self.chat_engines[collection] = engine
+            self.chat_engine_build_ms[collection] = build_ms
+            ten.log_info(
+                f"chat engine for collection [{collection}] built in {build_ms:.1f}ms"
+            )
+        return engine
+
+    def warm_up(self, ten: TenEnv, collection: str) -> None:
+        try:
+            self.get_chat_engine(ten, collection)
+        except Exception as e:
+            ten.log_error(f"chat engine for collection [{collection}] failed, err: {e}")
+
+    def prepare_chat_engine(self, ten: TenEnv, collection: str) -> None:
+        """Build the chat engine of a new collection ahead of the next turn."""
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.warm_up, ten, collection)
+
+    async def async_handle(self, ten: TenEnv):
         ten.log_info("async_handle started")
+        # pay the imports and the engine construction before the first turn
+        try:
+            self.load_modules(ten)
+        except Exception as e:
+            ten.log_error(f"failed to load llama_index modules, err: {e}")
+        self.warm_up(ten, self.collection_name)
         while not self.stop:
-            try:
-                value = self.queue.get()
-                if value is None:
-                    break
-                input_text, ts, task_type = value
-
-                if ts < self.get_outdated_ts():
-                    ten.log_info(
-                        f"text [{input_text}] ts [{ts}] task_type [{task_type}] dropped due to outdated"
-                    )
-                    continue
-
-                if task_type == TASK_TYPE_GREETING:
+            value = await self.queue.get()
+            if value is None:
+                break
+            input_text, ts, task_type = value
+
+            if ts < self.get_outdated_ts():
+                ten.log_info(
+                    f"text [{input_text}] ts [{ts}] task_type [{task_type}] dropped due to outdated"
+                )
+                continue
+
+            task = asyncio.create_task(self.handle_turn(ten, input_text, ts, task_type))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+        self.cancel_turns()
+        self.cancel_speculation_timer()
+        for _, retriever in self.chat_engines.values():
+            if retriever is not None:
+                retriever.cancel_speculation()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        ten.log_info("async_handle stoped")
+
+    async def handle_turn(
+        self, ten: TenEnv, input_text: str, ts: datetime, task_type: str
+    ):
+        retriever = None
+        try:
+            if task_type == TASK_TYPE_GREETING:
+                async with self.turn_lock:
                     # send greeting text directly
                     self._send_text_data(ten, input_text, True)
-                    continue
-
-                ten.log_info("process input text [%s] ts [%s]", input_text, ts)
-
-                # lazy import packages which requires long time to load
-                from .llama_llm import LlamaLLM
-                from .llama_retriever import LlamaRetriever
-
-                # prepare chat engine
-                chat_engine = None
-                if len(self.collection_name) > 0:
-                    from llama_index.core.chat_engine import ContextChatEngine
-
-                    chat_engine = ContextChatEngine.from_defaults(
-                        llm=LlamaLLM(ten=ten),
-                        retriever=LlamaRetriever(ten=ten, coll=self.collection_name),
-                        memory=self.chat_memory,
-                        system_prompt=(
-                            # "You are an expert Q&A system that is trusted around the world.\n"
-                            "You are a voice assistant who talks in a conversational way and can chat with me like my friends. \n"
-                            "I will speak to you in English or Chinese, and you will answer in the corrected and improved version of my text with the language I use. \n"
-                            "Don’t talk like a robot, instead I would like you to talk like a real human with emotions. \n"
-                            "I will use your answer for text-to-speech, so don’t return me any meaningless characters. \n"
-                            "I want you to be helpful, when I’m asking you for advice, give me precise, practical and useful advice instead of being vague. \n"
-                            "When giving me a list of options, express the options in a narrative way instead of bullet points.\n"
-                            "Always answer the query using the provided context information, "
-                            "and not prior knowledge.\n"
-                            "Some rules to follow:\n"
-                            "1. Never directly reference the given context in your answer.\n"
-                            "2. Avoid statements like 'Based on the context, ...' or "
-                            "'The context information ...' or anything along "
-                            "those lines."
-                        ),
-                    )
-                else:
-                    from llama_index.core.chat_engine import SimpleChatEngine
-
-                    chat_engine = SimpleChatEngine.from_defaults(
-                        llm=LlamaLLM(ten=ten),
-                        system_prompt=(
-                            "You are a voice assistant who talks in a conversational way and can chat with me like my friends. \n"
-                            "I will speak to you in English or Chinese, and you will answer in the corrected and improved version of my text with the language I use. \n"
-                            "Don’t talk like a robot, instead I would like you to talk like a real human with emotions. \n"
-                            "I will use your answer for text-to-speech, so don’t return me any meaningless characters. \n"
-                            "I want you to be helpful, when I’m asking you for advice, give me precise, practical and useful advice instead of being vague. \n"
-                            "When giving me a list of options, express the options in a narrative way instead of bullet points.\n"
-                        ),
-                        memory=self.chat_memory,
-                    )
-
-                resp = chat_engine.stream_chat(input_text)
-                for cur_token in resp.response_gen:
+                return
+
+            ten.log_info("process input text [%s] ts [%s]", input_text, ts)
+
+            collection = self.collection_name
+            start_time = time.perf_counter()
+            chat_engine, retriever = self.get_chat_engine(ten, collection)
+            setup_ms = (time.perf_counter() - start_time) * 1000
+            self.setup_ms_saved += max(
+                self.chat_engine_build_ms[collection] - setup_ms, 0
+            )
+            ten.log_info(
+                f"chat engine setup {setup_ms:.2f}ms, build {self.chat_engine_build_ms[collection]:.1f}ms, saved {self.setup_ms_saved:.1f}ms in total"
+            )
+
+            if retriever is not None:
+                # embedding and vector query run while the previous turn is still answering,
+                # or already ran for a partial transcript
+                retriever.prefetch(input_text)
+                ten.log_info(
+                    f"speculative retrievals reused {retriever.speculation_hits}, missed {retriever.speculation_misses}"
+                )
+
+            async with self.turn_lock:
+                resp = await chat_engine.astream_chat(input_text)
+                async for cur_token in resp.async_response_gen():
                     if self.stop:
                         break
                     if ts < self.get_outdated_ts():
@@ -255,16 +470,27 @@ class LlamaIndexExtension(Extension):
 
                 # send out end_of_segment
                 self._send_text_data(ten, "", True)
-            except Exception as e:
-                ten.log_error(str(e))
-        ten.log_info("async_handle stoped")
+        except asyncio.CancelledError:
+            ten.log_info(f"input text [{input_text}] ts [{ts}] cancelled by flush")
+        except Exception as e:
+            ten.log_error(str(e))
+        finally:
+            if retriever is not None:
+                retriever.cancel_prefetch(input_text)
+
+    def cancel_turns(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        for task in self.tasks:
+            task.cancel()
 
     def flush(self):
         with self.outdate_ts_lock:
             self.outdate_ts = datetime.now()
 
-        while not self.queue.empty():
-            self.queue.get()
+        # cancel the pending commands of the running turns instead of waiting for their answers
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.cancel_turns)
 
     def get_outdated_ts(self):
         with self.outdate_ts_lock:
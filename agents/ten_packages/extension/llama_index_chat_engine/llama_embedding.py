@@ -7,17 +7,25 @@ from ten import (
     CmdResult,
     TenEnv,
 )
+from ten_ai_base.const import PROPERTY_VECTOR_FORMAT, VECTOR_FORMAT_F32
+from ten_ai_base.vectors import decode_vector
+
+from .async_cmd import send_cmd_async
 
 EMBED_CMD = "embed"
 
 
 def embed_from_resp(cmd_result: CmdResult) -> List[float]:
-    embedding_output_json = cmd_result.get_property_to_json("embedding")
-    return json.loads(embedding_output_json)
+    try:
+        return decode_vector(cmd_result.get_property_buf("embedding_buf"))
+    except Exception:
+        # embedding extension without binary vector support
+        embedding_output_json = cmd_result.get_property_to_json("embedding")
+        return json.loads(embedding_output_json)
 
 
 class LlamaEmbedding(BaseEmbedding):
-    ten: Any
+    ten: Any = None
 
     def __init__(self, ten: TenEnv):
         """Creates a new Llama embedding interface."""
@@ -28,11 +36,20 @@ class LlamaEmbedding(BaseEmbedding):
     def class_name(cls) -> str:
         return "llama_embedding"
 
+    def _embed_cmd(self, query: str) -> Cmd:
+        cmd_out = Cmd.create(EMBED_CMD)
+        cmd_out.set_property_string("input", query)
+        cmd_out.set_property_string(PROPERTY_VECTOR_FORMAT, VECTOR_FORMAT_F32)
+        return cmd_out
+
     async def _aget_query_embedding(self, query: str) -> List[float]:
-        return self._get_query_embedding(query)
+        self.ten.log_info(f"LlamaEmbedding generate embeddings for the query: {query}")
+        result = await send_cmd_async(self.ten, self._embed_cmd(query))
+        self.ten.log_debug("LlamaEmbedding embedding received")
+        return embed_from_resp(result)
 
     async def _aget_text_embedding(self, text: str) -> List[float]:
-        return self._get_text_embedding(text)
+        return await self._aget_query_embedding(text)
 
     def _get_query_embedding(self, query: str) -> List[float]:
         self.ten.log_info(f"LlamaEmbedding generate embeddings for the query: {query}")
@@ -47,10 +64,7 @@ class LlamaEmbedding(BaseEmbedding):
             resp = embed_from_resp(result)
             wait_event.set()
 
-        cmd_out = Cmd.create(EMBED_CMD)
-        cmd_out.set_property_string("input", query)
-
-        self.ten.send_cmd(cmd_out, callback)
+        self.ten.send_cmd(self._embed_cmd(query), callback)
         wait_event.wait()
         return resp
 
@@ -9,6 +9,7 @@ from llama_index.core.base.llms.types import (
     ChatResponse,
     CompletionResponse,
     ChatResponseGen,
+    ChatResponseAsyncGen,
     CompletionResponseGen,
 )
 
@@ -17,6 +18,8 @@ from llama_index.core.llms.callbacks import llm_chat_callback, llm_completion_ca
 from llama_index.core.llms.custom import CustomLLM
 from ten import Cmd, StatusCode, CmdResult, TenEnv
 
+from .async_cmd import send_cmd_async, send_cmd_stream_async
+
 
 def chat_from_llama_response(cmd_result: CmdResult) -> ChatResponse | None:
     status = cmd_result.get_status_code()
@@ -36,7 +39,7 @@ def _messages_str_from_chat_messages(messages: Sequence[ChatMessage]) -> str:
 
 
 class LlamaLLM(CustomLLM):
-    ten: Any
+    ten: Any = None
 
     def __init__(self, ten: TenEnv):
         """Creates a new Llama model interface."""
@@ -79,6 +82,48 @@ class LlamaLLM(CustomLLM):
         wait_event.wait()
         return resp
 
+    def _chat_cmd(self, messages: Sequence[ChatMessage], stream: bool) -> Cmd:
+        messages_str = _messages_str_from_chat_messages(messages)
+        cmd = Cmd.create("call_chat")
+        cmd.set_property_string("messages", messages_str)
+        cmd.set_property_bool("stream", stream)
+        self.ten.log_info(
+            f"LlamaLLM send_cmd {cmd.get_name()}, stream {stream}, messages {messages_str}"
+        )
+        return cmd
+
+    @llm_chat_callback()
+    async def achat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponse:
+        self.ten.log_debug("LlamaLLM achat start")
+        result = await send_cmd_async(self.ten, self._chat_cmd(messages, False))
+        self.ten.log_debug("LlamaLLM achat done")
+        return chat_from_llama_response(result)
+
+    @llm_chat_callback()
+    async def astream_chat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponseAsyncGen:
+        self.ten.log_debug("LlamaLLM astream_chat start")
+        cmd = self._chat_cmd(messages, True)
+
+        async def gen() -> ChatResponseAsyncGen:
+            async for result in send_cmd_stream_async(self.ten, cmd):
+                status = result.get_status_code()
+                if status != StatusCode.OK:
+                    self.ten.log_warn(f"LlamaLLM astream_chat status {status}")
+                    break
+
+                delta_text = result.get_property_string("text")
+                self.ten.log_debug(f"LlamaLLM astream_chat text [{delta_text}]")
+                yield ChatResponse(
+                    message=ChatMessage(content=delta_text, role=MessageRole.ASSISTANT),
+                    delta=delta_text,
+                )
+
+        return gen()
+
     @llm_completion_callback()
     def complete(
         self, prompt: str, formatted: bool = False, **kwargs: Any
@@ -1,10 +1,17 @@
+import asyncio
+from difflib import SequenceMatcher
 import json, threading
-from typing import Any, List
+from typing import Any, Dict, List, Optional, Tuple
 from llama_index.core.schema import QueryBundle, TextNode
 from llama_index.core.schema import NodeWithScore
 from llama_index.core.retrievers import BaseRetriever
 
+from ten_ai_base.bm25 import BM25Index, reciprocal_rank_fusion, tokenize
+from ten_ai_base.vectors import encode_vector
+
+from .async_cmd import send_cmd_async
 from .llama_embedding import LlamaEmbedding
+from .reranker import CrossEncoderReranker
 from ten import (
     TenEnv,
     Cmd,
@@ -44,19 +51,167 @@ def format_node_result(ten: TenEnv, cmd_result: CmdResult) -> List[NodeWithScore
     return nodes
 
 
+def transcript_similarity(partial: str, final: str) -> float:
+    """Similarity in [0, 1] of the words of two transcripts, 0.8 for the first 4 words of 6."""
+    a, b = tokenize(partial), tokenize(final)
+    if not a or not b:
+        return 0.0
+    return SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+
 class LlamaRetriever(BaseRetriever):
     ten: Any
     embed_model: LlamaEmbedding
 
-    def __init__(self, ten: TenEnv, coll: str):
+    def __init__(
+        self,
+        ten: TenEnv,
+        coll: str,
+        top_k: int = 3,
+        bm25: Optional[BM25Index] = None,
+        reranker: Optional[CrossEncoderReranker] = None,
+        candidates: int = 10,
+        match_ratio: float = 0.8,
+    ):
+        """
+        Dense retrieval through query_vector, fused by reciprocal rank with the local
+        BM25 index of the collection when there is one, the fused candidates are then
+        reranked when a reranker is given.
+
+        Retrieval of a partial transcript started by speculate() is reused for the
+        final one when their transcript_similarity reaches match_ratio.
+        """
         super().__init__()
         try:
             self.ten = ten
             self.embed_model = LlamaEmbedding(ten=ten)
             self.collection_name = coll
+            self.top_k = top_k
+            self.bm25 = bm25
+            self.reranker = reranker
+            self.candidates = max(candidates, top_k)
+            # retrievals started ahead of the chat engine, by query
+            self.prefetched: Dict[str, asyncio.Task] = {}
+            # retrieval of the latest stable partial transcript
+            self.match_ratio = match_ratio
+            self.speculation: Optional[Tuple[str, asyncio.Task]] = None
+            self.speculation_hits = 0
+            self.speculation_misses = 0
         except Exception as e:
             ten.log_error(f"Failed to initialize LlamaRetriever: {e}")
 
+    @property
+    def hybrid(self) -> bool:
+        return self.bm25 is not None or self.reranker is not None
+
+    def _query_cmd(self, embedding: List[float]) -> Cmd:
+        query_cmd = Cmd.create("query_vector")
+        query_cmd.set_property_string("collection_name", self.collection_name)
+        query_cmd.set_property_int(
+            "top_k", self.candidates if self.hybrid else self.top_k
+        )
+        query_cmd.set_property_buf("embedding_buf", encode_vector(embedding))
+        self.ten.log_info(
+            f"LlamaRetriever send_cmd, collection_name: {self.collection_name}, embedding len: {len(embedding)}"
+        )
+        return query_cmd
+
+    def _lexical_search(self, query: str) -> List[str]:
+        self.bm25.refresh()
+        return [doc["text"] for doc, _ in self.bm25.search(query, self.candidates)]
+
+    async def _retrieve_async(self, query: str) -> List[NodeWithScore]:
+        lexical = None
+        if self.bm25 is not None:
+            # local, runs while the embedding and the vector query are in flight
+            lexical = asyncio.create_task(
+                asyncio.to_thread(self._lexical_search, query)
+            )
+        try:
+            embedding = await self.embed_model.aget_query_embedding(query)
+            result = await send_cmd_async(self.ten, self._query_cmd(embedding))
+        except BaseException:
+            if lexical is not None:
+                lexical.cancel()
+            raise
+        self.ten.log_debug("LlamaRetriever retrieve done")
+        nodes = format_node_result(self.ten, result)
+        if not self.hybrid:
+            return nodes
+
+        rankings = [[node.node.get_content() for node in nodes if node.node.get_content()]]
+        if lexical is not None:
+            try:
+                rankings.append(await lexical)
+            except Exception as e:
+                self.ten.log_warn(f"LlamaRetriever bm25 search failed: {e}")
+        fused = reciprocal_rank_fusion(rankings)[: self.candidates]
+        if not fused:
+            return nodes
+
+        if self.reranker is not None:
+            texts = [text for text, _ in fused]
+            scores = await asyncio.to_thread(self.reranker.rerank, query, texts)
+            fused = sorted(zip(texts, scores), key=lambda item: -item[1])
+        self.ten.log_info(
+            f"LlamaRetriever fused {[len(ranking) for ranking in rankings]} candidates into {len(fused)}"
+        )
+        return [
+            NodeWithScore(node=TextNode(text=text), score=score)
+            for text, score in fused[: self.top_k]
+        ]
+
+    def speculate(self, partial: str) -> None:
+        """Start retrieving for a partial transcript, replacing the previous one."""
+        if self.speculation is not None:
+            if self.speculation[0] == partial:
+                return
+            self.speculation[1].cancel()
+        self.ten.log_info(f"LlamaRetriever speculative retrieval for [{partial}]")
+        self.speculation = (partial, asyncio.create_task(self._retrieve_async(partial)))
+
+    def cancel_speculation(self) -> None:
+        if self.speculation is not None:
+            self.speculation[1].cancel()
+            self.speculation = None
+
+    def _take_speculation(self, query: str) -> Optional[asyncio.Task]:
+        if self.speculation is None:
+            return None
+        partial, task = self.speculation
+        self.speculation = None
+        failed = task.done() and (task.cancelled() or task.exception() is not None)
+        similarity = transcript_similarity(partial, query)
+        if not failed and similarity >= self.match_ratio:
+            self.speculation_hits += 1
+            self.ten.log_info(
+                f"LlamaRetriever reuses retrieval of [{partial}] for [{query}], similarity {similarity:.2f}"
+            )
+            return task
+        task.cancel()
+        self.speculation_misses += 1
+        return None
+
+    def prefetch(self, query: str) -> None:
+        """Start retrieving for query, so the chat engine finds the nodes ready."""
+        if query not in self.prefetched:
+            task = self._take_speculation(query)
+            if task is None:
+                task = asyncio.create_task(self._retrieve_async(query))
+            self.prefetched[query] = task
+
+    def cancel_prefetch(self, query: str) -> None:
+        task = self.prefetched.pop(query, None)
+        if task is not None:
+            task.cancel()
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        self.ten.log_info(f"LlamaRetriever aretrieve: {query_bundle.query_str}")
+        task = self.prefetched.pop(query_bundle.query_str, None)
+        if task is not None:
+            return await task
+        return await self._retrieve_async(query_bundle.query_str)
+
     def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
         self.ten.log_info(f"LlamaRetriever retrieve: {query_bundle.to_json}")
 
@@ -72,14 +227,7 @@ class LlamaRetriever(BaseRetriever):
 
         embedding = self.embed_model.get_query_embedding(query=query_bundle.query_str)
 
-        query_cmd = Cmd.create("query_vector")
-        query_cmd.set_property_string("collection_name", self.collection_name)
-        query_cmd.set_property_int("top_k", 3)
-        query_cmd.set_property_from_json("embedding", json.dumps(embedding))
-        self.ten.log_info(
-            f"LlamaRetriever send_cmd, collection_name: {self.collection_name}, embedding len: {len(embedding)}"
-        )
-        self.ten.send_cmd(query_cmd, cmd_callback)
+        self.ten.send_cmd(self._query_cmd(embedding), cmd_callback)
 
         wait_event.wait()
-        return resp
+        return resp[: self.top_k]
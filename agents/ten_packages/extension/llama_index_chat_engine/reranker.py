@@ -0,0 +1,20 @@
+from typing import List
+
+
+class CrossEncoderReranker:
+    """
+    Scores (query, passage) pairs with a small cross-encoder on CPU, e.g.
+    cross-encoder/ms-marco-MiniLM-L-6-v2. Needs sentence-transformers, which is only
+    imported when a rerank_model is configured.
+    """
+
+    def __init__(self, model: str):
+        from sentence_transformers import CrossEncoder
+
+        self.model = CrossEncoder(model, device="cpu")
+
+    def rerank(self, query: str, texts: List[str]) -> List[float]:
+        if not texts:
+            return []
+        scores = self.model.predict([(query, text) for text in texts])
+        return [float(score) for score in scores]
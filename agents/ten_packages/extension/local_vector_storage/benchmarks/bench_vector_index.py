@@ -0,0 +1,85 @@
+"""
+Recall@10 and query latency of the brute force and IVF searches of Collection, on
+clustered random vectors standing in for text embeddings.
+
+    python benchmarks/bench_vector_index.py [--dimension 1024] [--sizes 10000,100000]
+"""
+import argparse
+from pathlib import Path
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from vector_index import Collection  # noqa: E402
+
+QUERIES = 200
+K = 10
+
+
+def clustered(count: int, dimension: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(256, dimension)).astype(np.float32)
+    noise = rng.normal(scale=0.5, size=(count, dimension)).astype(np.float32)
+    return centers[rng.integers(0, len(centers), count)] + noise
+
+
+def run(collection: Collection, queries: np.ndarray, **kwargs) -> tuple[list, list]:
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        matches = collection.search(query, K, **kwargs)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append({row["content"] for row, _ in matches})
+    return results, latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dimension", type=int, default=1024)
+    parser.add_argument("--sizes", default="10000,100000")
+    args = parser.parse_args()
+
+    for size in [int(s) for s in args.sizes.split(",")]:
+        vectors = clustered(size, args.dimension, seed=0)
+        queries = clustered(QUERIES, args.dimension, seed=1)
+        rows = [{"file_name": "bench", "content": str(i)} for i in range(size)]
+
+        with tempfile.TemporaryDirectory() as data_dir:
+            start = time.perf_counter()
+            flat = Collection(args.dimension, f"{data_dir}/flat", ivf_threshold=10**12)
+            flat.add(rows, vectors)
+            flat_build = time.perf_counter() - start
+
+            start = time.perf_counter()
+            ivf = Collection(args.dimension, f"{data_dir}/ivf", ivf_threshold=0)
+            ivf.add(rows, vectors)
+            ivf_build = time.perf_counter() - start
+
+            start = time.perf_counter()
+            Collection.open(f"{data_dir}/ivf")
+            reopen = time.perf_counter() - start
+
+            truth, latencies = run(flat, queries)
+            print(
+                f"{size} x {args.dimension}: flat build {flat_build:.2f}s, "
+                f"p50 {np.percentile(latencies, 50):.2f} ms p99 {np.percentile(latencies, 99):.2f} ms"
+            )
+            print(
+                f"{size} x {args.dimension}: ivf build {ivf_build:.2f}s "
+                f"({len(ivf.ivf.centroids)} lists), reopen {reopen:.2f}s"
+            )
+            for nprobe in (4, 16, 64):
+                found, latencies = run(ivf, queries, nprobe=nprobe)
+                recall = np.mean([len(t & f) / K for t, f in zip(truth, found)])
+                print(
+                    f"    nprobe {nprobe:>3}: recall@{K} {recall:.3f}, "
+                    f"p50 {np.percentile(latencies, 50):.2f} ms p99 {np.percentile(latencies, 99):.2f} ms"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+from ten import (
+    AsyncExtension,
+    AsyncTenEnv,
+    Cmd,
+    StatusCode,
+    CmdResult,
+)
+
+import asyncio
+import json
+import os
+import re
+import shutil
+from dataclasses import dataclass
+from datetime import datetime
+
+from ten_ai_base.config import BaseConfig
+from ten_ai_base.vectors import decode_vectors_array
+
+from .vector_index import Collection
+
+CMD_CREATE_COLLECTION = "create_collection"
+CMD_DELETE_COLLECTION = "delete_collection"
+CMD_UPSERT_VECTOR = "upsert_vector"
+CMD_QUERY_VECTOR = "query_vector"
+CMD_DELETE_VECTOR = "delete_vector"
+
+DEFAULT_DIMENSION = 1024
+
+# Same rule as the collection names generated by file_chunker, also keeps them inside data_dir
+COLLECTION_NAME_PATTERN = re.compile(r"^[a-z]+[a-z0-9_]*$")
+
+
+@dataclass
+class LocalVectorStorageConfig(BaseConfig):
+    # collections are persisted under data_dir, in memory only if empty
+    data_dir: str = ""
+    # collections of at least ivf_threshold vectors are searched through an IVF index
+    ivf_threshold: int = 20000
+    nprobe: int = 16
+
+
+class LocalVectorStorageExtension(AsyncExtension):
+    """
+    In-process vector storage, a drop-in replacement of aliyun_analyticdb_vector_storage
+    for offline use and tests: same commands, cosine similarity scores.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.config: LocalVectorStorageConfig = None
+        self.collections = {}
+
+    async def on_start(self, ten_env: AsyncTenEnv) -> None:
+        ten_env.log_info("on_start")
+        self.config = await LocalVectorStorageConfig.create_async(ten_env=ten_env)
+        ten_env.log_info(f"config: {self.config}")
+
+    async def on_stop(self, ten_env: AsyncTenEnv) -> None:
+        ten_env.log_info("on_stop")
+        self.collections.clear()
+
+    async def on_cmd(self, ten_env: AsyncTenEnv, cmd: Cmd) -> None:
+        cmd_name = cmd.get_name()
+        ten_env.log_info(f"on_cmd [{cmd_name}]")
+        try:
+            if cmd_name == CMD_CREATE_COLLECTION:
+                cmd_result = await self.create_collection(ten_env, cmd)
+            elif cmd_name == CMD_DELETE_COLLECTION:
+                cmd_result = await self.delete_collection(ten_env, cmd)
+            elif cmd_name == CMD_UPSERT_VECTOR:
+                cmd_result = await self.upsert_vector(ten_env, cmd)
+            elif cmd_name == CMD_QUERY_VECTOR:
+                cmd_result = await self.query_vector(ten_env, cmd)
+            elif cmd_name == CMD_DELETE_VECTOR:
+                cmd_result = await self.delete_vector(ten_env, cmd)
+            else:
+                ten_env.log_warn(f"unknown cmd {cmd_name}")
+                cmd_result = CmdResult.create(StatusCode.ERROR)
+        except Exception as e:
+            ten_env.log_error(f"cmd {cmd_name} failed, err: {e}")
+            cmd_result = CmdResult.create(StatusCode.ERROR)
+        await ten_env.return_result(cmd_result, cmd)
+
+    def collection_path(self, name: str) -> str:
+        if not COLLECTION_NAME_PATTERN.match(name):
+            raise ValueError(f"invalid collection name {name}")
+        return os.path.join(self.config.data_dir, name) if self.config.data_dir else ""
+
+    def get_collection(self, name: str):
+        collection = self.collections.get(name)
+        if collection is None:
+            path = self.collection_path(name)
+            if not path or not os.path.isdir(path):
+                raise KeyError(f"collection {name} not found")
+            collection = self.collections[name] = Collection.open(
+                path, ivf_threshold=self.config.ivf_threshold, nprobe=self.config.nprobe
+            )
+        return collection
+
+    async def create_collection(self, ten_env: AsyncTenEnv, cmd: Cmd) -> CmdResult:
+        name = cmd.get_property_string("collection_name")
+        dimension = DEFAULT_DIMENSION
+        try:
+            dimension = cmd.get_property_int("dimension")
+        except Exception as e:
+            ten_env.log_warn(f"Error: {e}")
+
+        try:
+            self.get_collection(name)
+            ten_env.log_info(f"collection {name} exists")
+        except KeyError:
+            self.collections[name] = await asyncio.to_thread(
+                Collection,
+                dimension,
+                self.collection_path(name),
+                ivf_threshold=self.config.ivf_threshold,
+                nprobe=self.config.nprobe,
+            )
+            ten_env.log_info(f"collection {name} created, dimension {dimension}")
+        return CmdResult.create(StatusCode.OK)
+
+    async def delete_collection(self, ten_env: AsyncTenEnv, cmd: Cmd) -> CmdResult:
+        name = cmd.get_property_string("collection_name")
+        path = self.collection_path(name)
+        self.collections.pop(name, None)
+        if path and os.path.isdir(path):
+            await asyncio.to_thread(shutil.rmtree, path)
+        ten_env.log_info(f"collection {name} deleted")
+        return CmdResult.create(StatusCode.OK)
+
+    async def upsert_vector(self, ten_env: AsyncTenEnv, cmd: Cmd) -> CmdResult:
+        start_time = datetime.now()
+        name = cmd.get_property_string("collection_name")
+        file = cmd.get_property_string("file_name")
+        collection = self.get_collection(name)
+
+        embeddings_buf = self.get_property_buf(cmd, "embeddings_buf")
+        if embeddings_buf:
+            texts = json.loads(cmd.get_property_to_json("texts"))
+            vectors = decode_vectors_array(embeddings_buf)
+        else:
+            content = json.loads(cmd.get_property_string("content"))
+            texts = [item["text"] for item in content]
+            vectors = [item["embedding"] for item in content]
+        rows = [{"file_name": file, "content": text} for text in texts]
+        ids = self.get_property_json(cmd, "ids")
+        if ids:
+            # rows with an id replace the row previously upserted with it
+            for row, row_id in zip(rows, ids):
+                row["id"] = row_id
+
+        await asyncio.to_thread(collection.add, rows, vectors)
+        ten_env.log_info(
+            f"upsert_vector finished for file {file}, collection {name}, rows len {len(rows)}, total {len(collection)}, cost {int((datetime.now() - start_time).total_seconds() * 1000)}ms"
+        )
+        return CmdResult.create(StatusCode.OK)
+
+    async def query_vector(self, ten_env: AsyncTenEnv, cmd: Cmd) -> CmdResult:
+        start_time = datetime.now()
+        name = cmd.get_property_string("collection_name")
+        top_k = cmd.get_property_int("top_k")
+        collection = self.get_collection(name)
+
+        embedding_buf = self.get_property_buf(cmd, "embedding_buf")
+        if embedding_buf:
+            vector = decode_vectors_array(embedding_buf)[0]
+        else:
+            vector = json.loads(cmd.get_property_to_json("embedding"))
+
+        matches = await asyncio.to_thread(collection.search, vector, top_k)
+        ten_env.log_info(
+            f"query_vector finished for collection {name}, size {len(collection)}, matches {len(matches)}, cost {int((datetime.now() - start_time).total_seconds() * 1000)}ms"
+        )
+        results = [{"content": row["content"], "score": score} for row, score in matches]
+        cmd_result = CmdResult.create(StatusCode.OK)
+        cmd_result.set_property_from_json("response", json.dumps(results))
+        return cmd_result
+
+    async def delete_vector(self, ten_env: AsyncTenEnv, cmd: Cmd) -> CmdResult:
+        name = cmd.get_property_string("collection_name")
+        ids = json.loads(cmd.get_property_to_json("ids"))
+        collection = self.get_collection(name)
+        deleted = await asyncio.to_thread(collection.delete, ids)
+        ten_env.log_info(
+            f"delete_vector finished for collection {name}, ids len {len(ids)}, deleted {deleted}, total {len(collection)}"
+        )
+        return CmdResult.create(StatusCode.OK)
+
+    def get_property_json(self, cmd: Cmd, key: str):
+        try:
+            return json.loads(cmd.get_property_to_json(key))
+        except Exception:
+            return None
+
+    def get_property_buf(self, cmd: Cmd, key: str) -> bytes | None:
+        try:
+            return cmd.get_property_buf(key)
+        except Exception:
+            return None
@@ -0,0 +1,88 @@
+from pathlib import Path
+import sys
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from vector_index import Collection  # noqa: E402
+
+
+def clustered(count: int, dimension: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(64, dimension))
+    return centers[rng.integers(0, 64, count)] + rng.normal(
+        scale=0.3, size=(count, dimension)
+    )
+
+
+def rows(count: int, start: int = 0) -> list[dict]:
+    return [{"file_name": "f", "content": str(i)} for i in range(start, start + count)]
+
+
+def test_brute_force_finds_exact_match():
+    vectors = clustered(1000, 32)
+    collection = Collection(32)
+    collection.add(rows(1000), vectors)
+
+    matches = collection.search(vectors[123], 3)
+    assert matches[0][0]["content"] == "123"
+    assert abs(matches[0][1] - 1.0) < 1e-5
+    assert matches[0][1] >= matches[1][1] >= matches[2][1]
+
+
+def test_persisted_collection_reopens(tmp_path):
+    vectors = clustered(3000, 16)
+    collection = Collection(16, str(tmp_path / "coll"), ivf_threshold=2000)
+    collection.add(rows(2500), vectors[:2500])
+    assert collection.ivf is not None
+    collection.add(rows(500, 2500), vectors[2500:])
+
+    reopened = Collection.open(str(tmp_path / "coll"), ivf_threshold=2000)
+    assert len(reopened) == 3000
+    assert reopened.ivf.size == 3000
+    assert reopened.search(vectors[2999], 1)[0][0]["content"] == "2999"
+
+
+def test_interrupted_write_is_dropped(tmp_path):
+    path = tmp_path / "coll"
+    collection = Collection(8, str(path))
+    collection.add(rows(10), clustered(10, 8))
+    # vectors of a batch written without its rows
+    with open(path / "vectors.f32", "ab") as f:
+        f.write(np.ones((3, 8), dtype=np.float32).tobytes())
+
+    reopened = Collection.open(str(path))
+    assert len(reopened) == 10
+    reopened.add(rows(1, 10), np.ones((1, 8)))
+    assert Collection.open(str(path)).search(np.ones(8), 1)[0][0]["content"] == "10"
+
+
+def test_ivf_recall():
+    vectors = clustered(20000, 32)
+    queries = clustered(50, 32, seed=1)
+    flat = Collection(32, ivf_threshold=10**9)
+    flat.add(rows(20000), vectors)
+    ivf = Collection(32, ivf_threshold=10000)
+    ivf.add(rows(20000), vectors)
+
+    found = 0
+    for query in queries:
+        expected = {row["content"] for row, _ in flat.search(query, 10)}
+        found += len(expected & {row["content"] for row, _ in ivf.search(query, 10)})
+    assert found / (10 * len(queries)) > 0.9
+
+
+def test_rows_replaced_and_deleted_by_id(tmp_path):
+    path = str(tmp_path / "coll")
+    vectors = clustered(3, 8)
+    collection = Collection(8, path)
+    collection.add(
+        [{"id": "a", "content": "a"}, {"id": "b", "content": "b"}], vectors[:2]
+    )
+    collection.add([{"id": "a", "content": "a2"}], vectors[2:])
+    assert collection.delete(["b", "missing"]) == 1
+
+    reopened = Collection.open(path)
+    assert len(reopened) == 1
+    assert [row["content"] for row, _ in reopened.search(vectors[1], 3)] == ["a2"]
@@ -0,0 +1,326 @@
+import json
+import math
+import os
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+META_FILE = "meta.json"
+VECTORS_FILE = "vectors.f32"
+ROWS_FILE = "rows.jsonl"
+DELETED_FILE = "deleted.jsonl"
+IVF_FILE = "ivf.npz"
+
+# Rows scored per matrix product, bounds the temporary memory of a scan
+SCAN_CHUNK = 65536
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Rows scaled to unit length, so the inner product is the cosine similarity."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indexes of the k highest scores, best first."""
+    if k >= len(scores):
+        return np.argsort(-scores)
+    best = np.argpartition(-scores, k)[:k]
+    return best[np.argsort(-scores[best])]
+
+
+class IVFIndex:
+    """
+    Inverted file index: every vector is assigned to the nearest of nlist centroids
+    trained by spherical k-means, a query only scans the lists of its nprobe nearest
+    centroids.
+    """
+
+    def __init__(self, centroids: np.ndarray, assignments: np.ndarray):
+        self.centroids = centroids
+        self.assignments = assignments
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.searchsorted(assignments[order], np.arange(len(centroids) + 1))
+        self.lists = [order[bounds[i] : bounds[i + 1]] for i in range(len(centroids))]
+
+    @property
+    def size(self) -> int:
+        return len(self.assignments)
+
+    @classmethod
+    def train(
+        cls, vectors: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0
+    ) -> "IVFIndex":
+        rng = np.random.default_rng(seed)
+        sample = vectors
+        if len(vectors) > nlist * 64:
+            sample = vectors[np.sort(rng.choice(len(vectors), nlist * 64, replace=False))]
+        sample = np.asarray(sample)
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            empty = np.bincount(assignments, minlength=nlist) == 0
+            # restart empty clusters from random points
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = normalize(sums)
+        return cls(centroids, cls._assign(centroids, vectors))
+
+    @staticmethod
+    def _assign(centroids: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), SCAN_CHUNK):
+            chunk = np.asarray(vectors[start : start + SCAN_CHUNK])
+            assignments[start : start + len(chunk)] = np.argmax(
+                chunk @ centroids.T, axis=1
+            )
+        return assignments
+
+    def add(self, vectors: np.ndarray) -> None:
+        """Assign vectors appended to the collection after the ones already indexed."""
+        start = len(self.assignments)
+        assignments = self._assign(self.centroids, vectors)
+        self.assignments = np.concatenate([self.assignments, assignments])
+        for c in np.unique(assignments):
+            ids = start + np.flatnonzero(assignments == c)
+            self.lists[c] = np.concatenate([self.lists[c], ids])
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        probes = top_k(self.centroids @ query, nprobe)
+        return np.concatenate([self.lists[c] for c in probes])
+
+    def save(self, path: str) -> None:
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, centroids=self.centroids, assignments=self.assignments)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        with np.load(path) as data:
+            return cls(data["centroids"], data["assignments"])
+
+
+class Collection:
+    """
+    The vectors of a collection and the rows (file name, content) they belong to.
+
+    Vectors are normalized and appended to a float32 file read through a memory map,
+    rows to a jsonl file, so a collection is reopened without loading it in memory.
+    Rows with an "id" replace the previous row with the same id and can be deleted,
+    deleted rows are only masked out, their indexes appended to a jsonl file.
+    Without a path the collection only lives in memory. Collections of at least
+    ivf_threshold vectors are searched through an IVFIndex, smaller ones by brute force.
+    """
+
+    def __init__(
+        self,
+        dimension: int,
+        path: str = "",
+        ivf_threshold: int = 20000,
+        nprobe: int = 16,
+    ):
+        self.dimension = dimension
+        self.path = path
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self.lock = threading.Lock()
+
+        self.rows: List[dict] = []
+        self.vectors = np.empty((0, dimension), dtype=np.float32)
+        self.alive = np.ones(0, dtype=bool)
+        self.row_ids: dict[str, int] = {}  # id -> index of its live row
+        self.deleted = 0
+        self.ivf: Optional[IVFIndex] = None
+        self.trained_size = 0
+
+        if path:
+            os.makedirs(path, exist_ok=True)
+            meta_path = os.path.join(path, META_FILE)
+            if not os.path.exists(meta_path):
+                with open(meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"dimension": dimension}, f)
+            self._load()
+
+    @classmethod
+    def open(cls, path: str, **kwargs) -> "Collection":
+        """Reopen the collection persisted in path."""
+        with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        return cls(meta["dimension"], path, **kwargs)
+
+    def _load(self) -> None:
+        rows_path = os.path.join(self.path, ROWS_FILE)
+        torn = False
+        if os.path.exists(rows_path):
+            with open(rows_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self.rows.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        torn = True
+                        break
+        vectors_path = os.path.join(self.path, VECTORS_FILE)
+        stored = (
+            os.path.getsize(vectors_path) // (4 * self.dimension)
+            if os.path.exists(vectors_path)
+            else 0
+        )
+        # a write interrupted between the two files leaves vectors without rows or the
+        # reverse, drop them so that later appends stay aligned
+        count = min(stored, len(self.rows))
+        if stored > count:
+            os.truncate(vectors_path, count * self.dimension * 4)
+        if len(self.rows) > count or torn:
+            del self.rows[count:]
+            with open(rows_path, "w", encoding="utf-8") as f:
+                for row in self.rows:
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self._map(count)
+
+        self.alive = np.ones(count, dtype=bool)
+        deleted_path = os.path.join(self.path, DELETED_FILE)
+        if os.path.exists(deleted_path):
+            with open(deleted_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        index = int(line)
+                    except ValueError:
+                        continue  # torn write
+                    if index < count:
+                        self.alive[index] = False
+        self.deleted = count - int(self.alive.sum())
+        for index, row in enumerate(self.rows):
+            if "id" in row and self.alive[index]:
+                self.row_ids[row["id"]] = index
+
+        ivf_path = os.path.join(self.path, IVF_FILE)
+        if os.path.exists(ivf_path):
+            ivf = IVFIndex.load(ivf_path)
+            if ivf.size <= count:
+                ivf.add(self.vectors[ivf.size :])
+                self.ivf = ivf
+                self.trained_size = ivf.size
+        self._maybe_train()
+
+    def __len__(self) -> int:
+        """Number of live rows."""
+        return len(self.rows) - self.deleted
+
+    def _map(self, count: int) -> None:
+        if count == 0:
+            self.vectors = np.empty((0, self.dimension), dtype=np.float32)
+            return
+        self.vectors = np.memmap(
+            os.path.join(self.path, VECTORS_FILE),
+            dtype=np.float32,
+            mode="r",
+            shape=(count, self.dimension),
+        )
+
+    def _maybe_train(self) -> None:
+        count = len(self.rows)
+        # retrain once the collection quadrupled, the centroids no longer fit the data
+        if (
+            not count
+            or count < self.ivf_threshold
+            or (self.ivf and count < self.trained_size * 4)
+        ):
+            return
+        nlist = min(count, max(16, int(2 * math.sqrt(count))))
+        self.ivf = IVFIndex.train(self.vectors, nlist)
+        self.trained_size = count
+        if self.path:
+            self.ivf.save(os.path.join(self.path, IVF_FILE))
+
+    def add(self, rows: List[dict], vectors: np.ndarray) -> None:
+        """Append rows, e.g. {"file_name": ..., "content": ...}, with their vectors."""
+        if not rows:
+            return
+        vectors = normalize(vectors)
+        if vectors.shape != (len(rows), self.dimension):
+            raise ValueError(
+                f"{len(rows)} rows with vectors of shape {vectors.shape}, collection dimension {self.dimension}"
+            )
+        with self.lock:
+            replaced = [
+                self.row_ids[row["id"]] for row in rows if row.get("id") in self.row_ids
+            ]
+            self._delete_rows(replaced)
+            start = len(self.rows)
+            if self.path:
+                with open(os.path.join(self.path, VECTORS_FILE), "ab") as f:
+                    f.write(vectors.tobytes())
+                with open(os.path.join(self.path, ROWS_FILE), "a", encoding="utf-8") as f:
+                    for row in rows:
+                        f.write(json.dumps(row, ensure_ascii=False) + "\n")
+                self.rows.extend(rows)
+                self._map(len(self.rows))
+            else:
+                self.rows.extend(rows)
+                self.vectors = np.concatenate([self.vectors, vectors])
+            self.alive = np.concatenate([self.alive, np.ones(len(rows), dtype=bool)])
+            for index, row in enumerate(rows, start):
+                if "id" in row:
+                    self.row_ids[row["id"]] = index
+
+            if self.ivf is not None:
+                # only the trained index is saved, later vectors are assigned again on open
+                self.ivf.add(vectors)
+            self._maybe_train()
+
+    def _delete_rows(self, indexes: List[int]) -> None:
+        if not indexes:
+            return
+        if self.path:
+            with open(os.path.join(self.path, DELETED_FILE), "a", encoding="utf-8") as f:
+                f.write("".join(f"{index}\n" for index in indexes))
+        self.alive[indexes] = False
+        self.deleted += len(indexes)
+
+    def delete(self, ids: List[str]) -> int:
+        """Delete the rows with these ids, return how many existed."""
+        with self.lock:
+            indexes = [self.row_ids.pop(i) for i in ids if i in self.row_ids]
+            self._delete_rows(indexes)
+            return len(indexes)
+
+    def search(
+        self, vector, k: int, nprobe: Optional[int] = None
+    ) -> List[Tuple[dict, float]]:
+        """The k rows most similar to vector, with their cosine similarity."""
+        query = normalize(np.asarray(vector, dtype=np.float32).reshape(1, -1))[0]
+        if len(query) != self.dimension:
+            raise ValueError(
+                f"query of dimension {len(query)}, collection dimension {self.dimension}"
+            )
+        with self.lock:
+            vectors, rows, ivf, alive = self.vectors, self.rows, self.ivf, self.alive
+        if not len(vectors):
+            return []
+
+        if ivf is not None:
+            ids = np.sort(ivf.candidates(query, nprobe or self.nprobe))
+            ids = ids[ids < len(vectors)]  # added after the snapshot
+            ids = ids[alive[ids]]
+            scores = np.asarray(vectors[ids]) @ query
+            best = top_k(scores, k)
+            return [(rows[ids[i]], float(scores[i])) for i in best]
+
+        best_ids = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        for start in range(0, len(vectors), SCAN_CHUNK):
+            scores = np.asarray(vectors[start : start + SCAN_CHUNK]) @ query
+            scores[~alive[start : start + len(scores)]] = -np.inf
+            keep = top_k(scores, k)
+            best_ids = np.concatenate([best_ids, start + keep])
+            best_scores = np.concatenate([best_scores, scores[keep]])
+        best = top_k(best_scores, k)
+        return [
+            (rows[best_ids[i]], float(best_scores[i]))
+            for i in best
+            if best_scores[i] > -np.inf
+        ]
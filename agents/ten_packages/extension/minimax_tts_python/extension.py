@@ -3,9 +3,11 @@
 # Licensed under the Apache License, Version 2.0.
 # See the LICENSE file for more information.
 #
+import asyncio
 import traceback
+from ten_ai_base.http_client import close_http_client
 from ten_ai_base.tts import AsyncTTSBaseExtension
-from .minimax_tts import MinimaxTTS, MinimaxTTSConfig
+from .minimax_tts import HTTP_CLIENT_NAME, MinimaxTTS, MinimaxTTSConfig
 from ten import (
     AsyncTenEnv,
 )
@@ -32,11 +34,16 @@ class MinimaxTTSExtension(AsyncTTSBaseExtension):
             raise ValueError("api_key and group_id are required")
 
         self.client = MinimaxTTS(config)
+        asyncio.create_task(self.client.http.warmup(ten_env, config.url))
 
     async def on_stop(self, ten_env: AsyncTenEnv) -> None:
         await super().on_stop(ten_env)
         ten_env.log_debug("on_stop")
 
+        if self.client:
+            ten_env.log_info(f"http stats: {self.client.http.stats()}")
+        await close_http_client(HTTP_CLIENT_NAME)
+
     async def on_deinit(self, ten_env: AsyncTenEnv) -> None:
         await super().on_deinit(ten_env)
         ten_env.log_debug("on_deinit")
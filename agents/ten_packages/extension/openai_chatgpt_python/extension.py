@@ -18,6 +18,8 @@ from ten_ai_base.helper import (
     get_property_string,
 )
 from ten_ai_base import AsyncLLMBaseExtension
+from ten_ai_base.sentence import SentenceSegmenter
+from ten_ai_base.trace import SPAN_LLM_FIRST_TOKEN
 from ten_ai_base.types import (
     LLMCallCompletionArgs,
     LLMChatCompletionContentPartParam,
@@ -28,7 +30,6 @@ from ten_ai_base.types import (
     LLMToolResult,
 )
 
-from .helper import parse_sentences
 from .openai import OpenAIChatGPT, OpenAIChatGPTConfig
 from ten import (
     Cmd,
@@ -54,7 +55,7 @@ class OpenAIChatGPTExtension(AsyncLLMBaseExtension):
         self.memory_cache = []
         self.config = None
         self.client = None
-        self.sentence_fragment = ""
+        self.segmenter = SentenceSegmenter()
         self.tool_task_future: asyncio.Future | None = None
         self.users_count = 0
 
@@ -79,6 +80,7 @@ class OpenAIChatGPTExtension(AsyncLLMBaseExtension):
             async_ten_env.log_info(
                 f"initialized with max_tokens: {self.config.max_tokens}, model: {self.config.model}, vendor: {self.config.vendor}"
             )
+            asyncio.create_task(self.client.warmup(async_ten_env))
         except Exception as err:
             async_ten_env.log_info(f"Failed to initialize OpenAIChatGPT: {err}")
 
@@ -86,6 +88,9 @@ class OpenAIChatGPTExtension(AsyncLLMBaseExtension):
         async_ten_env.log_info("on_stop")
         await super().on_stop(async_ten_env)
 
+        if self.client:
+            await self.client.close()
+
     async def on_deinit(self, async_ten_env: AsyncTenEnv) -> None:
         async_ten_env.log_info("on_deinit")
         await super().on_deinit(async_ten_env)
@@ -137,6 +142,7 @@ class OpenAIChatGPTExtension(AsyncLLMBaseExtension):
             return
 
         async_ten_env.log_info(f"OnData input text: [{input_text}]")
+        self.trace_input(data)
 
         # Start an asynchronous task for handling chat completion
         message = LLMChatCompletionUserMessageParam(role="user", content=input_text)
@@ -209,7 +215,7 @@ class OpenAIChatGPTExtension(AsyncLLMBaseExtension):
                     tools.append(self._convert_tools_to_dict(tool))
                     async_ten_env.log_info(f"tool: {tool}")
 
-            self.sentence_fragment = ""
+            self.segmenter.reset()
 
             # Create an asyncio.Event to signal when content is finished
             content_finished_event = asyncio.Event()
@@ -284,14 +290,13 @@ class OpenAIChatGPTExtension(AsyncLLMBaseExtension):
                 self.tool_task_future.set_result(None)
 
             async def handle_content_update(content: str):
+                self.tracer.span(SPAN_LLM_FIRST_TOKEN)
                 # Append the content to the last assistant message
                 for item in reversed(self.memory_cache):
                     if item.get("role") == "assistant":
                         item["content"] = item["content"] + content
                         break
-                sentences, self.sentence_fragment = parse_sentences(
-                    self.sentence_fragment, content
-                )
+                sentences = self.segmenter.push(content)
                 for s in sentences:
                     self.send_text_output(async_ten_env, s, False)
 
@@ -314,6 +319,11 @@ class OpenAIChatGPTExtension(AsyncLLMBaseExtension):
             # Wait for the content to be finished
             await content_finished_event.wait()
 
+            # The segmenter holds back a trailing "." until more text arrives
+            fragment = self.segmenter.flush()
+            if fragment.strip():
+                self.send_text_output(async_ten_env, fragment, False)
+
             async_ten_env.log_info(
                 f"Chat completion finished for input text: {messages}"
             )
@@ -8,8 +8,7 @@
 from collections import defaultdict
 from dataclasses import dataclass
 import random
-import requests
-from openai import AsyncOpenAI, AsyncAzureOpenAI
+from openai import AsyncOpenAI, AsyncAzureOpenAI, DefaultAsyncHttpxClient
 from openai.types.chat.chat_completion import ChatCompletion
 
 from ten.async_ten_env import AsyncTenEnv
@@ -33,6 +32,7 @@ class OpenAIChatGPTConfig(BaseConfig):
     max_tokens: int = 512
     seed: int = random.randint(0, 10000)
     proxy_url: str = ""
+    http2: bool = False
     greeting: str = "Hello, how can I help you today?"
     max_memory_length: int = 10
     vendor: str = "openai"
@@ -45,26 +45,38 @@ class OpenAIChatGPT:
     def __init__(self, ten_env: AsyncTenEnv, config: OpenAIChatGPTConfig):
         self.config = config
         ten_env.log_info(f"OpenAIChatGPT initialized with config: {config.api_key}")
+        if config.proxy_url:
+            ten_env.log_info(f"Setting proxy: {config.proxy_url}")
+        # One pooled keep-alive client for every request, over the proxy if any
+        self.http_client = DefaultAsyncHttpxClient(
+            proxy=config.proxy_url or None, http2=config.http2
+        )
         if self.config.vendor == "azure":
             self.client = AsyncAzureOpenAI(
                 api_key=config.api_key,
                 api_version=self.config.azure_api_version,
                 azure_endpoint=config.azure_endpoint,
+                http_client=self.http_client,
             )
             ten_env.log_info(
                 f"Using Azure OpenAI with endpoint: {config.azure_endpoint}, api_version: {config.azure_api_version}"
             )
         else:
-            self.client = AsyncOpenAI(api_key=config.api_key, base_url=config.base_url)
-        self.session = requests.Session()
-        if config.proxy_url:
-            proxies = {
-                "http": config.proxy_url,
-                "https": config.proxy_url,
-            }
-            ten_env.log_info(f"Setting proxies: {proxies}")
-            self.session.proxies.update(proxies)
-        self.client.session = self.session
+            self.client = AsyncOpenAI(
+                api_key=config.api_key,
+                base_url=config.base_url,
+                http_client=self.http_client,
+            )
+
+    async def warmup(self, ten_env: AsyncTenEnv) -> None:
+        """Open a pooled connection to the API host so the first turn skips the handshakes."""
+        try:
+            await self.http_client.head(str(self.client.base_url))
+        except Exception as e:
+            ten_env.log_warn(f"warmup failed: {e}")
+
+    async def close(self) -> None:
+        await self.client.close()
 
     async def get_chat_completions(self, messages, tools=None) -> ChatCompletion:
         req = {
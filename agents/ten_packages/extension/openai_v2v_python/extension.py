@@ -11,7 +11,6 @@ import json
 from enum import Enum
 import traceback
 import time
-import numpy as np
 from datetime import datetime
 from typing import Iterable
 
@@ -23,11 +22,13 @@ from ten import (
     CmdResult,
     Data,
 )
-from ten.audio_frame import AudioFrameDataFmt
+from ten_ai_base.histogram import WindowedHistogram, latency_stats
+from ten_ai_base.audio import PcmFrameEmitter
 from ten_ai_base.const import CMD_PROPERTY_RESULT, CMD_TOOL_CALL
 from ten_ai_base import AsyncLLMBaseExtension
 from dataclasses import dataclass
 from ten_ai_base.config import BaseConfig
+from ten_ai_base.sentence import SentenceSegmenter
 from ten_ai_base.chat_memory import (
     ChatMemory,
     EVENT_MEMORY_EXPIRED,
@@ -139,14 +140,15 @@ class OpenAIRealtimeExtension(AsyncLLMBaseExtension):
         self.channel_name: str = ""
         self.audio_len_threshold: int = 5120
 
-        self.completion_times = []
-        self.connect_times = []
-        self.first_token_times = []
+        self.completion_times = WindowedHistogram()
+        self.connect_times = WindowedHistogram()
+        self.first_token_times = WindowedHistogram()
 
         self.buff: bytearray = b""
-        self.transcript: str = ""
+        self.transcript = SentenceSegmenter()
         self.ctx: dict = {}
         self.input_end = time.time()
+        self.audio_emitter = PcmFrameEmitter()
 
     async def on_init(self, ten_env: AsyncTenEnv) -> None:
         await super().on_init(ten_env)
@@ -166,6 +168,8 @@ class OpenAIRealtimeExtension(AsyncLLMBaseExtension):
             ten_env.log_error("api_key is required")
             return
 
+        self.audio_emitter = PcmFrameEmitter(sample_rate=self.config.sample_rate)
+
         try:
             self.memory = ChatMemory(self.config.max_history)
 
@@ -268,7 +272,7 @@ class OpenAIRealtimeExtension(AsyncLLMBaseExtension):
         try:
             start_time = time.time()
             await self.conn.connect()
-            self.connect_times.append(time.time() - start_time)
+            self.connect_times.record(time.time() - start_time)
             item_id = ""  # For truncate
             response_id = ""
             content_index = 0
@@ -375,7 +379,7 @@ class OpenAIRealtimeExtension(AsyncLLMBaseExtension):
                                 continue
                             if item_id != message.item_id:
                                 item_id = message.item_id
-                                self.first_token_times.append(
+                                self.first_token_times.record(
                                     time.time() - self.input_end
                                 )
                             self._send_transcript(message.delta, Role.Assistant, False)
@@ -395,8 +399,7 @@ class OpenAIRealtimeExtension(AsyncLLMBaseExtension):
                                     "id": message.item_id,
                                 }
                             )
-                            self.transcript = ""
-                            self._send_transcript("", Role.Assistant, True)
+                            self._flush_transcript()
                         case ResponseTextDone():
                             self.ten_env.log_info(
                                 f"On response text done {message.output_index} {message.content_index} {message.text}"
@@ -406,9 +409,8 @@ class OpenAIRealtimeExtension(AsyncLLMBaseExtension):
                                     f"On flushed text done {message.response_id}"
                                 )
                                 continue
-                            self.completion_times.append(time.time() - self.input_end)
-                            self.transcript = ""
-                            self._send_transcript("", Role.Assistant, True)
+                            self.completion_times.record(time.time() - self.input_end)
+                            self._flush_transcript()
                         case ResponseOutputItemDone():
                             self.ten_env.log_info(f"Output item done {message.item}")
                         case ResponseOutputItemAdded():
@@ -423,13 +425,14 @@ class OpenAIRealtimeExtension(AsyncLLMBaseExtension):
                                 continue
                             if item_id != message.item_id:
                                 item_id = message.item_id
-                                self.first_token_times.append(
+                                self.first_token_times.record(
                                     time.time() - self.input_end
                                 )
                             content_index = message.content_index
                             await self._on_audio_delta(message.delta)
                         case ResponseAudioDone():
-                            self.completion_times.append(time.time() - self.input_end)
+                            await self.audio_emitter.flush(self.ten_env)
+                            self.completion_times.record(time.time() - self.input_end)
                         case InputAudioBufferSpeechStarted():
                             self.ten_env.log_info(
                                 f"On server listening, in response {response_id}, last item {item_id}"
@@ -445,10 +448,9 @@ class OpenAIRealtimeExtension(AsyncLLMBaseExtension):
                                 await self.conn.send_request(truncate)
                             if self.config.server_vad:
                                 await self._flush()
-                            if response_id and self.transcript:
-                                transcript = self.transcript + "[interrupted]"
+                            if response_id and self.transcript.fragment:
+                                transcript = self.transcript.flush() + "[interrupted]"
                                 self._send_transcript(transcript, Role.Assistant, True)
-                                self.transcript = ""
                                 # memory leak, change to lru later
                                 flushed.add(response_id)
                             item_id = ""
@@ -605,39 +607,9 @@ class OpenAIRealtimeExtension(AsyncLLMBaseExtension):
         )
         self._dump_audio_if_need(audio_data, Role.Assistant)
 
-        f = AudioFrame.create("pcm_frame")
-        f.set_sample_rate(self.config.sample_rate)
-        f.set_bytes_per_sample(2)
-        f.set_number_of_channels(1)
-        f.set_data_fmt(AudioFrameDataFmt.INTERLEAVE)
-        f.set_samples_per_channel(len(audio_data) // 2)
-        f.alloc_buf(len(audio_data))
-        buff = f.lock_buf()
-        buff[:] = audio_data
-        f.unlock_buf(buff)
-        await self.ten_env.send_audio_frame(f)
+        await self.audio_emitter.push(self.ten_env, audio_data)
 
     def _send_transcript(self, content: str, role: Role, is_final: bool) -> None:
-        def is_punctuation(char):
-            if char in [",", "，", ".", "。", "?", "？", "!", "！"]:
-                return True
-            return False
-
-        def parse_sentences(sentence_fragment, content):
-            sentences = []
-            current_sentence = sentence_fragment
-            for char in content:
-                current_sentence += char
-                if is_punctuation(char):
-                    # Check if the current sentence contains non-punctuation characters
-                    stripped_sentence = current_sentence
-                    if any(c.isalnum() for c in stripped_sentence):
-                        sentences.append(stripped_sentence)
-                    current_sentence = ""  # Reset for the next sentence
-
-            remain = current_sentence  # Any remaining characters form the incomplete sentence
-            return sentences, remain
-
         def send_data(
             ten_env: AsyncTenEnv,
             sentence: str,
@@ -663,7 +635,7 @@ class OpenAIRealtimeExtension(AsyncLLMBaseExtension):
         stream_id = self.remote_stream_id if role == Role.User else 0
         try:
             if role == Role.Assistant and not is_final:
-                sentences, self.transcript = parse_sentences(self.transcript, content)
+                sentences = self.transcript.push(content)
                 for s in sentences:
                     send_data(self.ten_env, s, stream_id, role, is_final)
             else:
@@ -673,6 +645,11 @@ class OpenAIRealtimeExtension(AsyncLLMBaseExtension):
                 f"Error send text data {role}: {content} {is_final} {e}"
             )
 
+    def _flush_transcript(self) -> None:
+        # End the segment with the sentence the segmenter held back, if any
+        fragment = self.transcript.flush()
+        self._send_transcript(fragment if fragment.strip() else "", Role.Assistant, True)
+
     def _dump_audio_if_need(self, buf: bytearray, role: Role) -> None:
         if not self.config.dump:
             return
@@ -766,6 +743,7 @@ class OpenAIRealtimeExtension(AsyncLLMBaseExtension):
 
     async def _flush(self) -> None:
         try:
+            self.audio_emitter.reset()
             c = Cmd.create("flush")
             await self.ten_env.send_cmd(c)
         except Exception:
@@ -803,26 +781,21 @@ class OpenAIRealtimeExtension(AsyncLLMBaseExtension):
 
         data = Data.create("llm_stat")
         data.set_property_from_json("usage", json.dumps(self.total_usage.model_dump()))
-        if self.connect_times and self.completion_times and self.first_token_times:
+        if (
+            self.connect_times.count
+            and self.completion_times.count
+            and self.first_token_times.count
+        ):
             data.set_property_from_json(
                 "latency",
                 json.dumps(
-                    {
-                        "connection_latency_95": np.percentile(self.connect_times, 95),
-                        "completion_latency_95": np.percentile(
-                            self.completion_times, 95
-                        ),
-                        "first_token_latency_95": np.percentile(
-                            self.first_token_times, 95
-                        ),
-                        "connection_latency_99": np.percentile(self.connect_times, 99),
-                        "completion_latency_99": np.percentile(
-                            self.completion_times, 99
-                        ),
-                        "first_token_latency_99": np.percentile(
-                            self.first_token_times, 99
-                        ),
-                    }
+                    latency_stats(
+                        {
+                            "connection_latency": self.connect_times,
+                            "completion_latency": self.completion_times,
+                            "first_token_latency": self.first_token_times,
+                        }
+                    )
                 ),
             )
         asyncio.create_task(self.ten_env.send_data(data))
@@ -4,8 +4,9 @@
 # See the LICENSE file for more information.
 #
 import asyncio
-from .siliconflow_tts import SiliconFlowTTS, SiliconFlowTTSConfig
+from .siliconflow_tts import HTTP_CLIENT_NAME, SiliconFlowTTS, SiliconFlowTTSConfig
 from ten import AsyncTenEnv
+from ten_ai_base.http_client import close_http_client
 from ten_ai_base.tts import AsyncTTSBaseExtension
 
 
@@ -25,11 +26,14 @@ class SiliconFlowTTSExtension(AsyncTTSBaseExtension):
 
         self.config = await SiliconFlowTTSConfig.create_async(ten_env=ten_env)
         self.client = SiliconFlowTTS(self.config)
+        asyncio.create_task(self.client.warmup(ten_env))
 
     async def on_stop(self, ten_env: AsyncTenEnv) -> None:
         await super().on_stop(ten_env)
         ten_env.log_debug("on_stop")
 
+        await close_http_client(HTTP_CLIENT_NAME)
+
     async def on_deinit(self, ten_env: AsyncTenEnv) -> None:
         await super().on_deinit(ten_env)
         ten_env.log_debug("on_deinit")
@@ -37,7 +41,7 @@ class SiliconFlowTTSExtension(AsyncTTSBaseExtension):
     async def on_request_tts(
         self, ten_env: AsyncTenEnv, input_text: str, end_of_segment: bool
     ) -> None:
-        audio_data = self.client.text_to_speech_stream(ten_env, input_text, end_of_segment)
+        audio_data = await self.client.text_to_speech_stream(ten_env, input_text, end_of_segment)
         if audio_data:
             await self.send_audio_out(ten_env, audio_data)
 
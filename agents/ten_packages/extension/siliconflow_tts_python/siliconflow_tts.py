@@ -1,8 +1,10 @@
 import asyncio
 from dataclasses import dataclass
-import requests
 from ten.async_ten_env import AsyncTenEnv
 from ten_ai_base.config import BaseConfig
+from ten_ai_base.http_client import get_http_client
+
+HTTP_CLIENT_NAME = "siliconflow"
 
 
 @dataclass
@@ -23,6 +25,16 @@ class SiliconFlowTTS:
             "Authorization": f"Bearer {config.api_key}",
             "Content-Type": "application/json"
         }
+        self.http = None
+
+    def _http(self):
+        # one reference to the shared client, released by the extension at on_stop
+        if self.http is None:
+            self.http = get_http_client(HTTP_CLIENT_NAME)
+        return self.http
+
+    async def warmup(self, ten_env: AsyncTenEnv) -> None:
+        await self._http().warmup(ten_env, self.url)
 
     def _create_payload(self, text: str):
         return {
@@ -36,23 +48,21 @@ class SiliconFlowTTS:
             "gain": self.config.gain
         }
 
-    def text_to_speech_stream(
+    async def text_to_speech_stream(
         self, ten_env: AsyncTenEnv, text: str, end_of_segment: bool
     ) -> bytes:
         try:
             payload = self._create_payload(text)
-            response = requests.post(
+            async with self._http().post(
                 self.url,
                 json=payload,
                 headers=self.headers,
-                stream=True
-            )
-            
-            if response.status_code != 200:
-                ten_env.log_error(f"API request failed with status code {response.status_code}")
-                return None
-
-            return response.content
+            ) as response:
+                if response.status != 200:
+                    ten_env.log_error(f"API request failed with status code {response.status}")
+                    return None
+
+                return await response.read()
 
         except Exception as e:
             ten_env.log_error(f"Error in text_to_speech_stream: {e}")
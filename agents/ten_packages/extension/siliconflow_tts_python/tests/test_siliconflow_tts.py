@@ -1,9 +1,21 @@
 import unittest
-from unittest.mock import MagicMock, patch
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
 from ..siliconflow_tts import SiliconFlowTTS, SiliconFlowTTSConfig
 
 
-class TestSiliconFlowTTS(unittest.TestCase):
+def mock_http_client(response):
+    client = MagicMock()
+
+    @asynccontextmanager
+    async def post(*args, **kwargs):
+        yield response
+
+    client.post = MagicMock(side_effect=post)
+    return client
+
+
+class TestSiliconFlowTTS(unittest.IsolatedAsyncioTestCase):
     def setUp(self):
         self.config = SiliconFlowTTSConfig(
             api_key="test_key",
@@ -16,31 +28,32 @@ class TestSiliconFlowTTS(unittest.TestCase):
         self.tts = SiliconFlowTTS(self.config)
         self.ten_env = MagicMock()
 
-    @patch('requests.post')
-    def test_text_to_speech_stream_success(self, mock_post):
+    @patch('siliconflow_tts_python.siliconflow_tts.get_http_client')
+    async def test_text_to_speech_stream_success(self, mock_get_http_client):
         # Mock successful API response
         mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.content = b"test_audio_data"
-        mock_post.return_value = mock_response
+        mock_response.status = 200
+        mock_response.read = AsyncMock(return_value=b"test_audio_data")
+        client = mock_http_client(mock_response)
+        mock_get_http_client.return_value = client
 
-        result = self.tts.text_to_speech_stream(
+        result = await self.tts.text_to_speech_stream(
             self.ten_env,
             "Test text",
             True
         )
 
         self.assertEqual(result, b"test_audio_data")
-        mock_post.assert_called_once()
+        client.post.assert_called_once()
 
-    @patch('requests.post')
-    def test_text_to_speech_stream_failure(self, mock_post):
+    @patch('siliconflow_tts_python.siliconflow_tts.get_http_client')
+    async def test_text_to_speech_stream_failure(self, mock_get_http_client):
         # Mock failed API response
         mock_response = MagicMock()
-        mock_response.status_code = 400
-        mock_post.return_value = mock_response
+        mock_response.status = 400
+        mock_get_http_client.return_value = mock_http_client(mock_response)
 
-        result = self.tts.text_to_speech_stream(
+        result = await self.tts.text_to_speech_stream(
             self.ten_env,
             "Test text",
             True
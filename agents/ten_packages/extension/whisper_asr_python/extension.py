@@ -11,12 +11,13 @@ import os
 import json
 import asyncio
 import numpy as np
-import requests
 import traceback
 import logging
-from typing import Optional
+from typing import List, Optional
 from ten_ai_base.config import BaseConfig
 from .config import WhisperConfig
+from .segmenter import EVENT_FINAL, Segment, SegmenterConfig, SpeechSegmenter
+from .transport import WhisperStreamTransport, WhisperTransport
 from faster_whisper import WhisperModel
 import time
 from dataclasses import dataclass
@@ -39,7 +40,15 @@ class WhisperConfig(BaseConfig):
     beam_size: int = 5  # 束搜索大小
     log_level: str = "info"  # 日志级别
     server_url: str = "http://localhost:8000"  # Whisper 服务器地址
-    STRING_PROPS = ["model_size", "device", "compute_type", "model_path", "language", "log_level", "server_url"]
+    vad_enabled: bool = True  # 按语音端点切分，关闭时使用固定 2 秒窗口
+    vad_end_silence_ms: int = 500  # 结束一句话的静音时长
+    partial_interval_ms: int = 1000  # 长句中间结果的间隔
+    partial_window_ms: int = 10000  # 中间结果的滑动窗口长度
+    max_segment_ms: int = 28000  # 单句最大长度
+    max_in_flight: int = 2  # 同时进行的转写请求数
+    transport: str = "http"  # http: 每段音频一个 POST 请求；websocket: 通过 /ws/transcribe 流式发送
+    STRING_PROPS = ["model_size", "device", "compute_type", "model_path", "language", "log_level", "server_url", "transport"]
+    INT_PROPS = ["vad_end_silence_ms", "partial_interval_ms", "partial_window_ms", "max_segment_ms", "max_in_flight"]
 
     async def load_from_env(self, ten_env):
         """从环境中加载配置"""
@@ -68,6 +77,19 @@ class WhisperConfig(BaseConfig):
             except Exception as e:
                 ten_env.log_warn(f"[whisper_asr_python] Failed to load beam_size: {e}")
 
+            for prop in self.INT_PROPS:
+                try:
+                    val = await ten_env.get_property_int(prop)
+                    if val:
+                        setattr(self, prop, val)
+                except Exception as e:
+                    ten_env.log_warn(f"[whisper_asr_python] Failed to load {prop}: {e}")
+
+            try:
+                self.vad_enabled = await ten_env.get_property_bool("vad_enabled")
+            except Exception as e:
+                ten_env.log_warn(f"[whisper_asr_python] Failed to load vad_enabled: {e}")
+
             ten_env.log_info(f"[whisper_asr_python] Loaded config: {self}")
         except Exception as e:
             ten_env.log_error(f"[whisper_asr_python] Error loading configuration: {e}")
@@ -78,35 +100,47 @@ class WhisperConfig(BaseConfig):
         return (f"WhisperConfig(model_size='{self.model_size}', device='{self.device}', "
                 f"compute_type='{self.compute_type}', model_path='{self.model_path}', "
                 f"language='{self.language}', sample_rate={self.sample_rate}, "
-                f"beam_size={self.beam_size}, log_level='{self.log_level}', server_url='{self.server_url}')")
+                f"beam_size={self.beam_size}, log_level='{self.log_level}', server_url='{self.server_url}', "
+                f"vad_enabled={self.vad_enabled}, vad_end_silence_ms={self.vad_end_silence_ms}, "
+                f"partial_interval_ms={self.partial_interval_ms}, partial_window_ms={self.partial_window_ms}, "
+                f"max_segment_ms={self.max_segment_ms}, max_in_flight={self.max_in_flight}, "
+                f"transport='{self.transport}')")
 
 
 class WhisperASR:
     def __init__(self, config: WhisperConfig):
         """Initialize WhisperASR with config."""
         self.config = config
-        self.audio_buffer = np.array([], dtype=np.float32)
-        self.buffer_duration = 0
-        self.target_duration = 2.0  # seconds
-        self.session = requests.Session()
-        self.min_audio_length = 1.0  # 最小音频长度（秒）
-        self.request_id = 0  # 请求计数器
-        
-        # 音频质量参数
-        self.noise_threshold = 0.005  # 噪音阈值
-        self.signal_threshold = 0.02  # 有效信号阈值
+        self.target_duration = 2.0  # seconds, 关闭 VAD 时的固定窗口
+        # 音频写入预分配的环形缓冲区，按语音端点切分
+        self.segmenter = SpeechSegmenter(
+            SegmenterConfig(
+                sample_rate=config.sample_rate,
+                end_silence_ms=config.vad_end_silence_ms,
+                partial_interval_ms=config.partial_interval_ms,
+                partial_window_ms=config.partial_window_ms,
+                max_segment_ms=config.max_segment_ms,
+            ),
+            vad=config.vad_enabled,
+            fixed_ms=int(self.target_duration * 1000),
+        )
+        # 最小音频长度（秒），VAD 切分的短句包含前后静音
+        self.min_audio_length = 0.5 if config.vad_enabled else 1.0
+
+        # 音频质量参数，int16 幅度
+        self.noise_threshold = 0.005 * 32768  # 噪音阈值
+        self.signal_threshold = 0.02 * 32768  # 有效信号阈值
         self.min_signal_ratio = 0.1  # 最小信号比例
 
     def is_valid_audio(self, audio_data: np.ndarray) -> bool:
-        """检查音频是否有效（不是噪音）"""
-        # 计算音频统计信息
-        abs_data = np.abs(audio_data)
-        max_amplitude = np.max(abs_data)
-        rms = np.sqrt(np.mean(np.square(audio_data)))
-        
+        """检查 int16 音频是否有效（不是噪音）"""
+        # 计算音频统计信息，int16 的 -32768 取绝对值会溢出
+        max_amplitude = max(int(audio_data.max()), -int(audio_data.min()))
+        samples = audio_data.astype(np.float32)
+        rms = np.sqrt(np.mean(samples * samples))
+
         # 计算信号部分（超过噪音阈值的样本）
-        signal_samples = abs_data > self.noise_threshold
-        signal_ratio = np.sum(signal_samples) / len(audio_data)
+        signal_ratio = np.count_nonzero(np.abs(samples) > self.noise_threshold) / len(audio_data)
         
         # 检查是否是有效的语音信号
         if max_amplitude < self.signal_threshold:
@@ -130,75 +164,21 @@ class WhisperASR:
         """检查是否应该输出日志"""
         return logging.getLogger().isEnabledFor(getattr(logging, level.upper()))
 
-    def process_audio(self, audio_data: np.ndarray) -> str:
-        """Process audio data and return transcription."""
-        try:
-            # 检查音频长度
-            audio_duration = len(audio_data) / self.config.sample_rate
-            if audio_duration < self.min_audio_length:
-                if self._should_log('debug'):
-                    logging.debug(f"[whisper_asr_python] Audio too short: {audio_duration}s < {self.min_audio_length}s")
-                return ""
-
-            # 确保音频数据是 float32 类型，范围在 [-1, 1] 之间
-            if audio_data.dtype != np.float32:
-                audio_data = audio_data.astype(np.float32)
-            if np.max(np.abs(audio_data)) > 1.0:
-                audio_data = audio_data / 32768.0
-                
-            # 检查音频质量
-            if not self.is_valid_audio(audio_data):
-                return ""
-
-            # 将音频数据转换为 16kHz 采样率的 16 位整数 PCM
-            audio_data = (audio_data * 32768.0).astype(np.int16)
-            
-            # 生成唯一的请求ID
-            self.request_id += 1
-            
-            # 准备上传的文件
-            audio_bytes = audio_data.tobytes()
-            
-            files = {
-                'file': ('audio.raw', audio_bytes, 'application/octet-stream')
-            }
-
-            # 准备参数
-            params = {
-                'language': self.config.language,
-                'sample_rate': str(self.config.sample_rate),
-                'model_size': self.config.model_size,
-                'compute_type': self.config.compute_type,
-                'beam_size': str(self.config.beam_size),
-                'request_id': str(self.request_id)
-            }
-
-            # 发送请求
-            response = self.session.post(
-                f"{self.config.server_url}/transcribe",
-                files=files,
-                data=params,
-                timeout=30,
-                headers={'Cache-Control': 'no-cache'}
-            )
-            response.raise_for_status()
-            result = response.json()
-            logging.info(f"[whisper_asr_python] Server response (request_id={self.request_id}): {result}")
-
-            # 返回转写结果
-            text = result.get("text", "").strip()
-            if text:
-                logging.info(f"[whisper_asr_python] Transcribed: {text}")
-            return text
-
-        except requests.exceptions.RequestException as e:
-            logging.error(f"[whisper_asr_python] Network error: {str(e)}")
-            return ""
-        except Exception as e:
-            logging.error(f"[whisper_asr_python] Error: {str(e)}")
+    def prepare_audio(self, audio_data: np.ndarray) -> Optional[bytes]:
+        """int16 PCM to send to the server, None if too short or noise."""
+        # 检查音频长度
+        audio_duration = len(audio_data) / self.config.sample_rate
+        if audio_duration < self.min_audio_length:
             if self._should_log('debug'):
-                logging.debug(f"[whisper_asr_python] Traceback: {traceback.format_exc()}")
-            return ""
+                logging.debug(f"[whisper_asr_python] Audio too short: {audio_duration}s < {self.min_audio_length}s")
+            return None
+
+        # 检查音频质量
+        if not self.is_valid_audio(audio_data):
+            return None
+
+        # 服务器直接接收 16 位整数 PCM，不做格式转换；复制一次，环形缓冲区在请求期间会被覆盖
+        return audio_data.tobytes()
 
 
 class WhisperASRExtension(AsyncExtension):
@@ -206,6 +186,7 @@ class WhisperASRExtension(AsyncExtension):
         super().__init__(name)
         self.config = None
         self.asr = None
+        self.transport = None
         self.sample_width = 2  # 16-bit audio
         self.channels = 1  # mono audio
         self.stream_id = 0
@@ -231,10 +212,27 @@ class WhisperASRExtension(AsyncExtension):
         # 初始化 WhisperASR 实例
         self.asr = WhisperASR(self.config)
 
+        # 异步转写，服务器处理期间继续接收和切分音频
+        if self.config.transport == "websocket":
+            # 音频只发送一次，服务器保留上下文，按位置请求中间结果和最终结果
+            self.transport = WhisperStreamTransport(ten_env, self.config, self._on_transcription)
+        else:
+            self.transport = WhisperTransport(
+                ten_env, self.config, self._on_transcription, max(self.config.max_in_flight, 1)
+            )
+            asyncio.create_task(self.transport.warmup())
+
     async def on_stop(self, ten_env: AsyncTenEnv) -> None:
         """停止"""
         self.ten_env = ten_env
         self.ten_env.log_info("[whisper_asr_python] on_stop")
+        if self.transport is not None:
+            # 转写正在说的这句话，close 会等待它的结果
+            if self.asr is not None:
+                self._submit(self.asr.segmenter.flush())
+            ten_env.log_info(f"[whisper_asr_python] transport stats: {self.transport.stats()}")
+            await self.transport.close()
+            self.transport = None
 
     async def on_deinit(self, ten_env: AsyncTenEnv) -> None:
         """反初始化"""
@@ -262,46 +260,35 @@ class WhisperASRExtension(AsyncExtension):
             # 获取流ID
             self.stream_id = frame.get_property_int("stream_id")
 
-            # 将音频数据转换为numpy数组
-            audio_array = np.frombuffer(audio_data, dtype=np.int16).astype(np.float32) / 32768.0
-
             # 确保 asr 实例已初始化
             if not hasattr(self, 'asr') or self.asr is None:
                 self.asr = WhisperASR(self.config)
                 ten_env.log_info("[whisper_asr_python] WhisperASR instance initialized")
 
-            # 将音频数据添加到缓冲区
-            if not hasattr(self.asr, 'audio_buffer'):
-                self.asr.audio_buffer = np.array([], dtype=np.float32)
-                self.asr.buffer_duration = 0
-                ten_env.log_info("[whisper_asr_python] Audio buffer initialized")
-
-            self.asr.audio_buffer = np.concatenate([self.asr.audio_buffer, audio_array])
-            self.asr.buffer_duration = len(self.asr.audio_buffer) / self.config.sample_rate
-
-            # 如果缓冲区中的音频长度达到目标长度，则进行处理
-            if self.asr.buffer_duration >= self.asr.target_duration:
-                #ten_env.log_info(f"[whisper_asr_python] Processing {self.asr.buffer_duration:.2f}s audio")
-                
-                # 处理音频并获取转录结果
-                audio_to_process = self.asr.audio_buffer.copy()
-                self.asr.audio_buffer = np.array([], dtype=np.float32)
-                self.asr.buffer_duration = 0
-                
-                transcription = self.asr.process_audio(audio_to_process)
-
-                # 发送转录结果
-                if transcription:
-                    ten_env.log_info(f"[whisper_asr_python] STT Result: {transcription}")
-                    await self._send_text(ten_env, transcription, True, self.stream_id)
-                #else:
-                #    ten_env.log_info("[whisper_asr_python] No transcription result")
+            # int16 PCM 直接写入环形缓冲区，说话过程中输出中间结果，说完后输出最终结果
+            samples = np.frombuffer(audio_data, dtype=np.int16)
+            if self.transport is not None:
+                self.transport.send_audio(audio_data)
+            self._submit(self.asr.segmenter.push(samples))
 
         except Exception as e:
             ten_env.log_error(f"[whisper_asr_python] Error: {str(e)}")
             if self._should_log('debug'):
                 ten_env.log_error(f"[whisper_asr_python] Traceback: {traceback.format_exc()}")
 
+    def _submit(self, segments: List[Segment]) -> None:
+        """提交切分出的片段，过短或噪声片段不转写"""
+        for segment in segments:
+            pcm = self.asr.prepare_audio(segment.audio)
+            if pcm is not None and self.transport is not None:
+                self.transport.submit(segment, pcm)
+
+    async def _on_transcription(self, event: str, text: str) -> None:
+        """按提交顺序发送转录结果"""
+        is_final = event == EVENT_FINAL
+        self.ten_env.log_info(f"[whisper_asr_python] STT Result ({event}): {text}")
+        await self._send_text(self.ten_env, text, is_final, self.stream_id)
+
     async def _send_text(self, ten_env: AsyncTenEnv, text: str, is_final: bool, stream_id: int) -> None:
         """发送文本"""
         try:
@@ -0,0 +1,214 @@
+from dataclasses import dataclass
+from typing import List, NamedTuple
+
+import numpy as np
+
+EVENT_PARTIAL = "partial"
+EVENT_FINAL = "final"
+
+
+class Segment(NamedTuple):
+    event: str
+    audio: np.ndarray
+    # absolute sample positions of audio in the stream, [start, end)
+    start: int
+    end: int
+
+
+class RingBuffer:
+    """
+    Preallocated int16 ring buffer addressed by absolute sample positions: sample i is
+    kept until capacity newer samples were written after it.
+    """
+
+    def __init__(self, capacity: int):
+        self.buf = np.zeros(capacity, dtype=np.int16)
+        self.capacity = capacity
+        self.end = 0  # absolute position after the last written sample
+
+    @property
+    def start(self) -> int:
+        """Position of the oldest sample still held."""
+        return max(self.end - self.capacity, 0)
+
+    def write(self, samples: np.ndarray) -> None:
+        if len(samples) > self.capacity:
+            self.end += len(samples) - self.capacity
+            samples = samples[-self.capacity :]
+        offset = self.end % self.capacity
+        first = min(len(samples), self.capacity - offset)
+        self.buf[offset : offset + first] = samples[:first]
+        self.buf[: len(samples) - first] = samples[first:]
+        self.end += len(samples)
+
+    def read(self, start: int, end: int) -> np.ndarray:
+        """Samples [start, end), a view of the buffer unless the range wraps around."""
+        start = max(start, self.start)
+        end = min(end, self.end)
+        if end <= start:
+            return self.buf[:0]
+        offset = start % self.capacity
+        if offset + end - start <= self.capacity:
+            return self.buf[offset : offset + end - start]
+        return np.concatenate([self.buf[offset:], self.buf[: (end % self.capacity)]])
+
+
+class EnergyVAD:
+    """
+    Frame level voice activity from the RMS energy against an adaptive noise floor,
+    with the zero-crossing rate to reject hiss: a frame is voiced when its energy is
+    ratio times above the noise floor and it either crosses zero rarely, as voiced
+    speech does, or is loud enough that it cannot be noise.
+    """
+
+    def __init__(
+        self,
+        min_rms: float = 300.0,
+        ratio: float = 3.0,
+        max_zcr: float = 0.25,
+        adaptation: float = 0.05,
+    ):
+        self.min_rms = min_rms
+        self.ratio = ratio
+        self.max_zcr = max_zcr
+        self.adaptation = adaptation
+        self.noise_rms = min_rms / ratio
+
+    def is_speech(self, frame: np.ndarray) -> bool:
+        samples = frame.astype(np.float32)
+        rms = float(np.sqrt(np.mean(samples * samples)))
+        zcr = float(np.mean(np.signbit(samples[1:]) != np.signbit(samples[:-1])))
+        threshold = max(self.noise_rms * self.ratio, self.min_rms)
+        voiced = rms > threshold and (zcr < self.max_zcr or rms > 2 * threshold)
+        if not voiced:
+            # follow the background noise, faster when it drops
+            rate = self.adaptation if rms > self.noise_rms else 0.5
+            self.noise_rms += rate * (rms - self.noise_rms)
+        return voiced
+
+
+@dataclass
+class SegmenterConfig:
+    sample_rate: int = 16000
+    frame_ms: int = 30
+    # consecutive voiced frames starting an utterance
+    start_frames: int = 3
+    # silence ending an utterance
+    end_silence_ms: int = 500
+    # audio kept before the detected start, the VAD reacts a few frames late
+    preroll_ms: int = 300
+    # audio kept after the last voiced frame, word endings are quiet
+    trailing_ms: int = 150
+    # utterances shorter than this are dropped as clicks or coughs
+    min_speech_ms: int = 250
+    # partial results of the last partial_window_ms of the utterance every partial_interval_ms
+    partial_interval_ms: int = 1000
+    partial_window_ms: int = 10000
+    # longer utterances are cut into several finals
+    max_segment_ms: int = 28000
+
+
+class SpeechSegmenter:
+    """
+    Cuts a stream of int16 PCM into utterances with EnergyVAD, all audio goes through
+    one RingBuffer. push() returns the segments to transcribe, EVENT_PARTIAL ones while
+    an utterance grows and an EVENT_FINAL one once it ended. The audio may be a view of
+    the ring, valid until the next push.
+
+    Without vad, the stream is cut into finals of fixed_ms.
+    """
+
+    def __init__(self, config: SegmenterConfig, vad: bool = True, fixed_ms: int = 2000):
+        self.config = config
+        self.vad = EnergyVAD() if vad else None
+        self.ms = config.sample_rate // 1000
+        self.frame = config.frame_ms * self.ms
+        self.fixed = fixed_ms * self.ms
+        self.ring = RingBuffer(
+            (config.max_segment_ms + config.preroll_ms + 2 * config.frame_ms) * self.ms
+        )
+        # start of the utterance with its preroll, None in silence
+        self.speech_start = None
+        self.voice_start = 0
+        self.voiced_frames = 0
+        self.silent_frames = 0
+        self.last_voiced = 0
+        self.last_partial = 0
+        self.segment_start = 0  # fixed windows
+        # position of the next sample to run the VAD on
+        self.vad_pos = 0
+
+    def push(self, samples: np.ndarray) -> List[Segment]:
+        self.ring.write(samples)
+        if self.vad is None:
+            return self._fixed_windows()
+
+        events = []
+        c = self.config
+        while self.ring.end - self.vad_pos >= self.frame:
+            frame_end = self.vad_pos + self.frame
+            voiced = self.vad.is_speech(self.ring.read(self.vad_pos, frame_end))
+            self.vad_pos = frame_end
+
+            if self.speech_start is None:
+                self.voiced_frames = self.voiced_frames + 1 if voiced else 0
+                if self.voiced_frames >= c.start_frames:
+                    self.voice_start = frame_end - self.voiced_frames * self.frame
+                    self.speech_start = max(
+                        self.voice_start - c.preroll_ms * self.ms, self.ring.start
+                    )
+                    self.last_partial = frame_end
+                    self.last_voiced = frame_end
+                    self.silent_frames = 0
+                continue
+
+            if voiced:
+                self.last_voiced = frame_end
+                self.silent_frames = 0
+            else:
+                self.silent_frames += 1
+
+            if self.silent_frames * c.frame_ms >= c.end_silence_ms:
+                events.extend(self._final(self.last_voiced + c.trailing_ms * self.ms))
+                self.speech_start = None
+                self.voiced_frames = 0
+            elif frame_end - self.speech_start >= c.max_segment_ms * self.ms:
+                events.extend(self._final(frame_end))
+                self.speech_start = self.voice_start = frame_end
+                self.last_partial = frame_end
+            elif frame_end - self.last_partial >= c.partial_interval_ms * self.ms:
+                self.last_partial = frame_end
+                start = max(self.speech_start, frame_end - c.partial_window_ms * self.ms)
+                events.append(self._segment(EVENT_PARTIAL, start, frame_end))
+        return events
+
+    def _final(self, end: int) -> List[Segment]:
+        end = min(end, self.vad_pos)
+        if self.last_voiced - self.voice_start < self.config.min_speech_ms * self.ms:
+            return []
+        return [self._segment(EVENT_FINAL, self.speech_start, end)]
+
+    def _segment(self, event: str, start: int, end: int) -> Segment:
+        start = max(start, self.ring.start)
+        return Segment(event, self.ring.read(start, end), start, end)
+
+    def flush(self) -> List[Segment]:
+        """The final of the utterance in progress, e.g. when the stream stops."""
+        if self.vad is None:
+            segment = self._segment(EVENT_FINAL, self.segment_start, self.ring.end)
+            self.segment_start = self.ring.end
+            return [segment] if len(segment.audio) else []
+        if self.speech_start is None:
+            return []
+        events = self._final(self.vad_pos)
+        self.speech_start = None
+        self.voiced_frames = 0
+        return events
+
+    def _fixed_windows(self) -> List[Segment]:
+        events = []
+        while self.ring.end - self.segment_start >= self.fixed:
+            end = self.segment_start + self.fixed
+            events.append(self._segment(EVENT_FINAL, self.segment_start, end))
+            self.segment_start = end
+        return events
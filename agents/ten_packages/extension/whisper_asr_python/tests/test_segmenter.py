@@ -0,0 +1,97 @@
+from pathlib import Path
+import sys
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from segmenter import (  # noqa: E402
+    EVENT_FINAL,
+    EVENT_PARTIAL,
+    RingBuffer,
+    SegmenterConfig,
+    SpeechSegmenter,
+)
+
+SR = 16000
+rng = np.random.default_rng(0)
+
+
+def noise(seconds: float) -> np.ndarray:
+    return rng.normal(0, 60, int(seconds * SR)).astype(np.int16)
+
+
+def speech(seconds: float) -> np.ndarray:
+    t = np.arange(int(seconds * SR)) / SR
+    voiced = 3000 * np.sin(2 * np.pi * 180 * t) * (1 + 0.5 * np.sin(2 * np.pi * 3 * t))
+    return (voiced + rng.normal(0, 60, len(t))).astype(np.int16)
+
+
+def segment(audio: np.ndarray, config: SegmenterConfig = None, flush: bool = False):
+    """Push audio in 20ms frames, check every segment against the source audio."""
+    segmenter = SpeechSegmenter(config or SegmenterConfig())
+    segments = []
+    for i in range(0, len(audio), 320):
+        new = segmenter.push(audio[i : i + 320])
+        if flush and i + 320 >= len(audio):
+            new += segmenter.flush()
+        # the audio is only valid until the next push
+        for s in new:
+            assert np.array_equal(s.audio, audio[s.start : s.end])
+        segments += new
+    return [s for s in segments if s.event == EVENT_FINAL], [
+        s for s in segments if s.event == EVENT_PARTIAL
+    ]
+
+
+def test_ring_buffer_wraps_around():
+    ring = RingBuffer(10)
+    data = np.arange(25, dtype=np.int16)
+    for i in range(0, 25, 3):
+        ring.write(data[i : i + 3])
+    assert (ring.start, ring.end) == (15, 25)
+    assert np.array_equal(ring.read(15, 25), data[15:25])
+    assert np.array_equal(ring.read(18, 23), data[18:23])
+    # overwritten samples are cut off
+    assert np.array_equal(ring.read(0, 17), data[15:17])
+    assert len(ring.read(25, 30)) == 0
+
+    ring.write(np.arange(100, 125, dtype=np.int16))  # longer than the ring
+    assert (ring.start, ring.end) == (40, 50)
+    assert np.array_equal(ring.read(40, 50), np.arange(115, 125))
+
+
+def test_utterance_start_and_end():
+    config = SegmenterConfig()
+    finals, partials = segment(np.concatenate([noise(1), speech(2.5), noise(1)]), config)
+    assert len(finals) == 1
+    final = finals[0]
+    # starts a preroll before the VAD frame the speech starts in, ends a little after it
+    preroll = config.preroll_ms * SR // 1000
+    assert SR - preroll - config.frame_ms * SR // 1000 < final.start <= SR - preroll
+    assert 3.5 * SR <= final.end <= (3.5 + config.end_silence_ms / 1000) * SR
+    assert len(partials) == 2
+    assert all(p.end <= final.end for p in partials)
+
+
+def test_short_noise_burst_is_dropped():
+    finals, partials = segment(np.concatenate([noise(1), speech(0.1), noise(1)]))
+    assert finals == [] and partials == []
+
+
+def test_long_utterance_is_cut_at_max_segment():
+    config = SegmenterConfig(max_segment_ms=5000, partial_interval_ms=100000)
+    finals, _ = segment(np.concatenate([noise(1), speech(12), noise(1)]), config)
+    assert len(finals) == 3
+    # cut at the first VAD frame reaching the limit
+    frame = config.frame_ms * SR // 1000
+    assert 5000 * SR // 1000 <= finals[0].end - finals[0].start < 5000 * SR // 1000 + frame
+    # the cuts are contiguous
+    assert finals[1].start == finals[0].end and finals[2].start == finals[1].end
+
+
+def test_flush_returns_utterance_in_progress():
+    audio = np.concatenate([noise(1), speech(2)])
+    assert segment(audio)[0] == []
+    finals, _ = segment(audio, flush=True)
+    assert len(finals) == 1 and finals[0].end > 2.9 * SR
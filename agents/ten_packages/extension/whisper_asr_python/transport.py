@@ -0,0 +1,380 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, Union
+
+import aiohttp
+from ten import AsyncTenEnv
+from ten_ai_base.histogram import WindowedHistogram, latency_stats
+from ten_ai_base.http_client import (
+    HttpClientOptions,
+    close_http_client,
+    get_http_client,
+)
+from ten_ai_base.trace import record_latency
+
+from .segmenter import EVENT_PARTIAL, Segment
+
+HTTP_CLIENT_NAME = "whisper_asr"
+
+
+class WhisperTransport:
+    """
+    Sends segments to the whisper server /transcribe without blocking the audio path.
+
+    Requests share pooled keep-alive connections, at most max_in_flight run at once
+    and the results are delivered to on_result in submission order. A partial still
+    waiting for a slot when a newer segment comes is dropped, it would be stale.
+    """
+
+    def __init__(
+        self,
+        ten_env: AsyncTenEnv,
+        config,
+        on_result: Callable[[str, str], Awaitable[None]],
+        max_in_flight: int = 2,
+    ):
+        self.ten_env = ten_env
+        self.config = config
+        self.on_result = on_result
+        self.url = f"{config.server_url}/transcribe"
+        self.client = get_http_client(
+            HTTP_CLIENT_NAME,
+            HttpClientOptions(total_timeout=30, limit_per_host=max_in_flight),
+        )
+        self.slots = asyncio.Semaphore(max_in_flight)
+        # (event, task) in submission order, None stops the delivery
+        self.pending: asyncio.Queue = asyncio.Queue()
+        self.waiting_partial: Optional[asyncio.Task] = None
+        self.tasks: set[asyncio.Task] = set()
+        self.request_id = 0
+
+        self.dropped_partials = 0
+        self.failures = 0
+        self.queue_times = WindowedHistogram()
+        self.request_times = WindowedHistogram()
+        self.deliver_task = asyncio.create_task(self._deliver())
+
+    async def warmup(self) -> None:
+        await self.client.warmup(self.ten_env, self.config.server_url)
+
+    def send_audio(self, pcm: bytes) -> None:
+        """Only the segments are uploaded, the stream itself is not sent."""
+
+    def submit(self, segment: Segment, pcm: bytes) -> None:
+        """Queue the raw int16 PCM of segment for transcription, returns immediately."""
+        event = segment.event
+        if self.waiting_partial is not None and not self.waiting_partial.done():
+            self.waiting_partial.cancel()
+            self.dropped_partials += 1
+        self.request_id += 1
+        task = asyncio.create_task(self._transcribe(self.request_id, pcm))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        self.waiting_partial = task if event == EVENT_PARTIAL else None
+        self.pending.put_nowait((event, task))
+
+    async def _transcribe(self, request_id: int, pcm: bytes) -> str:
+        submitted = time.perf_counter()
+        async with self.slots:
+            if self.waiting_partial is asyncio.current_task():
+                self.waiting_partial = None  # started, no longer dropped
+            started = time.perf_counter()
+            self.queue_times.record((started - submitted) * 1000)
+
+            form = aiohttp.FormData()
+            form.add_field(
+                "file", pcm, filename="audio.raw", content_type="application/octet-stream"
+            )
+            form.add_field("language", self.config.language)
+            form.add_field("sample_rate", str(self.config.sample_rate))
+            form.add_field("model_size", self.config.model_size)
+            form.add_field("compute_type", self.config.compute_type)
+            form.add_field("beam_size", str(self.config.beam_size))
+            form.add_field("request_id", str(request_id))
+            async with self.client.post(
+                self.url, data=form, headers={"Cache-Control": "no-cache"}
+            ) as response:
+                response.raise_for_status()
+                result = await response.json()
+
+            latency_ms = (time.perf_counter() - started) * 1000
+            self.request_times.record(latency_ms)
+            record_latency("whisper_request", latency_ms)
+        self.ten_env.log_info(
+            f"[whisper_asr_python] Server response (request_id={request_id}, {latency_ms:.0f}ms): {result}"
+        )
+        return result.get("text", "").strip()
+
+    async def _deliver(self) -> None:
+        while True:
+            item = await self.pending.get()
+            if item is None:
+                break
+            event, task = item
+            await asyncio.wait([task])
+            if task.cancelled():
+                continue
+            if task.exception() is not None:
+                self.failures += 1
+                self.ten_env.log_error(
+                    f"[whisper_asr_python] Transcription failed: {task.exception()!r}"
+                )
+                continue
+            text = task.result()
+            if text:
+                try:
+                    await self.on_result(event, text)
+                except Exception as e:
+                    self.ten_env.log_error(f"[whisper_asr_python] Error delivering result: {e}")
+
+    def stats(self) -> dict:
+        stats = {
+            "requests": self.request_id,
+            "failures": self.failures,
+            "dropped_partials": self.dropped_partials,
+            "in_flight": len(self.tasks),
+            "http": self.client.stats(),
+        }
+        if self.request_times.count:
+            stats.update(
+                latency_stats(
+                    {"request_latency": self.request_times, "queue_latency": self.queue_times},
+                    (50, 95, 99),
+                )
+            )
+        return stats
+
+    async def close(self, timeout: float = 5.0) -> None:
+        """Deliver the results of the submitted segments, cancelling them after timeout."""
+        self.pending.put_nowait(None)
+        await asyncio.wait([self.deliver_task], timeout=timeout)
+        for task in list(self.tasks):
+            task.cancel()
+        self.deliver_task.cancel()
+        await asyncio.gather(self.deliver_task, *self.tasks, return_exceptions=True)
+        await close_http_client(HTTP_CLIENT_NAME)
+
+
+class WhisperStreamTransport:
+    """
+    Streams the audio to the whisper server /ws/transcribe over one WebSocket.
+
+    Every frame is sent once as it arrives and a segment is requested by its sample
+    positions, the server transcribes it from the audio it keeps with the previous
+    final as prompt. Results come back in request order, partials the server found
+    stale are skipped. After a connection failure the stream resumes on a new
+    connection, the requests that were in flight are lost. While the server cannot
+    be reached, at most max_backlog_s of audio is kept to resend, older frames and
+    the requests queued with them are dropped: the server only keeps the last 60
+    seconds of a stream anyway.
+    """
+
+    def __init__(
+        self,
+        ten_env: AsyncTenEnv,
+        config,
+        on_result: Callable[[str, str], Awaitable[None]],
+        max_backoff: float = 5.0,
+        max_backlog_s: float = 60.0,
+    ):
+        self.ten_env = ten_env
+        self.config = config
+        self.on_result = on_result
+        self.url = config.server_url.replace("http", "ws", 1) + "/ws/transcribe"
+        self.max_backoff = max_backoff
+        self.session = aiohttp.ClientSession()
+        # PCM bytes and request messages in stream order, None stops the stream
+        self.outgoing: deque[Union[bytes, dict, None]] = deque()
+        self.ready = asyncio.Event()
+        # samples of the frames in outgoing
+        self.backlog = 0
+        self.max_backlog = int(max_backlog_s * config.sample_rate)
+        # position of the next frame to send, where a new connection resumes the stream
+        self.position = 0
+        # frames were dropped, the server must be told the new position
+        self.resync = False
+        # request id -> (event, submit time) of the requests waiting for a result
+        self.requests: dict[int, tuple[str, float]] = {}
+        self.request_id = 0
+
+        self.failures = 0
+        self.reconnects = 0
+        self.dropped_partials = 0
+        self.dropped_requests = 0
+        self.dropped_samples = 0
+        self.request_times = WindowedHistogram()
+        self.run_task = asyncio.create_task(self._run())
+
+    def _put(self, item: Union[bytes, dict, None]) -> None:
+        self.outgoing.append(item)
+        if isinstance(item, bytes):
+            self.backlog += len(item) // 2
+            if self.backlog > self.max_backlog:
+                self._drop_oldest()
+        self.ready.set()
+
+    def _drop_oldest(self) -> None:
+        """Drop the oldest frames and requests until the backlog fits max_backlog."""
+        while self.backlog > self.max_backlog and self.outgoing[0] is not None:
+            item = self.outgoing.popleft()
+            if isinstance(item, bytes):
+                samples = len(item) // 2
+                self.backlog -= samples
+                self.position += samples
+                self.dropped_samples += samples
+            else:
+                self.requests.pop(item["id"], None)
+                self.dropped_requests += 1
+        self.resync = True
+
+    def _start_message(self) -> dict:
+        return {
+            "type": "start",
+            "language": self.config.language,
+            "model_size": self.config.model_size,
+            "compute_type": self.config.compute_type,
+            "beam_size": self.config.beam_size,
+            "sample_rate": self.config.sample_rate,
+            "position": self.position,
+        }
+
+    def send_audio(self, pcm: bytes) -> None:
+        """Queue a frame of int16 PCM for the server, returns immediately."""
+        self._put(bytes(pcm))
+
+    def submit(self, segment: Segment, pcm: bytes) -> None:
+        """Request the transcription of segment, pcm is not sent again."""
+        self.request_id += 1
+        self.requests[self.request_id] = (segment.event, time.perf_counter())
+        self._put(
+            {
+                "type": segment.event,
+                "id": self.request_id,
+                "start": segment.start,
+                "end": segment.end,
+            }
+        )
+
+    async def _run(self) -> None:
+        attempt = 0
+        while True:
+            try:
+                async with self.session.ws_connect(self.url, heartbeat=30) as ws:
+                    self.resync = False
+                    await ws.send_json(self._start_message())
+                    attempt = 0
+                    sender = asyncio.create_task(self._send(ws))
+                    receiver = asyncio.create_task(self._receive(ws))
+                    try:
+                        done, _ = await asyncio.wait(
+                            [sender, receiver], return_when=asyncio.FIRST_COMPLETED
+                        )
+                        if sender in done and sender.exception() is None:
+                            # stop sent, the server closes after the last result
+                            await receiver
+                            return
+                    finally:
+                        sender.cancel()
+                        receiver.cancel()
+                    errors = [task.exception() for task in done if task.exception()]
+                    raise errors[0] if errors else ConnectionError(
+                        "Connection closed by the server"
+                    )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failures += 1
+                self.ten_env.log_error(f"[whisper_asr_python] Stream connection failed: {e!r}")
+
+            if self.requests:
+                self.ten_env.log_warn(
+                    f"[whisper_asr_python] Lost {len(self.requests)} requests with the connection"
+                )
+                self.requests.clear()
+            attempt += 1
+            self.reconnects += 1
+            await asyncio.sleep(min(self.max_backoff, 0.2 * 2 ** (attempt - 1)))
+
+    async def _send(self, ws: aiohttp.ClientWebSocketResponse) -> None:
+        while True:
+            while not self.outgoing:
+                self.ready.clear()
+                await self.ready.wait()
+            item = self.outgoing.popleft()
+            if isinstance(item, bytes):
+                self.backlog -= len(item) // 2
+            try:
+                if self.resync:
+                    # restarts the stream of the server at the position after the drop
+                    self.resync = False
+                    await ws.send_json(self._start_message())
+                if item is None:
+                    await ws.send_json({"type": "stop"})
+                    return
+                if isinstance(item, bytes):
+                    await ws.send_bytes(item)
+                    self.position += len(item) // 2
+                else:
+                    await ws.send_json(item)
+            except BaseException:
+                # not sent, a new connection resends it
+                self.outgoing.appendleft(item)
+                if isinstance(item, bytes):
+                    self.backlog += len(item) // 2
+                raise
+
+    async def _receive(self, ws: aiohttp.ClientWebSocketResponse) -> None:
+        async for message in ws:
+            if message.type != aiohttp.WSMsgType.TEXT:
+                break
+            result = message.json()
+            request_id = result.get("id")
+            if request_id is None or request_id not in self.requests:
+                self.ten_env.log_error(f"[whisper_asr_python] Stream error: {result}")
+                continue
+            # results come in request order, the earlier ones were dropped as stale
+            for stale in [i for i in self.requests if i < request_id]:
+                del self.requests[stale]
+                self.dropped_partials += 1
+            event, submitted = self.requests.pop(request_id)
+            if result["type"] == "error":
+                self.failures += 1
+                self.ten_env.log_error(
+                    f"[whisper_asr_python] Transcription failed: {result.get('message')}"
+                )
+                continue
+
+            latency_ms = (time.perf_counter() - submitted) * 1000
+            self.request_times.record(latency_ms)
+            record_latency("whisper_request", latency_ms)
+            text = result.get("text", "").strip()
+            if text:
+                try:
+                    await self.on_result(event, text)
+                except Exception as e:
+                    self.ten_env.log_error(f"[whisper_asr_python] Error delivering result: {e}")
+
+    def stats(self) -> dict:
+        stats = {
+            "requests": self.request_id,
+            "failures": self.failures,
+            "reconnects": self.reconnects,
+            "dropped_partials": self.dropped_partials,
+            "dropped_requests": self.dropped_requests,
+            "dropped_audio_s": round(self.dropped_samples / self.config.sample_rate, 2),
+            "in_flight": len(self.requests),
+            "queued": len(self.outgoing),
+        }
+        if self.request_times.count:
+            stats.update(latency_stats({"request_latency": self.request_times}, (50, 95, 99)))
+        return stats
+
+    async def close(self, timeout: float = 5.0) -> None:
+        self._put(None)
+        try:
+            await asyncio.wait_for(self.run_task, timeout)
+        except Exception:
+            self.run_task.cancel()
+            await asyncio.gather(self.run_task, return_exceptions=True)
+        await self.session.close()
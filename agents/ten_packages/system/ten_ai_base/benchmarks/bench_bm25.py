@@ -0,0 +1,130 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+"""
+Build time, size and query latency of the BM25 index, and recall of dense, BM25 and
+reciprocal rank fusion retrieval on a synthetic corpus: chunks mix topic words with
+common words, queries reuse some words of their target chunk and paraphrase the
+others, the dense ranking comes from noisy embeddings standing in for a real model.
+
+    python benchmarks/bench_bm25.py [--chunks 20000] [--queries 500]
+"""
+import argparse
+from pathlib import Path
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "interface"))
+
+from ten_ai_base.bm25 import BM25Index, reciprocal_rank_fusion  # noqa: E402
+
+VOCABULARY = 20000
+# names, numbers, rare terms, a few per chunk
+RARE_WORDS = 200000
+TOPICS = 400
+TOPIC_WORDS = 40
+CHUNK_WORDS = 60
+DIMENSION = 256
+CANDIDATES = 10
+K = 3
+
+
+def corpus(chunks: int, rng: np.random.Generator):
+    words = [f"w{i}" for i in range(VOCABULARY)]
+    topic_words = rng.integers(0, VOCABULARY, (TOPICS, TOPIC_WORDS))
+    topics = rng.integers(0, TOPICS, chunks)
+    # zipf distributed common words
+    common = np.minimum(rng.zipf(1.3, (chunks, CHUNK_WORDS // 2)), VOCABULARY) - 1
+    specific = topic_words[topics[:, None], rng.integers(0, TOPIC_WORDS, (chunks, CHUNK_WORDS // 2))]
+    rare = rng.integers(0, RARE_WORDS, (chunks, 3))
+    texts = [
+        " ".join([words[t] for t in row] + [f"r{r}" for r in rare_row])
+        for row, rare_row in zip(np.concatenate([common, specific], axis=1), rare)
+    ]
+
+    centers = rng.normal(size=(TOPICS, DIMENSION))
+    embeddings = centers[topics] + rng.normal(scale=1.0, size=(chunks, DIMENSION))
+    return words, topic_words, topics, specific, rare, texts, embeddings
+
+
+def queries(count: int, rng, words, topic_words, topics, specific, rare, embeddings):
+    targets = rng.integers(0, len(topics), count)
+    texts, vectors = [], []
+    for target in targets:
+        kept = [words[rng.choice(specific[target])], f"r{rng.choice(rare[target])}"]
+        # paraphrased words: other words of the same topic
+        other = [words[t] for t in topic_words[topics[target], rng.integers(0, TOPIC_WORDS, 2)]]
+        # half of the queries lose their rare term, e.g. misrecognized by the ASR
+        if rng.random() < 0.5:
+            kept = kept[:1]
+        texts.append(" ".join(kept + other))
+        vectors.append(embeddings[target] + rng.normal(scale=6.0, size=DIMENSION))
+    return targets, texts, np.asarray(vectors)
+
+
+def recall(rankings, targets) -> float:
+    return float(np.mean([target in ranking[:K] for ranking, target in zip(rankings, targets)]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--files", type=int, default=20, help="segments, one per file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    words, topic_words, topics, specific, rare, texts, embeddings = corpus(args.chunks, rng)
+    targets, query_texts, query_vectors = queries(
+        args.queries, rng, words, topic_words, topics, specific, rare, embeddings
+    )
+    ids = [str(i) for i in range(args.chunks)]
+
+    with tempfile.TemporaryDirectory() as path:
+        index = BM25Index(path)
+        start = time.perf_counter()
+        for files in np.array_split(np.arange(args.chunks), args.files):
+            index.replace(f"file{files[0]}", [ids[i] for i in files], [texts[i] for i in files])
+        build = time.perf_counter() - start
+        size = sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
+        raw = sum(len(text.encode()) for text in texts)
+        print(
+            f"{args.chunks} chunks in {args.files} segments: build {build:.2f}s, "
+            f"index {size / 2**20:.1f} MiB for {raw / 2**20:.1f} MiB of text"
+        )
+
+        start = time.perf_counter()
+        reopened = BM25Index(path)
+        print(f"reopen {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        latencies, lexical = [], []
+        for query in query_texts:
+            start = time.perf_counter()
+            matches = reopened.search(query, CANDIDATES)
+            latencies.append((time.perf_counter() - start) * 1000)
+            lexical.append([int(doc["id"]) for doc, _ in matches])
+        print(
+            f"bm25 search p50 {np.percentile(latencies, 50):.2f} ms "
+            f"p99 {np.percentile(latencies, 99):.2f} ms"
+        )
+
+    normalized = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    dense = [list(np.argsort(-(normalized @ v))[:CANDIDATES]) for v in query_vectors]
+
+    latencies, fused = [], []
+    for d, l in zip(dense, lexical):
+        start = time.perf_counter()
+        fused.append([key for key, _ in reciprocal_rank_fusion([d, l])])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    print(f"recall@{K}: dense {recall(dense, targets):.3f}, bm25 {recall(lexical, targets):.3f}, "
+          f"rrf {recall(fused, targets):.3f} (fusion p50 {np.percentile(latencies, 50):.3f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+"""
+Bytes copied per second of audio by PcmFrameEmitter, compared with the previous
+leftover_bytes + audio_data concatenation in send_audio_out.
+
+    python benchmarks/bench_pcm_emitter.py
+"""
+import asyncio
+from pathlib import Path
+import random
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "interface"))
+
+from ten_ai_base.audio import PcmFrameEmitter  # noqa: E402
+
+SAMPLE_RATE = 24000
+SECONDS = 60
+
+
+class NullTenEnv:
+    async def send_audio_frame(self, _) -> None:
+        pass
+
+
+def chunks(seconds: int) -> list[bytes]:
+    """Vendor-like chunk sizes, including odd lengths."""
+    rng = random.Random(0)
+    total = SAMPLE_RATE * 2 * seconds
+    out = []
+    while total > 0:
+        n = min(total, rng.randint(501, 9601))
+        out.append(bytes(n))
+        total -= n
+    return out
+
+
+def legacy_copied(data: list[bytes]) -> int:
+    """Mirror of the old send_audio_out: concat, slice, copy into the frame buffer."""
+    copied = 0
+    leftover = b""
+    for audio_data in data:
+        combined = leftover + audio_data
+        copied += len(combined)
+        valid = len(combined) - len(combined) % 2
+        if valid != len(combined):
+            leftover = combined[valid:]
+            combined = combined[:valid]
+            copied += len(combined) + len(leftover)
+        else:
+            leftover = b""
+        copied += len(combined)
+    return copied
+
+
+async def main() -> None:
+    data = chunks(SECONDS)
+    ten_env = NullTenEnv()
+
+    start = time.perf_counter()
+    legacy = legacy_copied(data)
+    legacy_time = time.perf_counter() - start
+
+    for frame_ms in (10, 20):
+        emitter = PcmFrameEmitter(sample_rate=SAMPLE_RATE, frame_duration_ms=frame_ms)
+        start = time.perf_counter()
+        for audio_data in data:
+            await emitter.push(ten_env, audio_data)
+        await emitter.flush(ten_env)
+        elapsed = time.perf_counter() - start
+        print(
+            f"emitter {frame_ms}ms: {emitter.bytes_copied / SECONDS:.0f} bytes copied/s of audio "
+            f"({emitter.bytes_copied / emitter.bytes_in:.2f}x input), "
+            f"{emitter.frames_out} frames, {elapsed * 1000 / SECONDS:.3f} ms cpu/s of audio"
+        )
+
+    print(
+        f"legacy: {legacy / SECONDS:.0f} bytes copied/s of audio "
+        f"({legacy / (SAMPLE_RATE * 2 * SECONDS):.2f}x input), "
+        f"{legacy_time * 1000 / SECONDS:.3f} ms cpu/s of audio (without frame creation)"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
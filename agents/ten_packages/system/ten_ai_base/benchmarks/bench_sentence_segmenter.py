@@ -0,0 +1,122 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+"""
+SentenceSegmenter against the parse_sentences helper previously copied into the
+LLM extensions, on long multilingual streams split into token-sized deltas.
+
+    python benchmarks/bench_sentence_segmenter.py
+"""
+from pathlib import Path
+import random
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "interface"))
+
+from ten_ai_base.sentence import SentenceSegmenter  # noqa: E402
+
+SAMPLES = [
+    "The quick brown fox jumps over the lazy dog, and then it runs away. ",
+    "Dr. Smith paid $3.50 for 1,000 stickers... Was it worth it? Absolutely! ",
+    "今天天气很好，我们去公园散步吧。你觉得怎么样？好的！",
+    "東京は日本の首都です。人口は約1400万人です。",
+    "오늘은 날씨가 좋네요, 산책하러 갈까요? 좋아요. ",
+    "Bonjour, comment ça va? Très bien, merci. ",
+    "This is a very long clause without any punctuation that keeps going and going "
+    "because the model decided to produce a run-on sentence for no reason at all ",
+]
+
+
+def is_punctuation(char):
+    if char in [",", "，", ".", "。", "?", "？", "!", "！"]:
+        return True
+    return False
+
+
+def parse_sentences(sentence_fragment, content):
+    sentences = []
+    current_sentence = sentence_fragment
+    for char in content:
+        current_sentence += char
+        if is_punctuation(char):
+            stripped_sentence = current_sentence
+            if any(c.isalnum() for c in stripped_sentence):
+                sentences.append(stripped_sentence)
+            current_sentence = ""
+    remain = current_sentence
+    return sentences, remain
+
+
+def stream(total_chars: int) -> list[str]:
+    rng = random.Random(0)
+    text = []
+    size = 0
+    while size < total_chars:
+        s = rng.choice(SAMPLES)
+        text.append(s)
+        size += len(s)
+    text = "".join(text)
+    deltas = []
+    i = 0
+    while i < len(text):
+        n = rng.randint(1, 6)
+        deltas.append(text[i : i + n])
+        i += n
+    return deltas
+
+
+def bench_legacy(deltas: list[str]) -> tuple[float, int]:
+    start = time.perf_counter()
+    count = 0
+    fragment = ""
+    for delta in deltas:
+        sentences, fragment = parse_sentences(fragment, delta)
+        count += len(sentences)
+    return time.perf_counter() - start, count
+
+
+def bench_segmenter(deltas: list[str], **kwargs) -> tuple[float, int]:
+    start = time.perf_counter()
+    count = 0
+    segmenter = SentenceSegmenter(**kwargs)
+    for delta in deltas:
+        count += len(segmenter.push(delta))
+    segmenter.flush()
+    return time.perf_counter() - start, count
+
+
+def first_sentence_chars(deltas: list[str], **kwargs) -> int:
+    """Characters streamed before the first sentence is ready for TTS."""
+    segmenter = SentenceSegmenter(**kwargs)
+    seen = 0
+    for delta in deltas:
+        seen += len(delta)
+        if segmenter.push(delta):
+            return seen
+    return seen
+
+
+def main() -> None:
+    for total in (10_000, 100_000, 1_000_000):
+        deltas = stream(total)
+        legacy, legacy_count = bench_legacy(deltas)
+        segmenter, count = bench_segmenter(deltas)
+        bounded, bounded_count = bench_segmenter(deltas, min_length=8, max_length=80)
+        print(
+            f"{total:>9} chars: parse_sentences {legacy * 1000:8.2f} ms ({legacy_count} sentences), "
+            f"SentenceSegmenter {segmenter * 1000:8.2f} ms ({count}), "
+            f"min 8/max 80 {bounded * 1000:8.2f} ms ({bounded_count})"
+        )
+
+    print(
+        "chars before first sentence on a run-on stream: "
+        f"unbounded {first_sentence_chars([SAMPLES[-1]] * 20)}, "
+        f"max 80 {first_sentence_chars([SAMPLES[-1]] * 20, max_length=80)}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+"""
+Serialization cost per 1k embeddings of the binary vector payload, compared with the
+JSON text the embedding, file_chunker and vector storage extensions exchanged before.
+
+    python benchmarks/bench_vectors.py
+"""
+import json
+from pathlib import Path
+import random
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "interface"))
+
+from ten_ai_base.vectors import (  # noqa: E402
+    decode_vectors,
+    decode_vectors_array,
+    encode_vectors,
+)
+
+COUNT = 1000
+ROUNDS = 5
+
+
+def vectors(dim: int) -> list[list[float]]:
+    rng = random.Random(0)
+    return [[rng.uniform(-0.1, 0.1) for _ in range(dim)] for _ in range(COUNT)]
+
+
+def best_ms(fn) -> float:
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main() -> None:
+    for dim in (512, 1024, 1536):
+        data = vectors(dim)
+        records = [{"embedding": e, "text_index": i} for i, e in enumerate(data)]
+        text = json.dumps(records)
+        buf = encode_vectors(data)
+
+        json_encode = best_ms(lambda: json.dumps(records))
+        json_decode = best_ms(lambda: [r["embedding"] for r in json.loads(text)])
+        buf_encode = best_ms(lambda: encode_vectors(data))
+        buf_decode = best_ms(lambda: decode_vectors(buf))
+        line = (
+            f"dim {dim:>4}, per {COUNT} vectors: "
+            f"json {len(text) / 1e6:5.1f} MB encode {json_encode:7.1f} ms decode {json_decode:7.1f} ms | "
+            f"f32 {len(buf) / 1e6:5.1f} MB encode {buf_encode:6.1f} ms decode {buf_decode:6.1f} ms"
+        )
+        try:
+            import numpy as np
+
+            array = np.asarray(data, dtype=np.float32)
+            line += (
+                f" | numpy encode {best_ms(lambda: encode_vectors(array)):5.2f} ms"
+                f" decode {best_ms(lambda: decode_vectors_array(buf)):5.3f} ms"
+            )
+        except ImportError:
+            pass
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+
+from .types import (
+    LLMCallCompletionArgs,
+    LLMDataCompletionArgs,
+    LLMToolMetadata,
+    LLMToolResult,
+    LLMChatCompletionMessageParam,
+)
+from .usage import LLMUsage, LLMCompletionTokensDetails, LLMPromptTokensDetails
+from .chat_memory import ChatMemory, EVENT_MEMORY_APPENDED, EVENT_MEMORY_EXPIRED
+from .helper import AsyncQueue, AsyncEventEmitter
+from .audio import PcmFrameEmitter
+from .sentence import SentenceSegmenter
+from .histogram import Histogram, WindowedHistogram
+from .trace import TurnContext, TurnTracer
+from .http_client import HttpClient, HttpClientOptions, get_http_client, close_http_client
+from .vectors import (
+    encode_vectors,
+    decode_vectors,
+    decode_vectors_array,
+    VectorFormatError,
+)
+from .config import BaseConfig
+from .llm import AsyncLLMBaseExtension
+from .llm_tool import AsyncLLMToolBaseExtension
+
+# Specify what should be imported when a user imports * from the
+# ten_ai_base package.
+__all__ = [
+    "LLMToolMetadata",
+    "LLMToolResult",
+    "LLMCallCompletionArgs",
+    "LLMDataCompletionArgs",
+    "AsyncLLMBaseExtension",
+    "AsyncLLMToolBaseExtension",
+    "ChatMemory",
+    "AsyncQueue",
+    "AsyncEventEmitter",
+    "PcmFrameEmitter",
+    "SentenceSegmenter",
+    "Histogram",
+    "WindowedHistogram",
+    "TurnContext",
+    "TurnTracer",
+    "HttpClient",
+    "HttpClientOptions",
+    "get_http_client",
+    "close_http_client",
+    "encode_vectors",
+    "decode_vectors",
+    "decode_vectors_array",
+    "VectorFormatError",
+    "BaseConfig",
+    "LLMChatCompletionMessageParam",
+    "LLMUsage",
+    "LLMCompletionTokensDetails",
+    "LLMPromptTokensDetails",
+    "EVENT_MEMORY_APPENDED",
+    "EVENT_MEMORY_EXPIRED",
+]
@@ -0,0 +1,146 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+from typing import Iterator
+
+from ten.async_ten_env import AsyncTenEnv
+from ten.audio_frame import AudioFrame, AudioFrameDataFmt
+from .const import AUDIO_FRAME_OUTPUT_NAME
+from .trace import TurnContext
+
+
+class PcmFrameEmitter:
+    """
+    Cuts a PCM byte stream into fixed duration AudioFrames.
+
+    Whole frames are copied straight from a memoryview of the pushed data into the
+    frame buffer; only the tail of a push that does not fill a frame is kept, in a
+    preallocated carry buffer, until the next push or flush. Sub-sample bytes (odd
+    byte carry-over) stay in the carry buffer across flushes.
+
+    Frames are tagged with turn, if set, so the receivers can attribute them to a user turn.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        bytes_per_sample: int = 2,
+        number_of_channels: int = 1,
+        frame_duration_ms: int = 10,
+        name: str = AUDIO_FRAME_OUTPUT_NAME,
+    ):
+        self.name = name
+        self.frame_duration_ms = frame_duration_ms
+        self.sample_rate = 0
+        self.bytes_per_sample = 0
+        self.number_of_channels = 0
+        self.sample_size = 0
+        self.frame_size = 0
+        self._carry = bytearray()
+        self._carry_len = 0
+        self.turn: TurnContext | None = None
+
+        self.bytes_in = 0
+        self.bytes_copied = 0
+        self.frames_out = 0
+
+        self._set_format(sample_rate, bytes_per_sample, number_of_channels)
+
+    def _set_format(
+        self, sample_rate: int, bytes_per_sample: int, number_of_channels: int
+    ) -> None:
+        self.sample_rate = sample_rate
+        self.bytes_per_sample = bytes_per_sample
+        self.number_of_channels = number_of_channels
+        self.sample_size = bytes_per_sample * number_of_channels
+        self.frame_size = max(
+            self.sample_size,
+            sample_rate * self.frame_duration_ms // 1000 * self.sample_size,
+        )
+        if len(self._carry) < self.frame_size:
+            carry = bytearray(self.frame_size)
+            carry[: self._carry_len] = self._carry[: self._carry_len]
+            self._carry = carry
+
+    async def set_format(
+        self,
+        ten_env: AsyncTenEnv,
+        sample_rate: int,
+        bytes_per_sample: int,
+        number_of_channels: int,
+    ) -> None:
+        """Change the output format, flushing the audio buffered in the old one."""
+        if (
+            sample_rate == self.sample_rate
+            and bytes_per_sample == self.bytes_per_sample
+            and number_of_channels == self.number_of_channels
+        ):
+            return
+        await self.flush(ten_env)
+        self._set_format(sample_rate, bytes_per_sample, number_of_channels)
+
+    def frames(self, audio_data: bytes) -> Iterator[memoryview]:
+        """Yield the complete frames available after appending audio_data."""
+        view = memoryview(audio_data)
+        self.bytes_in += len(view)
+        frame_size = self.frame_size
+
+        if self._carry_len:
+            n = min(frame_size - self._carry_len, len(view))
+            self._carry[self._carry_len : self._carry_len + n] = view[:n]
+            self.bytes_copied += n
+            self._carry_len += n
+            view = view[n:]
+            if self._carry_len < frame_size:
+                return
+            self._carry_len = 0
+            yield memoryview(self._carry)[:frame_size]
+
+        offset = 0
+        while len(view) - offset >= frame_size:
+            yield view[offset : offset + frame_size]
+            offset += frame_size
+
+        remaining = len(view) - offset
+        if remaining:
+            self._carry[:remaining] = view[offset:]
+            self.bytes_copied += remaining
+            self._carry_len = remaining
+
+    async def push(self, ten_env: AsyncTenEnv, audio_data: bytes) -> None:
+        """Send out every complete frame, buffering the remainder."""
+        for frame in self.frames(audio_data):
+            await self._send(ten_env, frame)
+
+    async def flush(self, ten_env: AsyncTenEnv) -> None:
+        """Send out the buffered whole samples as a short frame, e.g. at the end of a sentence."""
+        valid_length = self._carry_len - self._carry_len % self.sample_size
+        if not valid_length:
+            return
+        await self._send(ten_env, memoryview(self._carry)[:valid_length])
+        partial = self._carry_len - valid_length
+        self._carry[:partial] = self._carry[valid_length : self._carry_len]
+        self._carry_len = partial
+
+    def reset(self) -> None:
+        """Drop the buffered audio, e.g. on interruption."""
+        self._carry_len = 0
+
+    async def _send(self, ten_env: AsyncTenEnv, data: memoryview) -> None:
+        f = AudioFrame.create(self.name)
+        f.set_sample_rate(self.sample_rate)
+        f.set_bytes_per_sample(self.bytes_per_sample)
+        f.set_number_of_channels(self.number_of_channels)
+        f.set_data_fmt(AudioFrameDataFmt.INTERLEAVE)
+        if self.turn:
+            self.turn.to_msg(f)
+        f.set_samples_per_channel(len(data) // self.sample_size)
+        f.alloc_buf(len(data))
+        buff = f.lock_buf()
+        buff[:] = data
+        f.unlock_buf(buff)
+        self.bytes_copied += len(data)
+        self.frames_out += 1
+        await ten_env.send_audio_frame(f)
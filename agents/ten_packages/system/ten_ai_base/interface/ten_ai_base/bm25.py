@@ -0,0 +1,234 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+import json
+import os
+import re
+import shutil
+import threading
+import uuid
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# Okapi BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+SEGMENTS_FILE = "segments.json"
+
+_TERMS_FILE = "terms.txt"
+_OFFSETS_FILE = "offsets.npy"
+_DOCS_FILE = "docs.npy"
+_TFS_FILE = "tfs.npy"
+_DOC_LENS_FILE = "doc_lens.npy"
+_TEXTS_FILE = "texts.jsonl"
+
+# latin words and digits, CJK runs are split into character bigrams
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af"
+_TOKEN_PATTERN = re.compile(f"[{_CJK}]+|[^\\W_]+")
+_CJK_PATTERN = re.compile(f"[{_CJK}]")
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        if _CJK_PATTERN.match(token):
+            if len(token) == 1:
+                tokens.append(token)
+            else:
+                tokens.extend(token[i : i + 2] for i in range(len(token) - 1))
+        else:
+            tokens.append(token)
+    return tokens
+
+
+class BM25Segment:
+    """
+    Immutable inverted index of a set of documents, e.g. the chunks of one file.
+
+    The sorted vocabulary is a text file, the postings of term i are
+    docs[offsets[i]:offsets[i + 1]] with their term frequencies in tfs, all arrays
+    are .npy files opened as memory maps.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, _TERMS_FILE), "r", encoding="utf-8") as f:
+            terms = f.read().split("\n") if os.path.getsize(f.name) else []
+        self.terms: Dict[str, int] = {term: i for i, term in enumerate(terms)}
+        self.offsets = self._load(_OFFSETS_FILE)
+        self.docs = self._load(_DOCS_FILE)
+        self.tfs = self._load(_TFS_FILE)
+        self.doc_lens = self._load(_DOC_LENS_FILE)
+        self.total_len = int(self.doc_lens.sum())
+        self._texts = None
+
+    def _load(self, name: str) -> np.ndarray:
+        return np.load(os.path.join(self.path, name), mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self.doc_lens)
+
+    @classmethod
+    def write(cls, path: str, ids: Sequence[str], texts: Sequence[str]) -> None:
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        doc_lens = np.empty(len(texts), dtype=np.uint32)
+        for doc, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_lens[doc] = sum(counts.values())
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc, tf))
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[term]) for term in terms])
+        # 4 bytes per posting for segments of less than 65536 documents
+        docs = np.empty(offsets[-1], dtype=np.uint16 if len(texts) < 2**16 else np.uint32)
+        tfs = np.empty(offsets[-1], dtype=np.uint16)
+        for i, term in enumerate(terms):
+            entries = np.asarray(postings[term], dtype=np.int64)
+            docs[offsets[i] : offsets[i + 1]] = entries[:, 0]
+            tfs[offsets[i] : offsets[i + 1]] = np.minimum(entries[:, 1], 65535)
+
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, _TERMS_FILE), "w", encoding="utf-8") as f:
+            f.write("\n".join(terms))
+        np.save(os.path.join(path, _OFFSETS_FILE), offsets)
+        np.save(os.path.join(path, _DOCS_FILE), docs)
+        np.save(os.path.join(path, _TFS_FILE), tfs)
+        np.save(os.path.join(path, _DOC_LENS_FILE), doc_lens)
+        with open(os.path.join(path, _TEXTS_FILE), "w", encoding="utf-8") as f:
+            for doc_id, text in zip(ids, texts):
+                f.write(json.dumps({"id": doc_id, "text": text}, ensure_ascii=False) + "\n")
+
+    def postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        i = self.terms.get(term)
+        if i is None:
+            return self.docs[:0], self.tfs[:0]
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.docs[start:end], self.tfs[start:end]
+
+    def document(self, doc: int) -> dict | None:
+        if self._texts is None:
+            # only read once a search returns a document of this segment
+            try:
+                with open(os.path.join(self.path, _TEXTS_FILE), "r", encoding="utf-8") as f:
+                    self._texts = [json.loads(line) for line in f]
+            except FileNotFoundError:
+                return None  # segment replaced by a writer since the last refresh
+        return self._texts[doc]
+
+
+class BM25Index:
+    """
+    BM25 index of a collection, one segment per source (file) so a source is replaced
+    or removed without rebuilding the others. segments.json maps the sources to their
+    segment directories and is replaced atomically, readers in other extensions pick
+    up new versions through refresh().
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.sources: Dict[str, str] = {}
+        self.segments: Dict[str, BM25Segment] = {}
+        self.version = None
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Reload the segments if another writer changed them."""
+        segments_path = os.path.join(self.path, SEGMENTS_FILE)
+        try:
+            version = os.stat(segments_path).st_mtime_ns
+        except FileNotFoundError:
+            version = None
+        if version == self.version:
+            return
+        sources = {}
+        if version is not None:
+            with open(segments_path, "r", encoding="utf-8") as f:
+                sources = json.load(f)
+        segments = {}
+        for name in sources.values():
+            segment = self.segments.get(name)
+            segments[name] = segment or BM25Segment(os.path.join(self.path, name))
+        with self.lock:
+            self.sources, self.segments, self.version = sources, segments, version
+
+    def __len__(self) -> int:
+        return sum(len(segment) for segment in self.segments.values())
+
+    def _save(self, sources: Dict[str, str]) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        tmp = os.path.join(self.path, SEGMENTS_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(sources, f, ensure_ascii=False)
+        os.replace(tmp, os.path.join(self.path, SEGMENTS_FILE))
+        stale = set(self.sources.values()) - set(sources.values())
+        self.version = None
+        self.refresh()
+        for name in stale:
+            shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+    def replace(self, source: str, ids: Sequence[str], texts: Sequence[str]) -> None:
+        """Index the documents of source, replacing the ones indexed before."""
+        name = uuid.uuid4().hex
+        BM25Segment.write(os.path.join(self.path, name), ids, texts)
+        with self.write_lock:
+            self.refresh()
+            self._save({**self.sources, source: name})
+
+    def remove(self, source: str) -> None:
+        with self.write_lock:
+            self.refresh()
+            if source in self.sources:
+                self._save({s: n for s, n in self.sources.items() if s != source})
+
+    def search(self, query: str, k: int) -> List[Tuple[dict, float]]:
+        """The k documents, {"id": ..., "text": ...}, with the best BM25 score."""
+        with self.lock:
+            segments = list(self.segments.values())
+        count = sum(len(segment) for segment in segments)
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not count or not terms:
+            return []
+        avg_len = max(sum(segment.total_len for segment in segments) / count, 1)
+
+        postings = [[segment.postings(term) for term in terms] for segment in segments]
+        dfs = np.sum([[len(docs) for docs, _ in row] for row in postings], axis=0)
+        idfs = np.log(1 + (count - dfs + 0.5) / (dfs + 0.5))
+
+        results = []
+        for segment, row in zip(segments, postings):
+            scores = np.zeros(len(segment), dtype=np.float32)
+            norms = BM25_K1 * (1 - BM25_B + BM25_B * segment.doc_lens / avg_len)
+            for idf, (docs, tfs) in zip(idfs, row):
+                if len(docs):
+                    tfs = tfs.astype(np.float32)
+                    scores[docs] += idf * tfs * (BM25_K1 + 1) / (tfs + norms[docs])
+            matched = np.flatnonzero(scores)
+            best = matched[np.argsort(-scores[matched], kind="stable")[:k]]
+            results.extend((segment, int(doc), float(scores[doc])) for doc in best)
+
+        results.sort(key=lambda result: -result[2])
+        documents = [(segment.document(doc), score) for segment, doc, score in results]
+        return [(document, score) for document, score in documents if document][:k]
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[str]], k: int = 60
+) -> List[Tuple[str, float]]:
+    """
+    Fuse rankings of keys, best first, by reciprocal rank: every ranking adds
+    1 / (k + rank) to the score of its keys.
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, 1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: -item[1])
@@ -0,0 +1,131 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+import asyncio
+from collections import deque
+
+from typing import Callable, Dict, List
+
+EVENT_MEMORY_EXPIRED = "memory_expired"
+EVENT_MEMORY_APPENDED = "memory_appended"
+
+# Fixed cost of a message (role, separators) and of a non-text content part.
+MESSAGE_TOKEN_OVERHEAD = 4
+CONTENT_PART_TOKENS = 85
+
+
+def _estimate_text_tokens(text: str) -> int:
+    # ~4 characters per token for latin text, ~1 token per CJK character
+    # (3 utf-8 bytes, so 2 extra bytes each)
+    extra_bytes = len(text.encode("utf-8")) - len(text)
+    return (len(text) - extra_bytes // 2) // 4 + extra_bytes // 2 + 1
+
+
+def estimate_tokens(message: dict) -> int:
+    """Cheap token estimate of a chat message, used as the default ChatMemory tokenizer."""
+    tokens = MESSAGE_TOKEN_OVERHEAD
+    content = message.get("content")
+    if isinstance(content, str):
+        tokens += _estimate_text_tokens(content)
+    elif content:
+        for part in content:
+            if isinstance(part, dict) and part.get("type") == "text":
+                tokens += _estimate_text_tokens(part.get("text", ""))
+            else:
+                tokens += CONTENT_PART_TOKENS
+    for call in message.get("tool_calls") or []:
+        function = call.get("function") or {}
+        tokens += _estimate_text_tokens(
+            (function.get("name") or "") + (function.get("arguments") or "")
+        )
+    return tokens
+
+
+class ChatMemory:
+    """
+    Chat history bounded by message count and, optionally, by an estimated token budget.
+
+    Messages are evicted from the front. An assistant or tool message is never left at
+    the front, so an assistant tool call and its tool results are evicted together.
+    get() returns an immutable snapshot that is reused until the history changes.
+    """
+
+    def __init__(
+        self,
+        max_history_length,
+        max_tokens: int = 0,
+        tokenizer: Callable[[dict], int] = estimate_tokens,
+    ):
+        self.max_history_length = max_history_length
+        self.max_tokens = max_tokens
+        self.tokenizer = tokenizer
+        self.history: deque = deque()
+        self.token_counts: deque[int] = deque()
+        self.total_tokens = 0
+        self.snapshot: tuple | None = None
+        self.listeners: Dict[str, List] = {}
+
+    def put(self, message):
+        tokens = self.tokenizer(message)
+        self.history.append(message)
+        self.token_counts.append(tokens)
+        self.total_tokens += tokens
+        self.snapshot = None
+        self.emit(EVENT_MEMORY_APPENDED, message)
+
+        while True:
+            history_count = len(self.history)
+            if history_count > 0 and history_count > self.max_history_length:
+                self._expire()
+                continue
+            if (
+                history_count > 1
+                and self.max_tokens
+                and self.total_tokens > self.max_tokens
+            ):
+                self._expire()
+                continue
+            if history_count > 0 and (self.history[0]["role"] == "assistant" or self.history[0]["role"] == "tool"):
+                # we cannot have an assistant message at the start of the chat history
+                # if after removal of the first, we have an assistant message,
+                # we need to remove the assistant message too
+                self._expire()
+                continue
+            break
+
+    def get(self) -> tuple:
+        if self.snapshot is None:
+            self.snapshot = tuple(self.history)
+        return self.snapshot
+
+    def count(self):
+        return len(self.history)
+
+    def tokens(self) -> int:
+        """Estimated tokens of the whole history."""
+        return self.total_tokens
+
+    def clear(self):
+        self.history.clear()
+        self.token_counts.clear()
+        self.total_tokens = 0
+        self.snapshot = None
+
+    def _expire(self):
+        self.total_tokens -= self.token_counts.popleft()
+        self.snapshot = None
+        self.emit(EVENT_MEMORY_EXPIRED, self.history.popleft())
+
+    def on(self, event_name, listener):
+        """Register an event listener."""
+        if event_name not in self.listeners:
+            self.listeners[event_name] = []
+        self.listeners[event_name].append(listener)
+
+    def emit(self, event_name, *args, **kwargs):
+        """Fire the event without waiting for listeners to finish."""
+        if event_name in self.listeners:
+            for listener in self.listeners[event_name]:
+                asyncio.create_task(listener(*args, **kwargs))
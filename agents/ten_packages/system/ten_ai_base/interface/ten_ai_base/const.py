@@ -0,0 +1,44 @@
+CMD_TOOL_REGISTER = "tool_register"
+CMD_TOOL_CALL = "tool_call"
+CMD_PROPERTY_TOOL = "tool"
+CMD_PROPERTY_RESULT = "tool_result"
+CMD_CHAT_COMPLETION_CALL = "chat_completion_call"
+CMD_GENERATE_IMAGE_CALL = "generate_image_call"
+CMD_IN_FLUSH = "flush"
+CMD_OUT_FLUSH = "flush"
+
+DATA_OUT_NAME = "text_data"
+CONTENT_DATA_OUT_NAME = "content_data"
+DATA_OUT_PROPERTY_TEXT = "text"
+DATA_OUT_PROPERTY_TEXT = "text"
+DATA_OUT_PROPERTY_END_OF_SEGMENT = "end_of_segment"
+
+DATA_IN_PROPERTY_TEXT = "text"
+DATA_IN_PROPERTY_END_OF_SEGMENT = "end_of_segment"
+
+DATA_INPUT_NAME = "text_data"
+CONTENT_DATA_INPUT_NAME = "content_data"
+
+AUDIO_FRAME_OUTPUT_NAME = "pcm_frame"
+
+PROPERTY_TTS_PIPELINE_DEPTH = "pipeline_depth"
+
+# Capacity of the input queue of the LLM and TTS extensions, unbounded if 0, and what
+# happens to a new item when it is full: QUEUE_OVERFLOW_* of helper.py
+PROPERTY_QUEUE_MAX_SIZE = "queue_max_size"
+PROPERTY_QUEUE_OVERFLOW = "queue_overflow"
+
+PROPERTY_TURN_ID = "turn_id"
+PROPERTY_TURN_START_MS = "turn_start_ms"
+
+DATA_LATENCY_STAT_NAME = "latency_stat"
+
+# Set to VECTOR_FORMAT_F32 on embed / embed_batch to receive a binary vector payload
+PROPERTY_VECTOR_FORMAT = "vector_format"
+VECTOR_FORMAT_F32 = "f32"
+
+CMD_EMBED = "embed"
+CMD_PROPERTY_EMBED_INPUT = "input"
+CMD_RESULT_PROPERTY_EMBEDDING_BUF = "embedding_buf"
+
+DATA_SEMANTIC_CACHE_STAT_NAME = "semantic_cache_stat"
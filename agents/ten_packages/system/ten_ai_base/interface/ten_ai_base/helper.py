@@ -0,0 +1,302 @@
+#
+#
+# Agora Real Time Engagement
+# Created by Wei Hu in 2024-08.
+# Copyright (c) 2024 Agora IO. All rights reserved.
+#
+#
+import asyncio
+from collections import deque
+from datetime import datetime
+import functools
+import time
+from typing import Callable
+from ten.async_ten_env import AsyncTenEnv
+from .const import PROPERTY_QUEUE_MAX_SIZE, PROPERTY_QUEUE_OVERFLOW
+
+
+def get_property_bool(ten_env: AsyncTenEnv, property_name: str) -> bool:
+    """Helper to get boolean property from ten_env with error handling."""
+    try:
+        return ten_env.get_property_bool(property_name)
+    except Exception as err:
+        ten_env.log_warn(f"GetProperty {property_name} failed: {err}")
+        return False
+
+def get_properties_bool(ten_env: AsyncTenEnv, property_names: list[str], callback: Callable[[str, bool], None]) -> None:
+    """Helper to get boolean properties from ten_env with error handling."""
+    for property_name in property_names:
+        callback(property_name, get_property_bool(ten_env, property_name))
+
+
+def get_property_string(ten_env: AsyncTenEnv, property_name: str) -> str:
+    """Helper to get string property from ten_env with error handling."""
+    try:
+        return ten_env.get_property_string(property_name)
+    except Exception as err:
+        ten_env.log_warn(f"GetProperty {property_name} failed: {err}")
+        return ""
+
+
+def get_properties_string(ten_env: AsyncTenEnv, property_names: list[str], callback: Callable[[str, str], None]) -> None:
+    """Helper to get string properties from ten_env with error handling."""
+    for property_name in property_names:
+        callback(property_name, get_property_string(ten_env, property_name))
+
+def get_property_int(ten_env: AsyncTenEnv, property_name: str) -> int:
+    """Helper to get int property from ten_env with error handling."""
+    try:
+        return ten_env.get_property_int(property_name)
+    except Exception as err:
+        ten_env.log_warn(f"GetProperty {property_name} failed: {err}")
+        return 0
+    
+def get_properties_int(ten_env: AsyncTenEnv, property_names: list[str], callback: Callable[[str, int], None]) -> None:
+    """Helper to get int properties from ten_env with error handling."""
+    for property_name in property_names:
+        callback(property_name, get_property_int(ten_env, property_name))
+    
+def get_property_float(ten_env: AsyncTenEnv, property_name: str) -> float:
+    """Helper to get float property from ten_env with error handling."""
+    try:
+        return ten_env.get_property_float(property_name)
+    except Exception as err:
+        ten_env.log_warn(f"GetProperty {property_name} failed: {err}")
+        return 0.0
+
+def get_properties_float(ten_env: AsyncTenEnv, property_names: list[str], callback: Callable[[str, float], None]) -> None:
+    """Helper to get float properties from ten_env with error handling."""
+    for property_name in property_names:
+        callback(property_name, get_property_float(ten_env, property_name))
+
+class AsyncEventEmitter:
+    def __init__(self):
+        self.listeners = {}
+
+    def on(self, event_name, listener):
+        """Register an event listener."""
+        if event_name not in self.listeners:
+            self.listeners[event_name] = []
+        self.listeners[event_name].append(listener)
+
+    def emit(self, event_name, *args, **kwargs):
+        """Fire the event without waiting for listeners to finish."""
+        if event_name in self.listeners:
+            for listener in self.listeners[event_name]:
+                asyncio.create_task(listener(*args, **kwargs))
+
+
+QUEUE_OVERFLOW_BLOCK = "block"
+QUEUE_OVERFLOW_DROP_OLDEST = "drop_oldest"
+QUEUE_OVERFLOW_DROP_NEWEST = "drop_newest"
+QUEUE_OVERFLOW_POLICIES = (
+    QUEUE_OVERFLOW_BLOCK,
+    QUEUE_OVERFLOW_DROP_OLDEST,
+    QUEUE_OVERFLOW_DROP_NEWEST,
+)
+
+QUEUE_PRIORITY_HIGH = 0
+QUEUE_PRIORITY_NORMAL = 1
+
+
+class AsyncQueue:
+    """
+    FIFO queue for a single event loop with priority lanes and an optional capacity.
+
+    No lock is taken: waiting getters and putters park on futures that are resolved
+    directly. get returns from the highest priority non-empty lane. When maxsize is
+    reached, put blocks, drops the oldest item of the lowest priority lane, or drops
+    the new item, depending on overflow.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 0,
+        overflow: str = QUEUE_OVERFLOW_BLOCK,
+        lanes: int = 2,
+    ):
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self._lanes = [deque() for _ in range(lanes)]
+        self._size = 0
+        self._getters: deque[asyncio.Future] = deque()
+        self._putters: deque[asyncio.Future] = deque()
+
+        self.put_count = 0
+        self.get_count = 0
+        self.drop_count = 0
+        self.flush_count = 0
+        self.max_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def put(self, item, prepend=False, priority=QUEUE_PRIORITY_NORMAL) -> bool:
+        """
+        Add an item to the queue, prepend puts it in the high priority lane.
+        Returns False if the item was dropped because the queue is full.
+        """
+        if self.maxsize and self._size >= self.maxsize:
+            if self.overflow == QUEUE_OVERFLOW_BLOCK:
+                while self._size >= self.maxsize:
+                    await self._wait(self._putters)
+            elif self.overflow == QUEUE_OVERFLOW_DROP_NEWEST:
+                self.drop_count += 1
+                return False
+            else:
+                self._drop_oldest()
+        return self.put_nowait(item, QUEUE_PRIORITY_HIGH if prepend else priority)
+
+    def put_nowait(self, item, priority=QUEUE_PRIORITY_NORMAL) -> bool:
+        """Add an item regardless of blocking, overflow policies still apply."""
+        if self.maxsize and self._size >= self.maxsize:
+            if self.overflow == QUEUE_OVERFLOW_DROP_OLDEST:
+                self._drop_oldest()
+            else:
+                self.drop_count += 1
+                return False
+        self._lanes[priority].append((item, time.monotonic()))
+        self._size += 1
+        self.put_count += 1
+        if self._size > self.max_depth:
+            self.max_depth = self._size
+        self._wakeup_next(self._getters)
+        return True
+
+    async def get(self):
+        """Remove and return an item from the queue, waiting until one is available."""
+        while not self._size:
+            await self._wait(self._getters)
+        for lane in self._lanes:
+            if lane:
+                item, put_at = lane.popleft()
+                break
+        self._size -= 1
+        self.get_count += 1
+        wait = time.monotonic() - put_at
+        self.total_wait += wait
+        if wait > self.max_wait:
+            self.max_wait = wait
+        self._wakeup_next(self._putters)
+        return item
+
+    async def flush(self):
+        """Drop all items from the queue."""
+        if self._size:
+            self._lanes = [deque() for _ in self._lanes]
+            self.flush_count += self._size
+            self._size = 0
+        while self._putters:
+            self._wakeup_next(self._putters)
+
+    def stats(self) -> dict:
+        """Counters for depth, wait time and drops."""
+        return {
+            "depth": self._size,
+            "max_depth": self.max_depth,
+            "put": self.put_count,
+            "get": self.get_count,
+            "dropped": self.drop_count,
+            "flushed": self.flush_count,
+            "avg_wait_ms": (
+                int(self.total_wait * 1000 / self.get_count) if self.get_count else 0
+            ),
+            "max_wait_ms": int(self.max_wait * 1000),
+        }
+
+    async def configure(self, ten_env: AsyncTenEnv) -> None:
+        """Set maxsize and overflow from the queue_max_size and queue_overflow properties, if any."""
+        try:
+            maxsize = await ten_env.get_property_int(PROPERTY_QUEUE_MAX_SIZE)
+            if maxsize >= 0:
+                self.maxsize = maxsize
+        except Exception:
+            pass
+        try:
+            overflow = await ten_env.get_property_string(PROPERTY_QUEUE_OVERFLOW)
+        except Exception:
+            overflow = ""
+        if overflow in QUEUE_OVERFLOW_POLICIES:
+            self.overflow = overflow
+        elif overflow:
+            ten_env.log_warn(f"unknown {PROPERTY_QUEUE_OVERFLOW} {overflow}, keeping {self.overflow}")
+
+    def __len__(self):
+        """Return the current size of the queue."""
+        return self._size
+
+    def _drop_oldest(self):
+        for lane in reversed(self._lanes):
+            if lane:
+                lane.popleft()
+                self._size -= 1
+                self.drop_count += 1
+                return
+
+    async def _wait(self, waiters: deque):
+        waiter = asyncio.get_running_loop().create_future()
+        waiters.append(waiter)
+        try:
+            await waiter
+        except BaseException:
+            waiter.cancel()
+            try:
+                waiters.remove(waiter)
+            except ValueError:
+                pass
+            # pass the wakeup on if this waiter was woken and then cancelled
+            if waiter.done() and not waiter.cancelled():
+                self._wakeup_next(waiters)
+            raise
+
+    @staticmethod
+    def _wakeup_next(waiters: deque):
+        while waiters:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                break
+
+
+def write_pcm_to_file(buffer: bytearray, file_name: str) -> None:
+    """Helper function to write PCM data to a file."""
+    with open(file_name, "ab") as f:  # append to file
+        f.write(buffer)
+
+
+def generate_file_name(prefix: str) -> str:
+    # Create a timestamp for the file name
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"{prefix}_{timestamp}.pcm"
+
+class PCMWriter:
+    def __init__(self, prefix: str, write_pcm: bool, buffer_size: int = 1024 * 64):
+        self.write_pcm = write_pcm
+        self.buffer = bytearray()
+        self.buffer_size = buffer_size
+        self.file_name = generate_file_name(prefix) if write_pcm else None
+        self.loop = asyncio.get_event_loop()
+
+    async def write(self, data: bytes) -> None:
+        """Accumulate data into the buffer and write to file when necessary."""
+        if not self.write_pcm:
+            return
+
+        self.buffer.extend(data)
+
+        # Write to file if buffer is full
+        if len(self.buffer) >= self.buffer_size:
+            await self._flush()
+
+    async def flush(self) -> None:
+        """Write any remaining data in the buffer to the file."""
+        if self.write_pcm and self.buffer:
+            await self._flush()
+
+    async def _flush(self) -> None:
+        """Helper method to write the buffer to the file."""
+        if self.file_name:
+            await self.loop.run_in_executor(
+                None,
+                functools.partial(write_pcm_to_file, self.buffer[:], self.file_name),
+            )
+        self.buffer.clear()
\ No newline at end of file
@@ -0,0 +1,174 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+from collections import deque
+import math
+import time
+
+
+class Histogram:
+    """
+    Constant memory histogram of non-negative values, e.g. latencies in ms.
+
+    Values are counted in logarithmic buckets, so a percentile is within
+    relative_accuracy of the exact one and the number of buckets only depends on the
+    range of the values (about 1200 from 1us to 3h at 1%), not on how many are recorded.
+    Values below min_value are counted as min_value.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, min_value: float = 0.001):
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: dict[int, int] = {}
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _key(self, value: float) -> int:
+        return math.ceil(math.log(max(value, self.min_value)) / self._log_gamma)
+
+    def _value(self, key: int) -> float:
+        # The point of the bucket (gamma^(key-1), gamma^key] with the smallest relative error
+        return 2 * self.gamma**key / (self.gamma + 1)
+
+    def record(self, value: float) -> None:
+        key = self._key(value)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "Histogram") -> None:
+        """Add the values of other, which must have the same relative_accuracy."""
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def reset(self) -> None:
+        self.buckets.clear()
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def percentile(self, p: float) -> float:
+        """The p-th percentile (0-100), 0 if nothing was recorded."""
+        return self.percentiles(p)[0]
+
+    def percentiles(self, *ps: float) -> list[float]:
+        """Several percentiles (0-100) computed in a single pass over the buckets."""
+        if not self.count:
+            return [0.0] * len(ps)
+
+        order = sorted(range(len(ps)), key=lambda i: ps[i])
+        result = [0.0] * len(ps)
+        keys = iter(sorted(self.buckets))
+        seen = 0
+        key = None
+        for i in order:
+            if ps[i] <= 0:
+                result[i] = self.min
+                continue
+            if ps[i] >= 100:
+                result[i] = self.max
+                continue
+            rank = ps[i] / 100 * (self.count - 1)
+            while seen <= rank:
+                key = next(keys)
+                seen += self.buckets[key]
+            result[i] = min(max(self._value(key), self.min), self.max)
+        return result
+
+
+class WindowedHistogram:
+    """
+    A cumulative Histogram plus a rolling one over roughly the last window_seconds.
+
+    The window is kept as `slots` sub-histograms of window_seconds / slots each, the
+    oldest one is dropped when a new one starts, so memory stays bounded too. The
+    window covers between window_seconds * (slots - 1) / slots and window_seconds.
+    """
+
+    def __init__(
+        self,
+        window_seconds: float = 60.0,
+        slots: int = 6,
+        relative_accuracy: float = 0.01,
+        min_value: float = 0.001,
+    ):
+        self.slot_seconds = window_seconds / slots
+        self.max_slots = slots
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.cumulative = Histogram(relative_accuracy, min_value)
+        self.slots: deque[tuple[int, Histogram]] = deque()
+
+    @property
+    def count(self) -> int:
+        return self.cumulative.count
+
+    def _expire(self, index: int) -> None:
+        while self.slots and self.slots[0][0] <= index - self.max_slots:
+            self.slots.popleft()
+
+    def record(self, value: float, now: float | None = None) -> None:
+        index = int((time.monotonic() if now is None else now) // self.slot_seconds)
+        if not self.slots or self.slots[-1][0] != index:
+            self._expire(index)
+            self.slots.append(
+                (index, Histogram(self.relative_accuracy, self.min_value))
+            )
+        self.slots[-1][1].record(value)
+        self.cumulative.record(value)
+
+    def window(self, now: float | None = None) -> Histogram:
+        """The values recorded in the window, merged into one Histogram."""
+        self._expire(
+            int((time.monotonic() if now is None else now) // self.slot_seconds)
+        )
+        merged = Histogram(self.relative_accuracy, self.min_value)
+        for _, histogram in self.slots:
+            merged.merge(histogram)
+        return merged
+
+    def percentiles(self, *ps: float, windowed: bool = False) -> list[float]:
+        histogram = self.window() if windowed else self.cumulative
+        return histogram.percentiles(*ps)
+
+    def percentile(self, p: float, windowed: bool = False) -> float:
+        return self.percentiles(p, windowed=windowed)[0]
+
+    def reset(self) -> None:
+        self.cumulative.reset()
+        self.slots.clear()
+
+
+def latency_stats(
+    histograms: dict[str, WindowedHistogram], percentiles: tuple = (95, 99)
+) -> dict[str, float]:
+    """
+    Flat percentiles of named histograms for a llm_stat latency property, e.g.
+    {"first_token_latency_95": cumulative p95, "first_token_latency_window_95": p95 over the window}.
+    """
+    stats = {}
+    for name, histogram in histograms.items():
+        cumulative = histogram.percentiles(*percentiles)
+        windowed = histogram.percentiles(*percentiles, windowed=True)
+        for p, value, window_value in zip(percentiles, cumulative, windowed):
+            stats[f"{name}_{p}"] = value
+            stats[f"{name}_window_{p}"] = window_value
+    return stats
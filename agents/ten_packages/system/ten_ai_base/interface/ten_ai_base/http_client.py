@@ -0,0 +1,219 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+import random
+from typing import AsyncIterator
+
+import aiohttp
+from ten.async_ten_env import AsyncTenEnv
+
+RETRY_STATUSES = frozenset([429, 502, 503, 504])
+# Methods a server may run twice, failures after the request was sent are retried only for them
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "PUT", "DELETE", "TRACE"])
+# Failures before the request reached the server, safe to retry for any method
+CONNECT_ERRORS = (aiohttp.ClientConnectorError, aiohttp.ConnectionTimeoutError)
+
+
+@dataclass
+class HttpClientOptions:
+    total_timeout: float | None = 30.0
+    connect_timeout: float | None = 5.0
+    read_timeout: float | None = None
+    """Max wait between two reads, bounds streamed responses better than total_timeout."""
+
+    limit_per_host: int = 16
+    keepalive_timeout: float = 60.0
+    dns_cache_ttl: int = 300
+    retries: int = 2
+    """
+    Retries on RETRY_STATUSES and on failures to connect. Idempotent requests are also
+    retried on timeouts and connection errors after the request was sent.
+    """
+
+    retry_backoff: float = 0.2
+    """Base of the exponential backoff, the actual delay is drawn uniformly below it (full jitter)."""
+
+    retry_max_backoff: float = 2.0
+
+
+class HttpClient:
+    """
+    A keep-alive aiohttp session shared by every request to a vendor.
+
+    Connections are pooled per host and DNS lookups are cached, so only the first
+    request (or warmup) pays for TCP and TLS handshakes. Use get_http_client to get
+    the shared instance of a vendor instead of creating one per request, and
+    close_http_client to release it.
+    """
+
+    def __init__(self, name: str, options: HttpClientOptions | None = None):
+        self.name = name
+        self.options = options or HttpClientOptions()
+        self.session: aiohttp.ClientSession | None = None
+        self.references = 0
+
+        self.request_count = 0
+        self.retry_count = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.dns_cache_hits = 0
+        self.dns_cache_misses = 0
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit_per_host=self.options.limit_per_host,
+                ttl_dns_cache=self.options.dns_cache_ttl,
+                keepalive_timeout=self.options.keepalive_timeout,
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(
+                    total=self.options.total_timeout,
+                    connect=self.options.connect_timeout,
+                    sock_read=self.options.read_timeout,
+                ),
+                trace_configs=[self._trace_config()],
+            )
+        return self.session
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_connection_create_end(*_):
+            self.connections_created += 1
+
+        async def on_connection_reuseconn(*_):
+            self.connections_reused += 1
+
+        async def on_dns_cache_hit(*_):
+            self.dns_cache_hits += 1
+
+        async def on_dns_cache_miss(*_):
+            self.dns_cache_misses += 1
+
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace_config.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace_config.on_dns_cache_miss.append(on_dns_cache_miss)
+        return trace_config
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(
+            0,
+            min(
+                self.options.retry_max_backoff,
+                self.options.retry_backoff * (2 ** (attempt - 1)),
+            ),
+        )
+
+    @asynccontextmanager
+    async def request(
+        self, method: str, url: str, idempotent: bool | None = None, **kwargs
+    ) -> AsyncIterator[aiohttp.ClientResponse]:
+        """
+        Like aiohttp.ClientSession.request, retrying failures that happen before the response is used.
+
+        A timeout or a dropped connection may come after the server got the request, so
+        those are only retried when the request is idempotent: by default when its method
+        is, a POST the server deduplicates can opt in with idempotent=True.
+        """
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        retry_errors = (
+            (aiohttp.ClientConnectionError, asyncio.TimeoutError)
+            if idempotent
+            else CONNECT_ERRORS
+        )
+        session = self._get_session()
+        self.request_count += 1
+        attempt = 0
+        while True:
+            try:
+                response = await session.request(method, url, **kwargs)
+            except retry_errors:
+                if attempt >= self.options.retries:
+                    raise
+            else:
+                if (
+                    response.status not in RETRY_STATUSES
+                    or attempt >= self.options.retries
+                ):
+                    break
+                response.release()
+            attempt += 1
+            self.retry_count += 1
+            await asyncio.sleep(self._backoff(attempt))
+
+        try:
+            yield response
+        finally:
+            response.release()
+
+    def get(self, url: str, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    async def warmup(self, ten_env: AsyncTenEnv, url: str) -> None:
+        """Open a pooled connection to the host of url, e.g. at on_start, so the first turn skips the handshakes."""
+        try:
+            async with self._get_session().head(url, allow_redirects=False) as response:
+                ten_env.log_debug(f"{self.name} warmup {url}: {response.status}")
+        except Exception as e:
+            ten_env.log_warn(f"{self.name} warmup {url} failed: {e}")
+
+    def stats(self) -> dict:
+        """Counters showing how often connections and DNS lookups are reused."""
+        return {
+            "requests": self.request_count,
+            "retries": self.retry_count,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "dns_cache_hits": self.dns_cache_hits,
+            "dns_cache_misses": self.dns_cache_misses,
+        }
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+_clients: dict[tuple[str, asyncio.AbstractEventLoop], HttpClient] = {}
+
+
+def get_http_client(name: str, options: HttpClientOptions | None = None) -> HttpClient:
+    """
+    Return the shared client of a vendor on the running event loop, creating it with
+    options on first use. Extensions of the same vendor share connections, each call
+    takes a reference to release with close_http_client.
+    """
+    key = (name, asyncio.get_running_loop())
+    client = _clients.get(key)
+    if client is None:
+        client = HttpClient(name, options)
+        _clients[key] = client
+    client.references += 1
+    return client
+
+
+async def close_http_client(name: str) -> None:
+    """
+    Release a reference to the shared client of a vendor on the running event loop,
+    e.g. at on_stop. The client is closed once no extension uses it anymore.
+    """
+    key = (name, asyncio.get_running_loop())
+    client = _clients.get(key)
+    if client is None:
+        return
+    client.references -= 1
+    if client.references <= 0:
+        del _clients[key]
+        await client.close()
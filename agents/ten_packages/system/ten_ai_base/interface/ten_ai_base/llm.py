@@ -0,0 +1,319 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+from abc import ABC, abstractmethod
+import asyncio
+from contextvars import ContextVar
+import time
+import traceback
+from typing import TYPE_CHECKING
+
+from ten import (
+    AsyncExtension,
+    Data,
+)
+from ten.async_ten_env import AsyncTenEnv
+from ten.cmd import Cmd
+from ten.cmd_result import CmdResult, StatusCode
+from .const import (
+    CMD_EMBED,
+    CMD_PROPERTY_EMBED_INPUT,
+    CMD_PROPERTY_TOOL,
+    CMD_RESULT_PROPERTY_EMBEDDING_BUF,
+    CMD_TOOL_REGISTER,
+    DATA_OUT_NAME,
+    DATA_OUT_PROPERTY_END_OF_SEGMENT,
+    DATA_OUT_PROPERTY_TEXT,
+    DATA_SEMANTIC_CACHE_STAT_NAME,
+    CMD_CHAT_COMPLETION_CALL,
+    PROPERTY_VECTOR_FORMAT,
+    VECTOR_FORMAT_F32,
+)
+from .types import LLMCallCompletionArgs, LLMDataCompletionArgs, LLMToolMetadata
+from .helper import AsyncQueue
+from .trace import (
+    SPAN_ASR_FINAL,
+    SPAN_LLM_FIRST_SENTENCE,
+    TurnContext,
+    TurnTracer,
+    current_turn,
+)
+from .vectors import decode_vector
+import json
+
+if TYPE_CHECKING:
+    from .semantic_cache import SemanticCache
+
+# sentences sent by send_text_output during the turn, stored in the semantic cache after it
+_cache_recording: ContextVar[list | None] = ContextVar("cache_recording", default=None)
+
+
+class AsyncLLMBaseExtension(AsyncExtension, ABC):
+    """
+    Base class for implementing a Language Model Extension.
+    This class provides a basic implementation for processing chat completions.
+    It automatically handles the registration of tools and the processing of chat completions.
+    Use queue_input_item to queue input items for processing.
+    Use flush_input_items to flush the queue and cancel the current task.
+    Override on_call_chat_completion and on_data_chat_completion to implement the chat completion logic.
+    Call trace_input with the input data before queueing it, so the sentences sent for it are tagged
+    with its turn and self.tracer can record the latency spans of the turn.
+    Set self.semantic_cache to answer a user utterance close enough to a previous one of the same
+    system prompt (semantic_cache_prompt) and tools from the cache instead of the LLM. Only turns
+    without chat history (semantic_cache_has_history) are cached.
+    The input queue is unbounded unless the `queue_max_size` property is set, `queue_overflow`
+    then chooses between blocking the producer (block), dropping the oldest queued item
+    (drop_oldest) or the new one (drop_newest).
+    """
+
+    # Create the queue for message processing
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.queue = AsyncQueue()
+        self.available_tools: list[LLMToolMetadata] = []
+        self.available_tools_lock = asyncio.Lock()  # Lock to ensure thread-safe access
+        self.current_task = None
+        self.hit_default_cmd = False
+        self.loop_task = None
+        self.loop = None
+        self.tracer = TurnTracer()
+        self.semantic_cache: "SemanticCache | None" = None
+
+    async def on_init(self, async_ten_env: AsyncTenEnv) -> None:
+        await super().on_init(async_ten_env)
+
+    async def on_start(self, async_ten_env: AsyncTenEnv) -> None:
+        await super().on_start(async_ten_env)
+        await self.queue.configure(async_ten_env)
+
+        if self.loop_task is None:
+            self.loop = asyncio.get_event_loop()
+            self.loop_task = self.loop.create_task(self._process_queue(async_ten_env))
+
+    async def on_stop(self, async_ten_env: AsyncTenEnv) -> None:
+        await super().on_stop(async_ten_env)
+        # the stop marker must get in even if the queue is full
+        self.queue.maxsize = 0
+        await self.queue.put(None)
+
+    async def on_deinit(self, async_ten_env: AsyncTenEnv) -> None:
+        await super().on_deinit(async_ten_env)
+
+    async def on_cmd(self, async_ten_env: AsyncTenEnv, cmd: Cmd) -> None:
+        """
+        handle default commands
+        return True if the command is handled, False otherwise
+        """
+        cmd_name = cmd.get_name()
+        async_ten_env.log_debug(f"on_cmd name {cmd_name}")
+        if cmd_name == CMD_TOOL_REGISTER:
+            try:
+                tool_metadata_json = cmd.get_property_to_json(CMD_PROPERTY_TOOL)
+                async_ten_env.log_info(f"register tool: {tool_metadata_json}")
+                tool_metadata = LLMToolMetadata.model_validate_json(tool_metadata_json)
+                async with self.available_tools_lock:
+                    self.available_tools.append(tool_metadata)
+                await self.on_tools_update(async_ten_env, tool_metadata)
+                await async_ten_env.return_result(CmdResult.create(StatusCode.OK), cmd)
+            except Exception:
+                async_ten_env.log_warn(f"on_cmd failed: {traceback.format_exc()}")
+                await async_ten_env.return_result(
+                    CmdResult.create(StatusCode.ERROR), cmd
+                )
+        elif cmd_name == CMD_CHAT_COMPLETION_CALL:
+            try:
+                args = json.loads(cmd.get_property_to_json("arguments"))
+                response = await self.on_call_chat_completion(async_ten_env, **args)
+                cmd_result = CmdResult.create(StatusCode.OK)
+                cmd_result.set_property_from_json("response", response)
+                await async_ten_env.return_result(cmd_result, cmd)
+            except Exception as err:
+                async_ten_env.log_warn(f"on_cmd failed: {err}")
+                await async_ten_env.return_result(
+                    CmdResult.create(StatusCode.ERROR), cmd
+                )
+
+    def trace_input(self, data: Data) -> TurnContext:
+        """Make the turn of an input data (a new one if the ASR did not tag it) the current turn."""
+        turn = TurnContext.from_msg(data) or TurnContext.begin()
+        current_turn.set(turn)
+        self.tracer.span(SPAN_ASR_FINAL, turn)
+        return turn
+
+    async def queue_input_item(
+        self, prepend: bool = False, **kargs: LLMDataCompletionArgs
+    ):
+        """
+        Queues an input item for processing, prepend puts it ahead of normal items, e.g. tool results.
+        Returns False if the item was dropped because the queue is full.
+        """
+        return await self.queue.put((kargs, current_turn.get()), prepend)
+
+    async def flush_input_items(self, async_ten_env: AsyncTenEnv):
+        """Flushes the self.queue and cancels the current task."""
+        async_ten_env.log_debug(f"queue stats before flush: {self.queue.stats()}")
+        # Flush the queue using the new flush method
+        await self.queue.flush()
+
+        # Cancel the current task if one is running
+        if self.current_task:
+            async_ten_env.log_info("Cancelling the current task during flush.")
+            self.current_task.cancel()
+
+    def send_text_output(
+        self, async_ten_env: AsyncTenEnv, sentence: str, end_of_segment: bool
+    ):
+        try:
+            output_data = Data.create(DATA_OUT_NAME)
+            output_data.set_property_string(DATA_OUT_PROPERTY_TEXT, sentence)
+            output_data.set_property_bool(
+                DATA_OUT_PROPERTY_END_OF_SEGMENT, end_of_segment
+            )
+            recording = _cache_recording.get()
+            if recording is not None:
+                recording.append((sentence, end_of_segment))
+            turn = current_turn.get()
+            if turn:
+                turn.to_msg(output_data)
+                if sentence:
+                    self.tracer.span(SPAN_LLM_FIRST_SENTENCE, turn)
+            asyncio.create_task(async_ten_env.send_data(output_data))
+            async_ten_env.log_info(
+                f"{'end of segment ' if end_of_segment else ''}sent sentence [{sentence}]"
+            )
+        except Exception as err:
+            async_ten_env.log_warn(f"send sentence [{sentence}] failed, err: {err}")
+
+    def semantic_cache_prompt(self) -> str:
+        """The system prompt of the turns, answers are only reused for the same prompt and tools."""
+        return ""
+
+    async def on_semantic_cache_hit(
+        self, async_ten_env: AsyncTenEnv, messages: list, answer: str
+    ) -> None:
+        """Called after the cached answer to messages was sent, e.g. to append both to the chat memory."""
+
+    def semantic_cache_has_history(self) -> bool:
+        """
+        Whether the turn is answered with earlier turns of the chat. The cache is skipped
+        then, the answer to follow-ups like "yes" or "tell me more" depends on them.
+        """
+        return False
+
+    def no_semantic_cache(self) -> None:
+        """Do not cache the answer of the current turn, e.g. it depends on tool results."""
+        _cache_recording.set(None)
+
+    @abstractmethod
+    async def on_call_chat_completion(
+        self, async_ten_env: AsyncTenEnv, **kargs: LLMCallCompletionArgs
+    ) -> any:
+        """Called when a chat completion is requested by cmd call. Implement this method to process the chat completion."""
+
+    @abstractmethod
+    async def on_data_chat_completion(
+        self, async_ten_env: AsyncTenEnv, **kargs: LLMDataCompletionArgs
+    ) -> None:
+        """
+        Called when a chat completion is requested by data input. Implement this method to process the chat completion.
+        Note that this method is stream-based, and it should consider supporting local context caching.
+        """
+
+    @abstractmethod
+    async def on_tools_update(
+        self, async_ten_env: AsyncTenEnv, tool: LLMToolMetadata
+    ) -> None:
+        """Called when a new tool is registered. Implement this method to process the new tool."""
+
+    async def _process_queue(self, async_ten_env: AsyncTenEnv):
+        """Asynchronously process queue items one by one."""
+        while True:
+            # Wait for an item to be available in the queue
+            item = await self.queue.get()
+            if item is None:
+                break  # stopped
+            args, turn = item
+            try:
+                async_ten_env.log_info(f"Processing queue item: {args}")
+                # The task runs in a copy of the context, with the turn of the item
+                current_turn.set(turn)
+                self.current_task = asyncio.create_task(
+                    self._complete_with_semantic_cache(async_ten_env, args)
+                    if self.semantic_cache
+                    else self.on_data_chat_completion(async_ten_env, **args)
+                )
+                await self.current_task  # Wait for the current task to finish or be cancelled
+            except asyncio.CancelledError:
+                async_ten_env.log_info(f"Task cancelled: {args}")
+            except Exception:
+                async_ten_env.log_error(f"Task failed: {args}, err: {traceback.format_exc()}")
+
+    async def _embed_utterance(self, async_ten_env: AsyncTenEnv, text: str) -> list[float]:
+        cmd = Cmd.create(CMD_EMBED)
+        cmd.set_property_string(CMD_PROPERTY_EMBED_INPUT, text)
+        cmd.set_property_string(PROPERTY_VECTOR_FORMAT, VECTOR_FORMAT_F32)
+        [result, err] = await async_ten_env.send_cmd(cmd)
+        if err is not None or result.get_status_code() != StatusCode.OK:
+            raise RuntimeError(f"embed failed, err: {err}")
+        return decode_vector(result.get_property_buf(CMD_RESULT_PROPERTY_EMBEDDING_BUF))
+
+    async def _complete_with_semantic_cache(self, async_ten_env: AsyncTenEnv, args: dict):
+        """
+        Replay the cached answer of a single user utterance, or complete it with the LLM
+        and cache the sentences sent for it.
+        """
+        from .semantic_cache import cache_scope
+
+        cache = self.semantic_cache
+        messages = args.get("messages") or []
+        utterance = messages[0].get("content") if len(messages) == 1 else None
+        if messages and (messages[0].get("role") != "user" or not isinstance(utterance, str)):
+            utterance = None
+        if not utterance or self.semantic_cache_has_history():
+            await self.on_data_chat_completion(async_ten_env, **args)
+            return
+
+        async with self.available_tools_lock:
+            scope = cache_scope(self.semantic_cache_prompt(), self.available_tools)
+        vector = None
+        start = time.perf_counter()
+        try:
+            vector = await asyncio.wait_for(
+                self._embed_utterance(async_ten_env, utterance),
+                cache.lookup_timeout_ms / 1000,
+            )
+            answer = cache.lookup(scope, vector)
+        except Exception as err:
+            # the LLM answers, the cache must never fail a turn
+            async_ten_env.log_warn(f"semantic cache lookup failed, err: {err}")
+            cache.record_error()
+            answer = None
+        cache.record_lookup_time((time.perf_counter() - start) * 1000)
+        self._send_semantic_cache_stat(async_ten_env)
+
+        if answer:
+            async_ten_env.log_info(
+                f"semantic cache hit for [{utterance}]: [{answer.utterance}], hits {answer.hits}"
+            )
+            for sentence, end_of_segment in answer.sentences:
+                self.send_text_output(async_ten_env, sentence, end_of_segment)
+            await self.on_semantic_cache_hit(async_ten_env, messages, answer.text)
+            return
+
+        recording = []
+        _cache_recording.set(recording)
+        await self.on_data_chat_completion(async_ten_env, **args)
+        # reset by no_semantic_cache, not stored either when cancelled or failed
+        if vector is not None and _cache_recording.get() is recording and recording:
+            cache.put(scope, utterance, vector, recording)
+
+    def _send_semantic_cache_stat(self, async_ten_env: AsyncTenEnv) -> None:
+        try:
+            data = Data.create(DATA_SEMANTIC_CACHE_STAT_NAME)
+            data.set_property_from_json("stat", json.dumps(self.semantic_cache.stats()))
+            asyncio.create_task(async_ten_env.send_data(data))
+        except Exception as err:
+            async_ten_env.log_warn(f"send semantic cache stat failed, err: {err}")
@@ -0,0 +1,183 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+from dataclasses import dataclass, field
+import hashlib
+import json
+import threading
+import time
+from typing import Sequence
+
+import numpy as np
+
+from .histogram import WindowedHistogram, latency_stats
+from .types import LLMToolMetadata
+
+
+def cache_scope(system_prompt: str, tools: Sequence[LLMToolMetadata]) -> str:
+    """
+    Answers are only shared by turns of the same scope: the same system prompt and the
+    same registered tools, whatever their registration order.
+    """
+    payload = json.dumps(
+        {
+            "prompt": system_prompt,
+            "tools": sorted(json.dumps(tool.model_dump(), sort_keys=True) for tool in tools),
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CachedAnswer:
+    utterance: str
+    # (sentence, end_of_segment) as sent by send_text_output
+    sentences: list[tuple[str, bool]]
+    created_at: float
+    last_hit_at: float
+    hits: int = 0
+
+    @property
+    def text(self) -> str:
+        return "".join(sentence for sentence, _ in self.sentences)
+
+
+@dataclass
+class _Scope:
+    answers: list[CachedAnswer] = field(default_factory=list)
+    # normalized embeddings of the utterances, row i for answers[i]
+    vectors: np.ndarray = None
+
+
+class SemanticCache:
+    """
+    Answers of the LLM keyed by the embedding of the user utterance. A lookup returns
+    the answer of the most similar cached utterance of the scope when their cosine
+    similarity reaches threshold and the answer is younger than ttl_seconds. Past
+    max_entries, the least recently used answers are evicted.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.92,
+        ttl_seconds: float = 3600,
+        max_entries: int = 10000,
+        lookup_timeout_ms: int = 300,
+    ):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # the turn goes to the LLM if the utterance embedding takes longer
+        self.lookup_timeout_ms = lookup_timeout_ms
+        self.lock = threading.Lock()
+        self.scopes: dict[str, _Scope] = {}
+        self.entries = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.evictions = 0
+        self.lookup_times = WindowedHistogram()
+
+    def _remove(self, scope: _Scope, keep: np.ndarray) -> None:
+        self.entries -= len(scope.answers) - int(keep.sum())
+        scope.answers = [a for a, k in zip(scope.answers, keep) if k]
+        scope.vectors = scope.vectors[keep]
+
+    def lookup(
+        self, scope_key: str, vector: Sequence[float], now: float | None = None
+    ) -> CachedAnswer | None:
+        now = time.time() if now is None else now
+        query = _normalize(vector)
+        with self.lock:
+            scope = self.scopes.get(scope_key)
+            if scope is not None and scope.answers:
+                expired = np.array(
+                    [now - a.created_at > self.ttl_seconds for a in scope.answers]
+                )
+                if expired.any():
+                    self._remove(scope, ~expired)
+            if scope is None or not scope.answers or scope.vectors.shape[1] != len(query):
+                self.misses += 1
+                return None
+            scores = scope.vectors @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+            answer = scope.answers[best]
+            answer.hits += 1
+            answer.last_hit_at = now
+            self.hits += 1
+            return answer
+
+    def put(
+        self,
+        scope_key: str,
+        utterance: str,
+        vector: Sequence[float],
+        sentences: list[tuple[str, bool]],
+        now: float | None = None,
+    ) -> None:
+        now = time.time() if now is None else now
+        row = _normalize(vector)[None, :]
+        with self.lock:
+            scope = self.scopes.setdefault(scope_key, _Scope())
+            if scope.vectors is None or scope.vectors.shape[1] != row.shape[1]:
+                self.entries -= len(scope.answers)
+                scope.answers, scope.vectors = [], np.empty((0, row.shape[1]), np.float32)
+            scope.answers.append(CachedAnswer(utterance, list(sentences), now, now))
+            scope.vectors = np.concatenate([scope.vectors, row])
+            self.entries += 1
+            if self.entries > self.max_entries:
+                self._evict()
+
+    def _evict(self) -> None:
+        # drop the least recently used tenth, amortizing the copies of the vectors
+        count = max(self.entries - self.max_entries, self.max_entries // 10, 1)
+        ages = sorted(
+            (a.last_hit_at, key, i)
+            for key, scope in self.scopes.items()
+            for i, a in enumerate(scope.answers)
+        )
+        evicted: dict[str, list[int]] = {}
+        for _, key, i in ages[:count]:
+            evicted.setdefault(key, []).append(i)
+        for key, indexes in evicted.items():
+            scope = self.scopes[key]
+            keep = np.ones(len(scope.answers), dtype=bool)
+            keep[indexes] = False
+            self._remove(scope, keep)
+        self.evictions += count
+
+    def record_lookup_time(self, ms: float) -> None:
+        self.lookup_times.record(ms)
+
+    def record_error(self) -> None:
+        with self.lock:
+            self.errors += 1
+
+    def stats(self) -> dict:
+        """Hit rate and counters, for a semantic_cache_stat data message."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "errors": self.errors,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": self.entries,
+                "evictions": self.evictions,
+            }
+        if self.lookup_times.count:
+            stats.update(latency_stats({"lookup_latency": self.lookup_times}, (50, 95)))
+        return stats
+
+
+def _normalize(vector: Sequence[float]) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
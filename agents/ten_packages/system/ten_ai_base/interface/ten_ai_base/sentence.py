@@ -0,0 +1,171 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+import re
+from typing import Optional
+
+# Characters that may end a sentence.
+_BOUNDARIES = frozenset(".,!?;…\n。，、！？；")
+_BOUNDARY_RE = re.compile(r"[.,!?;…\n。，、！？；]")
+
+# Boundaries where a sentence shorter than min_length keeps growing instead.
+_SOFT_BOUNDARIES = frozenset(",;、，；")
+
+# Trailing characters kept with the sentence they close.
+_CLOSERS = frozenset("\"'”’」』）)]】》!?！？。…")
+
+# Letters, digits and CJK, but not underscore.
+_ALNUM_RE = re.compile(r"[^\W_]")
+
+_ABBREVIATIONS = frozenset(
+    ["mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "vs", "fig", "approx"]
+)
+
+
+class SentenceSegmenter:
+    """
+    Incrementally splits streamed LLM output into sentences for TTS.
+
+    Text is scanned once: the unfinished fragment and the position scanning stopped
+    at are kept across push calls. Decimals ("3.14", "1,000"), ellipses ("..."), initials
+    ("J. Smith") and common abbreviations ("Mr.", "e.g.", "No. 5") do not end a sentence.
+    A "." or "," at the very end of a delta is held until the next delta tells which case
+    it is.
+
+    min_length: sentences shorter than this keep growing past soft boundaries (commas).
+    max_length: fragments longer than this are cut at the last space (or hard for CJK)
+        even without punctuation, so long clauses reach TTS earlier. 0 disables it.
+
+    Segments without any letter or digit are dropped, like the parse_sentences
+    helpers this replaces.
+    """
+
+    def __init__(self, min_length: int = 0, max_length: int = 0):
+        self.min_length = min_length
+        self.max_length = max_length
+        self._fragment = ""
+        self._scan = 0
+
+    @property
+    def fragment(self) -> str:
+        """The text received since the last complete sentence."""
+        return self._fragment
+
+    def push(self, content: str) -> list[str]:
+        """Add a delta of streamed text and return the sentences it completed."""
+        if self._scan == len(self._fragment) and _BOUNDARIES.isdisjoint(content):
+            # Nothing to decide, most deltas are a word or two
+            self._fragment += content
+            self._scan = len(self._fragment)
+            if not self.max_length or self._scan <= self.max_length:
+                return []
+            text = self._fragment
+        else:
+            text = self._fragment + content if self._fragment else content
+        length = len(text)
+        sentences = []
+        start = 0
+        scan = self._scan
+        deferred = False
+
+        for m in _BOUNDARY_RE.finditer(text, scan):
+            i = m.start()
+            if i < start:
+                continue  # absorbed as a closer of the previous sentence
+
+            ch = text[i]
+            scan = i + 1
+            end = i + 1
+            if ch == "." or ch == ",":
+                if end == length:
+                    deferred = True  # decide once the next character arrives
+                    scan = i
+                    break
+                boundary = self._is_boundary(text, start, i)
+                if boundary is None:
+                    deferred = True
+                    scan = i
+                    break
+                if not boundary:
+                    continue
+
+            while end < length and text[end] in _CLOSERS:
+                end += 1
+
+            if (
+                self.min_length
+                and ch in _SOFT_BOUNDARIES
+                and len(text[start:end].strip()) < self.min_length
+            ):
+                continue
+
+            self._append(sentences, text[start:end])
+            start = end
+            scan = end
+
+        if not deferred:
+            scan = length
+
+        if self.max_length:
+            while length - start > self.max_length:
+                limit = start + self.max_length
+                cut = text.rfind(" ", start + 1, limit) + 1 or limit
+                self._append(sentences, text[start:cut])
+                start = cut
+                scan = max(scan, start)
+
+        self._fragment = text[start:]
+        self._scan = max(scan - start, 0)
+        return sentences
+
+    def flush(self) -> str:
+        """Return the unfinished fragment, e.g. at the end of a response, and reset."""
+        fragment = self._fragment
+        self.reset()
+        return fragment
+
+    def reset(self) -> None:
+        self._fragment = ""
+        self._scan = 0
+
+    @staticmethod
+    def _append(sentences: list[str], sentence: str) -> None:
+        if _ALNUM_RE.search(sentence):
+            sentences.append(sentence)
+
+    @staticmethod
+    def _is_boundary(text: str, start: int, i: int) -> Optional[bool]:
+        """
+        Whether the "." or "," at i, which is not the last character, ends a sentence,
+        None if that depends on text not received yet.
+        """
+        ch = text[i]
+        prev = text[i - 1] if i > start else ""
+        nxt = text[i + 1]
+
+        if prev.isdigit() and nxt.isdigit():
+            return False  # decimal or thousands separator
+        if ch == ",":
+            return True
+        if nxt == ".":
+            return False  # ellipsis, the last dot decides
+
+        j = i
+        while j > start and i - j < 6 and text[j - 1].isascii() and text[j - 1].isalpha():
+            j -= 1
+        word = text[j:i]
+        if not word or word == "I" or (j > start and text[j - 1].isalnum()):
+            return True
+        if len(word) == 1:
+            if j > start and text[j - 1] == ".":
+                return False  # dotted abbreviation, "e.g.", "U.S."
+            # Initials ("J. Smith", "John F. Kennedy") go on, "plan B." ends the sentence
+            before = text[start:j].split()
+            return bool(before) and not before[-1][0].isupper() and before[-1][-1] != "."
+        if word.lower() == "no":
+            # "No. 5", but "I said no."
+            after = text[i + 1 : i + 3].lstrip()
+            return not after[0].isdigit() if after else None
+        return word.lower() not in _ABBREVIATIONS
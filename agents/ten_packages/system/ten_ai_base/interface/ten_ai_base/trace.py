@@ -0,0 +1,133 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+from contextvars import ContextVar
+from dataclasses import dataclass
+import json
+import threading
+import time
+import uuid
+
+from ten import Data
+from .const import DATA_LATENCY_STAT_NAME, PROPERTY_TURN_ID, PROPERTY_TURN_START_MS
+from .histogram import Histogram
+
+# Spans of a turn, in pipeline order. Each one is the latency in ms from the moment the
+# ASR emitted the final transcript of the user turn.
+SPAN_ASR_FINAL = "asr_final"  # the final transcript reached the LLM extension
+SPAN_LLM_FIRST_TOKEN = "llm_first_token"
+SPAN_LLM_FIRST_SENTENCE = "llm_first_sentence"
+SPAN_TTS_FIRST_BYTE = "tts_first_byte"
+SPAN_AUDIO_FIRST_FRAME = "audio_first_frame"  # the first pcm_frame of the answer was sent
+
+SPANS = [
+    SPAN_ASR_FINAL,
+    SPAN_LLM_FIRST_TOKEN,
+    SPAN_LLM_FIRST_SENTENCE,
+    SPAN_TTS_FIRST_BYTE,
+    SPAN_AUDIO_FIRST_FRAME,
+]
+
+
+@dataclass
+class TurnContext:
+    """Identifies a user turn, carried by the turn_id and turn_start_ms properties of text_data and pcm_frame."""
+
+    turn_id: str
+    start_ms: int
+
+    @classmethod
+    def begin(cls) -> "TurnContext":
+        return cls(uuid.uuid4().hex, int(time.time() * 1000))
+
+    @classmethod
+    def from_msg(cls, msg) -> "TurnContext | None":
+        """The turn a received message belongs to, None if it is not tagged."""
+        try:
+            turn_id = msg.get_property_string(PROPERTY_TURN_ID)
+            start_ms = msg.get_property_int(PROPERTY_TURN_START_MS)
+        except Exception:
+            return None
+        return cls(turn_id, start_ms) if turn_id else None
+
+    def to_msg(self, msg) -> None:
+        """Tag a message (text_data, pcm_frame...) sent for this turn."""
+        msg.set_property_string(PROPERTY_TURN_ID, self.turn_id)
+        msg.set_property_int(PROPERTY_TURN_START_MS, self.start_ms)
+
+    def elapsed_ms(self) -> int:
+        return int(time.time() * 1000) - self.start_ms
+
+
+# The turn the current task works on, set when an input of the turn is received.
+current_turn: ContextVar[TurnContext | None] = ContextVar("current_turn", default=None)
+
+
+class TurnTracer:
+    """
+    Records the spans of the turns seen by one extension into the process wide latency
+    histograms. Only the first occurrence of a span in a turn is recorded, so it can be
+    called for every token, sentence or frame.
+    """
+
+    def __init__(self):
+        self.turn_id = ""
+        self.spans: set[str] = set()
+
+    def span(self, name: str, turn: TurnContext | None = None) -> int | None:
+        """Record span name of turn (default: current_turn), return its latency in ms if it was recorded."""
+        turn = turn or current_turn.get()
+        if turn is None:
+            return None
+        if turn.turn_id != self.turn_id:
+            self.turn_id = turn.turn_id
+            self.spans = set()
+        if name in self.spans:
+            return None
+        self.spans.add(name)
+
+        elapsed = turn.elapsed_ms()
+        record_latency(name, elapsed)
+        return elapsed
+
+
+# Extensions run on their own threads, the histograms are shared by all of them.
+_histograms: dict[str, Histogram] = {}
+_histograms_lock = threading.Lock()
+
+
+def record_latency(name: str, latency_ms: float) -> None:
+    with _histograms_lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.record(latency_ms)
+
+
+def _span_order(name: str) -> int:
+    return SPANS.index(name) if name in SPANS else len(SPANS)
+
+
+def latency_percentiles() -> dict[str, dict]:
+    """p50/p95/p99 and count of every recorded span."""
+    with _histograms_lock:
+        stats = {}
+        for name in sorted(_histograms, key=_span_order):
+            histogram = _histograms[name]
+            p50, p95, p99 = histogram.percentiles(50, 95, 99)
+            stats[name] = {
+                "p50": round(p50, 1),
+                "p95": round(p95, 1),
+                "p99": round(p99, 1),
+                "count": histogram.count,
+            }
+        return stats
+
+
+def create_latency_stat_data() -> Data:
+    """A latency_stat data message with the latency percentiles, like llm_stat does for usage."""
+    data = Data.create(DATA_LATENCY_STAT_NAME)
+    data.set_property_from_json("latency", json.dumps(latency_percentiles()))
+    return data
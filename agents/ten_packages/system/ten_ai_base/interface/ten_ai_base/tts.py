@@ -0,0 +1,339 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+from abc import ABC, abstractmethod
+import asyncio
+from collections import deque
+from contextvars import ContextVar
+import time
+import traceback
+
+from ten import (
+    AsyncExtension,
+    Data,
+)
+from ten.async_ten_env import AsyncTenEnv
+from ten.cmd import Cmd
+from ten.cmd_result import CmdResult, StatusCode
+from ten_ai_base.const import (
+    CMD_IN_FLUSH,
+    CMD_OUT_FLUSH,
+    DATA_IN_PROPERTY_END_OF_SEGMENT,
+    DATA_IN_PROPERTY_TEXT,
+    PROPERTY_TTS_PIPELINE_DEPTH,
+)
+from ten_ai_base.types import TTSPcmOptions, TTSSentenceMetrics
+from .audio import PcmFrameEmitter
+from .helper import AsyncQueue, PCMWriter, get_property_bool, get_property_string
+from .trace import (
+    SPAN_AUDIO_FIRST_FRAME,
+    SPAN_TTS_FIRST_BYTE,
+    TurnContext,
+    TurnTracer,
+    create_latency_stat_data,
+)
+
+
+class _TTSSentence:
+    """A queued sentence being synthesized, with the audio it produced while not at the head of the pipeline."""
+
+    def __init__(
+        self,
+        text: str,
+        end_of_segment: bool,
+        queued_at: float,
+        turn: TurnContext | None,
+    ):
+        self.text = text
+        self.end_of_segment = end_of_segment
+        self.queued_at = queued_at
+        self.turn = turn
+        self.started_at = 0.0
+        self.first_byte_at = 0.0
+        self.in_flight = 0
+        self.chunks: deque = deque()
+        self.released = False  # audio can go straight out, all earlier sentences are done
+        self.done = False
+        self.task: asyncio.Task | None = None
+
+
+# The sentence the current on_request_tts task is synthesizing, None outside the pipeline.
+_current_sentence: ContextVar[_TTSSentence | None] = ContextVar(
+    "tts_current_sentence", default=None
+)
+
+
+class AsyncTTSBaseExtension(AsyncExtension, ABC):
+    """
+    Base class for implementing a Text-to-Speech Extension.
+    This class provides a basic implementation for converting text to speech.
+    It automatically handles the processing of tts requests.
+    Use send_audio_out to send the audio data to the output, it is cut into fixed duration frames
+    and the tail is sent when on_request_tts returns, or by calling end_send_audio_out.
+    Override on_request_tts to implement the TTS logic.
+
+    By default sentences are synthesized one by one. Set the `pipeline_depth` property
+    (or self.pipeline_depth before on_start) to let up to that many on_request_tts calls
+    run concurrently; audio is reordered so it still leaves send_audio_out in sentence order.
+    Only enable it for vendors whose client supports concurrent requests.
+
+    The sentence queue is unbounded unless the `queue_max_size` property is set,
+    `queue_overflow` then chooses between blocking on_data (block), dropping the oldest
+    queued sentence (drop_oldest) or the new one (drop_newest).
+
+    Audio frames of a sentence carry the turn of its text_data. When the first frame of a
+    turn is sent, a latency_stat data with the turn latency percentiles is sent too.
+    """
+
+    # Create the queue for message processing
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.queue = AsyncQueue()
+        self.current_task = None
+        self.loop_task = None
+        self.audio_emitter = PcmFrameEmitter()
+        self.pipeline_depth = 1
+        self.pipeline: deque[_TTSSentence] = deque()
+        self.pipeline_slots: asyncio.Semaphore | None = None
+        self.pipeline_lock = asyncio.Lock()
+        self.generation = 0
+        self.tracer = TurnTracer()
+
+    async def on_init(self, ten_env: AsyncTenEnv) -> None:
+        await super().on_init(ten_env)
+
+    async def on_start(self, ten_env: AsyncTenEnv) -> None:
+        await super().on_start(ten_env)
+
+        try:
+            depth = await ten_env.get_property_int(PROPERTY_TTS_PIPELINE_DEPTH)
+            if depth > 0:
+                self.pipeline_depth = depth
+        except Exception:
+            pass
+        self.pipeline_slots = asyncio.Semaphore(self.pipeline_depth)
+        await self.queue.configure(ten_env)
+
+        if self.loop_task is None:
+            self.loop = asyncio.get_event_loop()
+            self.loop_task = self.loop.create_task(self._process_queue(ten_env))
+
+    async def on_stop(self, ten_env: AsyncTenEnv) -> None:
+        await super().on_stop(ten_env)
+        self.loop_task.cancel()
+
+    async def on_deinit(self, ten_env: AsyncTenEnv) -> None:
+        await super().on_deinit(ten_env)
+
+    async def on_cmd(self, async_ten_env: AsyncTenEnv, cmd: Cmd) -> None:
+        cmd_name = cmd.get_name()
+        async_ten_env.log_info(f"on_cmd name: {cmd_name}")
+
+        if cmd_name == CMD_IN_FLUSH:
+            await self.on_cancel_tts(async_ten_env)
+            await self.flush_input_items(async_ten_env)
+            await async_ten_env.send_cmd(Cmd.create(CMD_OUT_FLUSH))
+            async_ten_env.log_info("on_cmd sent flush")
+            status_code, detail = StatusCode.OK, "success"
+            cmd_result = CmdResult.create(status_code)
+            cmd_result.set_property_string("detail", detail)
+            await async_ten_env.return_result(cmd_result, cmd)
+
+    async def on_data(self, async_ten_env: AsyncTenEnv, data: Data) -> None:
+        # Get the necessary properties
+        async_ten_env.log_info(f"on_data name: {data.get_name()}")
+        input_text = get_property_string(data, DATA_IN_PROPERTY_TEXT)
+        end_of_segment = get_property_bool(data, DATA_IN_PROPERTY_END_OF_SEGMENT)
+
+        if not input_text:
+            async_ten_env.log_warn("ignore empty text")
+            return
+
+        # Start an asynchronous task for handling tts
+        if not await self.queue.put(
+            [input_text, end_of_segment, time.time(), TurnContext.from_msg(data)]
+        ):
+            async_ten_env.log_warn(f"queue full, sentence dropped: {input_text}")
+
+    def queue_depth(self) -> int:
+        """Number of sentences waiting for or in synthesis."""
+        return len(self.queue) + len(self.pipeline)
+
+    async def flush_input_items(self, ten_env: AsyncTenEnv):
+        """Flushes the self.queue and cancels every in-flight task."""
+        # Anything already taken from the queue but not started yet is dropped by generation
+        self.generation += 1
+
+        ten_env.log_debug(f"queue stats before flush: {self.queue.stats()}")
+        # Flush the queue using the new flush method
+        await self.queue.flush()
+
+        # Cancel the running tasks and drop the audio they buffered
+        pipeline, self.pipeline = self.pipeline, deque()
+        for sentence in pipeline:
+            sentence.chunks.clear()
+            if sentence.task and not sentence.task.done():
+                ten_env.log_info(f"Cancelling the task during flush: {sentence.text}")
+                sentence.task.cancel()
+        self.audio_emitter.reset()
+
+    async def send_audio_out(
+        self, ten_env: AsyncTenEnv, audio_data: bytes, **args: TTSPcmOptions
+    ) -> None:
+        """
+        Send audio out. Called from on_request_tts, audio of a sentence is held back
+        until all sentences queued before it have been sent.
+        """
+        sentence = _current_sentence.get()
+        if sentence is None:
+            # No sentence boundary to wait for, send everything right away
+            await self._send_pcm(ten_env, audio_data, None, **args)
+            await self.end_send_audio_out(ten_env)
+            return
+
+        if not sentence.first_byte_at:
+            sentence.first_byte_at = time.time()
+            if sentence.turn:
+                self.tracer.span(SPAN_TTS_FIRST_BYTE, sentence.turn)
+        if self.pipeline and self.pipeline[0] is sentence and sentence.released:
+            await self._send_pcm(ten_env, audio_data, sentence.turn, **args)
+        elif sentence in self.pipeline:
+            sentence.chunks.append((audio_data, args))
+
+    async def end_send_audio_out(self, ten_env: AsyncTenEnv) -> None:
+        """Send out the audio still held back to fill a frame."""
+        try:
+            await self.audio_emitter.flush(ten_env)
+        except Exception:
+            ten_env.log_error(f"error send audio frame, {traceback.format_exc()}")
+
+    async def _send_pcm(
+        self,
+        ten_env: AsyncTenEnv,
+        audio_data: bytes,
+        turn: TurnContext | None,
+        **args: TTSPcmOptions,
+    ) -> None:
+        sample_rate = args.get("sample_rate", 16000)
+        bytes_per_sample = args.get("bytes_per_sample", 2)
+        number_of_channels = args.get("number_of_channels", 1)
+        try:
+            await self.audio_emitter.set_format(
+                ten_env, sample_rate, bytes_per_sample, number_of_channels
+            )
+            self.audio_emitter.turn = turn
+            frames_out = self.audio_emitter.frames_out
+            await self.audio_emitter.push(ten_env, audio_data)
+        except Exception:
+            ten_env.log_error(f"error send audio frame, {traceback.format_exc()}")
+            return
+
+        if turn and self.audio_emitter.frames_out > frames_out:
+            if self.tracer.span(SPAN_AUDIO_FIRST_FRAME, turn) is not None:
+                asyncio.create_task(ten_env.send_data(create_latency_stat_data()))
+
+    @abstractmethod
+    async def on_request_tts(
+        self, ten_env: AsyncTenEnv, input_text: str, end_of_segment: bool
+    ) -> None:
+        """
+        Called when a new input item is available in the queue. Override this method to implement the TTS request logic.
+        Use send_audio_out to send the audio data to the output when the audio data is ready.
+        """
+        pass
+
+    @abstractmethod
+    async def on_cancel_tts(self, ten_env: AsyncTenEnv) -> None:
+        """Called when the TTS request is cancelled."""
+        pass
+
+    async def on_tts_metrics(
+        self, ten_env: AsyncTenEnv, metrics: TTSSentenceMetrics
+    ) -> None:
+        """Called after each sentence is synthesized. Override to export the metrics."""
+        ten_env.log_info(f"tts metrics: {metrics.model_dump_json()}")
+
+    async def _process_queue(self, ten_env: AsyncTenEnv):
+        """Asynchronously process queue items, at most pipeline_depth at a time."""
+        while True:
+            # Wait for an item to be available in the queue
+            [text, end_of_segment, queued_at, turn] = await self.queue.get()
+            generation = self.generation
+
+            # Wait for a free slot, the item is stale if a flush happened meanwhile
+            await self.pipeline_slots.acquire()
+            if generation != self.generation:
+                self.pipeline_slots.release()
+                continue
+
+            sentence = _TTSSentence(text, end_of_segment, queued_at, turn)
+            sentence.released = not self.pipeline
+            self.pipeline.append(sentence)
+            sentence.task = asyncio.create_task(self._request_tts(ten_env, sentence))
+            self.current_task = sentence.task
+
+    async def _request_tts(self, ten_env: AsyncTenEnv, sentence: _TTSSentence):
+        _current_sentence.set(sentence)
+        sentence.started_at = time.time()
+        sentence.in_flight = sum(1 for s in self.pipeline if not s.done)
+        try:
+            await self.on_request_tts(ten_env, sentence.text, sentence.end_of_segment)
+        except asyncio.CancelledError:
+            ten_env.log_info(f"Task cancelled: {sentence.text}")
+        except Exception:
+            ten_env.log_error(
+                f"Task failed: {sentence.text}, err: {traceback.format_exc()}"
+            )
+        finally:
+            sentence.done = True
+            self.pipeline_slots.release()
+
+        if sentence not in self.pipeline:
+            return  # flushed
+
+        await self._drain_pipeline(ten_env)
+
+    async def _drain_pipeline(self, ten_env: AsyncTenEnv):
+        """Send the buffered audio of finished sentences in order, and release the next head."""
+        sent = []
+        async with self.pipeline_lock:
+            pipeline = self.pipeline
+            while pipeline and pipeline is self.pipeline:
+                head = pipeline[0]
+                while head.chunks:
+                    audio_data, args = head.chunks.popleft()
+                    await self._send_pcm(ten_env, audio_data, head.turn, **args)
+                head.released = True
+                if not head.done:
+                    break
+                pipeline.popleft()
+                await self.end_send_audio_out(ten_env)
+                sent.append((head, time.time()))
+
+        # A sentence is measured once all of its audio is out, which may be long after
+        # its synthesis finished when an earlier sentence was still playing
+        for sentence, sent_at in sent:
+            await self._send_metrics(ten_env, sentence, sent_at)
+
+    async def _send_metrics(
+        self, ten_env: AsyncTenEnv, sentence: _TTSSentence, sent_at: float
+    ):
+        metrics = TTSSentenceMetrics(
+            text=sentence.text,
+            queue_wait_ms=int((sentence.started_at - sentence.queued_at) * 1000),
+            ttfb_ms=(
+                int((sentence.first_byte_at - sentence.started_at) * 1000)
+                if sentence.first_byte_at
+                else -1
+            ),
+            duration_ms=int((sent_at - sentence.started_at) * 1000),
+            queue_depth=self.queue_depth(),
+            in_flight=sentence.in_flight,
+        )
+        try:
+            await self.on_tts_metrics(ten_env, metrics)
+        except Exception:
+            ten_env.log_warn(f"on_tts_metrics failed: {traceback.format_exc()}")
@@ -0,0 +1,100 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+from array import array
+import struct
+import sys
+from typing import Sequence
+
+# Binary vector payload, sent with set_property_buf:
+#   magic "TVEC" | version u8 | dtype u8 | reserved u16 | count u32 | dim u32
+# followed by count * dim little-endian float32 values, row by row.
+VECTORS_MAGIC = b"TVEC"
+VECTORS_VERSION = 1
+VECTORS_DTYPE_FLOAT32 = 1
+
+_HEADER = struct.Struct("<4sBBHII")
+HEADER_SIZE = _HEADER.size
+
+_BIG_ENDIAN = sys.byteorder == "big"
+
+
+class VectorFormatError(ValueError):
+    pass
+
+
+def _header(count: int, dim: int) -> bytes:
+    return _HEADER.pack(VECTORS_MAGIC, VECTORS_VERSION, VECTORS_DTYPE_FLOAT32, 0, count, dim)
+
+
+def encode_vectors(vectors) -> bytes:
+    """
+    Pack vectors of the same dimension, a list of lists of floats or a 2-D numpy
+    array, into a binary vector payload.
+    """
+    if hasattr(vectors, "shape"):
+        # numpy array, avoid converting every value to a python float
+        if len(vectors.shape) != 2:
+            raise VectorFormatError(f"expected a 2-D array, got shape {vectors.shape}")
+        count, dim = vectors.shape
+        return _header(count, dim) + vectors.astype("<f4", copy=False).tobytes()
+
+    count = len(vectors)
+    dim = len(vectors[0]) if count else 0
+    values = array("f")
+    for vector in vectors:
+        if len(vector) != dim:
+            raise VectorFormatError(f"mixed dimensions {dim} and {len(vector)}")
+        values.extend(vector)
+    if _BIG_ENDIAN:
+        values.byteswap()
+    return _header(count, dim) + values.tobytes()
+
+
+def encode_vector(vector: Sequence[float]) -> bytes:
+    return encode_vectors([vector])
+
+
+def vectors_shape(buf) -> tuple[int, int]:
+    """(count, dim) of a binary vector payload, validating its header and size."""
+    if len(buf) < HEADER_SIZE:
+        raise VectorFormatError(f"payload of {len(buf)} bytes is shorter than the header")
+    magic, version, dtype, _, count, dim = _HEADER.unpack_from(buf)
+    if magic != VECTORS_MAGIC:
+        raise VectorFormatError(f"bad magic {magic!r}")
+    if version != VECTORS_VERSION or dtype != VECTORS_DTYPE_FLOAT32:
+        raise VectorFormatError(f"unsupported version {version} or dtype {dtype}")
+    if len(buf) != HEADER_SIZE + count * dim * 4:
+        raise VectorFormatError(
+            f"payload of {len(buf)} bytes does not hold {count} vectors of {dim} floats"
+        )
+    return count, dim
+
+
+def decode_vectors(buf) -> list[list[float]]:
+    """Vectors of a binary vector payload as lists of floats."""
+    count, dim = vectors_shape(buf)
+    values = array("f")
+    values.frombytes(memoryview(buf)[HEADER_SIZE:])
+    if _BIG_ENDIAN:
+        values.byteswap()
+    return [values[i * dim : (i + 1) * dim].tolist() for i in range(count)]
+
+
+def decode_vector(buf) -> list[float]:
+    vectors = decode_vectors(buf)
+    if len(vectors) != 1:
+        raise VectorFormatError(f"expected 1 vector, got {len(vectors)}")
+    return vectors[0]
+
+
+def decode_vectors_array(buf):
+    """Vectors of a binary vector payload as a (count, dim) float32 numpy array, without copying."""
+    import numpy as np
+
+    count, dim = vectors_shape(buf)
+    return np.frombuffer(buf, dtype="<f4", count=count * dim, offset=HEADER_SIZE).reshape(
+        count, dim
+    )
@@ -0,0 +1,161 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+import asyncio
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "interface"))
+
+from ten_ai_base.helper import (  # noqa: E402
+    QUEUE_OVERFLOW_BLOCK,
+    QUEUE_OVERFLOW_DROP_NEWEST,
+    QUEUE_OVERFLOW_DROP_OLDEST,
+    AsyncQueue,
+)
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, 5))
+
+
+async def drain(queue: AsyncQueue) -> list:
+    return [await queue.get() for _ in range(len(queue))]
+
+
+def test_block_waits_for_a_free_slot():
+    async def main():
+        queue = AsyncQueue(maxsize=2, overflow=QUEUE_OVERFLOW_BLOCK)
+        await queue.put("a")
+        await queue.put("b")
+        putter = asyncio.create_task(queue.put("c"))
+        await asyncio.sleep(0.01)
+        assert not putter.done() and len(queue) == 2
+
+        assert await queue.get() == "a"
+        assert await putter is True
+        assert await drain(queue) == ["b", "c"]
+        assert queue.stats()["dropped"] == 0
+
+    run(main())
+
+
+def test_drop_oldest_keeps_the_high_lane():
+    async def main():
+        queue = AsyncQueue(maxsize=2, overflow=QUEUE_OVERFLOW_DROP_OLDEST)
+        await queue.put("tool result", prepend=True)
+        await queue.put("a")
+        assert await queue.put("b") is True
+        # the oldest item of the lowest priority lane went
+        assert await drain(queue) == ["tool result", "b"]
+
+        await queue.put("c")
+        await queue.put("d")
+        assert queue.put_nowait("e") is True
+        assert await drain(queue) == ["d", "e"]
+        assert queue.stats()["dropped"] == 2
+
+    run(main())
+
+
+def test_drop_newest_rejects_the_new_item():
+    async def main():
+        queue = AsyncQueue(maxsize=2, overflow=QUEUE_OVERFLOW_DROP_NEWEST)
+        await queue.put("a")
+        await queue.put("b")
+        assert await queue.put("c") is False
+        assert queue.put_nowait("d") is False
+        assert await drain(queue) == ["a", "b"]
+        assert queue.stats()["dropped"] == 2
+
+    run(main())
+
+
+def test_prepend_goes_to_the_high_lane():
+    async def main():
+        queue = AsyncQueue()
+        await queue.put("a")
+        await queue.put("b")
+        await queue.put("x", prepend=True)
+        await queue.put("y", prepend=True)
+        # ahead of the normal items, first in first out among themselves
+        assert await drain(queue) == ["x", "y", "a", "b"]
+
+    run(main())
+
+
+def test_flush_keeps_waiting_getters_and_wakes_putters():
+    async def main():
+        queue = AsyncQueue()
+        getters = [asyncio.create_task(queue.get()) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        await queue.flush()
+        await asyncio.sleep(0.01)
+        assert not any(getter.done() for getter in getters)
+
+        await queue.put("a")
+        await queue.put("b")
+        assert sorted(await asyncio.gather(*getters)) == ["a", "b"]
+
+        queue = AsyncQueue(maxsize=1)
+        await queue.put("old")
+        putter = asyncio.create_task(queue.put("new"))
+        await asyncio.sleep(0.01)
+        await queue.flush()
+        assert await putter is True
+        assert await drain(queue) == ["new"]
+
+    run(main())
+
+
+def test_stats():
+    async def main():
+        queue = AsyncQueue(maxsize=3, overflow=QUEUE_OVERFLOW_DROP_NEWEST)
+        for item in "abcd":
+            await queue.put(item)
+        await asyncio.sleep(0.02)
+        await queue.get()
+        await queue.flush()
+
+        stats = queue.stats()
+        assert stats["depth"] == 0 and len(queue) == 0
+        assert stats["max_depth"] == 3
+        assert (stats["put"], stats["get"], stats["dropped"], stats["flushed"]) == (3, 1, 1, 2)
+        assert stats["avg_wait_ms"] >= 20 and stats["max_wait_ms"] >= 20
+
+    run(main())
+
+
+class FakeTenEnv:
+    def __init__(self, properties: dict):
+        self.properties = properties
+        self.warnings = []
+
+    async def get_property_int(self, name: str) -> int:
+        return self.properties[name]
+
+    async def get_property_string(self, name: str) -> str:
+        return self.properties[name]
+
+    def log_warn(self, msg: str) -> None:
+        self.warnings.append(msg)
+
+
+def test_configure_from_properties():
+    async def main():
+        queue = AsyncQueue()
+        await queue.configure(FakeTenEnv({}))
+        assert (queue.maxsize, queue.overflow) == (0, QUEUE_OVERFLOW_BLOCK)
+
+        ten_env = FakeTenEnv({"queue_max_size": 8, "queue_overflow": "drop_oldest"})
+        await queue.configure(ten_env)
+        assert (queue.maxsize, queue.overflow) == (8, QUEUE_OVERFLOW_DROP_OLDEST)
+
+        ten_env = FakeTenEnv({"queue_overflow": "drop_everything"})
+        await queue.configure(ten_env)
+        assert queue.overflow == QUEUE_OVERFLOW_DROP_OLDEST
+        assert len(ten_env.warnings) == 1
+
+    run(main())
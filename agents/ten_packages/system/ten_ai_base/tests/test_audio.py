@@ -0,0 +1,131 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+import asyncio
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "interface"))
+
+from ten_ai_base.audio import PcmFrameEmitter  # noqa: E402
+
+# 10ms of 16kHz 16-bit mono
+FRAME = 320
+
+
+class FakeTenEnv:
+    def __init__(self):
+        self.frames = []
+
+    async def send_audio_frame(self, frame) -> None:
+        self.frames.append(
+            (frame.get_sample_rate(), frame.get_samples_per_channel(), bytes(frame.get_buf()))
+        )
+
+    def data(self) -> bytes:
+        return b"".join(buf for _, _, buf in self.frames)
+
+    def sizes(self) -> list[int]:
+        return [len(buf) for _, _, buf in self.frames]
+
+
+def pcm(size: int, start: int = 0) -> bytes:
+    return bytes((start + i) % 251 for i in range(size))
+
+
+def run(coro):
+    asyncio.run(coro)
+
+
+def test_carry_over_across_pushes():
+    async def main():
+        ten_env, emitter = FakeTenEnv(), PcmFrameEmitter()
+        data = pcm(1000)
+        for start, end in ((0, 100), (100, 400), (400, 650), (650, 1000)):
+            await emitter.push(ten_env, data[start:end])
+        # every frame is whole, the tail waits for the next push
+        assert ten_env.sizes() == [FRAME] * 3
+        assert ten_env.data() == data[: 3 * FRAME]
+        assert all(spc == FRAME // 2 for _, spc, _ in ten_env.frames)
+        assert (emitter.bytes_in, emitter.frames_out) == (1000, 3)
+
+        # a push of whole frames goes out without being buffered
+        await emitter.flush(ten_env)
+        copied = emitter.bytes_copied
+        await emitter.push(ten_env, pcm(2 * FRAME))
+        assert emitter.bytes_copied - copied == 2 * FRAME  # into the frames only
+
+    run(main())
+
+
+def test_flush_sends_the_tail_as_a_short_frame():
+    async def main():
+        ten_env, emitter = FakeTenEnv(), PcmFrameEmitter()
+        data = pcm(FRAME + 10)
+        await emitter.push(ten_env, data)
+        await emitter.flush(ten_env)
+        assert ten_env.sizes() == [FRAME, 10]
+        assert ten_env.frames[1][1] == 5
+        assert ten_env.data() == data
+        # nothing left
+        await emitter.flush(ten_env)
+        assert len(ten_env.frames) == 2
+
+    run(main())
+
+
+def test_odd_byte_counts_keep_samples_aligned():
+    async def main():
+        ten_env, emitter = FakeTenEnv(), PcmFrameEmitter()
+        data = pcm(2 * FRAME + 2)
+        await emitter.push(ten_env, data[:FRAME + 1])
+        # the half sample stays for the next push
+        await emitter.flush(ten_env)
+        assert ten_env.sizes() == [FRAME]
+        await emitter.push(ten_env, data[FRAME + 1 : FRAME + 6])
+        await emitter.flush(ten_env)
+        # completed by the first pushed byte
+        assert ten_env.sizes() == [FRAME, 6]
+        await emitter.push(ten_env, data[FRAME + 6 :])
+        await emitter.flush(ten_env)
+        assert ten_env.data() == data
+        assert all(len(buf) % 2 == 0 for _, _, buf in ten_env.frames)
+
+    run(main())
+
+
+def test_set_format_flushes_the_old_format():
+    async def main():
+        ten_env, emitter = FakeTenEnv(), PcmFrameEmitter()
+        await emitter.push(ten_env, pcm(100))
+        await emitter.set_format(ten_env, 16000, 2, 1)
+        assert ten_env.frames == []  # same format, nothing to do
+
+        await emitter.set_format(ten_env, 24000, 2, 1)
+        assert ten_env.frames == [(16000, 50, pcm(100))]
+        assert emitter.frame_size == 480
+        await emitter.push(ten_env, pcm(1000))
+        assert ten_env.sizes() == [100, 480, 480]
+        assert {rate for rate, _, _ in ten_env.frames[1:]} == {24000}
+
+        # stereo: a sample is 4 bytes, a frame 10ms of both channels
+        await emitter.set_format(ten_env, 16000, 2, 2)
+        assert emitter.frame_size == 640 and ten_env.sizes()[-1] == 40
+
+    run(main())
+
+
+def test_reset_drops_the_buffered_audio():
+    async def main():
+        ten_env, emitter = FakeTenEnv(), PcmFrameEmitter()
+        await emitter.push(ten_env, pcm(FRAME - 1))
+        emitter.reset()
+        await emitter.flush(ten_env)
+        assert ten_env.frames == []
+        # the next frame starts at the new audio
+        await emitter.push(ten_env, pcm(FRAME, start=7))
+        assert ten_env.data() == pcm(FRAME, start=7)
+
+    run(main())
@@ -0,0 +1,46 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "interface"))
+
+from ten_ai_base.bm25 import (  # noqa: E402
+    BM25Index,
+    reciprocal_rank_fusion,
+    tokenize,
+)
+
+
+def test_tokenize_splits_cjk_into_bigrams():
+    assert tokenize("Opening hours: 9AM, 营业时间") == [
+        "opening",
+        "hours",
+        "9am",
+        "营业",
+        "业时",
+        "时间",
+    ]
+
+
+def test_search_ranks_rare_terms_and_replaces_sources(tmp_path):
+    index = BM25Index(str(tmp_path))
+    index.replace("a.pdf", ["1", "2"], ["the cat sat on the mat", "the dog barked"])
+    index.replace("b.pdf", ["3"], ["a cat and a dog"])
+
+    reader = BM25Index(str(tmp_path))
+    assert [doc["id"] for doc, _ in reader.search("cat mat", 3)] == ["1", "3"]
+
+    index.replace("a.pdf", ["4"], ["the mat is new"])
+    index.remove("b.pdf")
+    reader.refresh()
+    assert len(reader) == 1
+    assert [doc["id"] for doc, _ in reader.search("cat mat", 3)] == ["4"]
+
+
+def test_reciprocal_rank_fusion_favors_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "b", "d"]])
+    assert {key for key, _ in fused[:2]} == {"b", "c"}
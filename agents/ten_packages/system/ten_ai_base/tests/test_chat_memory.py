@@ -0,0 +1,120 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+import asyncio
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "interface"))
+
+from ten_ai_base.chat_memory import (  # noqa: E402
+    EVENT_MEMORY_EXPIRED,
+    MESSAGE_TOKEN_OVERHEAD,
+    ChatMemory,
+    estimate_tokens,
+)
+
+
+def words(message: dict) -> int:
+    """One token per word of the content, tool calls count one each."""
+    return len((message.get("content") or "").split()) + len(
+        message.get("tool_calls") or []
+    )
+
+
+def user(text: str) -> dict:
+    return {"role": "user", "content": text}
+
+
+def tool_turn(call_id: str) -> list[dict]:
+    return [
+        {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [
+                {"id": call_id, "type": "function", "function": {"name": "f", "arguments": "{}"}}
+            ],
+        },
+        {"role": "tool", "tool_call_id": call_id, "content": "result of the call"},
+        {"role": "assistant", "content": "the answer"},
+    ]
+
+
+def test_token_budget_with_custom_tokenizer():
+    memory = ChatMemory(max_history_length=100, max_tokens=10, tokenizer=words)
+    memory.put(user("one two three four"))
+    memory.put(user("five six seven"))
+    assert memory.tokens() == 7 and memory.count() == 2
+
+    memory.put(user("eight nine ten eleven"))
+    # the oldest message went to make room
+    assert [m["content"] for m in memory.get()] == ["five six seven", "eight nine ten eleven"]
+    assert memory.tokens() == 7
+
+    # a single message over the budget is kept on its own
+    memory.put(user(" ".join(["word"] * 20)))
+    assert memory.count() == 1 and memory.tokens() == 20
+
+    memory.clear()
+    assert memory.count() == 0 and memory.tokens() == 0
+
+
+def test_tool_call_is_evicted_with_its_result():
+    memory = ChatMemory(max_history_length=100, max_tokens=12, tokenizer=words)
+    memory.put(user("what is the weather"))
+    for message in tool_turn("call_1"):
+        memory.put(message)
+    assert memory.count() == 4 and memory.tokens() == 4 + 1 + 4 + 2
+
+    # evicting the question would leave the tool call, and then its result, at the front
+    memory.put(user("and tomorrow"))
+    assert memory.get() == (user("and tomorrow"),)
+    assert memory.tokens() == 2
+
+
+def test_tool_result_never_leads_the_history():
+    memory = ChatMemory(max_history_length=4)
+    memory.put(user("what is the weather"))
+    for message in tool_turn("call_1"):
+        memory.put(message)
+    memory.put(user("thanks"))
+    roles = [m["role"] for m in memory.get()]
+    assert roles == ["user"]
+
+
+def test_snapshot_is_reused_until_the_history_changes():
+    memory = ChatMemory(max_history_length=2)
+    memory.put(user("a"))
+    snapshot = memory.get()
+    assert memory.get() is snapshot
+    memory.put(user("b"))
+    assert memory.get() is not snapshot and memory.get() == (user("a"), user("b"))
+
+
+def test_default_tokenizer():
+    assert estimate_tokens({"role": "user", "content": ""}) == MESSAGE_TOKEN_OVERHEAD + 1
+    latin = estimate_tokens(user("a" * 400))
+    cjk = estimate_tokens(user("字" * 100))
+    assert latin == cjk == MESSAGE_TOKEN_OVERHEAD + 101
+    image = {"role": "user", "content": [{"type": "image_url"}, {"type": "text", "text": "hi"}]}
+    assert estimate_tokens(image) > estimate_tokens(user("hi"))
+    assert estimate_tokens(tool_turn("call_1")[0]) > MESSAGE_TOKEN_OVERHEAD
+
+
+def test_expired_messages_are_emitted_in_order():
+    async def main():
+        memory = ChatMemory(max_history_length=1)
+        expired = []
+
+        async def on_expired(message):
+            expired.append(message["content"])
+
+        memory.on(EVENT_MEMORY_EXPIRED, on_expired)
+        for text in ("a", "b", "c"):
+            memory.put(user(text))
+        await asyncio.sleep(0)
+        assert expired == ["a", "b"]
+
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+from pathlib import Path
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "interface"))
+
+from ten_ai_base.histogram import (  # noqa: E402
+    Histogram,
+    WindowedHistogram,
+    latency_stats,
+)
+
+
+def test_percentiles_within_relative_accuracy():
+    rng = random.Random(1)
+    values = [rng.lognormvariate(0, 1) for _ in range(50_000)]
+    histogram = Histogram(relative_accuracy=0.01)
+    for v in values:
+        histogram.record(v)
+
+    values.sort()
+    for p in (50, 90, 95, 99, 99.9):
+        exact = values[int(p / 100 * (len(values) - 1))]
+        assert abs(histogram.percentile(p) - exact) <= 0.0101 * exact
+    assert histogram.percentile(0) == values[0]
+    assert histogram.percentile(100) == values[-1]
+    assert histogram.count == len(values)
+
+
+def test_empty_histogram():
+    histogram = WindowedHistogram()
+    assert histogram.count == 0
+    assert histogram.percentiles(50, 99) == [0.0, 0.0]
+    assert histogram.percentile(95, windowed=True) == 0.0
+
+
+def test_window_only_keeps_recent_values():
+    histogram = WindowedHistogram(window_seconds=60, slots=6)
+    for i in range(60):
+        histogram.record(1000.0, now=i)
+    for i in range(60, 120):
+        histogram.record(10.0, now=i)
+
+    assert histogram.percentile(99, windowed=False) > 900
+    assert histogram.window(now=119).max == 10.0
+    assert histogram.window(now=1000).count == 0
+
+
+def test_latency_stats_keys():
+    histogram = WindowedHistogram()
+    histogram.record(0.5)
+    stats = latency_stats({"first_token_latency": histogram})
+    assert set(stats) == {
+        "first_token_latency_95",
+        "first_token_latency_99",
+        "first_token_latency_window_95",
+        "first_token_latency_window_99",
+    }
+
+
+def test_memory_is_bounded_over_a_million_samples():
+    rng = random.Random(2)
+    histogram = WindowedHistogram(window_seconds=60, slots=6)
+
+    tracemalloc.start()
+    now = 0.0
+    for _ in range(10_000):
+        now += 0.01
+        histogram.record(rng.expovariate(1 / 300), now=now)
+    after_warmup, _ = tracemalloc.get_traced_memory()
+    for _ in range(1_000_000):
+        now += 0.01
+        histogram.record(rng.expovariate(1 / 300), now=now)
+    after_million, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert histogram.count == 1_010_000
+    assert len(histogram.slots) <= 6
+    # log buckets: ~1200 cover 1us to 3h, the count of values does not matter
+    assert len(histogram.cumulative.buckets) < 1200
+    assert after_million - after_warmup < 256 * 1024
@@ -0,0 +1,114 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+import asyncio
+from pathlib import Path
+import sys
+
+import aiohttp
+from aiohttp import web
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "interface"))
+
+from ten_ai_base.http_client import (  # noqa: E402
+    HttpClientOptions,
+    close_http_client,
+    get_http_client,
+)
+
+
+async def serve(handler):
+    """A local server running handler for every path, returns (runner, base url)."""
+    app = web.Application()
+    app.router.add_route("*", "/{tail:.*}", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_post_is_not_retried_after_the_request_was_sent():
+    calls = []
+
+    async def slow(request):
+        calls.append(request.method)
+        await asyncio.sleep(1)
+        return web.Response()
+
+    async def main():
+        runner, url = await serve(slow)
+        client = get_http_client("test_slow", HttpClientOptions(total_timeout=0.2, retry_backoff=0))
+        try:
+            with pytest.raises(asyncio.TimeoutError):
+                async with client.post(url):
+                    pass
+            assert calls == ["POST"]
+
+            # a GET, or a POST opting in, may run again
+            with pytest.raises(asyncio.TimeoutError):
+                async with client.get(url):
+                    pass
+            with pytest.raises(asyncio.TimeoutError):
+                async with client.post(url, idempotent=True):
+                    pass
+            assert calls == ["POST"] + ["GET"] * 3 + ["POST"] * 3
+        finally:
+            await close_http_client("test_slow")
+            await runner.cleanup()
+
+    run(main())
+
+
+def test_retry_statuses_and_connect_errors_are_retried():
+    statuses = [503, 429, 200]
+
+    async def flaky(request):
+        return web.Response(status=statuses.pop(0))
+
+    async def main():
+        runner, url = await serve(flaky)
+        client = get_http_client("test_flaky", HttpClientOptions(retry_backoff=0))
+        try:
+            async with client.post(url) as response:
+                assert response.status == 200
+            assert client.stats()["retries"] == 2
+
+            # nothing listens on the port, the request never reached a server
+            await runner.cleanup()
+            await client.close()  # no pooled connection left either
+            with pytest.raises(aiohttp.ClientConnectorError):
+                async with client.post(url):
+                    pass
+            assert client.stats()["retries"] == 4
+        finally:
+            await close_http_client("test_flaky")
+
+    run(main())
+
+
+def test_shared_client_is_closed_by_the_last_user():
+    async def main():
+        first = get_http_client("test_shared")
+        second = get_http_client("test_shared")
+        assert first is second
+        session = first._get_session()
+
+        await close_http_client("test_shared")
+        assert not session.closed
+        assert get_http_client("test_shared") is first
+        await close_http_client("test_shared")
+        await close_http_client("test_shared")
+        assert session.closed
+        assert get_http_client("test_shared") is not first
+        await close_http_client("test_shared")
+
+    run(main())
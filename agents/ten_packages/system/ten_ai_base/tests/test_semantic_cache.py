@@ -0,0 +1,52 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "interface"))
+
+from ten_ai_base.semantic_cache import SemanticCache, cache_scope  # noqa: E402
+from ten_ai_base.types import LLMToolMetadata  # noqa: E402
+
+ANSWER = [("We open at 9.", False), ("See you!", True)]
+
+
+def test_lookup_threshold_ttl_and_stats():
+    cache = SemanticCache(threshold=0.9, ttl_seconds=60)
+    cache.put("scope", "when do you open", [1.0, 0.0, 0.1], ANSWER, now=0)
+
+    hit = cache.lookup("scope", [2.0, 0.0, 0.3], now=10)
+    assert hit.sentences == ANSWER
+    assert hit.text == "We open at 9.See you!"
+    assert cache.lookup("scope", [0.0, 1.0, 0.0], now=10) is None
+    assert cache.lookup("other scope", [1.0, 0.0, 0.1], now=10) is None
+    # expired
+    assert cache.lookup("scope", [1.0, 0.0, 0.1], now=100) is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 3, 0)
+    assert stats["hit_rate"] == 0.25
+
+
+def test_evicts_least_recently_used():
+    cache = SemanticCache(max_entries=10)
+    for i in range(10):
+        cache.put("scope", f"q{i}", [1.0, float(i)], ANSWER, now=i)
+    assert cache.lookup("scope", [1.0, 0.0], now=20).utterance == "q0"
+
+    cache.put("scope", "q10", [0.0, 1.0], ANSWER, now=21)
+    assert cache.stats()["entries"] == 10
+    assert cache.stats()["evictions"] == 1
+    # q1 was the least recently used, q0 was hit
+    assert [a.utterance for a in cache.scopes["scope"].answers][:2] == ["q0", "q2"]
+
+
+def test_scope_depends_on_prompt_and_tools_not_their_order():
+    weather = LLMToolMetadata(name="weather", description="", parameters=[])
+    search = LLMToolMetadata(name="search", description="", parameters=[])
+    assert cache_scope("p", [weather, search]) == cache_scope("p", [search, weather])
+    assert cache_scope("p", [weather]) != cache_scope("p", [weather, search])
+    assert cache_scope("p", []) != cache_scope("q", [])
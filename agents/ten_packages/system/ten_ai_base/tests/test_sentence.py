@@ -0,0 +1,54 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "interface"))
+
+from ten_ai_base.sentence import SentenceSegmenter  # noqa: E402
+
+
+def split(text: str, chunk: int = 0) -> list[str]:
+    """Sentences of text streamed in deltas of chunk characters, all at once if 0."""
+    segmenter = SentenceSegmenter()
+    sentences = []
+    for i in range(0, len(text), chunk or len(text)):
+        sentences += segmenter.push(text[i : i + (chunk or len(text))])
+    fragment = segmenter.flush()
+    if fragment.strip():
+        sentences.append(fragment)
+    return [s.strip() for s in sentences]
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("Hello there. How are you.", ["Hello there.", "How are you."]),
+        ("I said no. Then we left.", ["I said no.", "Then we left."]),
+        ("See No. 5 for details.", ["See No. 5 for details."]),
+        ("Go with plan B. It works.", ["Go with plan B.", "It works."]),
+        ("J. Smith met John F. Kennedy.", ["J. Smith met John F. Kennedy."]),
+        ("Use tools, e.g. a hammer.", ["Use tools,", "e.g. a hammer."]),
+        ("Mr. Lee paid 3.14 or 1,000 dollars.", ["Mr. Lee paid 3.14 or 1,000 dollars."]),
+        ("Wait... what? Yes!", ["Wait...", "what?", "Yes!"]),
+        ("So I. Went home.", ["So I.", "Went home."]),
+        ('He said "hi." Then left.', ['He said "hi."', "Then left."]),
+        ("你好。今天天气很好，我们去公园吧！", ["你好。", "今天天气很好，", "我们去公园吧！"]),
+    ],
+)
+def test_boundaries(text, expected):
+    assert split(text) == expected
+    # Character by character holds back every "." and "," until the next delta
+    assert split(text, chunk=1) == expected
+
+
+def test_flush_returns_held_back_sentence():
+    segmenter = SentenceSegmenter()
+    assert segmenter.push("Hello there. How are you.") == ["Hello there."]
+    assert segmenter.flush().strip() == "How are you."
+    assert segmenter.flush() == ""
@@ -0,0 +1,178 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+import asyncio
+from pathlib import Path
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "interface"))
+
+from ten_ai_base.tts import AsyncTTSBaseExtension  # noqa: E402
+
+# One 10ms frame of 16kHz 16-bit mono
+FRAME_BYTES = 320
+
+
+class FakeTenEnv:
+    def __init__(self):
+        self.frames: list[str] = []
+
+    def log_info(self, msg: str) -> None:
+        pass
+
+    log_debug = log_warn = log_error = log_info
+
+    async def get_property_int(self, name: str) -> int:
+        raise KeyError(name)
+
+    async def send_audio_frame(self, frame) -> None:
+        # every frame is filled with the first letter of its sentence
+        self.frames.append(chr(bytes(frame.get_buf())[0]))
+
+    async def send_data(self, data) -> None:
+        pass
+
+
+class FakeTTS(AsyncTTSBaseExtension):
+    """Synthesizes a sentence into two frames after waiting delays[text] seconds."""
+
+    def __init__(self, delays: dict[str, float], pipeline_depth: int):
+        super().__init__("fake_tts")
+        self.delays = delays
+        self.pipeline_depth = pipeline_depth
+        self.requests: list[tuple[str, float, float]] = []
+        self.cancelled: list[str] = []
+        self.metrics = []
+
+    async def on_request_tts(self, ten_env, input_text: str, end_of_segment: bool):
+        started = time.time()
+        try:
+            await asyncio.sleep(self.delays.get(input_text, 0))
+        except asyncio.CancelledError:
+            self.cancelled.append(input_text)
+            raise
+        for _ in range(2):
+            await self.send_audio_out(ten_env, input_text[0].encode() * FRAME_BYTES)
+            await asyncio.sleep(0)
+        self.requests.append((input_text, started, time.time()))
+
+    async def on_cancel_tts(self, ten_env) -> None:
+        pass
+
+    async def on_tts_metrics(self, ten_env, metrics) -> None:
+        self.metrics.append(metrics)
+
+
+async def start(delays: dict[str, float], pipeline_depth: int):
+    ten_env = FakeTenEnv()
+    tts = FakeTTS(delays, pipeline_depth)
+    await tts.on_start(ten_env)
+    return ten_env, tts
+
+
+async def say(tts: FakeTTS, *texts: str) -> None:
+    for text in texts:
+        await tts.queue.put([text, False, time.time(), None])
+
+
+async def wait_for_metrics(tts: FakeTTS, count: int) -> None:
+    while len(tts.metrics) < count:
+        await asyncio.sleep(0.01)
+
+
+def run(coro):
+    asyncio.run(asyncio.wait_for(coro, 5))
+
+
+def test_out_of_order_completion_is_sent_in_order():
+    async def main():
+        ten_env, tts = await start({"a": 0.2, "b": 0.1, "c": 0}, pipeline_depth=3)
+        await say(tts, "a", "b", "c")
+        await wait_for_metrics(tts, 3)
+
+        # c and b finish first, their audio waits for a
+        assert [text for text, _, _ in tts.requests] == ["c", "b", "a"]
+        assert ten_env.frames == list("aabbcc")
+        assert [m.text for m in tts.metrics] == ["a", "b", "c"]
+        assert [m.in_flight for m in tts.metrics] == [3, 3, 3]
+        # measured until the audio is out, not until the synthesis finished
+        assert all(m.duration_ms >= 190 for m in tts.metrics)
+        assert tts.metrics[2].ttfb_ms < 100
+        await tts.on_stop(ten_env)
+
+    run(main())
+
+
+def test_flush_drops_buffered_audio_and_stale_sentences():
+    async def main():
+        ten_env, tts = await start({"a": 1, "b": 0, "c": 1}, pipeline_depth=2)
+        await say(tts, "a", "b", "c", "d")
+        await asyncio.sleep(0.1)
+        # b is done with its audio held back, a and c are synthesizing, d waits for a slot
+        assert [s.text for s in tts.pipeline] == ["a", "b", "c"]
+        assert tts.pipeline[1].done and len(tts.pipeline[1].chunks) == 2
+
+        generation = tts.generation
+        await tts.flush_input_items(ten_env)
+        assert tts.generation == generation + 1
+        assert not tts.pipeline and len(tts.queue) == 0
+        await asyncio.sleep(0.05)
+        assert tts.cancelled == ["a", "c"]
+        assert ten_env.frames == [] and tts.metrics == []
+
+        # the slots came back, d was dropped
+        await say(tts, "e")
+        await wait_for_metrics(tts, 1)
+        assert ten_env.frames == list("ee")
+        assert [text for text, _, _ in tts.requests] == ["b", "e"]
+        await tts.on_stop(ten_env)
+
+    run(main())
+
+
+def test_cancelled_sentence_releases_the_next_one():
+    async def main():
+        ten_env, tts = await start({"a": 1, "b": 0}, pipeline_depth=2)
+        await say(tts, "a", "b")
+        await asyncio.sleep(0.1)
+        assert ten_env.frames == []
+
+        tts.pipeline[0].task.cancel()
+        await wait_for_metrics(tts, 2)
+        assert tts.cancelled == ["a"]
+        assert ten_env.frames == list("bb")
+        assert (tts.metrics[0].text, tts.metrics[0].ttfb_ms) == ("a", -1)
+        assert not tts.pipeline
+        await tts.on_stop(ten_env)
+
+    run(main())
+
+
+def test_depth_one_is_sequential():
+    async def main():
+        ten_env, tts = await start({"a": 0.1, "b": 0, "c": 0.05}, pipeline_depth=1)
+        sent = []
+        send_audio_out = tts.send_audio_out
+
+        async def record(ten_env, audio_data, **args):
+            await send_audio_out(ten_env, audio_data, **args)
+            sent.append(len(ten_env.frames))
+
+        tts.send_audio_out = record
+        await say(tts, "a", "b", "c")
+        await wait_for_metrics(tts, 3)
+
+        assert [text for text, _, _ in tts.requests] == ["a", "b", "c"]
+        # each request starts after the previous one returned
+        for (_, _, ended), (_, started, _) in zip(tts.requests, tts.requests[1:]):
+            assert started >= ended
+        # nothing is held back, every chunk goes straight out
+        assert sent == [1, 2, 3, 4, 5, 6]
+        assert ten_env.frames == list("aabbcc")
+        assert [m.in_flight for m in tts.metrics] == [1, 1, 1]
+        await tts.on_stop(ten_env)
+
+    run(main())
@@ -0,0 +1,259 @@
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Set
+
+from scheduler import Job, ModelKey
+
+logger = logging.getLogger("whisper_server")
+
+SAMPLE_RATE = 16000
+
+
+class WhisperBackend(ABC):
+    """
+    推理引擎接口。load 和 transcribe_batch 在调度器的工作线程中运行，
+    transcribe_batch 按顺序返回每个 job 的 {"text", "segments", "language"}。
+    """
+
+    name = ""
+    # 能否把多个片段合并成一批解码，不能时调度器把片段分给不同的工作线程
+    batching = True
+
+    def __init__(self, cpu_threads: int, workers: int):
+        self.cpu_threads = cpu_threads
+        self.workers = workers
+        self.resolved: Dict[ModelKey, ModelKey] = {}
+
+    @abstractmethod
+    def cuda_available(self) -> bool:
+        """是否有可用的 GPU"""
+
+    def cuda_device_name(self) -> Optional[str]:
+        return None
+
+    @abstractmethod
+    def default_compute_type(self, device: str) -> str:
+        """device 上默认的计算类型"""
+
+    @abstractmethod
+    def supported_compute_types(self, device: str) -> Set[str]:
+        """device 上支持的计算类型"""
+
+    def resolve_key(self, key: ModelKey) -> ModelKey:
+        """
+        换成实际使用的设备和计算类型，没有 GPU 时用 CPU，不支持的计算类型用默认值，
+        这样同一个模型只加载一次
+        """
+        resolved = self.resolved.get(key)
+        if resolved is None:
+            model_size, device, compute_type = key
+            if device == "cuda" and not self.cuda_available():
+                device = "cpu"
+            if compute_type not in self.supported_compute_types(device):
+                # 例如客户端按 GPU 配置了 float16，而服务器只有 CPU
+                fallback = self.default_compute_type(device)
+                logger.warning(
+                    f"Compute type {compute_type} is not supported on {device}, using {fallback}"
+                )
+                compute_type = fallback
+            resolved = self.resolved[key] = (model_size, device, compute_type)
+        return resolved
+
+    @abstractmethod
+    def load(self, key: ModelKey) -> Any:
+        """加载模型，返回值传给 transcribe_batch"""
+
+    @abstractmethod
+    def transcribe_batch(self, model: Any, jobs: List[Job]) -> List[dict]:
+        """按顺序返回每个 job 的转写结果"""
+
+
+class OpenAIWhisperBackend(WhisperBackend):
+    """OpenAI Whisper (PyTorch)，GPU 上使用 float16"""
+
+    name = "openai"
+
+    def __init__(self, cpu_threads: int, workers: int):
+        super().__init__(cpu_threads, workers)
+        import torch
+        import whisper  # OpenAI's Whisper
+
+        self.torch = torch
+        self.whisper = whisper
+        # 工作线程平分 CPU 核心，避免 PyTorch 线程互相抢占
+        torch.set_num_threads(cpu_threads)
+
+        # 添加详细的CUDA诊断信息
+        logger.info("=== CUDA Diagnostic Information ===")
+        logger.info(f"PyTorch version: {torch.__version__}")
+        logger.info(f"CUDA available: {self.cuda_available()}")
+        if self.cuda_available():
+            logger.info(f"CUDA version: {torch.version.cuda}")
+            logger.info(f"CUDA device: {torch.cuda.get_device_name(0)}")
+            logger.info(f"CUDA device count: {torch.cuda.device_count()}")
+            logger.info(f"Current CUDA device: {torch.cuda.current_device()}")
+        else:
+            logger.warning("CUDA is not available. Using CPU instead.")
+            logger.info("Please check:")
+            logger.info("1. NVIDIA GPU is properly installed")
+            logger.info("2. CUDA drivers are installed")
+            logger.info("3. PyTorch is installed with CUDA support")
+
+    def cuda_available(self) -> bool:
+        return self.torch.cuda.is_available()
+
+    def cuda_device_name(self) -> Optional[str]:
+        return self.torch.cuda.get_device_name(0) if self.cuda_available() else None
+
+    def default_compute_type(self, device: str) -> str:
+        return "float16" if device == "cuda" else "float32"
+
+    def supported_compute_types(self, device: str) -> Set[str]:
+        return {"float16", "float32"} if device == "cuda" else {"float32"}
+
+    def load(self, key: ModelKey) -> Any:
+        """加载 Whisper 模型，返回 (模型, 推理锁)"""
+        model_size, device, compute_type = key
+        logger.info(f"Loading Whisper model: {model_size} on device: {device} ({compute_type})")
+        model = self.whisper.load_model(model_size, device=device)
+        logger.info("Model loaded successfully")
+        # whisper 的 kv cache hook 挂在模型上，同一模型不能同时解码两批
+        return model, threading.Lock()
+
+    def transcribe_batch(self, loaded: Any, jobs: List[Job]) -> List[dict]:
+        whisper = self.whisper
+        model, lock = loaded
+        job = jobs[0]
+        fp16 = job.model_key[2] == "float16" and model.device.type == "cuda"
+        beam_size = job.beam_size if job.beam_size > 1 else None
+
+        with lock:
+            if len(jobs) == 1:
+                result = model.transcribe(
+                    job.audio,
+                    language=job.language,
+                    task="transcribe",
+                    beam_size=beam_size,
+                    fp16=fp16,
+                    initial_prompt=job.prompt or None,
+                )
+                return [
+                    {
+                        "text": result["text"],
+                        "segments": result["segments"],
+                        "language": result["language"],
+                    }
+                ]
+
+            # 多个短片段（≤30 秒，贪心解码）补齐到 30 秒后一次解码
+            mels = self.torch.stack(
+                [
+                    whisper.log_mel_spectrogram(
+                        whisper.pad_or_trim(j.audio), n_mels=model.dims.n_mels
+                    )
+                    for j in jobs
+                ]
+            ).to(model.device)
+            options = whisper.DecodingOptions(
+                language=job.language,
+                beam_size=beam_size,
+                fp16=fp16,
+                prompt=job.prompt or None,
+                without_timestamps=True,
+            )
+            results = whisper.decode(model, mels, options)
+
+        return [
+            {
+                "text": result.text,
+                "segments": [
+                    {
+                        "id": 0,
+                        "start": 0.0,
+                        "end": round(len(j.audio) / SAMPLE_RATE, 2),
+                        "text": result.text,
+                    }
+                ],
+                "language": job.language,
+            }
+            for j, result in zip(jobs, results)
+        ]
+
+
+class FasterWhisperBackend(WhisperBackend):
+    """
+    faster-whisper (CTranslate2)，CPU 上默认 int8 量化。
+    模型可以被多个工作线程同时使用，num_workers 与工作线程数相同，
+    每次推理使用 cpu_threads 个线程。
+    """
+
+    name = "faster_whisper"
+    batching = False
+
+    def __init__(self, cpu_threads: int, workers: int):
+        super().__init__(cpu_threads, workers)
+        import ctranslate2
+        from faster_whisper import WhisperModel
+
+        self.ctranslate2 = ctranslate2
+        self.model_class = WhisperModel
+        logger.info(f"CTranslate2 version: {ctranslate2.__version__}")
+        logger.info(f"CUDA devices: {ctranslate2.get_cuda_device_count()}")
+
+    def cuda_available(self) -> bool:
+        return self.ctranslate2.get_cuda_device_count() > 0
+
+    def default_compute_type(self, device: str) -> str:
+        return "float16" if device == "cuda" else "int8"
+
+    def supported_compute_types(self, device: str) -> Set[str]:
+        return self.ctranslate2.get_supported_compute_types(device)
+
+    def load(self, key: ModelKey) -> Any:
+        model_size, device, compute_type = key
+        logger.info(f"Loading Whisper model: {model_size} on device: {device} ({compute_type})")
+        model = self.model_class(
+            model_size,
+            device=device,
+            compute_type=compute_type,
+            cpu_threads=self.cpu_threads,
+            num_workers=self.workers,
+        )
+        logger.info("Model loaded successfully")
+        return model
+
+    def transcribe_batch(self, model: Any, jobs: List[Job]) -> List[dict]:
+        # batching 为 False，调度器每批只给一个片段，多个片段由不同工作线程同时转写
+        results = []
+        for job in jobs:
+            segments, info = model.transcribe(
+                job.audio,
+                language=job.language,
+                beam_size=max(job.beam_size, 1),
+                initial_prompt=job.prompt or None,
+            )
+            segments = [
+                {"id": s.id, "start": s.start, "end": s.end, "text": s.text}
+                for s in segments
+            ]
+            results.append(
+                {
+                    "text": "".join(s["text"] for s in segments),
+                    "segments": segments,
+                    "language": info.language,
+                }
+            )
+        return results
+
+
+BACKENDS = {
+    OpenAIWhisperBackend.name: OpenAIWhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+}
+
+
+def create_backend(name: str, cpu_threads: int, workers: int) -> WhisperBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown WHISPER_BACKEND {name}, expected one of {list(BACKENDS)}")
+    return BACKENDS[name](cpu_threads, workers)
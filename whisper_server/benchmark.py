@@ -0,0 +1,169 @@
+"""
+Whisper 后端基准测试：在同一段音频上比较各后端的实时率
+RTF = 转写耗时 / 音频时长，小于 1 表示比实时快。
+
+音频按 --segment-seconds 切成片段逐个转写，与 whisper_asr_python 发送的语音片段相当；
+支持批量解码的后端另外测一次所有片段合成一批的耗时。
+
+用法：
+    python benchmark.py
+    python benchmark.py --backends faster_whisper --compute-types int8,int8_float32 --threads 4
+    python benchmark.py --audio speech.wav --model small
+
+--audio 为 16kHz 16 位单声道 wav 或 raw PCM。省略时使用内置的合成样本
+（按音节包络调制的元音谐波），它能比较各后端的解码速度，但转写出的文字没有意义，
+评估效果请使用真实录音。
+"""
+import argparse
+import json
+import os
+import time
+import wave
+
+import numpy as np
+from dotenv import load_dotenv
+
+from backends import BACKENDS, SAMPLE_RATE, create_backend
+from scheduler import Job
+
+
+def synthetic_sample(seconds: float = 30.0, seed: int = 0) -> np.ndarray:
+    """内置样本：基频和共振峰随音节变化的谐波，音节之间有短暂停顿"""
+    rng = np.random.default_rng(seed)
+    audio = []
+    while sum(len(a) for a in audio) < seconds * SAMPLE_RATE:
+        duration = rng.uniform(0.15, 0.35)
+        t = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+        f0 = rng.uniform(110, 220) * (1 + 0.1 * t / duration)
+        formants = rng.choice([(730, 1090), (270, 2290), (300, 870), (530, 1840), (640, 1190)])
+        syllable = np.zeros_like(t)
+        for harmonic in range(1, 30):
+            frequency = f0 * harmonic
+            # 共振峰附近的谐波更强
+            gain = sum(np.exp(-((frequency - f) / 150) ** 2) for f in formants) + 0.05 / harmonic
+            syllable += gain * np.sin(2 * np.pi * np.cumsum(frequency) / SAMPLE_RATE)
+        syllable *= np.hanning(len(t))
+        audio.append(syllable / np.abs(syllable).max() * 0.3)
+        if rng.random() < 0.25:
+            audio.append(np.zeros(int(rng.uniform(0.1, 0.5) * SAMPLE_RATE)))
+    audio = np.concatenate(audio)[: int(seconds * SAMPLE_RATE)]
+    return (audio + rng.normal(0, 0.003, len(audio))).astype(np.float32)
+
+
+def load_audio(path: str) -> np.ndarray:
+    """16kHz 16 位单声道 wav 或 raw PCM，返回 float32"""
+    if path.lower().endswith(".wav"):
+        with wave.open(path) as f:
+            if (f.getframerate(), f.getsampwidth(), f.getnchannels()) != (SAMPLE_RATE, 2, 1):
+                raise ValueError(f"{path} must be 16kHz 16-bit mono")
+            content = f.readframes(f.getnframes())
+    else:
+        with open(path, "rb") as f:
+            content = f.read()
+    return np.frombuffer(content, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def make_jobs(audio: np.ndarray, key, language: str, beam_size: int, segment_seconds: float):
+    step = int(segment_seconds * SAMPLE_RATE)
+    return [
+        Job(key, audio[i : i + step], language, beam_size, future=None)
+        for i in range(0, len(audio), step)
+    ]
+
+
+def run(backend, model, jobs, batched: bool) -> tuple:
+    started = time.perf_counter()
+    if batched:
+        results = backend.transcribe_batch(model, jobs)
+    else:
+        results = [backend.transcribe_batch(model, [job])[0] for job in jobs]
+    return time.perf_counter() - started, "".join(r["text"] for r in results)
+
+
+def benchmark(args, audio: np.ndarray) -> list:
+    duration = len(audio) / SAMPLE_RATE
+    rows = []
+    for name in args.backends.split(","):
+        try:
+            backend = create_backend(name, args.threads, workers=1)
+        except ImportError as e:
+            print(f"[{name}] skipped: {e}")
+            continue
+        compute_types = args.compute_types.split(",") if args.compute_types else [
+            backend.default_compute_type(args.device)
+        ]
+        for compute_type in compute_types:
+            key = backend.resolve_key((args.model, args.device, compute_type))
+            started = time.perf_counter()
+            model = backend.load(key)
+            load_s = time.perf_counter() - started
+
+            jobs = make_jobs(audio, key, args.language, args.beam_size, args.segment_seconds)
+            run(backend, model, jobs[:1], batched=False)  # 预热
+            times = []
+            for _ in range(args.runs):
+                elapsed, text = run(backend, model, jobs, batched=False)
+                times.append(elapsed)
+            row = {
+                "backend": name,
+                "model": key[0],
+                "device": key[1],
+                "compute_type": key[2],
+                "threads": args.threads,
+                "load_s": round(load_s, 2),
+                "audio_s": round(duration, 2),
+                "transcribe_s": round(float(np.mean(times)), 3),
+                "rtf": round(float(np.mean(times)) / duration, 3),
+                "rtf_batched": None,
+                "text": text.strip()[:60],
+            }
+            # 调度器只合并贪心解码的片段
+            if backend.batching and args.beam_size <= 1 and len(jobs) > 1:
+                elapsed, _ = run(backend, model, jobs, batched=True)
+                row["rtf_batched"] = round(elapsed / duration, 3)
+            rows.append(row)
+            print(json.dumps(row, ensure_ascii=False))
+            del model
+    return rows
+
+
+def print_table(rows: list) -> None:
+    columns = ["backend", "model", "device", "compute_type", "threads", "load_s", "rtf", "rtf_batched"]
+    widths = [max(len(c), *(len(str(r[c])) for r in rows)) for c in columns]
+    print()
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(str("-" if row[c] is None else row[c]).ljust(w) for c, w in zip(columns, widths)))
+
+
+def main():
+    load_dotenv("config.env")
+    parser = argparse.ArgumentParser(description="Real-time factor of the Whisper backends")
+    parser.add_argument("--audio", help="16kHz 16-bit mono wav or raw PCM, the bundled synthetic sample if omitted")
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--model", default=os.getenv("WHISPER_MODEL", "base"))
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--compute-types", help="comma separated, the default of each backend if omitted")
+    parser.add_argument("--language", default=os.getenv("WHISPER_LANGUAGE", "en"))
+    parser.add_argument("--beam-size", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--segment-seconds", type=float, default=5.0)
+    parser.add_argument("--seconds", type=float, default=30.0, help="length of the synthetic sample")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    unknown = set(args.backends.split(",")) - set(BACKENDS)
+    if unknown:
+        parser.error(f"unknown backends {sorted(unknown)}, expected {list(BACKENDS)}")
+
+    if args.audio:
+        audio = load_audio(args.audio)
+    else:
+        print("Using the synthetic sample, pass --audio for a real recording")
+        audio = synthetic_sample(args.seconds)
+    rows = benchmark(args, audio)
+    if rows:
+        print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
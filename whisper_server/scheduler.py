@@ -0,0 +1,294 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("whisper_server")
+
+# 模型键：(模型大小, 设备, 计算类型)
+ModelKey = Tuple[str, str, str]
+
+
+# 按对象比较，deque.remove 时不会逐个比较 numpy 数组
+@dataclass(eq=False)
+class Job:
+    """一个待转写的音频片段"""
+    model_key: ModelKey
+    audio: np.ndarray  # float32, 16kHz
+    language: str
+    beam_size: int
+    future: asyncio.Future
+    # 解码的提示文本，流式转写时为上一句的结果
+    prompt: str = ""
+    # 分派给工作线程时调用，之后请求已在解码
+    on_dispatch: Optional[Callable[[], None]] = None
+    submitted: float = field(default_factory=time.perf_counter)
+
+    @property
+    def batch_key(self) -> tuple:
+        # 同一模型、同样解码参数的短片段才能合并成一批
+        return (self.model_key, self.language, self.beam_size, self.prompt)
+
+
+class LatencyWindow:
+    """最近 size 个耗时（毫秒）的分位数，工作线程记录，事件循环读取"""
+
+    def __init__(self, size: int = 1000):
+        self.values: Deque[float] = deque(maxlen=size)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def record(self, value: float) -> None:
+        with self.lock:
+            self.values.append(value)
+            self.count += 1
+
+    def stats(self) -> Dict[str, float]:
+        # 遍历 deque 时不能被其他线程修改，先复制一份
+        with self.lock:
+            values = list(self.values)
+            count = self.count
+        if not values:
+            return {"count": 0}
+        p50, p95, p99 = np.percentile(np.asarray(values), [50, 95, 99])
+        return {
+            "count": count,
+            "p50": round(float(p50), 1),
+            "p95": round(float(p95), 1),
+            "p99": round(float(p99), 1),
+        }
+
+
+class ModelCache:
+    """按 ModelKey 缓存已加载的模型，超过 max_models 时卸载最久未使用的"""
+
+    def __init__(self, load: Callable[[ModelKey], Any], max_models: int = 2):
+        self.load = load
+        self.max_models = max(max_models, 1)
+        self.models: "OrderedDict[ModelKey, Any]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.load_locks: Dict[ModelKey, threading.Lock] = {}
+        self.loads = 0
+        self.unloads = 0
+
+    def get(self, key: ModelKey) -> Any:
+        with self.lock:
+            model = self.models.get(key)
+            if model is not None:
+                self.models.move_to_end(key)
+                return model
+            load_lock = self.load_locks.setdefault(key, threading.Lock())
+
+        # 同一个模型只加载一次，其他模型的推理不受影响
+        with load_lock:
+            with self.lock:
+                model = self.models.get(key)
+            if model is None:
+                logger.info(f"Loading model {key}")
+                model = self.load(key)
+                with self.lock:
+                    self.models[key] = model
+                    self.loads += 1
+                    while len(self.models) > self.max_models:
+                        # 正在推理的批次仍持有引用，结束后才释放
+                        evicted, _ = self.models.popitem(last=False)
+                        self.unloads += 1
+                        logger.info(f"Unloaded least recently used model {evicted}")
+        with self.lock:
+            if key in self.models:
+                self.models.move_to_end(key)
+        return model
+
+    def loaded(self) -> List[str]:
+        with self.lock:
+            return ["/".join(key) for key in self.models]
+
+
+class InferenceScheduler:
+    """
+    排队转写请求并分派到 workers 个工作线程。
+
+    一个工作线程空闲时，取出队首的请求，并把队列中同一 batch_key 的短片段
+    （不超过 short_segment_s）一起合并，最多 max_batch 个；队列为空时最多再等
+    batch_window_ms 凑批。长片段和 beam_size 大于 1 的请求单独转写。
+    transcribe_batch(model, jobs) 在工作线程中运行，按顺序返回每个 job 的结果。
+    """
+
+    def __init__(
+        self,
+        load_model: Callable[[ModelKey], Any],
+        transcribe_batch: Callable[[Any, List[Job]], List[dict]],
+        workers: int = 2,
+        max_batch: int = 8,
+        batch_window_ms: int = 10,
+        max_models: int = 2,
+        short_segment_s: float = 30.0,
+        sample_rate: int = 16000,
+        resolve_key: Optional[Callable[[ModelKey], ModelKey]] = None,
+    ):
+        self.models = ModelCache(load_model, max_models)
+        # 请求的模型键换成实际加载的模型键
+        self.resolve_key = resolve_key
+        self.transcribe_batch = transcribe_batch
+        self.workers = max(workers, 1)
+        self.max_batch = max(max_batch, 1)
+        self.batch_window = batch_window_ms / 1000
+        self.short_samples = int(short_segment_s * sample_rate)
+        self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix="whisper")
+        self.queue: Optional[asyncio.Queue] = None
+        # 凑批时取出但不属于当前批次的请求，保持先来先服务
+        self.deferred: Deque[Job] = deque()
+        self.slots: Optional[asyncio.Semaphore] = None
+        self.dispatcher: Optional[asyncio.Task] = None
+        self.running = 0
+
+        self.queue_times = LatencyWindow()
+        self.inference_times = LatencyWindow()
+        self.batch_sizes = LatencyWindow()
+        self.completed = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        self.queue = asyncio.Queue()
+        self.slots = asyncio.Semaphore(self.workers)
+        self.dispatcher = asyncio.create_task(self._dispatch())
+
+    async def stop(self) -> None:
+        if self.dispatcher is not None:
+            self.dispatcher.cancel()
+            await asyncio.gather(self.dispatcher, return_exceptions=True)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def submit(
+        self,
+        model_key: ModelKey,
+        audio: np.ndarray,
+        language: str,
+        beam_size: int,
+        prompt: str = "",
+        on_dispatch: Optional[Callable[[], None]] = None,
+    ) -> dict:
+        if self.resolve_key is not None:
+            model_key = self.resolve_key(model_key)
+        job = Job(
+            model_key,
+            audio,
+            language,
+            beam_size,
+            asyncio.get_running_loop().create_future(),
+            prompt,
+            on_dispatch,
+        )
+        self.queue.put_nowait(job)
+        return await job.future
+
+    def _can_batch(self, job: Job) -> bool:
+        # openai-whisper 的 beam search 批量解码时 kv cache 维度出错，只合并贪心解码
+        return job.beam_size <= 1 and len(job.audio) <= self.short_samples
+
+    async def _next_job(self) -> Job:
+        if self.deferred:
+            return self.deferred.popleft()
+        return await self.queue.get()
+
+    async def _collect(self, first: Job) -> List[Job]:
+        batch = [first]
+        if not self._can_batch(first):
+            return batch
+
+        # 先从之前留下的请求里找同批次的
+        for job in list(self.deferred):
+            if len(batch) >= self.max_batch:
+                break
+            if job.batch_key == first.batch_key and self._can_batch(job):
+                self.deferred.remove(job)
+                batch.append(job)
+
+        deadline = time.perf_counter() + self.batch_window
+        while len(batch) < self.max_batch:
+            try:
+                job = self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    job = await asyncio.wait_for(self.queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            if job.batch_key == first.batch_key and self._can_batch(job):
+                batch.append(job)
+            else:
+                self.deferred.append(job)
+        return batch
+
+    async def _dispatch(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            first = await self._next_job()
+            # 等到有空闲工作线程再凑批，忙的时候队列里积累的请求正好合并
+            await self.slots.acquire()
+            try:
+                batch = await self._collect(first)
+            except BaseException:
+                self.slots.release()
+                raise
+            batch = [job for job in batch if not job.future.cancelled()]
+            if not batch:
+                self.slots.release()
+                continue
+            for job in batch:
+                if job.on_dispatch is not None:
+                    job.on_dispatch()
+            self.running += 1
+            task = loop.run_in_executor(self.executor, self._run, batch)
+            task.add_done_callback(lambda f, batch=batch: self._done(f, batch))
+
+    def _run(self, batch: List[Job]) -> List[dict]:
+        started = time.perf_counter()
+        for job in batch:
+            self.queue_times.record((started - job.submitted) * 1000)
+        model = self.models.get(batch[0].model_key)
+        inference_started = time.perf_counter()
+        results = self.transcribe_batch(model, batch)
+        self.inference_times.record((time.perf_counter() - inference_started) * 1000)
+        self.batch_sizes.record(len(batch))
+        return results
+
+    def _done(self, future: "asyncio.Future", batch: List[Job]) -> None:
+        self.running -= 1
+        self.slots.release()
+        error = future.exception()
+        for i, job in enumerate(batch):
+            if job.future.done():
+                continue
+            if error is not None:
+                job.future.set_exception(error)
+            else:
+                job.future.set_result(future.result()[i])
+        if error is not None:
+            self.failed += len(batch)
+            logger.error(f"Batch of {len(batch)} failed: {error}")
+        else:
+            self.completed += len(batch)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "busy_workers": self.running,
+            "queued": (self.queue.qsize() if self.queue else 0) + len(self.deferred),
+            "completed": self.completed,
+            "failed": self.failed,
+            "queue_time_ms": self.queue_times.stats(),
+            "inference_time_ms": self.inference_times.stats(),
+            "batch_size": self.batch_sizes.stats(),
+            "loaded_models": self.models.loaded(),
+            "model_loads": self.models.loads,
+            "model_unloads": self.models.unloads,
+        }
@@ -1,33 +1,16 @@
+import asyncio
 import os
-from fastapi import FastAPI, UploadFile
+from fastapi import FastAPI, File, Form, UploadFile, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-import whisper  # OpenAI's Whisper
 import numpy as np
 import uvicorn
 from typing import Optional
 import logging
 from dotenv import load_dotenv
-import torch  # 添加torch导入
 
-# 检查CUDA可用性
-CUDA_AVAILABLE = torch.cuda.is_available()
-
-# 添加详细的CUDA诊断信息
-logger = logging.getLogger("whisper_server")
-logger.info("=== CUDA Diagnostic Information ===")
-logger.info(f"PyTorch version: {torch.__version__}")
-logger.info(f"CUDA available: {CUDA_AVAILABLE}")
-if CUDA_AVAILABLE:
-    logger.info(f"CUDA version: {torch.version.cuda}")
-    logger.info(f"CUDA device: {torch.cuda.get_device_name(0)}")
-    logger.info(f"CUDA device count: {torch.cuda.device_count()}")
-    logger.info(f"Current CUDA device: {torch.cuda.current_device()}")
-else:
-    logger.warning("CUDA is not available. Using CPU instead.")
-    logger.info("Please check:")
-    logger.info("1. NVIDIA GPU is properly installed")
-    logger.info("2. CUDA drivers are installed")
-    logger.info("3. PyTorch is installed with CUDA support")
+from backends import SAMPLE_RATE, create_backend
+from scheduler import InferenceScheduler
+from streaming import StreamSession
 
 # 加载.env配置文件
 load_dotenv("config.env")
@@ -38,11 +21,18 @@ logging.basicConfig(
     level=getattr(logging, log_level.upper()),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
+logger = logging.getLogger("whisper_server")
+
+WORKERS = int(os.getenv("WHISPER_WORKERS", "2"))
+# 每次推理的 CPU 线程数，默认工作线程平分 CPU 核心
+CPU_THREADS = int(os.getenv("WHISPER_CPU_THREADS", "0")) or max((os.cpu_count() or 1) // WORKERS, 1)
 
-# 记录CUDA状态
-logger.info(f"CUDA available: {CUDA_AVAILABLE}")
-if CUDA_AVAILABLE:
-    logger.info(f"CUDA device: {torch.cuda.get_device_name(0)}")
+# 推理引擎：openai (PyTorch) 或 faster_whisper (CTranslate2)
+backend = create_backend(os.getenv("WHISPER_BACKEND", "openai"), CPU_THREADS, WORKERS)
+
+# 检查CUDA可用性
+CUDA_AVAILABLE = backend.cuda_available()
+logger.info(f"Backend: {backend.name}, CUDA available: {CUDA_AVAILABLE}, CPU threads: {CPU_THREADS}")
 
 app = FastAPI(title="Whisper STT Server")
 
@@ -55,90 +45,140 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 全局变量存储 Whisper 模型
-model = None
+DEFAULT_DEVICE = os.getenv("WHISPER_DEVICE", "cuda" if CUDA_AVAILABLE else "cpu")
+
+
+def default_compute_type(device: str) -> str:
+    return os.getenv("WHISPER_COMPUTE_TYPE") or backend.default_compute_type(device)
+
+
+scheduler = InferenceScheduler(
+    backend.load,
+    backend.transcribe_batch,
+    workers=WORKERS,
+    max_batch=int(os.getenv("WHISPER_MAX_BATCH", "8")) if backend.batching else 1,
+    batch_window_ms=int(os.getenv("WHISPER_BATCH_WINDOW_MS", "10")),
+    max_models=int(os.getenv("WHISPER_MAX_MODELS", "2")),
+    resolve_key=backend.resolve_key,
+)
+
+
+@app.on_event("startup")
+async def start_scheduler():
+    scheduler.start()
+    if os.getenv("WHISPER_PRELOAD", "true").lower() == "true":
+        # 预先加载默认模型，避免第一个请求等待
+        key = backend.resolve_key(
+            (os.getenv("WHISPER_MODEL", "medium"), DEFAULT_DEVICE, default_compute_type(DEFAULT_DEVICE))
+        )
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, scheduler.models.get, key)
+        except Exception as e:
+            logger.error(f"Error preloading model {key}: {str(e)}")
+
+
+@app.on_event("shutdown")
+async def stop_scheduler():
+    await scheduler.stop()
 
-def load_model(model_size: str = None, device: str = None):
-    global model
-    if model is None:
-        # 从环境变量获取配置，如果没有则使用参数值或默认值
-        model_size = model_size or os.getenv("WHISPER_MODEL", "medium")
-        device = device or os.getenv("WHISPER_DEVICE", "cuda" if CUDA_AVAILABLE else "cpu")
-        
-        logger.info(f"Loading Whisper model: {model_size} on device: {device}")
-        model = whisper.load_model(model_size)
-        
-        # 只有当设备为cuda且CUDA可用时才移动到GPU
-        if device == "cuda" and CUDA_AVAILABLE:
-            model = model.cuda()
-        else:
-            model = model.cpu()
-            
-        logger.info("Model loaded successfully")
-    return model
 
 @app.post("/transcribe")
 async def transcribe_audio(
-    file: UploadFile,
-    model_size: Optional[str] = None,
-    language: Optional[str] = None,
-    device: Optional[str] = None
+    file: UploadFile = File(...),
+    model_size: Optional[str] = Form(None),
+    language: Optional[str] = Form(None),
+    device: Optional[str] = Form(None),
+    compute_type: Optional[str] = Form(None),
+    beam_size: int = Form(5),
+    sample_rate: int = Form(SAMPLE_RATE),
+    request_id: Optional[str] = Form(None),
 ):
     """
     将音频转写为文本
-    
+
     Args:
-        file: 音频文件
+        file: 16 位单声道 PCM 音频
         model_size: Whisper模型大小 (可选，默认使用环境变量配置)
         language: 目标语言 (可选，默认使用环境变量配置)
         device: 运行设备 (可选，默认使用环境变量配置)
-    
+        compute_type: 计算精度 (可选，openai 后端为 float16/float32，faster_whisper 后端
+            还支持 int8/int8_float32 等，默认使用环境变量配置或后端的默认值)
+        beam_size: beam search 宽度，1 为贪心解码
+        sample_rate: 音频采样率，非 16kHz 时重采样
+        request_id: 客户端请求 ID，原样返回
+
     Returns:
         dict: 包含转写文本和其他信息
     """
     try:
-        # 加载模型
-        model = load_model(model_size, device)
-        
         # 读取音频数据
         content = await file.read()
         audio_np = np.frombuffer(content, dtype=np.int16).astype(np.float32) / 32768.0
-        
-        logger.info(f"Processing audio file: {file.filename}, size: {len(content)} bytes")
-        
+        if sample_rate != SAMPLE_RATE and len(audio_np):
+            duration = len(audio_np) / sample_rate
+            audio_np = np.interp(
+                np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE,
+                np.arange(len(audio_np)) / sample_rate,
+                audio_np,
+            ).astype(np.float32)
+
+        logger.info(f"Processing audio file: {file.filename}, size: {len(content)} bytes, request_id: {request_id}")
+
         # 使用环境变量配置或参数值
+        model_size = model_size or os.getenv("WHISPER_MODEL", "medium")
+        device = device or DEFAULT_DEVICE
+        compute_type = compute_type or default_compute_type(device)
         language = language or os.getenv("WHISPER_LANGUAGE", "zh")
-        
-        # 转写音频
-        result = model.transcribe(
-            audio_np,
-            language=language,
-            task="transcribe"
+
+        # 排队等待工作线程转写，不阻塞事件循环
+        result = await scheduler.submit(
+            (model_size, device, compute_type), audio_np, language, beam_size
         )
-        
+
         logger.info(f"Transcription completed successfully")
-        
-        return {
-            "text": result["text"],
-            "segments": result["segments"],
-            "language": result["language"]
-        }
-        
+
+        return {**result, "request_id": request_id}
+
     except Exception as e:
         logger.error(f"Error during transcription: {str(e)}")
         raise
 
+@app.websocket("/ws/transcribe")
+async def transcribe_stream(websocket: WebSocket):
+    """
+    流式转写：客户端持续发送 16 位 PCM，按需请求 partial/final 结果，
+    协议见 streaming.StreamSession
+    """
+    await websocket.accept()
+    device = DEFAULT_DEVICE
+    session = StreamSession(
+        websocket,
+        scheduler,
+        (os.getenv("WHISPER_MODEL", "medium"), device, default_compute_type(device)),
+        os.getenv("WHISPER_LANGUAGE", "zh"),
+        beam_size=5,
+        sample_rate=SAMPLE_RATE,
+    )
+    logger.info(f"Streaming connection opened: {websocket.client}")
+    await session.run()
+    logger.info(f"Streaming connection closed: {websocket.client}, dropped partials: {session.dropped_partials}")
+
 @app.get("/health")
 async def health_check():
     """健康检查接口"""
+    stats = scheduler.stats()
     return {
         "status": "healthy",
-        "model_loaded": model is not None,
+        "model_loaded": bool(stats["loaded_models"]),
         "cuda_available": CUDA_AVAILABLE,
-        "cuda_device": torch.cuda.get_device_name(0) if CUDA_AVAILABLE else None,
+        "cuda_device": backend.cuda_device_name(),
+        "scheduler": stats,
         "config": {
+            "backend": backend.name,
             "model_size": os.getenv("WHISPER_MODEL", "medium"),
-            "device": os.getenv("WHISPER_DEVICE", "cuda" if CUDA_AVAILABLE else "cpu"),
+            "device": DEFAULT_DEVICE,
+            "compute_type": default_compute_type(DEFAULT_DEVICE),
+            "cpu_threads": CPU_THREADS,
             "language": os.getenv("WHISPER_LANGUAGE", "zh"),
             "log_level": os.getenv("LOG_LEVEL", "INFO")
         }
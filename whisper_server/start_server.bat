@@ -61,6 +61,7 @@ if not exist config.env (
     echo Warning: config.env not found, creating from template...
     (
         echo # Whisper Model Configuration
+        echo WHISPER_BACKEND=openai   # Options: openai, faster_whisper
         echo WHISPER_MODEL=medium     # Options: tiny, base, small, medium, large
         echo WHISPER_DEVICE=cuda     # Options: cuda, cpu
         echo WHISPER_LANGUAGE=zh     # Default language
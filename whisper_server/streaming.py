@@ -0,0 +1,199 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Optional
+
+import numpy as np
+from fastapi import WebSocket, WebSocketDisconnect
+
+from scheduler import InferenceScheduler, ModelKey
+
+logger = logging.getLogger("whisper_server")
+
+# 每个连接保留的音频长度（秒），请求只能引用这段时间内的音频
+CONTEXT_SECONDS = 60
+# 作为下一句提示的上文长度（字符）
+PROMPT_CHARS = 200
+
+
+class AudioContext:
+    """按绝对样本位置寻址的 float32 环形缓冲区，保留最近 capacity 个样本"""
+
+    def __init__(self, capacity: int, position: int = 0):
+        self.buf = np.zeros(capacity, dtype=np.float32)
+        self.capacity = capacity
+        self.first = position  # 重连的流从这里开始，之前的音频不在本连接
+        self.end = position  # 最后一个样本之后的位置
+
+    @property
+    def start(self) -> int:
+        return max(self.end - self.capacity, self.first)
+
+    def write(self, samples: np.ndarray) -> None:
+        if len(samples) > self.capacity:
+            self.end += len(samples) - self.capacity
+            samples = samples[-self.capacity :]
+        offset = self.end % self.capacity
+        first = min(len(samples), self.capacity - offset)
+        self.buf[offset : offset + first] = samples[:first]
+        self.buf[: len(samples) - first] = samples[first:]
+        self.end += len(samples)
+
+    def read(self, start: int, end: int) -> np.ndarray:
+        """[start, end) 的副本，超出保留范围的部分被截掉"""
+        start = max(start, self.start)
+        end = min(end, self.end)
+        if end <= start:
+            return np.zeros(0, dtype=np.float32)
+        offset = start % self.capacity
+        if offset + end - start <= self.capacity:
+            return self.buf[offset : offset + end - start].copy()
+        return np.concatenate([self.buf[offset:], self.buf[: end % self.capacity]])
+
+
+class StreamSession:
+    """
+    /ws/transcribe 的一个连接。
+
+    客户端先发送 start 消息（可选）设置转写参数，之后以二进制消息发送 16 位 PCM，
+    服务器按样本位置保存最近 CONTEXT_SECONDS 秒。需要结果时客户端发送
+    {"type": "partial"|"final", "id": n, "start": s, "end": e}，转写 [s, e) 的音频；
+    省略 start 时从上一个 final 的结尾开始，省略 end 时到已收到的最后一个样本。
+    上一句 final 的文本作为下一次解码的提示。结果按请求顺序返回，
+    新请求到来时还在排队的 partial 已过时，会被丢弃；已经开始解码的 partial 照常返回。
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        scheduler: InferenceScheduler,
+        model_key: ModelKey,
+        language: str,
+        beam_size: int,
+        sample_rate: int = 16000,
+    ):
+        self.websocket = websocket
+        self.scheduler = scheduler
+        self.model_key = model_key
+        self.language = language
+        self.beam_size = beam_size
+        self.sample_rate = sample_rate
+        self.audio = AudioContext(CONTEXT_SECONDS * sample_rate)
+        self.final_end = 0
+        self.prompt = ""
+        # (请求, task, 提交时间) 按请求顺序，None 结束发送
+        self.pending: asyncio.Queue = asyncio.Queue()
+        self.waiting_partial: Optional[asyncio.Task] = None
+        self.tasks: set = set()
+        self.dropped_partials = 0
+
+    def configure(self, message: dict) -> None:
+        model_size, device, compute_type = self.model_key
+        self.model_key = (
+            message.get("model_size") or model_size,
+            message.get("device") or device,
+            message.get("compute_type") or compute_type,
+        )
+        self.language = message.get("language") or self.language
+        self.beam_size = int(message.get("beam_size") or self.beam_size)
+        if int(message.get("sample_rate") or self.sample_rate) != self.sample_rate:
+            raise ValueError(f"Only {self.sample_rate}Hz audio is supported")
+        # 重连的客户端从它的当前位置继续编号
+        position = int(message.get("position", 0))
+        self.audio = AudioContext(self.audio.capacity, position)
+        self.final_end = position
+
+    def request(self, message: dict) -> None:
+        if self.waiting_partial is not None and not self.waiting_partial.done():
+            self.waiting_partial.cancel()
+            self.dropped_partials += 1
+        start = int(message.get("start", self.final_end))
+        end = int(message.get("end", self.audio.end))
+        audio = self.audio.read(start, end)
+        is_final = message["type"] == "final"
+        if is_final:
+            self.final_end = max(self.final_end, end)
+        task = asyncio.create_task(self._transcribe(audio, is_final))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        self.waiting_partial = None if is_final else task
+        self.pending.put_nowait(
+            ({**message, "start": start, "end": end}, task, time.perf_counter())
+        )
+
+    async def _transcribe(self, audio: np.ndarray, is_final: bool) -> dict:
+        if not len(audio):
+            return {"text": ""}
+        task = asyncio.current_task()
+
+        def dispatched():
+            if self.waiting_partial is task:
+                self.waiting_partial = None  # 已在解码，取消只会浪费这次推理
+
+        result = await self.scheduler.submit(
+            self.model_key, audio, self.language, self.beam_size, self.prompt, dispatched
+        )
+        if is_final and result["text"].strip():
+            self.prompt = (self.prompt + " " + result["text"].strip())[-PROMPT_CHARS:]
+        return result
+
+    async def _send_results(self) -> None:
+        while True:
+            item = await self.pending.get()
+            if item is None:
+                break
+            message, task, submitted = item
+            await asyncio.wait([task])
+            if task.cancelled():
+                continue
+            response = {
+                "type": message["type"],
+                "id": message.get("id"),
+                "start": message["start"],
+                "end": message["end"],
+            }
+            if task.exception() is not None:
+                logger.error(f"Error during streaming transcription: {task.exception()}")
+                response.update(type="error", message=str(task.exception()))
+            else:
+                response.update(
+                    text=task.result()["text"],
+                    latency_ms=round((time.perf_counter() - submitted) * 1000),
+                )
+            await self.websocket.send_json(response)
+
+    async def run(self) -> None:
+        sender = asyncio.create_task(self._send_results())
+        try:
+            while True:
+                message = await self.websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    return
+                if message.get("bytes") is not None:
+                    samples = np.frombuffer(message["bytes"], dtype=np.int16)
+                    self.audio.write(samples.astype(np.float32) / 32768.0)
+                    continue
+
+                try:
+                    control = json.loads(message["text"])
+                    if control["type"] == "start":
+                        self.configure(control)
+                    elif control["type"] in ("partial", "final"):
+                        self.request(control)
+                    elif control["type"] == "stop":
+                        break
+                except (ValueError, KeyError) as e:
+                    await self.websocket.send_json({"type": "error", "message": str(e)})
+
+            # 发送完已请求的结果再关闭
+            self.pending.put_nowait(None)
+            await sender
+            await self.websocket.close()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            sender.cancel()
+            # 客户端断开后不再转写还在排队的片段
+            for task in list(self.tasks):
+                task.cancel()
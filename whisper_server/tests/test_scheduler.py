@@ -0,0 +1,140 @@
+import asyncio
+from pathlib import Path
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scheduler import InferenceScheduler, ModelCache  # noqa: E402
+
+SR = 16000
+KEY = ("base", "cpu", "int8")
+
+
+class FakeModel:
+    """transcribe_batch 记录每批的片段，第一批等 gate 放行后才返回"""
+
+    def __init__(self):
+        self.batches = []
+        self.running = threading.Event()
+        self.gate = threading.Event()
+
+    def load(self, key):
+        return key
+
+    def transcribe_batch(self, model, jobs):
+        self.batches.append([int(job.audio[0]) for job in jobs])
+        self.running.set()
+        self.gate.wait(5)
+        return [{"text": str(int(job.audio[0]))} for job in jobs]
+
+
+def audio(tag: int, seconds: float = 1.0) -> np.ndarray:
+    return np.full(int(seconds * SR), tag, dtype=np.float32)
+
+
+def run(test):
+    """在 workers=1 的调度器上运行 test(scheduler, fake)"""
+
+    async def main():
+        fake = FakeModel()
+        scheduler = InferenceScheduler(
+            fake.load, fake.transcribe_batch, workers=1, short_segment_s=30
+        )
+        scheduler.start()
+        try:
+            await asyncio.wait_for(test(scheduler, fake), 5)
+        finally:
+            fake.gate.set()
+            await scheduler.stop()
+
+    asyncio.run(main())
+
+
+async def occupy_worker(scheduler, fake):
+    """提交第一个请求，等它在工作线程上阻塞，之后的请求都在队列里等"""
+    first = asyncio.create_task(scheduler.submit(KEY, audio(0), "en", 1))
+    await asyncio.get_running_loop().run_in_executor(None, fake.running.wait, 5)
+    return first
+
+
+def test_batches_group_by_key_and_keep_deferred_jobs_in_order():
+    async def test(scheduler, fake):
+        first = await occupy_worker(scheduler, fake)
+        requests = [
+            (audio(1), "en", 1),
+            (audio(2), "zh", 1),  # 语言不同
+            (audio(3), "en", 1),
+            (audio(4, 40), "en", 1),  # 超过 short_segment_s
+            (audio(5), "en", 5),  # beam search
+            (audio(6), "zh", 1),
+        ]
+        tasks = [asyncio.create_task(scheduler.submit(KEY, *r)) for r in requests]
+        await asyncio.sleep(0.05)
+        fake.gate.set()
+        results = await asyncio.gather(first, *tasks)
+
+        assert [r["text"] for r in results] == [str(i) for i in range(7)]
+        # 1 的批次带走了 3，被跳过的请求按到达顺序处理
+        assert fake.batches == [[0], [1, 3], [2, 6], [4], [5]]
+        assert scheduler.stats()["completed"] == 7
+
+    run(test)
+
+
+def test_cancelled_job_is_skipped_and_releases_its_slot():
+    async def test(scheduler, fake):
+        first = await occupy_worker(scheduler, fake)
+        cancelled = asyncio.create_task(scheduler.submit(KEY, audio(1), "en", 1))
+        await asyncio.sleep(0.05)
+        cancelled.cancel()
+        fake.gate.set()
+        await first
+        await asyncio.sleep(0.05)
+
+        # 只有一个工作线程，取消的请求没有释放名额时这里会超时
+        result = await scheduler.submit(KEY, audio(2), "zh", 1)
+        assert result["text"] == "2"
+        assert fake.batches == [[0], [2]]
+        assert scheduler.stats()["busy_workers"] == 0
+
+    run(test)
+
+
+def test_model_is_loaded_once_by_concurrent_callers():
+    loads = []
+
+    def load(key):
+        loads.append(key)
+        time.sleep(0.05)
+        return object()
+
+    cache = ModelCache(load, max_models=2)
+    models = []
+    threads = [threading.Thread(target=lambda: models.append(cache.get(KEY))) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert loads == [KEY]
+    assert len(models) == 4 and all(m is models[0] for m in models)
+    assert cache.loads == 1
+
+
+def test_least_recently_used_model_is_unloaded():
+    cache = ModelCache(lambda key: key, max_models=2)
+    tiny, base, small = [(size, "cpu", "int8") for size in ("tiny", "base", "small")]
+    cache.get(tiny)
+    cache.get(base)
+    cache.get(tiny)  # base 变成最久未使用
+    cache.get(small)
+
+    assert cache.loaded() == ["tiny/cpu/int8", "small/cpu/int8"]
+    assert (cache.loads, cache.unloads) == (3, 1)
+    cache.get(base)
+    assert cache.loaded() == ["small/cpu/int8", "base/cpu/int8"]
+    assert (cache.loads, cache.unloads) == (4, 2)